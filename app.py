@@ -1,8 +1,7 @@
 import streamlit as st
 import os
-import time
 import subprocess
-from modules.database import get_connection, test_connection, ensure_system_roles, merge_role_alias, get_user_info_safe, process_automatic_notifications
+from modules.database import get_connection, test_connection, run_startup_maintenance, get_user_info_safe
 from modules.utils import apply_custom_css, initialize_session_state, safe_rerun
 from modules.ui_components import render_login_tabs, render_sidebar_profile, render_no_view_dashboard, render_db_config_screen
 from modules.cookie_auth import check_auth_cookie, init_cookie_manager
@@ -80,41 +79,12 @@ def main():
     check_auth_cookie()
 
     try:
-        ensure_system_roles()
-    except Exception:
-        pass
-    try:
-        from modules.database import ensure_roles_view_type_column
-        ensure_roles_view_type_column()
-    except Exception:
-        pass
-    try:
-        from modules.database import ensure_clientes_schema, ensure_projects_schema, ensure_contactos_schema, ensure_cliente_solicitudes_schema
-        ensure_clientes_schema()
-        ensure_projects_schema()
-        ensure_contactos_schema()
-        ensure_cliente_solicitudes_schema()
-    except Exception:
-        pass
-    try:
-        merge_role_alias('Sin Rol', 'sin_rol')
-    except Exception:
-        pass
-    try:
-        from modules.database import fix_administracion_department_role
-        fix_administracion_department_role()
-    except Exception:
-        pass
-
-    try:
-        current_ts = time.time()
-        last_notification_run = float(st.session_state.get("automatic_notification_last_run", 0.0) or 0.0)
-        if current_ts - last_notification_run >= 60:
-            process_automatic_notifications()
-            st.session_state["automatic_notification_last_run"] = current_ts
+        # Migraciones de esquema y normalización de roles: solo la primera vez en el proceso
+        run_startup_maintenance()
     except Exception as e:
-        log_app_error(e, module="app", function="main.process_automatic_notifications")
+        log_app_error(e, module="app", function="main.run_startup_maintenance")
 
+    # Los correos automáticos los envía el worker (python -m modules.notification_worker)
 
     if st.session_state.user_id is None:
         render_login_tabs()
@@ -1,7 +1,64 @@
+import unicodedata
+
 import streamlit as st
 from .database import get_connection
 
 
+def _load_assignment_mapping(c, asignaciones):
+    """Materializa {id_tecnico: usuario_id} en la tabla temporal asignacion_tecnicos"""
+    from psycopg2.extras import execute_values
+
+    c.execute("DROP TABLE IF EXISTS pg_temp.asignacion_tecnicos")
+    c.execute("""
+        CREATE TEMP TABLE asignacion_tecnicos (
+            id_tecnico INTEGER PRIMARY KEY,
+            usuario_id INTEGER NOT NULL
+        ) ON COMMIT DROP
+    """)
+    if asignaciones:
+        execute_values(c, "INSERT INTO asignacion_tecnicos (id_tecnico, usuario_id) VALUES %s",
+                       list(asignaciones.items()))
+
+
+def apply_assignment_mapping(conn, asignaciones, solo_sin_asignar=False, dry_run=False):
+    """
+    Asigna los registros de cada técnico a su usuario con un único UPDATE ... FROM.
+
+    Args:
+        conn: Conexión (el commit queda a cargo del llamador)
+        asignaciones: dict {id_tecnico: usuario_id}
+        solo_sin_asignar: Solo tocar registros con usuario_id NULL
+        dry_run: No modificar nada; solo contar qué registros cambiarían
+
+    Returns:
+        dict: {id_tecnico: registros asignados (o que se asignarían)}; solo se
+        cuentan registros cuyo usuario realmente cambia
+    """
+    c = conn.cursor()
+    _load_assignment_mapping(c, asignaciones)
+    filtro = "AND r.usuario_id IS NULL" if solo_sin_asignar else "AND r.usuario_id IS DISTINCT FROM m.usuario_id"
+    if dry_run:
+        c.execute(f"""
+            SELECT m.id_tecnico, COUNT(*)
+            FROM asignacion_tecnicos m
+            JOIN registros r ON r.id_tecnico = m.id_tecnico {filtro}
+            GROUP BY m.id_tecnico
+        """)
+        conteos = dict(c.fetchall())
+        c.execute("DROP TABLE asignacion_tecnicos")
+        return conteos
+    c.execute(f"""
+        WITH actualizados AS (
+            UPDATE registros r SET usuario_id = m.usuario_id
+            FROM asignacion_tecnicos m
+            WHERE r.id_tecnico = m.id_tecnico {filtro}
+            RETURNING r.id_tecnico
+        )
+        SELECT id_tecnico, COUNT(*) FROM actualizados GROUP BY id_tecnico
+    """)
+    return dict(c.fetchall())
+
+
 def fix_existing_records_assignment(conn=None):
     """Corrige la asignación de registros existentes basándose en el nombre del técnico y su rol"""
     close_conn = False
@@ -29,7 +86,6 @@ def fix_existing_records_assignment(conn=None):
     tecnicos = c.fetchall()
 
     with st.spinner(f"Procesando {len(usuarios)} usuarios y {len(tecnicos)} técnicos..."):
-        registros_asignados = 0
         tecnicos_procesados = set()
 
         def normalizar_texto(texto):
@@ -118,15 +174,16 @@ def fix_existing_records_assignment(conn=None):
         # Aumentar el umbral mínimo para evitar asignaciones incorrectas
         UMBRAL_MINIMO = 70  # Aumentado de 50 a 70 para mayor precisión
 
+        asignaciones = {}
         for tecnico_id, tecnico_nombre in tecnicos:
             mejor_usuario, mejor_puntuacion = find_matching_user_flexible(tecnico_nombre, usuarios)
             # Solo asignar si hay una coincidencia válida Y supera el umbral mínimo
             if mejor_usuario and mejor_puntuacion >= UMBRAL_MINIMO:
                 tecnicos_procesados.add(tecnico_id)
-                c.execute("UPDATE registros SET usuario_id = %s WHERE id_tecnico = %s AND usuario_id IS NULL", 
-                         (mejor_usuario["id"], tecnico_id))
-                registros_actualizados = c.rowcount
-                registros_asignados += registros_actualizados
+                asignaciones[tecnico_id] = mejor_usuario["id"]
+
+        # Una sola sentencia para todos los técnicos emparejados
+        registros_asignados = sum(apply_assignment_mapping(conn, asignaciones, solo_sin_asignar=True).values())
 
         if registros_asignados > 0:
             conn.commit()
@@ -158,6 +215,170 @@ def fix_existing_records_assignment(conn=None):
     return registros_asignados
 
 
+def _normalizar_componente(texto):
+    """Normaliza texto removiendo acentos y convirtiendo a minúsculas"""
+    if not texto:
+        return ""
+    texto_sin_acentos = ''.join(c for c in unicodedata.normalize('NFD', texto) 
+                               if unicodedata.category(c) != 'Mn')
+    return texto_sin_acentos.lower().strip()
+
+
+def _extraer_componentes(texto_completo):
+    """Extrae todos los componentes de un nombre completo"""
+    if not texto_completo:
+        return []
+    # Dividir por espacios y filtrar componentes vacíos
+    componentes = [_normalizar_componente(comp) for comp in texto_completo.split() if comp.strip()]
+    return [comp for comp in componentes if comp]  # Filtrar strings vacíos
+
+
+def _calcular_coincidencia_componentes(componentes_tecnico, componentes_usuario):
+    """
+    Calcula la tasa de coincidencia entre componentes de nombres.
+    
+    Returns:
+        dict: {
+            'coincidencias': int,
+            'total_tecnico': int,
+            'total_usuario': int,
+            'tasa_tecnico': float,  # coincidencias / total_tecnico
+            'tasa_usuario': float,  # coincidencias / total_usuario
+            'tasa_promedio': float,
+            'componentes_coincidentes': list
+        }
+    """
+    if not componentes_tecnico or not componentes_usuario:
+        return {
+            'coincidencias': 0,
+            'total_tecnico': len(componentes_tecnico),
+            'total_usuario': len(componentes_usuario),
+            'tasa_tecnico': 0.0,
+            'tasa_usuario': 0.0,
+            'tasa_promedio': 0.0,
+            'componentes_coincidentes': []
+        }
+    
+    coincidencias = 0
+    componentes_coincidentes = []
+    componentes_usuario_usados = set()
+    
+    # Buscar coincidencias exactas
+    for comp_tecnico in componentes_tecnico:
+        for i, comp_usuario in enumerate(componentes_usuario):
+            if i not in componentes_usuario_usados and comp_tecnico == comp_usuario:
+                coincidencias += 1
+                componentes_coincidentes.append(comp_tecnico)
+                componentes_usuario_usados.add(i)
+                break
+    
+    total_tecnico = len(componentes_tecnico)
+    total_usuario = len(componentes_usuario)
+    
+    tasa_tecnico = coincidencias / total_tecnico if total_tecnico > 0 else 0
+    tasa_usuario = coincidencias / total_usuario if total_usuario > 0 else 0
+    tasa_promedio = (tasa_tecnico + tasa_usuario) / 2
+    
+    return {
+        'coincidencias': coincidencias,
+        'total_tecnico': total_tecnico,
+        'total_usuario': total_usuario,
+        'tasa_tecnico': tasa_tecnico,
+        'tasa_usuario': tasa_usuario,
+        'tasa_promedio': tasa_promedio,
+        'componentes_coincidentes': componentes_coincidentes
+    }
+
+
+def _puntuar_coincidencia(resultado, componentes_tecnico):
+    """Puntuación 0-100 de una coincidencia calculada por _calcular_coincidencia_componentes"""
+    puntuacion = 0
+    
+    # Criterio 1: Coincidencia perfecta (100 puntos)
+    if (resultado['coincidencias'] == resultado['total_tecnico'] and 
+        resultado['coincidencias'] == resultado['total_usuario']):
+        puntuacion = 100
+    
+    # Criterio 2: Alta coincidencia con todos los componentes del técnico (90-95 puntos)
+    elif resultado['tasa_tecnico'] == 1.0:  # Todos los componentes del técnico coinciden
+        if resultado['tasa_usuario'] >= 0.8:  # Al menos 80% del usuario coincide
+            puntuacion = 95
+        else:
+            puntuacion = 90
+    
+    # Criterio 3: Alta coincidencia bidireccional (80-89 puntos)
+    elif resultado['tasa_promedio'] >= 0.8:
+        puntuacion = 80 + (resultado['tasa_promedio'] * 9)  # 80-89 puntos
+    
+    # Criterio 4: Coincidencia moderada (60-79 puntos)
+    elif resultado['tasa_promedio'] >= 0.6:
+        puntuacion = 60 + (resultado['tasa_promedio'] * 19)  # 60-79 puntos
+    
+    # Criterio 5: Coincidencia mínima (40-59 puntos)
+    elif resultado['coincidencias'] >= 2 or resultado['tasa_promedio'] >= 0.4:
+        puntuacion = 40 + (resultado['tasa_promedio'] * 19)  # 40-59 puntos
+    
+    # Bonificaciones adicionales
+    if resultado['coincidencias'] >= 3:  # 3 o más componentes coinciden
+        puntuacion += 5
+    
+    if resultado['coincidencias'] >= len(componentes_tecnico) // 2:  # Más de la mitad coincide
+        puntuacion += 3
+    
+    # Penalizaciones por diferencias significativas en cantidad de componentes
+    diferencia_componentes = abs(resultado['total_tecnico'] - resultado['total_usuario'])
+    if diferencia_componentes > 2:
+        puntuacion -= diferencia_componentes * 2
+    
+    # Asegurar que la puntuación esté en el rango válido
+    return max(0, min(100, puntuacion))
+
+
+class UserNameIndex:
+    """
+    Componentes de nombre de los usuarios normalizados una sola vez, con un índice
+    invertido componente -> usuarios para puntuar solo a los que comparten alguno.
+    """
+
+    def __init__(self, usuarios_info):
+        self.usuarios = []  # (usuario, nombre_completo, componentes) en el orden recibido
+        self.por_componente = {}
+        self.total = 0
+        for usuario in usuarios_info:
+            self.total += 1
+            usuario_id, nombre, apellido, rol_id, rol_nombre = usuario
+            nombre_completo_usuario = f"{nombre} {apellido}".strip()
+            componentes_usuario = _extraer_componentes(nombre_completo_usuario)
+            if not componentes_usuario:
+                continue
+            pos = len(self.usuarios)
+            self.usuarios.append((usuario, nombre_completo_usuario, componentes_usuario))
+            for comp in set(componentes_usuario):
+                self.por_componente.setdefault(comp, []).append(pos)
+
+    def __len__(self):
+        return self.total
+
+    def candidatos(self, componentes_tecnico):
+        """Posiciones (ordenadas) de los usuarios con al menos un componente en común"""
+        posiciones = set()
+        for comp in set(componentes_tecnico):
+            posiciones.update(self.por_componente.get(comp, ()))
+        return sorted(posiciones)
+
+    def primer_usuario_corto(self, excluir):
+        """Primer usuario de 1-3 componentes fuera de `excluir`.
+
+        Sin componentes en común la puntuación es 0, salvo frente a un técnico de un
+        solo componente: ahí la bonificación por mitad coincidente (0 >= 1 // 2) da 3
+        puntos a los usuarios sin penalización por diferencia de tamaño (1-3 componentes).
+        """
+        for pos, (_, _, componentes_usuario) in enumerate(self.usuarios):
+            if pos not in excluir and len(componentes_usuario) <= 3:
+                return pos
+        return None
+
+
 def find_matching_user_by_components(tecnico_nombre, usuarios_info, umbral_minimo=70):
     """
     Algoritmo mejorado de coincidencia basado en componentes individuales de nombres.
@@ -165,150 +386,41 @@ def find_matching_user_by_components(tecnico_nombre, usuarios_info, umbral_minim
     
     Args:
         tecnico_nombre: Nombre del técnico a buscar
-        usuarios_info: Lista de usuarios [(id, nombre, apellido, rol_id, rol_nombre)]
+        usuarios_info: Lista de usuarios [(id, nombre, apellido, rol_id, rol_nombre)] o un
+            UserNameIndex ya construido (conviene al buscar muchos técnicos)
         umbral_minimo: Puntuación mínima para considerar una coincidencia válida
     
     Returns:
         tuple: (mejor_usuario, mejor_puntuacion)
     """
-    import unicodedata
-    
-    def normalizar_texto(texto):
-        """Normaliza texto removiendo acentos y convirtiendo a minúsculas"""
-        if not texto:
-            return ""
-        texto_sin_acentos = ''.join(c for c in unicodedata.normalize('NFD', texto) 
-                                   if unicodedata.category(c) != 'Mn')
-        return texto_sin_acentos.lower().strip()
-    
-    def extraer_componentes(texto_completo):
-        """Extrae todos los componentes de un nombre completo"""
-        if not texto_completo:
-            return []
-        # Dividir por espacios y filtrar componentes vacíos
-        componentes = [normalizar_texto(comp) for comp in texto_completo.split() if comp.strip()]
-        return [comp for comp in componentes if comp]  # Filtrar strings vacíos
-    
-    def calcular_coincidencia_componentes(componentes_tecnico, componentes_usuario):
-        """
-        Calcula la tasa de coincidencia entre componentes de nombres.
-        
-        Returns:
-            dict: {
-                'coincidencias': int,
-                'total_tecnico': int,
-                'total_usuario': int,
-                'tasa_tecnico': float,  # coincidencias / total_tecnico
-                'tasa_usuario': float,  # coincidencias / total_usuario
-                'tasa_promedio': float,
-                'componentes_coincidentes': list
-            }
-        """
-        if not componentes_tecnico or not componentes_usuario:
-            return {
-                'coincidencias': 0,
-                'total_tecnico': len(componentes_tecnico),
-                'total_usuario': len(componentes_usuario),
-                'tasa_tecnico': 0.0,
-                'tasa_usuario': 0.0,
-                'tasa_promedio': 0.0,
-                'componentes_coincidentes': []
-            }
-        
-        coincidencias = 0
-        componentes_coincidentes = []
-        componentes_usuario_usados = set()
-        
-        # Buscar coincidencias exactas
-        for comp_tecnico in componentes_tecnico:
-            for i, comp_usuario in enumerate(componentes_usuario):
-                if i not in componentes_usuario_usados and comp_tecnico == comp_usuario:
-                    coincidencias += 1
-                    componentes_coincidentes.append(comp_tecnico)
-                    componentes_usuario_usados.add(i)
-                    break
-        
-        total_tecnico = len(componentes_tecnico)
-        total_usuario = len(componentes_usuario)
-        
-        tasa_tecnico = coincidencias / total_tecnico if total_tecnico > 0 else 0
-        tasa_usuario = coincidencias / total_usuario if total_usuario > 0 else 0
-        tasa_promedio = (tasa_tecnico + tasa_usuario) / 2
-        
-        return {
-            'coincidencias': coincidencias,
-            'total_tecnico': total_tecnico,
-            'total_usuario': total_usuario,
-            'tasa_tecnico': tasa_tecnico,
-            'tasa_usuario': tasa_usuario,
-            'tasa_promedio': tasa_promedio,
-            'componentes_coincidentes': componentes_coincidentes
-        }
-    
+    indice = usuarios_info if isinstance(usuarios_info, UserNameIndex) else UserNameIndex(usuarios_info)
+
     # Extraer componentes del técnico
-    componentes_tecnico = extraer_componentes(tecnico_nombre)
+    componentes_tecnico = _extraer_componentes(tecnico_nombre)
     
     if not componentes_tecnico:
         return None, 0
     
+    # Solo se puntúa a quienes comparten componentes; el resto puntúa 0, salvo el caso
+    # de un técnico de un componente (ver UserNameIndex.primer_usuario_corto)
+    posiciones = indice.candidatos(componentes_tecnico)
+    if len(componentes_tecnico) == 1:
+        pos_extra = indice.primer_usuario_corto(set(posiciones))
+        if pos_extra is not None:
+            posiciones = sorted(posiciones + [pos_extra])
+
     mejor_usuario = None
     mejor_puntuacion = 0
-    mejor_detalle = None
     
-    for usuario_id, nombre, apellido, rol_id, rol_nombre in usuarios_info:
-        # Crear nombre completo del usuario
-        nombre_completo_usuario = f"{nombre} {apellido}".strip()
-        componentes_usuario = extraer_componentes(nombre_completo_usuario)
-        
-        if not componentes_usuario:
-            continue
-        
-        # Calcular coincidencia
-        resultado = calcular_coincidencia_componentes(componentes_tecnico, componentes_usuario)
-        
-        # Calcular puntuación basada en diferentes criterios
-        puntuacion = 0
-        
-        # Criterio 1: Coincidencia perfecta (100 puntos)
-        if (resultado['coincidencias'] == resultado['total_tecnico'] and 
-            resultado['coincidencias'] == resultado['total_usuario']):
-            puntuacion = 100
-        
-        # Criterio 2: Alta coincidencia con todos los componentes del técnico (90-95 puntos)
-        elif resultado['tasa_tecnico'] == 1.0:  # Todos los componentes del técnico coinciden
-            if resultado['tasa_usuario'] >= 0.8:  # Al menos 80% del usuario coincide
-                puntuacion = 95
-            else:
-                puntuacion = 90
-        
-        # Criterio 3: Alta coincidencia bidireccional (80-89 puntos)
-        elif resultado['tasa_promedio'] >= 0.8:
-            puntuacion = 80 + (resultado['tasa_promedio'] * 9)  # 80-89 puntos
-        
-        # Criterio 4: Coincidencia moderada (60-79 puntos)
-        elif resultado['tasa_promedio'] >= 0.6:
-            puntuacion = 60 + (resultado['tasa_promedio'] * 19)  # 60-79 puntos
+    for pos in posiciones:
+        usuario, nombre_completo_usuario, componentes_usuario = indice.usuarios[pos]
+        usuario_id, nombre, apellido, rol_id, rol_nombre = usuario
         
-        # Criterio 5: Coincidencia mínima (40-59 puntos)
-        elif resultado['coincidencias'] >= 2 or resultado['tasa_promedio'] >= 0.4:
-            puntuacion = 40 + (resultado['tasa_promedio'] * 19)  # 40-59 puntos
+        # Calcular coincidencia y puntuación
+        resultado = _calcular_coincidencia_componentes(componentes_tecnico, componentes_usuario)
+        puntuacion = _puntuar_coincidencia(resultado, componentes_tecnico)
         
-        # Bonificaciones adicionales
-        if resultado['coincidencias'] >= 3:  # 3 o más componentes coinciden
-            puntuacion += 5
-        
-        if resultado['coincidencias'] >= len(componentes_tecnico) // 2:  # Más de la mitad coincide
-            puntuacion += 3
-        
-        # Penalizaciones por diferencias significativas en cantidad de componentes
-        diferencia_componentes = abs(resultado['total_tecnico'] - resultado['total_usuario'])
-        if diferencia_componentes > 2:
-            puntuacion -= diferencia_componentes * 2
-        
-        # Asegurar que la puntuación esté en el rango válido
-        puntuacion = max(0, min(100, puntuacion))
-        
-        # Actualizar mejor coincidencia
+        # Actualizar mejor coincidencia (ante empate gana el primero, como en el recorrido completo)
         if puntuacion > mejor_puntuacion:
             mejor_puntuacion = puntuacion
             mejor_usuario = {
@@ -319,7 +431,6 @@ def find_matching_user_by_components(tecnico_nombre, usuarios_info, umbral_minim
                 "rol_id": rol_id,
                 "rol_nombre": rol_nombre,
             }
-            mejor_detalle = resultado
     
     return mejor_usuario, mejor_puntuacion
 
@@ -342,7 +453,7 @@ def simulate_assignment_with_improved_algorithm(conn=None, umbral_minimo=70):
         JOIN roles r ON u.rol_id = r.id_rol
         WHERE u.nombre IS NOT NULL AND u.apellido IS NOT NULL
     """)
-    usuarios = c.fetchall()
+    usuarios = UserNameIndex(c.fetchall())
 
     # Obtener técnicos
     c.execute("SELECT id_tecnico, nombre FROM tecnicos")
@@ -385,8 +496,18 @@ def simulate_assignment_with_improved_algorithm(conn=None, umbral_minimo=70):
     progress_bar.empty()
     status_text.empty()
 
+    # Registros que cambiarían de usuario, con la misma tabla de mapeo que usa la ejecución real
+    asignaciones = {r['tecnico_id']: r['mejor_usuario']['id'] for r in resultados_detallados if r['seria_asignado']}
+    conteos = apply_assignment_mapping(conn, asignaciones, dry_run=True)
+    registros_por_usuario = {}
+    for resultado in resultados_detallados:
+        resultado['registros'] = conteos.get(resultado['tecnico_id'], 0)
+        if resultado['seria_asignado'] and resultado['registros']:
+            nombre_usuario = resultado['mejor_usuario']['nombre_completo']
+            registros_por_usuario[nombre_usuario] = registros_por_usuario.get(nombre_usuario, 0) + resultado['registros']
+
     # Mostrar resumen
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
         st.metric("✅ Asignaciones Exitosas", asignaciones_exitosas)
     with col2:
@@ -394,6 +515,13 @@ def simulate_assignment_with_improved_algorithm(conn=None, umbral_minimo=70):
     with col3:
         tasa_exito = (asignaciones_exitosas / len(tecnicos)) * 100 if tecnicos else 0
         st.metric("📊 Tasa de Éxito", f"{tasa_exito:.1f}%")
+    with col4:
+        st.metric("📝 Registros a reasignar", sum(registros_por_usuario.values()))
+
+    if registros_por_usuario:
+        with st.expander(f"📝 Registros que cambiarían de usuario ({len(registros_por_usuario)} usuarios)"):
+            for nombre_usuario, cantidad in sorted(registros_por_usuario.items(), key=lambda x: -x[1]):
+                st.write(f"• {nombre_usuario}: {cantidad} registros")
 
     # Mostrar asignaciones exitosas
     asignaciones_exitosas_lista = [r for r in resultados_detallados if r['seria_asignado']]
@@ -444,17 +572,17 @@ def fix_existing_records_assignment_improved(conn=None, umbral_minimo=70):
         JOIN roles r ON u.rol_id = r.id_rol
         WHERE u.nombre IS NOT NULL AND u.apellido IS NOT NULL
     """)
-    usuarios = c.fetchall()
+    usuarios = UserNameIndex(c.fetchall())
 
     # Obtener técnicos
     c.execute("SELECT id_tecnico, nombre FROM tecnicos")
     tecnicos = c.fetchall()
 
     with st.spinner(f"Procesando {len(usuarios)} usuarios y {len(tecnicos)} técnicos con algoritmo mejorado..."):
-        registros_asignados = 0
         tecnicos_procesados = set()
         resultados_detallados = []
 
+        asignaciones = {}
         for tecnico_id, tecnico_nombre in tecnicos:
             mejor_usuario, mejor_puntuacion = find_matching_user_by_components(
                 tecnico_nombre, usuarios, umbral_minimo
@@ -470,15 +598,18 @@ def fix_existing_records_assignment_improved(conn=None, umbral_minimo=70):
             
             if mejor_usuario and mejor_puntuacion >= umbral_minimo:
                 tecnicos_procesados.add(tecnico_id)
-                c.execute("UPDATE registros SET usuario_id = %s WHERE id_tecnico = %s", 
-                         (mejor_usuario["id"], tecnico_id))
-                registros_actualizados = c.rowcount
-                registros_asignados += registros_actualizados
+                asignaciones[tecnico_id] = mejor_usuario["id"]
                 resultado_detalle['asignado'] = True
-                resultado_detalle['registros_actualizados'] = registros_actualizados
             
             resultados_detallados.append(resultado_detalle)
 
+        # Una sola sentencia para todos los técnicos emparejados
+        actualizados = apply_assignment_mapping(conn, asignaciones)
+        for resultado_detalle in resultados_detallados:
+            if resultado_detalle['asignado']:
+                resultado_detalle['registros_actualizados'] = actualizados.get(resultado_detalle['tecnico_id'], 0)
+        registros_asignados = sum(actualizados.values())
+
         if registros_asignados > 0:
             conn.commit()
             st.success(f"🎯 Total de registros procesados con algoritmo mejorado: {registros_asignados}")
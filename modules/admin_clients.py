@@ -1,5 +1,6 @@
 import streamlit as st
 from .database import get_clientes_dataframe, get_connection, check_client_duplicate
+from .query_cache import invalidate_tables
 from .utils import show_success_message, validate_phone_number, normalize_cuit, safe_rerun, normalize_name, normalize_text
 from .utils import show_ordered_dataframe_with_labels, normalize_web, excel_normalize_columns
 import re
@@ -416,6 +417,7 @@ def _process_bulk_upload(file, preloaded_df=None):
                     if nombre_clean: name_lookup[nombre_clean] = {'id_cliente': new_id, 'cuit': cuit_raw, 'nombre': final_nombre, 'email': email, 'telefono': telefono, 'celular': celular, 'web': web, 'notes': notes}
 
         conn.commit()
+        invalidate_tables('clientes', 'clientes_puntajes')
         msg = f"✅ Proceso completado. Clientes nuevos: {processed_count}, Actualizados: {updated_count}"
         if merged_count > 0:
             msg += f", Fusionados: {merged_count}"
@@ -632,6 +634,7 @@ def render_client_crud_management(is_wizard=False, on_continue=None):
                         )
                     )
                     conn.commit()
+                    invalidate_tables('clientes')
                     st.success(f"Cliente '{new_client_name_normalized}' agregado exitosamente.")
                     safe_rerun()
                 except Exception as e:
@@ -755,6 +758,7 @@ def render_client_edit_delete_forms(clients_df):
                                 )
                             )
                             conn.commit()
+                            invalidate_tables('clientes')
                             st.success(f"Cliente actualizado a '{edit_name_normalized}' exitosamente.")
                             safe_rerun()
                         except Exception as e:
@@ -818,6 +822,7 @@ def render_client_edit_delete_forms(clients_df):
                         # 3. Finalmente eliminar el cliente
                         c.execute("DELETE FROM clientes WHERE id_cliente = %s", (client_id,))
                         conn.commit()
+                        invalidate_tables('clientes', 'clientes_puntajes')
                         show_success_message(f"✅ Cliente '{client_row['nombre']}' y todos sus datos asociados fueron eliminados exitosamente.", 2)
                         from .utils import safe_rerun
                         safe_rerun()
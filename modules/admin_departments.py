@@ -4,6 +4,7 @@ from sqlalchemy import text
 
 from .database import get_connection, get_engine, generate_roles_from_nomina
 from .utils import show_ordered_dataframe_with_labels, format_role_display, clean_role_name
+from .query_cache import invalidate_tables
 
 
 def render_department_management():
@@ -86,6 +87,7 @@ def render_department_management():
                                 # clean_role_name devuelve espacios, así que incluimos variantes con espacio
                                 if real_base in ['admin', 'sin_rol', 'sin rol', 'hipervisor', 'general', 'visor']:
                                     conn.commit()
+                                    invalidate_tables('roles')
                                     st.success(f"Departamento '{final_name}' agregado correctamente.")
                                     from .utils import safe_rerun
                                     safe_rerun()
@@ -108,6 +110,7 @@ def render_department_management():
                             except Exception:
                                 pass
                             conn.commit()
+                            invalidate_tables('roles')
                             st.success(f"Departamento '{final_name}' agregado correctamente.")
                             from .utils import safe_rerun
                             safe_rerun()
@@ -215,6 +218,7 @@ def render_department_management():
                 try:
                     c.execute("UPDATE roles SET view_type = %s WHERE id_rol = %s", (selected_view, int(selected_role_id)))
                     conn.commit()
+                    invalidate_tables('roles')
                     st.success("Vista actualizada.")
                     from .utils import safe_rerun
                     safe_rerun()
@@ -259,6 +263,7 @@ def render_department_edit_delete_forms(roles_df: pd.DataFrame):
                                     (nombre_limpio, nueva_descripcion, bool(is_hidden), rol_id),
                                 )
                                 conn.commit()
+                                invalidate_tables('roles')
                                 st.success(f"Departamento actualizado correctamente. Nombre interno: {nombre_limpio}")
                                 from .utils import safe_rerun
                                 safe_rerun()
@@ -303,6 +308,7 @@ def render_department_edit_delete_forms(roles_df: pd.DataFrame):
                         else:
                             c.execute("DELETE FROM roles WHERE id_rol = %s", (rol_id,))
                             conn.commit()
+                            invalidate_tables('roles')
                             st.success("Departamento eliminado exitosamente.")
                             from .utils import safe_rerun
                             safe_rerun()
@@ -10,6 +10,7 @@ from .database import (
     get_connection,
 )
 from .utils import show_success_message, normalize_text, show_ordered_dataframe_with_labels
+from .query_cache import invalidate_tables
 
 
 def render_grupo_management():
@@ -106,6 +107,7 @@ def render_grupo_edit_delete_forms(grupos_df):
                                     (edit_grupo_nombre, edit_grupo_desc, grupo_id),
                                 )
                                 conn.commit()
+                                invalidate_tables('grupos')
                                 update_grupo_roles(grupo_id, edit_selected_roles)
                                 st.success("Grupo actualizado exitosamente.")
                                 from .utils import safe_rerun
@@ -147,6 +149,7 @@ def render_grupo_edit_delete_forms(grupos_df):
                             pass
                         c.execute("DELETE FROM grupos WHERE id_grupo = %s", (grupo_id,))
                         conn.commit()
+                        invalidate_tables('grupos', 'grupos_roles', 'grupos_puntajes')
                         st.success("Grupo eliminado exitosamente.")
                         from .utils import safe_rerun
                         st.session_state.pop("select_grupo_delete", None)
@@ -1,5 +1,6 @@
 import streamlit as st
 from .database import get_modalidades_dataframe, get_connection
+from .query_cache import invalidate_tables
 from .utils import show_success_message, show_ordered_dataframe_with_labels, safe_rerun
 
 def render_modality_management():
@@ -20,6 +21,7 @@ def render_modality_management():
                 try:
                     c.execute("INSERT INTO modalidades_tarea (descripcion) VALUES (%s)", (new_modality_normalized,))
                     conn.commit()
+                    invalidate_tables('modalidades_tarea')
                     st.success(f"Modalidad '{new_modality_normalized}' agregada exitosamente.")
                     safe_rerun()
                 except Exception as e:
@@ -67,6 +69,7 @@ def render_modality_edit_delete_forms(modalidades_df):
                         try:
                             c.execute("UPDATE modalidades_tarea SET descripcion = %s WHERE id_modalidad = %s", (edit_modalidad_name_normalized, modalidad_id))
                             conn.commit()
+                            invalidate_tables('modalidades_tarea')
                             st.success(f"Modalidad actualizada a '{edit_modalidad_name_normalized}' exitosamente.")
                             safe_rerun()
                         except Exception as e:
@@ -108,6 +111,7 @@ def render_modality_edit_delete_forms(modalidades_df):
                         else:
                             c.execute("DELETE FROM modalidades_tarea WHERE id_modalidad = %s", (modalidad_id,))
                             conn.commit()
+                            invalidate_tables('modalidades_tarea')
                             st.session_state.pop("select_modalidad_delete", None)
                             st.session_state.pop("select_modalidad_edit", None)
                             st.session_state.pop("edit_modalidad_name", None)
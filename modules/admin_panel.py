@@ -21,7 +21,9 @@ from .database import (
     get_feriados_dataframe, add_feriado, toggle_feriado, delete_feriado,
     add_registros_comerciales_batch, send_test_notification_email
 )
-from .config import SYSTEM_ROLES, DEFAULT_VALUES, SYSTEM_LIMITS
+from .config import SYSTEM_ROLES, DEFAULT_VALUES, SYSTEM_LIMITS, REGISTROS_EXPORT_DIR
+from .query_cache import invalidate_tables
+from .logging_utils import log_app_error, log_sql_error
 from .nomina_management import render_nomina_edit_delete_forms
 from .auth import create_user, validate_password, hash_password, is_2fa_enabled, unlock_user
 from .utils import show_success_message, normalize_text, month_name_es, get_general_alerts, safe_rerun
@@ -713,14 +715,16 @@ def process_commercial_excel_data(excel_df):
         st.error(f"Error procesando planilla comercial: {e}")
         return 0, [str(e)], 0, set()
 
-def process_excel_data(excel_df):
-    """Procesa y carga datos desde Excel con control de duplicados y estandarización"""
-    import calendar
-    import openpyxl  # Importar explícitamente openpyxl
-    from datetime import datetime
-    import unicodedata
-    from .database import get_or_create_tecnico, get_or_create_cliente, get_or_create_tipo_tarea, get_or_create_modalidad, get_or_create_grupo_with_department_association
-    import streamlit as st
+def process_excel_data(excel_data):
+    """Procesa y carga datos desde Excel con control de duplicados y estandarización.
+
+    excel_data puede ser un DataFrame o un iterable de DataFrames (bloques de
+    excel_stream.iter_excel_chunks); en ese caso cada bloque se inserta a medida
+    que se lee y los registros se confirman todos juntos al final.
+    """
+    from itertools import chain
+    from .excel_stream import normalize_excel_column
+    from .entity_resolver import load_entity_resolver
 
     # Función auxiliar para verificar si un valor está vacío o es inválido
     def is_empty_or_invalid(value):
@@ -733,6 +737,12 @@ def process_excel_data(excel_df):
             return True
         return False
 
+    chunks = iter([excel_data]) if isinstance(excel_data, pd.DataFrame) else iter(excel_data)
+    excel_df = next(chunks, None)
+    if excel_df is None:
+        st.warning("No hay datos válidos para procesar después de filtrar fechas vacías.")
+        return 0, 0, 0, set()
+
     conn = get_connection()
     c = conn.cursor()
     
@@ -747,16 +757,8 @@ def process_excel_data(excel_df):
     # Obtener el usuario actual que está cargando la planilla
     current_user_id = st.session_state.get('user_id')
 
-    # Función para normalizar nombres de columnas removiendo acentos y caracteres especiales
-    def normalize_column_name(col):
-        col = str(col).strip()
-        # Remover acentos y caracteres especiales
-        col = unicodedata.normalize('NFD', col)
-        col = ''.join(char for char in col if unicodedata.category(char) != 'Mn')
-        return col
-    
-    # Normalizar nombres de columnas del Excel
-    normalized_columns = [normalize_column_name(col) for col in excel_df.columns]
+    # Normalizar nombres de columnas del Excel (sin acentos ni espacios extremos)
+    normalized_columns = [normalize_excel_column(col) for col in excel_df.columns]
     
     # --- DETECCIÓN DE TIPO DE PLANILLA ---
     # Convertir a minúsculas para detección flexible
@@ -774,7 +776,7 @@ def process_excel_data(excel_df):
         # Si tiene keywords comerciales o (fecha + cliente pero no técnico/modalidad)
         if comm_matches >= 1:
              conn.close() # Cerrar conexión antes de delegar
-             return process_commercial_excel_data(excel_df)
+             return process_commercial_excel_data(pd.concat([excel_df, *chunks], ignore_index=True))
     # -------------------------------------
     
     # Mapeo de columnas esperadas (normalizadas)
@@ -794,21 +796,10 @@ def process_excel_data(excel_df):
     
     # Validar que el DataFrame tenga las columnas requeridas (usando versiones normalizadas)
     required_columns_normalized = ['Fecha', 'Tecnico', 'Cliente', 'Tipo tarea', 'Modalidad']
-    missing_columns = []
-    
-    for req_col in required_columns_normalized:
-        if req_col not in normalized_columns:
-            # Buscar la columna original correspondiente para mostrar en el error
-            original_col = None
-            for orig, norm in zip(original_columns, normalized_columns):
-                if norm == req_col:
-                    original_col = orig
-                    break
-            if not original_col:
-                # Si no encontramos la columna, usar el nombre normalizado
-                missing_columns.append(req_col)
+    missing_columns = [col for col in required_columns_normalized if col not in normalized_columns]
     
     if missing_columns:
+        conn.close()
         st.error(f"❌ La planilla no tiene el formato correcto. Faltan las siguientes columnas: {', '.join(missing_columns)}")
         st.info("📋 **Formato esperado de la planilla:**")
         st.info("• Fecha")
@@ -821,36 +812,21 @@ def process_excel_data(excel_df):
         st.info("• Breve Descripción (opcional, puede ser sin acento)")
         st.info("• Sector o Equipo (opcional)")
         return 0, 0, 0, set()
-    
-    # Crear DataFrame con columnas normalizadas
-    excel_df_normalized = excel_df.copy()
-    excel_df_normalized.columns = normalized_columns
-    
-    # Aplicar mapeo de columnas
-    excel_df_mapped = excel_df_normalized.rename(columns=column_mapping_normalized)
-    # Eliminar posibles columnas duplicadas tras el mapeo
-    excel_df_mapped = excel_df_mapped.loc[:, ~excel_df_mapped.columns.duplicated()]
-    
-    # Limpiar DataFrame: eliminar filas con fechas vacías
-    excel_df_mapped = excel_df_mapped.dropna(subset=['fecha'])
-    excel_df_mapped = excel_df_mapped[excel_df_mapped['fecha'] != '']
-    
-    if excel_df_mapped.empty:
-        st.warning("No hay datos válidos para procesar después de filtrar fechas vacías.")
-        return 0, 0, 0, set()
-    
-    success_count = 0
+
+    def map_chunk(chunk):
+        """Aplica a un bloque el mapeo de columnas detectado en el primero"""
+        chunk = chunk.copy()
+        chunk.columns = [normalize_excel_column(col) for col in chunk.columns]
+        chunk = chunk.rename(columns=column_mapping_normalized)
+        # Eliminar posibles columnas duplicadas tras el mapeo
+        chunk = chunk.loc[:, ~chunk.columns.duplicated()]
+        # Limpiar: eliminar filas con fechas vacías
+        chunk = chunk.dropna(subset=['fecha'])
+        return chunk[chunk['fecha'] != '']
+
     error_count = 0
-    duplicate_count = 0
-    created_entities = {
-        'tecnicos': set(),
-        'clientes': set(),
-        'tipos_tarea': set(),
-        'modalidades': set(),
-        'grupos': set()  # Agregar grupos a las entidades creadas
-    }
-    
-    # Nuevo: Registro de errores por tipo
+
+    # Registro de errores por tipo
     error_types = {
         'fecha_invalida': 0,
         'tecnico_vacio': 0,
@@ -864,255 +840,291 @@ def process_excel_data(excel_df):
     
     missing_clients = set()
     
-    # Obtener entidades existentes para evitar duplicados y optimizar búsqueda
-    c.execute("SELECT nombre FROM tecnicos")
-    existing_tecnicos = {row[0] for row in c.fetchall()}
-    
-    # Cargar todos los clientes con sus IDs para búsqueda inteligente en memoria
-    c.execute("SELECT id_cliente, nombre FROM clientes")
-    all_clients_data = c.fetchall() # Lista de tuplas (id, nombre)
-    existing_clientes = {nombre for _, nombre in all_clients_data}
-    
-    # Pre-procesar clientes para búsqueda normalizada
-    # Estructura: {'NOMBRE_NORMALIZADO': id_cliente}
-    import re
-    from .utils import normalize_name
-        
-    normalized_client_map = {}
-    for cid, cname in all_clients_data:
-        norm = normalize_name(cname)
-        if norm:
-            normalized_client_map[norm] = cid
-            
-    c.execute("SELECT descripcion FROM tipos_tarea")
-    existing_tipos = {row[0] for row in c.fetchall()}
-    
-    c.execute("SELECT descripcion FROM modalidades_tarea")
-    existing_modalidades = {row[0] for row in c.fetchall()}
-    
-    for index, row in excel_df_mapped.iterrows():
-        try:
-            # Validación temprana: omitir filas con campos críticos vacíos (sin reportar error)
-            if (is_empty_or_invalid(row['fecha']) or 
-                is_empty_or_invalid(row['tecnico']) or 
-                is_empty_or_invalid(row['cliente']) or 
-                is_empty_or_invalid(row['tipo_tarea']) or 
-                is_empty_or_invalid(row['modalidad'])):
-                continue  # Omitir silenciosamente
-            
-            # Estandarizar fecha
-            fecha_str = str(row['fecha'])
+    # Índices en memoria de las entidades: una lectura por tabla para toda la planilla
+    resolvers = {table: load_entity_resolver(table, conn) for table in ('tecnicos', 'clientes', 'tipos_tarea', 'modalidades_tarea')}
+
+    def parse_fecha(fecha_str):
+        """Convierte el texto de la planilla en datetime (acepta d/m/aa, d/m/aaaa y lo que entienda pandas)"""
+        if '/' in fecha_str:
+            partes = fecha_str.split('/')
+            if len(partes) == 3:
+                # Asegurar que el día y mes tengan dos dígitos
+                fecha_str = f"{int(partes[0]):02d}/{int(partes[1]):02d}/{partes[2]}"
+                return datetime.strptime(fecha_str, '%d/%m/%y' if len(partes[2]) == 2 else '%d/%m/%Y')
+        return pd.to_datetime(fecha_str)
+
+    def clean(value):
+        return ' '.join(str(value).strip().split())
+
+    def normalize_rows(rows):
+        """Normaliza filas en memoria (sin consultas); cuenta los errores de formato"""
+        nonlocal error_count
+        filas = []
+        for row in rows:
             try:
-                if '/' in fecha_str:
-                    # Normalizar formato de fecha para manejar días con un solo dígito
-                    partes = fecha_str.split('/')
-                    # Asegurar que el día y mes tengan dos dígitos
-                    if len(partes) == 3:
-                        # Si el año tiene 2 dígitos
-                        if len(partes[2]) == 2:
-                            fecha_str = f"{int(partes[0]):02d}/{int(partes[1]):02d}/{partes[2]}"
-                            fecha_obj = datetime.strptime(fecha_str, '%d/%m/%y')
-                        else:  # Si el año tiene 4 dígitos
-                            fecha_str = f"{int(partes[0]):02d}/{int(partes[1]):02d}/{partes[2]}"
-                            fecha_obj = datetime.strptime(fecha_str, '%d/%m/%Y')
-                    else:
-                        # Si el formato no es el esperado, intentar con pandas
-                        fecha_obj = pd.to_datetime(fecha_str)
-                else:
-                    fecha_obj = pd.to_datetime(fecha_str)
-                fecha_formateada = fecha_obj.strftime('%d/%m/%y')
-            except Exception as e:
-                # Solo reportar error si la fecha no está vacía
-                if not is_empty_or_invalid(row['fecha']):
+                # Validación temprana: omitir filas con campos críticos vacíos (sin reportar error)
+                if any(is_empty_or_invalid(row[col]) for col in ('fecha', 'tecnico', 'cliente', 'tipo_tarea', 'modalidad')):
+                    continue  # Omitir silenciosamente
+
+                fecha_str = str(row['fecha'])
+                if fecha_str not in fechas_parseadas:
+                    try:
+                        fechas_parseadas[fecha_str] = parse_fecha(fecha_str)
+                    except Exception:
+                        fechas_parseadas[fecha_str] = None
+                fecha_obj = fechas_parseadas[fecha_str]
+                if fecha_obj is None or pd.isna(fecha_obj):
                     error_types['fecha_invalida'] += 1
                     error_count += 1
-                continue  # Omitir filas con fechas que no se pueden procesar
-            
-            # Obtener y crear entidades automáticamente (normalizadas)
-            tecnico = ' '.join(str(row['tecnico']).strip().split()).title()
-            cliente = ' '.join(str(row['cliente']).strip().split()).title()
-            tipo_tarea = ' '.join(str(row['tipo_tarea']).strip().split()).title()
-            modalidad = ' '.join(str(row['modalidad']).strip().split()).title()
-            
-            # Verificar si existe la columna grupo y obtener su valor (normalizado)
-            grupo = "General"  # Valor predeterminado (primera letra mayúscula)
-            usar_grupo_general = True  # Flag para saber si usar asociación general
-            
-            if 'grupo' in row and not is_empty_or_invalid(row['grupo']):
-                grupo_valor = str(row['grupo']).strip()
-                # Verificar que no sea un valor vacío o inválido
-                if not is_empty_or_invalid(grupo_valor):
-                    grupo = ' '.join(grupo_valor.split()).title()
+                    continue
+
+                # Verificar si existe la columna grupo y obtener su valor (normalizado)
+                grupo = "General"  # Valor predeterminado (primera letra mayúscula)
+                usar_grupo_general = True  # Flag para saber si usar asociación general
+                if not is_empty_or_invalid(row.get('grupo')):
+                    grupo = clean(row['grupo']).title()
                     usar_grupo_general = False
-            
-            # Usar get_or_create para obtener IDs (creando si no existen)
+
+                # Validar tiempo (acepta "1,5", "1.5", "1,5 hs")
+                raw_tiempo = row.get('tiempo')
+                tiempo = 0.0
+                if not is_empty_or_invalid(raw_tiempo):
+                    try:
+                        tiempo_str = ''.join(ch for ch in str(raw_tiempo).strip().lower() if ch.isdigit() or ch in [',', '.'])
+                        tiempo = round(float(tiempo_str.replace(',', '.')), 2)
+                    except Exception:
+                        tiempo = 0.0
+
+                # Detectar checkbox de hora extra marcado (True, 1, yes, si) o "x"
+                raw_hora_extra = row.get('es_hora_extra')
+                es_hora_extra = (not is_empty_or_invalid(raw_hora_extra)
+                                 and str(raw_hora_extra).strip().lower() in ['true', '1', 'si', 'yes', 'x', 'v', 's'])
+
+                filas.append({
+                    'fecha': fecha_obj.strftime('%d/%m/%y'),
+                    'tecnico': clean(row['tecnico']).title(),
+                    'cliente': clean(row['cliente']).title(),
+                    'tipo_tarea': clean(row['tipo_tarea']).title(),
+                    'modalidad': clean(row['modalidad']).title(),
+                    'grupo': grupo,
+                    'usar_grupo_general': usar_grupo_general,
+                    'tarea_realizada': clean(row['tarea_realizada']) if not is_empty_or_invalid(row.get('tarea_realizada')) else 'N/A',
+                    'numero_ticket': str(row['numero_ticket']).strip() if not is_empty_or_invalid(row.get('numero_ticket')) else 'N/A',
+                    'tiempo': tiempo,
+                    'descripcion': clean(row['descripcion']) if not is_empty_or_invalid(row.get('descripcion')) else '',
+                    # Guardar número de mes; el nombre se resolverá al leer
+                    'mes': fecha_obj.month,
+                    'es_hora_extra': es_hora_extra,
+                })
+            except Exception:
+                error_types['otros_errores'] += 1
+                error_count += 1
+        return filas
+
+    # --- Resolución de entidades: una sola vez por valor distinto en toda la planilla ---
+    def resolve(ids, keys, resolver):
+        for key in keys:
+            if key in ids:
+                continue
             try:
-                id_tecnico = get_or_create_tecnico(tecnico, conn)
-                if tecnico not in existing_tecnicos:
-                    created_entities['tecnicos'].add(tecnico)
-                    
-                # CAMBIO: No crear cliente automáticamente. Buscar existente.
-                # Estrategia de búsqueda jerárquica INTELIGENTE:
-                
-                # 0. Preparar datos
-                from .utils import find_cliente_id
-                id_cliente = find_cliente_id(cliente, all_clients_data, normalized_client_map)
-
-                # 4. Fallback a SQL "Starts With" (por si acaso, aunque cubierto por 3A)
-                if not id_cliente and len(cliente) >= 3:
-                     c.execute("SELECT id_cliente FROM clientes WHERE UPPER(nombre) LIKE %s LIMIT 1", (cliente.upper() + '%',))
-                     res_cliente = c.fetchone()
-                     if res_cliente:
-                         id_cliente = res_cliente[0]
-                
-                if id_cliente:
-                    # Encontrado
-                    pass
-                else:
-                    # Cliente no existe y ya no se permite crear desde métricas
-                    error_types['cliente_no_existe'] += 1
-                    error_count += 1
-                    missing_clients.add(cliente)
-                    continue # Saltar este registro
-                    
-                # if cliente not in existing_clientes:
-                #    created_entities['clientes'].add(cliente)
-                    
-                # Pasar el nombre del empleado (técnico) para asociación automática
-                id_tipo = get_or_create_tipo_tarea(tipo_tarea, conn, empleado_nombre=tecnico)
-                if tipo_tarea not in existing_tipos:
-                    created_entities['tipos_tarea'].add(tipo_tarea)
-                    
-                id_modalidad = get_or_create_modalidad(modalidad, conn)
-                if modalidad not in existing_modalidades:
-                    created_entities['modalidades'].add(modalidad)
-                    
-                # Crear grupo con lógica diferente según si es "General" o específico
-                if usar_grupo_general:
-                    # Para grupo "General", usar la función original que asocia al usuario que sube la planilla
-                    from .database import get_or_create_grupo_with_department_association
-                    current_user_id = st.session_state.get('user_id')
-                    id_grupo = get_or_create_grupo_with_department_association(grupo, current_user_id, conn)
-                else:
-                    # Para grupos específicos, usar la nueva función que asocia al departamento del técnico
-                    id_grupo = get_or_create_grupo_with_tecnico_department_association(grupo, tecnico, conn)
-                
-                # Verificar si el grupo es nuevo para agregarlo a las entidades creadas
-                c.execute("SELECT COUNT(*) FROM grupos WHERE nombre = %s", (grupo,))
-                grupo_count = c.fetchone()[0]
-                if grupo_count == 1:  # Si solo hay 1, significa que se acaba de crear
-                    created_entities['grupos'].add(grupo)
-                    
+                ids[key] = resolver(key)
             except Exception as e:
-                # Solo incrementar error si no es un problema de campos vacíos
-                if not (is_empty_or_invalid(tecnico) or is_empty_or_invalid(cliente) or 
-                       is_empty_or_invalid(tipo_tarea) or is_empty_or_invalid(modalidad)):
-                    error_types['entidad_error'] += 1
-                    error_count += 1
-                continue
-            
-            # Validar otros campos (normalizados)
-            tarea_realizada = ' '.join(str(row['tarea_realizada']).strip().split()) if not is_empty_or_invalid(row.get('tarea_realizada')) else 'N/A'
-            numero_ticket = str(row['numero_ticket']).strip() if not is_empty_or_invalid(row.get('numero_ticket')) else 'N/A'
-            
-            # Validar tiempo (acepta "1,5", "1.5", "1,5 hs")
-            raw_tiempo = row.get('tiempo')
-            if is_empty_or_invalid(raw_tiempo):
-                tiempo = 0.0
+                # Los get_or_create_* comparten la conexión: limpiar la transacción abortada
+                conn.rollback()
+                log_app_error(e, module="admin_panel", function="process_excel_data")
+                ids[key] = None
+
+    def resolve_grupo(key):
+        grupo, tecnico = key
+        if tecnico is None:
+            # Para grupo "General", asociar al usuario que sube la planilla
+            return get_or_create_grupo_with_department_association(grupo, current_user_id, conn)
+        # Para grupos específicos, asociar al departamento del técnico
+        return get_or_create_grupo_with_tecnico_department_association(grupo, tecnico, conn)
+
+    fechas_parseadas = {}  # Las planillas repiten pocas fechas distintas
+    tecnico_ids, cliente_ids, tipo_ids, modalidad_ids, grupo_ids = {}, {}, {}, {}, {}
+    tipo_tecnico = {}  # Cada tipo se asocia (al crearse) al técnico de la primera fila que lo usa
+
+    def build_registros(filas):
+        """Resuelve las entidades de un bloque y arma las filas para bulk_load_registros"""
+        nonlocal error_count
+        resolve(tecnico_ids, dict.fromkeys(f['tecnico'] for f in filas),
+                lambda t: get_or_create_tecnico(t, conn, resolver=resolvers['tecnicos']))
+        # Búsqueda jerárquica (exacta, compacta, por contención); no se crean clientes
+        resolve(cliente_ids, dict.fromkeys(f['cliente'] for f in filas), resolvers['clientes'].find)
+
+        # Clientes inexistentes: ya no se permite crearlos desde métricas
+        con_cliente = []
+        for f in filas:
+            if cliente_ids[f['cliente']]:
+                con_cliente.append(f)
             else:
-                try:
-                    tiempo_str = str(raw_tiempo).strip().lower()
-                    # Mantener solo dígitos y separadores decimal
-                    tiempo_str = ''.join(ch for ch in tiempo_str if ch.isdigit() or ch in [',', '.'])
-                    tiempo_str = tiempo_str.replace(',', '.')
-                    tiempo = round(float(tiempo_str), 2)
-                except Exception:
-                    tiempo = 0.0
-            descripcion = ' '.join(str(row.get('descripcion', '')).strip().split()) if not is_empty_or_invalid(row.get('descripcion')) else ''
-            # Validar que el mes sea válido antes de convertir
-            mes_num = fecha_obj.month
-            if mes_num is None or mes_num < 1 or mes_num > 12:
-                from datetime import datetime
-                mes_num = datetime.now().month
-            # Guardar número de mes; el nombre se resolverá al leer
-            mes = mes_num
-
-            # --- PROCESAMIENTO DE HORA EXTRA ---
-            es_hora_extra = False
-            raw_hora_extra = row.get('es_hora_extra')
-            if not is_empty_or_invalid(raw_hora_extra):
-                # Detectar checkbox marcado (True, 1, yes, si) o "x"
-                val_he = str(raw_hora_extra).strip().lower()
-                if val_he in ['true', '1', 'si', 'yes', 'x', 'v', 's']:
-                    es_hora_extra = True
-            # -----------------------------------
-
-            # Verificar duplicados
-            c.execute('''
-                SELECT id, grupo, es_hora_extra FROM registros 
-                WHERE fecha = %s AND id_tecnico = %s AND id_cliente = %s AND id_tipo = %s
-                AND id_modalidad = %s AND tarea_realizada = %s AND tiempo = %s
-            ''', (fecha_formateada, id_tecnico, id_cliente, id_tipo, id_modalidad, tarea_realizada, tiempo))
-            
-            registro_existente = c.fetchone()
-            
-            if registro_existente:
-                registro_id, grupo_actual, he_actual = registro_existente
-                
-                # Actualizar el grupo o hora extra si han cambiado
-                updates = []
-                params = []
-                
-                if grupo != grupo_actual:
-                    updates.append("grupo = %s")
-                    params.append(grupo)
-                
-                # Convertir None a False para comparación segura
-                he_actual_bool = bool(he_actual)
-                if es_hora_extra != he_actual_bool:
-                    updates.append("es_hora_extra = %s")
-                    params.append(es_hora_extra)
-                
-                if updates:
-                    params.append(registro_id)
-                    sql_update = f"UPDATE registros SET {', '.join(updates)} WHERE id = %s"
-                    c.execute(sql_update, tuple(params))
-                
-                duplicate_count += 1
-                continue
-            
-            # Insertar registro incluyendo el campo grupo, hora extra y fecha de creación
-            from datetime import datetime
-            now_created_at = datetime.now()
-            c.execute('''
-                INSERT INTO registros 
-                (fecha, id_tecnico, id_cliente, id_tipo, id_modalidad, tarea_realizada, 
-                 numero_ticket, tiempo, descripcion, mes, usuario_id, grupo, es_hora_extra, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (fecha_formateada, id_tecnico, id_cliente, id_tipo, id_modalidad, 
-                  tarea_realizada, numero_ticket, tiempo, descripcion, mes, None, grupo, es_hora_extra, now_created_at))
-            
-            success_count += 1
-            
-        except Exception as e:
-            # Solo reportar errores que no sean por campos vacíos
-            if not (is_empty_or_invalid(row.get('fecha')) and 
-                   is_empty_or_invalid(row.get('tecnico')) and 
-                   is_empty_or_invalid(row.get('cliente')) and 
-                   is_empty_or_invalid(row.get('tipo_tarea')) and 
-                   is_empty_or_invalid(row.get('modalidad'))):
-                error_types['otros_errores'] += 1
+                error_types['cliente_no_existe'] += 1
                 error_count += 1
-            continue
+                missing_clients.add(f['cliente'])
+
+        for f in con_cliente:
+            tipo_tecnico.setdefault(f['tipo_tarea'], f['tecnico'])
+        resolve(tipo_ids, dict.fromkeys(f['tipo_tarea'] for f in con_cliente),
+                lambda t: get_or_create_tipo_tarea(t, conn, empleado_nombre=tipo_tecnico[t], resolver=resolvers['tipos_tarea']))
+        resolve(modalidad_ids, dict.fromkeys(f['modalidad'] for f in con_cliente),
+                lambda m: get_or_create_modalidad(m, conn, resolver=resolvers['modalidades_tarea']))
+        grupo_keys = [(f['grupo'], None if f['usar_grupo_general'] else f['tecnico']) for f in con_cliente]
+        resolve(grupo_ids, dict.fromkeys(grupo_keys), resolve_grupo)
+
+        registros = []
+        for f, grupo_key in zip(con_cliente, grupo_keys):
+            ids = (tecnico_ids[f['tecnico']], cliente_ids[f['cliente']], tipo_ids[f['tipo_tarea']], modalidad_ids[f['modalidad']])
+            if not all(ids) or grupo_ids[grupo_key] is None:
+                error_types['entidad_error'] += 1
+                error_count += 1
+                continue
+            registros.append((f['fecha'],) + ids + (
+                f['tarea_realizada'], f['numero_ticket'], f['tiempo'], f['descripcion'], f['mes'], f['grupo'], f['es_hora_extra']
+            ))
+        return registros
+
+    # --- Procesar bloque a bloque: normalizar, resolver e insertar con COPY ---
+    # Los registros van por una conexión propia que se confirma una sola vez al final:
+    # los get_or_create_* hacen commit en `conn` y confirmarían los bloques ya cargados
+    success_count = 0
+    staged_count = 0
+    filas_con_fecha = 0
+    pending_rows = 0  # filas del bloque en curso que todavía no se cargaron
+    load_conn = get_connection()
+    try:
+        for chunk in chain([excel_df], chunks):
+            pending_rows = len(chunk)
+            excel_df_mapped = map_chunk(chunk)
+            filas_con_fecha += len(excel_df_mapped)
+            pending_rows = len(excel_df_mapped)
+            registros = build_registros(normalize_rows(excel_df_mapped.to_dict('records')))
+            pending_rows = len(registros)
+            conn.commit()  # entidades creadas en el bloque, visibles para load_conn
+            success_count += bulk_load_registros(load_conn, registros)
+            staged_count += len(registros)
+            pending_rows = 0
+        load_conn.commit()
+    except Exception as e:
+        load_conn.rollback()
+        log_sql_error(e, query="bulk_load_registros")
+        st.error(f"Error al guardar los registros: {e}")
+        # Nada se confirmó: no se importan los bloques ya cargados, el que falló ni los que faltaban leer
+        not_imported = staged_count + pending_rows
+        try:
+            not_imported += sum(len(map_chunk(chunk)) for chunk in chunks)
+        except Exception as read_error:
+            log_app_error(read_error, module="admin_panel", function="process_excel_data")
+        error_types['otros_errores'] += not_imported
+        error_count += not_imported
+        success_count = staged_count = 0
+    finally:
+        load_conn.close()
+        conn.close()
+    duplicate_count = staged_count - success_count
+
+    # Los get_or_create_* escribieron en esta conexión: invalidar recién tras el commit
+    invalidate_tables('clientes', 'tipos_tarea', 'tipos_tarea_roles', 'modalidades_tarea', 'grupos', 'grupos_roles')
 
-    # Confirmar transacción y cerrar conexión
-    conn.commit()
-    conn.close()
+    if filas_con_fecha == 0:
+        st.warning("No hay datos válidos para procesar después de filtrar fechas vacías.")
     
     # Retornar los contadores de procesamiento
     return success_count, error_count, duplicate_count, missing_clients
 
 
+_REGISTROS_KEY = "fecha, id_tecnico, id_cliente, id_tipo, id_modalidad, tarea_realizada, tiempo"
+
+
+def bulk_load_registros(conn, registros):
+    """Carga filas de registros con COPY y devuelve cuántas se insertaron.
+
+    Cada fila es (fecha, id_tecnico, id_cliente, id_tipo, id_modalidad, tarea_realizada,
+    numero_ticket, tiempo, descripcion, mes, grupo, es_hora_extra). Las filas cuya clave
+    (fecha, técnico, cliente, tipo, modalidad, tarea, tiempo) ya existe no se insertan:
+    solo se actualizan grupo y hora extra si cambiaron. Dentro de la planilla se inserta
+    la primera ocurrencia de cada clave con los valores de la última, igual que la carga
+    fila a fila. No hace commit.
+    """
+    import csv
+    import io
+
+    if not registros:
+        return 0
+
+    c = conn.cursor()
+    # Puede quedar de una carga anterior en la misma transacción
+    c.execute("DROP TABLE IF EXISTS pg_temp.import_registros")
+    c.execute('''
+        CREATE TEMP TABLE import_registros (
+            orden INTEGER NOT NULL,
+            fecha VARCHAR(20) NOT NULL,
+            id_tecnico INTEGER NOT NULL,
+            id_cliente INTEGER NOT NULL,
+            id_tipo INTEGER NOT NULL,
+            id_modalidad INTEGER NOT NULL,
+            tarea_realizada TEXT NOT NULL,
+            numero_ticket VARCHAR(50) NOT NULL,
+            tiempo NUMERIC NOT NULL,
+            descripcion TEXT,
+            mes VARCHAR(20) NOT NULL,
+            grupo VARCHAR(100),
+            es_hora_extra BOOLEAN NOT NULL,
+            existe BOOLEAN NOT NULL DEFAULT FALSE
+        ) ON COMMIT DROP
+    ''')
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    for orden, registro in enumerate(registros):
+        writer.writerow((orden,) + tuple(registro))
+    buffer.seek(0)
+    c.copy_expert('''
+        COPY import_registros (orden, fecha, id_tecnico, id_cliente, id_tipo, id_modalidad, tarea_realizada,
+                               numero_ticket, tiempo, descripcion, mes, grupo, es_hora_extra)
+        FROM STDIN WITH (FORMAT csv)
+    ''', buffer)
+
+    key_match = " AND ".join(f"r.{col} = s.{col}" for col in _REGISTROS_KEY.split(", "))
+    c.execute(f'''
+        UPDATE import_registros s SET existe = TRUE
+        WHERE EXISTS (SELECT 1 FROM registros r WHERE {key_match})
+    ''')
+
+    # Registros existentes: aplicar grupo/hora extra de la última ocurrencia si cambiaron
+    c.execute(f'''
+        UPDATE registros r SET grupo = s.grupo, es_hora_extra = s.es_hora_extra
+        FROM (
+            SELECT DISTINCT ON ({_REGISTROS_KEY}) *
+            FROM import_registros WHERE existe
+            ORDER BY {_REGISTROS_KEY}, orden DESC
+        ) s
+        WHERE {key_match}
+          AND (r.grupo IS DISTINCT FROM s.grupo OR COALESCE(r.es_hora_extra, FALSE) <> s.es_hora_extra)
+    ''')
+
+    c.execute(f'''
+        INSERT INTO registros
+            (fecha, id_tecnico, id_cliente, id_tipo, id_modalidad, tarea_realizada,
+             numero_ticket, tiempo, descripcion, mes, usuario_id, grupo, es_hora_extra, created_at)
+        SELECT p.fecha, p.id_tecnico, p.id_cliente, p.id_tipo, p.id_modalidad, p.tarea_realizada,
+               p.numero_ticket, p.tiempo, p.descripcion, p.mes, NULL, u.grupo, u.es_hora_extra, %s
+        FROM (
+            SELECT DISTINCT ON ({_REGISTROS_KEY}) *
+            FROM import_registros WHERE NOT existe
+            ORDER BY {_REGISTROS_KEY}, orden
+        ) p
+        JOIN (
+            SELECT DISTINCT ON ({_REGISTROS_KEY}) {_REGISTROS_KEY}, grupo, es_hora_extra
+            FROM import_registros WHERE NOT existe
+            ORDER BY {_REGISTROS_KEY}, orden DESC
+        ) u USING ({_REGISTROS_KEY})
+        ORDER BY p.orden
+    ''', (datetime.now(),))
+    return c.rowcount
+
+
 def auto_assign_records_by_technician(conn):
     """Asigna automáticamente registros a usuarios basándose en el nombre del técnico"""
     from .admin_assignments import fix_existing_records_assignment_improved
@@ -1143,13 +1155,14 @@ def render_admin_settings():
         encode_env_multiline,
     )
     from .database import get_current_project_id_sequence, set_project_id_sequence, get_roles_dataframe, update_rol_visibility
+    from .database import get_table_scan_stats_dataframe, get_index_usage_dataframe
     from .utils import safe_rerun
     import html
     import re
     
     st.subheader("Administración")
     
-    tabs_options = ["🔌 Conexiones", "✉️ SMTP y Notificaciones", "📂 Configuración Proyectos", "💾 Backup & Restore", "👁️ Visibilidad Departamentos"]
+    tabs_options = ["🔌 Conexiones", "✉️ SMTP y Notificaciones", "📂 Configuración Proyectos", "💾 Backup & Restore", "👁️ Visibilidad Departamentos", "📊 Diagnóstico BD"]
     
     if "admin_active_tab" not in st.session_state:
         st.session_state.admin_active_tab = tabs_options[0]
@@ -1222,6 +1235,57 @@ def render_admin_settings():
         else:
             st.info("No hay departamentos configurados.")
 
+    if selected_admin_tab == "📊 Diagnóstico BD":
+        st.markdown("### Diagnóstico de Base de Datos")
+        st.info("Estadísticas acumuladas de PostgreSQL desde el último reinicio del servidor o reseteo de estadísticas.")
+
+        st.markdown("**Lecturas por tabla**")
+        tables_df = get_table_scan_stats_dataframe()
+        if not tables_df.empty:
+            st.dataframe(
+                tables_df,
+                column_config={
+                    "tabla": "Tabla",
+                    "filas": st.column_config.NumberColumn("Filas (aprox.)"),
+                    "seq_scan": st.column_config.NumberColumn("Scans secuenciales"),
+                    "seq_tup_read": st.column_config.NumberColumn("Filas leídas por scan secuencial"),
+                    "idx_scan": st.column_config.NumberColumn("Scans por índice"),
+                    "pct_idx": st.column_config.NumberColumn("% por índice", format="%.1f%%"),
+                    "last_analyze": st.column_config.DatetimeColumn("Último ANALYZE"),
+                    "last_autoanalyze": st.column_config.DatetimeColumn("Último autoanalyze"),
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.info("No hay estadísticas de tablas disponibles.")
+
+        st.markdown("**Uso de índices**")
+        indexes_df = get_index_usage_dataframe()
+        if not indexes_df.empty:
+            missing_df = indexes_df[indexes_df['gestionado'] & indexes_df['idx_scan'].isna()]
+            if not missing_df.empty:
+                st.warning("Faltan índices gestionados: " + ", ".join(missing_df['indice']))
+            unused_df = indexes_df[indexes_df['gestionado'] & (indexes_df['idx_scan'] == 0)]
+            if not unused_df.empty:
+                st.caption("Índices gestionados sin uso registrado: " + ", ".join(unused_df['indice']))
+            st.dataframe(
+                indexes_df,
+                column_config={
+                    "tabla": "Tabla",
+                    "indice": "Índice",
+                    "idx_scan": st.column_config.NumberColumn("Scans"),
+                    "idx_tup_read": st.column_config.NumberColumn("Entradas leídas"),
+                    "idx_tup_fetch": st.column_config.NumberColumn("Filas obtenidas"),
+                    "tamano": "Tamaño",
+                    "gestionado": st.column_config.CheckboxColumn("Gestionado"),
+                },
+                hide_index=True,
+                use_container_width=True
+            )
+        else:
+            st.info("No hay estadísticas de índices disponibles.")
+
     if selected_admin_tab == "🔌 Conexiones":
         with st.form("admin_connections_form", clear_on_submit=False):
             st.markdown("**PostgreSQL**")
@@ -1759,6 +1823,31 @@ def render_admin_settings():
                     else:
                         st.error("Error al generar el respaldo.")
 
+            st.markdown("### 📊 Exportar Registros (Parquet)")
+            st.info("Exporta los registros con nombres de catálogo a Parquet particionado por año/mes. Solo se reescriben los meses que cambiaron desde la última exportación.")
+            full_export = st.checkbox("Reescribir todas las particiones", key="parquet_export_full")
+            if st.button("Exportar Registros a Parquet"):
+                with st.spinner("Exportando registros..."):
+                    try:
+                        from .parquet_export import export_registros_parquet, zip_parquet_export
+                        summary = export_registros_parquet(full=full_export)
+                    except Exception as e:
+                        log_sql_error(f"Error exportando registros a Parquet: {e}")
+                        st.error("Error al exportar los registros.")
+                    else:
+                        st.success(
+                            f"Particiones escritas: {len(summary['escritas'])} ({summary['registros']} registros), "
+                            f"sin cambios: {summary['sin_cambios']}, eliminadas: {len(summary['eliminadas'])}."
+                        )
+                        st.caption(f"Dataset: {REGISTROS_EXPORT_DIR}")
+                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                        st.download_button(
+                            label="⬇️ Descargar Dataset (.zip)",
+                            data=zip_parquet_export(),
+                            file_name=f"registros_parquet_{timestamp}.zip",
+                            mime="application/zip"
+                        )
+
         with col_restore:
             st.markdown("### 📤 Restaurar Backup")
             st.error("PELIGRO: Esto borrará TODOS los datos actuales y los reemplazará con el backup.")
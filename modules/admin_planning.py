@@ -14,17 +14,15 @@ from .database import (
     get_user_default_schedule,
     sync_user_schedule_roles_for_range,
     get_vacaciones_by_users_and_range,
-    is_feriado,
     upsert_user_default_schedule,
 )
 from .utils import get_week_dates, format_week_range, format_role_display, normalize_name
 from .ui_components import inject_project_card_css
+from .cache_invalidation import cache_version
+from .holiday_calendar import get_holiday_calendar
 
 # Cachear funciones de obtención de datos para mejorar el rendimiento
-@st.cache_data(ttl=60) # antes: ttl=3600
-def cached_get_roles_dataframe(exclude_admin=True, exclude_sin_rol=True, exclude_hidden=True):
-    return get_roles_dataframe(exclude_admin, exclude_sin_rol, exclude_hidden)
-
+# (roles, modalidades y clientes ya se sirven desde la caché de query_cache, invalidada en cada escritura)
 @st.cache_data(ttl=3600)
 def cached_get_users_dataframe():
     return get_users_dataframe()
@@ -33,22 +31,28 @@ def cached_get_users_dataframe():
 def cached_get_users_by_rol(rol_id, exclude_hidden=True):
     return get_users_by_rol(rol_id, exclude_hidden)
 
+# La planificación entra en la clave con su versión (cache_invalidation): una escritura en
+# cualquier réplica cambia la versión del usuario/rol y solo esas entradas dejan de usarse
 @st.cache_data(ttl=3600)
-def cached_get_modalidades_dataframe():
-    return get_modalidades_dataframe()
-
-@st.cache_data(ttl=3600)
-def cached_get_clientes_dataframe():
-    return get_clientes_dataframe()
+def _cached_user_default_schedule(user_id, version):
+    return get_user_default_schedule(user_id)
 
-@st.cache_data(ttl=600) # Cachea por 10 minutos para los defaults
 def cached_get_user_default_schedule(user_id):
-    return get_user_default_schedule(user_id)
+    return _cached_user_default_schedule(user_id, cache_version('user_default_schedule', user_id))
 
-@st.cache_data(ttl=60) # Cachea por 1 minuto para asignaciones semanales
-def cached_get_weekly_modalities_by_rol(rol_id, start_date, end_date):
+cached_get_user_default_schedule.clear = _cached_user_default_schedule.clear
+
+@st.cache_data(ttl=3600)
+def _cached_weekly_modalities_by_rol(rol_id, start_date, end_date, version):
     return get_weekly_modalities_by_rol(rol_id, start_date, end_date)
 
+def cached_get_weekly_modalities_by_rol(rol_id, start_date, end_date):
+    return _cached_weekly_modalities_by_rol(
+        rol_id, start_date, end_date, cache_version('user_modalidad_schedule', rol_id)
+    )
+
+cached_get_weekly_modalities_by_rol.clear = _cached_weekly_modalities_by_rol.clear
+
 def render_planning_management(restricted_role_name=None):
     import unicodedata
     import difflib
@@ -118,7 +122,8 @@ def render_planning_management(restricted_role_name=None):
         week_dates.append(current_date)
         current_date += timedelta(days=1)
 
-    feriados_set = {d for d in week_dates if is_feriado(d)}
+    feriados_cal = get_holiday_calendar(week_dates[0], week_dates[-1])
+    feriados_set = {d for d in week_dates if feriados_cal.is_holiday(d)}
 
     # Mapeo días ES
     day_mapping = {
@@ -127,7 +132,7 @@ def render_planning_management(restricted_role_name=None):
     }
 
     # Clientes para uso en vista
-    clientes_df = cached_get_clientes_dataframe()
+    clientes_df = get_clientes_dataframe()
     cliente_options = [(int(row["id_cliente"]), row["nombre"]) for _, row in clientes_df.iterrows()]
     cliente_alias_by_id = {}
     cliente_alias_by_name = {}
@@ -161,7 +166,7 @@ def render_planning_management(restricted_role_name=None):
         cliente_display_by_id[cid] = alias if alias else nombre
 
     # Catálogo de modalidades para selects y validaciones
-    modalidades_df = cached_get_modalidades_dataframe()
+    modalidades_df = get_modalidades_dataframe()
     options_ids = [int(row["id_modalidad"]) for _, row in modalidades_df.iterrows()]
     desc_by_id = {int(row["id_modalidad"]): str(row["descripcion"]) for _, row in modalidades_df.iterrows()}
     
@@ -185,7 +190,7 @@ def render_planning_management(restricted_role_name=None):
     
 
     # [MOVIDO] Filtros de Departamento bajo el título de la vista
-    roles_df = cached_get_roles_dataframe(
+    roles_df = get_roles_dataframe(
         exclude_admin=True,
         exclude_sin_rol=True,
         exclude_hidden=True  # no incluimos ocultos
@@ -261,7 +266,7 @@ def render_planning_management(restricted_role_name=None):
         st.session_state["admin_dept_for_view"] = int(dept_for_view)
         role_ids_for_view = [int(dept_for_view)]
         try:
-            roles_all_df = cached_get_roles_dataframe(
+            roles_all_df = get_roles_dataframe(
                 exclude_admin=True,
                 exclude_sin_rol=True,
                 exclude_hidden=False
@@ -980,15 +985,11 @@ def render_planning_management(restricted_role_name=None):
                     st.warning("No se pudo asegurar la modalidad 'Cliente'. Verifica el catálogo de modalidades.")
                 # Preparar catálogo de clientes para matching unificado
                 from .utils import parse_planning_cell
-                all_clients_data = list(zip(clientes_df["id_cliente"].tolist(), clientes_df["nombre"].tolist())) if not clientes_df.empty else []
-                normalized_client_map = {}
-                for cid, cname in all_clients_data:
-                    norm = normalize_name(cname)
-                    if norm:
-                        normalized_client_map[norm] = int(cid)
+                from .entity_resolver import EntityResolver
+                clientes_index = EntityResolver(zip(clientes_df["id_cliente"].astype(int).tolist(), clientes_df["nombre"].tolist())) if not clientes_df.empty else EntityResolver()
 
                 def parse_cell(cell_val):
-                    return parse_planning_cell(cell_val, mod_name_to_id, all_clients_data, normalized_client_map, cliente_mod_id)
+                    return parse_planning_cell(cell_val, mod_name_to_id, clientes_index, cliente_mod_id)
 
                 # Procesar cronograma por defecto
                 import unicodedata
@@ -1273,19 +1274,15 @@ def render_planning_management(restricted_role_name=None):
 
                 clientes_df = get_clientes_dataframe()
                 client_name_to_id = {normalize_text(name): int(cid) for cid, n in zip(clientes_df["id_cliente"], clientes_df["nombre"])} if not clientes_df.empty else {}
-                all_clients_data = list(zip(clientes_df["id_cliente"].tolist(), clientes_df["nombre"].tolist())) if not clientes_df.empty else []
-                normalized_client_map = {}
-                for cid, cname in all_clients_data:
-                    norm = normalize_name(cname)
-                    if norm:
-                        normalized_client_map[norm] = int(cid)
+                from .entity_resolver import EntityResolver
+                clientes_index = EntityResolver(zip(clientes_df["id_cliente"].astype(int).tolist(), clientes_df["nombre"].tolist())) if not clientes_df.empty else EntityResolver()
 
                 # Parser de celdas (se mantiene para carga de defaults)
                 desc_by_mod_id = {int(mid): str(desc) for mid, desc in zip(modalidades_df["id_modalidad"], modalidades_df["descripcion"])}
 
                 from .utils import parse_planning_cell
                 def parse_cell(cell_val):
-                    return parse_planning_cell(cell_val, mod_name_to_id, all_clients_data, normalized_client_map, cliente_mod_id)
+                    return parse_planning_cell(cell_val, mod_name_to_id, clientes_index, cliente_mod_id)
 
                 # Carga de cronograma por defecto (sin vistas de depuración)
 
@@ -1896,14 +1893,10 @@ def render_planning_management(restricted_role_name=None):
                 desc_by_mod_id = {int(mid): str(desc) for mid, desc in zip(modalidades_df["id_modalidad"], modalidades_df["descripcion"])}
 
                 from .utils import parse_planning_cell
-                all_clients_data = list(zip(clientes_df["id_cliente"].tolist(), clientes_df["nombre"].tolist())) if not clientes_df.empty else []
-                normalized_client_map = {}
-                for cid, cname in all_clients_data:
-                    norm = normalize_name(cname)
-                    if norm:
-                        normalized_client_map[norm] = int(cid)
+                from .entity_resolver import EntityResolver
+                clientes_index = EntityResolver(zip(clientes_df["id_cliente"].astype(int).tolist(), clientes_df["nombre"].tolist())) if not clientes_df.empty else EntityResolver()
                 def parse_cell(cell_val):
-                    return parse_planning_cell(cell_val, mod_by_desc, all_clients_data, normalized_client_map, cliente_mod_id)
+                    return parse_planning_cell(cell_val, mod_by_desc, clientes_index, cliente_mod_id)
 
                 # Carga de cronograma por defecto (sin vistas de depuración)
 
@@ -36,7 +36,8 @@ def render_records_import(role_id=None):
         label="Selecciona un archivo Excel con registros de actividad (.xls o .xlsx)",
         key=f"records_excel_upload_{role_id if role_id else 'default'}",
         expanded=False,
-        enable_sheet_selection=True
+        enable_sheet_selection=True,
+        preview_rows=100
     )
     if uploaded_file is not None and excel_df is not None:
         if st.button("🚀 Procesar y Cargar Datos", key=f"process_excel_{role_id if role_id else 'default'}"):
@@ -44,8 +45,12 @@ def render_records_import(role_id=None):
                 try:
                     # Importar aquí para evitar importación circular
                     from .admin_panel import process_excel_data
+                    from .excel_stream import iter_excel_chunks
                     
-                    success_count, error_data, duplicate_count, missing_clients = process_excel_data(excel_df)
+                    # La hoja completa se lee e inserta por bloques (memoria acotada)
+                    success_count, error_data, duplicate_count, missing_clients = process_excel_data(
+                        iter_excel_chunks(uploaded_file, selected_sheet)
+                    )
                     
                     # Manejar si error_data es lista (comercial) o entero (técnico)
                     error_count = 0
@@ -113,7 +118,7 @@ def render_records_import(role_id=None):
                 except Exception as e:
                     st.error(f"❌ Error al procesar el archivo: {str(e)}")
 
-def render_records_management(df, role_id=None, show_header=True, allow_edit=True):
+def render_records_management(df, role_id=None, show_header=True, allow_edit=True, filter_by_tecnico=True):
     # Mostrar/ocultar solo el encabezado interno
     if show_header:
         st.subheader("📋 Tabla de Registros")
@@ -130,7 +135,10 @@ def render_records_management(df, role_id=None, show_header=True, allow_edit=Tru
         st.info("📝 No hay registros disponibles. Puedes importar datos usando la funcionalidad de carga de Excel arriba.")
     else:
         # Determine filter column based on dataframe content
-        if 'Vendedor' in df.columns:
+        if not filter_by_tecnico:
+            # El filtro ya se aplicó en la consulta (render_records_management_paged)
+            filter_col = None
+        elif 'Vendedor' in df.columns:
             filter_col = 'Vendedor'
             filter_label = "Vendedor"
         elif 'tecnico' in df.columns:
@@ -303,6 +311,28 @@ def render_records_management(df, role_id=None, show_header=True, allow_edit=Tru
     else:
         st.info("No hay registros disponibles para editar o eliminar.")
 
+def render_records_management_paged(role_id, filter_type='all_time', custom_month=None, custom_year=None,
+                                   start_date=None, end_date=None, allow_edit=True):
+    """Tabla de registros del departamento paginada en el servidor (una página por consulta)"""
+    from .registros_paging import get_registros_tecnicos, period_bounds, render_registros_pager
+
+    fecha_desde, fecha_hasta = period_bounds(filter_type, custom_month, custom_year, start_date, end_date)
+    tecnicos = get_registros_tecnicos(role_id, fecha_desde, fecha_hasta, incluir_sin_fecha=filter_type == 'custom_range')
+    selected_option = st.selectbox(
+        "Técnico",
+        options=["Todos los registros"] + tecnicos,
+        index=0,
+        key=f"select_tecnico_admin_{role_id if role_id else 'default'}",
+    )
+    filters = {'rol_id': role_id, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta,
+               'sin_fecha_por_creacion': filter_type == 'custom_range'}
+    if selected_option != "Todos los registros":
+        filters['tecnico'] = selected_option
+
+    page_df = render_registros_pager(f"admin_{role_id if role_id else 'default'}", filters)
+    page_df = page_df.drop(columns=['usuario_id'], errors='ignore')
+    render_records_management(page_df, role_id, show_header=False, allow_edit=allow_edit, filter_by_tecnico=False)
+
 def render_admin_edit_form(registro_seleccionado, registro_id, role_id=None):
     """Renderiza el formulario de edición de registros para administradores"""
     st.subheader("✏️ Editar Registro")
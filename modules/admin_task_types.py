@@ -1,5 +1,6 @@
 import streamlit as st
 from .database import get_connection, get_tipos_dataframe_with_roles, get_roles_dataframe
+from .query_cache import invalidate_tables
 from .utils import show_success_message, safe_rerun
 
 def render_task_type_management():
@@ -44,6 +45,7 @@ def render_task_type_management():
                             c.execute("INSERT INTO tipos_tarea_roles (id_tipo, id_rol) VALUES (%s, %s)", (tipo_id, rol_id))
                         
                         conn.commit()
+                        invalidate_tables('tipos_tarea', 'tipos_tarea_roles')
                         st.success(f"✅ Tipo de tarea '{new_task_type_normalized}' agregado exitosamente.")
                         st.session_state.task_type_counter += 1
                         safe_rerun()
@@ -115,6 +117,7 @@ def render_task_type_edit_delete_forms(tipos_df, roles_df):
                             for rol_id in selected_roles:
                                 c.execute("INSERT INTO tipos_tarea_roles (id_tipo, id_rol) VALUES (%s, %s)", (tipo_id, rol_id))
                             conn.commit()
+                            invalidate_tables('tipos_tarea', 'tipos_tarea_roles')
                             st.success("Tipo de tarea actualizado exitosamente.")
                             safe_rerun()
                         except Exception as e:
@@ -155,6 +158,7 @@ def render_task_type_edit_delete_forms(tipos_df, roles_df):
                             c.execute("DELETE FROM tipos_tarea_puntajes WHERE id_tipo = %s", (tipo_id,))
                             c.execute("DELETE FROM tipos_tarea WHERE id_tipo = %s", (tipo_id,))
                             conn.commit()
+                            invalidate_tables('tipos_tarea', 'tipos_tarea_roles', 'tipos_tarea_puntajes')
                             show_success_message(f"✅ Tipo de tarea '{tipo_row['descripcion']}' eliminado exitosamente.", 1.5)
                             safe_rerun()
                     except Exception as e:
@@ -196,6 +200,7 @@ def clean_duplicate_task_types():
                 deleted_count += 1
         
         conn.commit()
+        invalidate_tables('tipos_tarea', 'tipos_tarea_roles')
         return deleted_count, grupos_con_duplicados
     except Exception as e:
         conn.rollback()
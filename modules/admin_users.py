@@ -9,6 +9,7 @@ from .database import (
     generate_users_from_nomina,
 )
 from .config import SYSTEM_ROLES
+from .query_cache import invalidate_tables
 from .auth import create_user, validate_password, hash_password, is_2fa_enabled, unlock_user
 from .utils import show_success_message, show_ordered_dataframe_with_labels, safe_rerun
 
@@ -283,6 +284,8 @@ def render_user_edit_form(users_df, roles_df):
                                 return
                         
                         conn.commit()
+                        # El rol filtra los resúmenes cacheados (el trigger avisa a las demás réplicas)
+                        invalidate_tables('usuarios')
                         st.success("Usuario actualizado exitosamente.")
                         safe_rerun()
                     except Exception as e:
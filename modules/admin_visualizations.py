@@ -4,7 +4,6 @@ import plotly.express as px
 from datetime import datetime, timedelta
 
 from .database import (
-    get_registros_dataframe,
     get_roles_dataframe,
     get_registros_by_rol_with_date_filter,
     get_all_proyectos,
@@ -31,9 +30,10 @@ from .contacts_shared import render_shared_contacts_management
 
 # Opcional: si ya extrajiste gestión de registros a admin_records.py
 try:
-    from .admin_records import render_records_management
+    from .admin_records import render_records_management, render_records_management_paged
 except Exception:
     render_records_management = None
+    render_records_management_paged = None
 
 # Importar uploader y tabla por separado
 try:
@@ -270,22 +270,20 @@ def render_unified_records_tab(df, roles_df):
             )
         return
 
-    # Registros filtrados por departamento y período (Lógica original para técnicos)
-    role_df = get_registros_by_rol_with_date_filter(
-        selected_role_id, filter_type, custom_month, custom_year, start_date, end_date, use_created_at=False
-    )
-    
-    # Mostrar la tabla debajo de los filtros (sin duplicar título)
-    if render_records_management:
-        # Force reload of this module if needed by Streamlit
-        render_records_management(role_df, selected_role_id, show_header=False, allow_edit=not is_commercial)
+    # Registros filtrados por departamento y período, de a una página (Lógica original para técnicos)
+    if render_records_management_paged:
+        render_records_management_paged(
+            selected_role_id, filter_type, custom_month, custom_year, start_date, end_date,
+            allow_edit=not is_commercial,
+        )
     else:
-        st.dataframe(role_df, use_container_width=True)
+        st.error("❌ La tabla de registros no está disponible. Revisa los logs de la consola para más detalles.")
 
 
 def render_data_visualization():
     """Renderiza la sección de visualización de datos con pestaña global de registros y métricas por departamento."""
-    df = get_registros_dataframe()
+    # Las pestañas consultan sus propios datos (página de registros o métricas del rol)
+    df = None
     roles_df = get_roles_dataframe(exclude_admin=True, exclude_hidden=True)
     
     # Filtrar roles que comienzan con 'adm_'
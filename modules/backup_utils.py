@@ -3,9 +3,19 @@ import io
 import streamlit as st
 from sqlalchemy import text
 from .database import get_connection, get_engine, log_sql_error, ensure_clientes_schema, ensure_projects_schema, ensure_cliente_solicitudes_schema
+from .query_cache import clear_query_cache
+from .excel_stream import excel_sheet_names, iter_excel_chunks
+from .schema_migrations import REGISTROS_TOMBSTONE_TABLE, ROLLUP_TABLE
+from .hours_rollup import rebuild_hours_rollup
 
 pd.set_option('future.no_silent_downcasting', True)
 
+# No se respaldan ni se restauran: schema_version describe el esquema de esta instalación,
+# el resumen mensual se recalcula desde registros y las bajas solo sirven a los cachés vivos
+EXCLUDED_BACKUP_TABLES = {'schema_version', ROLLUP_TABLE, REGISTROS_TOMBSTONE_TABLE}
+# Trigger por sentencia del resumen mensual: con executemany se dispararía una vez por fila
+ROLLUP_INSERT_TRIGGER = "trg_registros_resumen_insert"
+
 def create_full_backup_excel():
     """Genera un archivo Excel con todas las tablas de la base de datos"""
     conn = get_connection()
@@ -19,7 +29,7 @@ def create_full_backup_excel():
             FROM pg_catalog.pg_tables 
             WHERE schemaname = 'public'
         """)
-        tables = [row[0] for row in cursor.fetchall()]
+        tables = [row[0] for row in cursor.fetchall() if row[0] not in EXCLUDED_BACKUP_TABLES]
         tables.sort() # Orden alfabético para consistencia visual
         
         with pd.ExcelWriter(output, engine='openpyxl') as writer:
@@ -85,13 +95,14 @@ def restore_full_backup_excel(uploaded_file):
     ]
     
     try:
-        # Leer Excel (todas las hojas)
-        # Usamos na_values=['NaT'] para que pandas interprete "NaT" como NaN desde el inicio
-        xls = pd.read_excel(uploaded_file, sheet_name=None, na_values=['NaT'])
+        # Solo se leen los nombres de hoja: cada hoja se procesa luego por bloques
+        sheet_names = excel_sheet_names(uploaded_file)
         
         # Obtener tablas existentes en BD
+        # schema_version no se trunca (el esquema ya está migrado antes de restaurar) y las
+        # tablas derivadas se recalculan al final; hojas de backups viejos con ellas se ignoran
         cursor.execute("SELECT tablename FROM pg_catalog.pg_tables WHERE schemaname = 'public'")
-        db_tables = [row[0] for row in cursor.fetchall()]
+        db_tables = [row[0] for row in cursor.fetchall() if row[0] not in EXCLUDED_BACKUP_TABLES]
         
         processed_deletes = set()
         
@@ -166,13 +177,21 @@ def restore_full_backup_excel(uploaded_file):
             
             cursor.executemany(query, values)
         
+        def insert_sheet(table_name, sheet_name):
+            # Usamos na_values=['NaT'] para que "NaT" se lea como nulo desde el inicio
+            for chunk in iter_excel_chunks(uploaded_file, sheet_name, na_values=['NaT']):
+                insert_table_data(table_name, chunk)
+        
+        # El resumen mensual se recalcula una sola vez después de cargar registros
+        cursor.execute(f"ALTER TABLE registros DISABLE TRIGGER {ROLLUP_INSERT_TRIGGER}")
+
         for table in INSERT_ORDER:
             sheet_name = table[:31]
-            if sheet_name in xls:
-                insert_table_data(table, xls[sheet_name])
+            if sheet_name in sheet_names:
+                insert_sheet(table, sheet_name)
                 processed_inserts.add(sheet_name)
         
-        for sheet_name, df in xls.items():
+        for sheet_name in sheet_names:
             if sheet_name not in processed_inserts:
                 target_table = None
                 if sheet_name in db_tables:
@@ -184,7 +203,10 @@ def restore_full_backup_excel(uploaded_file):
                             break
                 
                 if target_table:
-                    insert_table_data(target_table, df)
+                    insert_sheet(target_table, sheet_name)
+
+        cursor.execute(f"ALTER TABLE registros ENABLE TRIGGER {ROLLUP_INSERT_TRIGGER}")
+        rebuild_hours_rollup(conn)
         
         for table in db_tables:
             cursor.execute(f"""
@@ -211,6 +233,7 @@ def restore_full_backup_excel(uploaded_file):
                     log_sql_error(f"Warning reset sequence {table}.{col_name}: {e}")
 
         conn.commit()
+        clear_query_cache()
         return True, "Restauración completada exitosamente. Todas las tablas han sido recargadas."
         
     except Exception as e:
@@ -0,0 +1,134 @@
+"""
+Invalidación de cachés entre réplicas vía LISTEN/NOTIFY de PostgreSQL.
+
+Los triggers de la migración 11 publican {"table": ..., "key": ...} en
+CACHE_INVALIDATION_CHANNEL por cada escritura. Cada proceso mantiene un hilo
+que escucha el canal y:
+
+- invalida la tabla en la caché de referencia (query_cache.REFERENCE_CACHE);
+- incrementa la versión de (tabla, clave), que las cachés por sesión o de
+  st.cache_data incluyen en su clave para descartar solo las entradas afectadas.
+
+Si el listener pierde la conexión no puede saber qué se escribió mientras tanto,
+por lo que al reconectar invalida todo.
+"""
+import json
+import select
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+from .logging_utils import log_app_error
+from .query_cache import REFERENCE_CACHE
+from .schema_migrations import CACHE_INVALIDATION_CHANNEL
+
+_VERSIONS = {}  # (tabla, clave) -> contador; clave None = tabla completa
+_VERSIONS_LOCK = threading.Lock()
+_EPOCH = [0]    # se incrementa al reconectar el listener
+
+
+def cache_version(table, key=None):
+    """Versión actual de una tabla (o de una clave dentro de ella) para armar claves de caché"""
+    with _VERSIONS_LOCK:
+        version = (_EPOCH[0], _VERSIONS.get((table, None), 0))
+        if key is not None:
+            version += (_VERSIONS.get((table, str(key)), 0),)
+        return version
+
+
+def bump_cache_version(table, key=None):
+    """Marca como obsoletas las entradas de la tabla (o solo las de la clave indicada)"""
+    with _VERSIONS_LOCK:
+        k = (table, None if key is None else str(key))
+        _VERSIONS[k] = _VERSIONS.get(k, 0) + 1
+    REFERENCE_CACHE.invalidate(table)
+
+
+def invalidate_all():
+    with _VERSIONS_LOCK:
+        _EPOCH[0] += 1
+    REFERENCE_CACHE.clear()
+
+
+def handle_notification(payload):
+    """Aplica un payload recibido por el canal de invalidación"""
+    try:
+        data = json.loads(payload)
+        table = data['table']
+    except (ValueError, KeyError, TypeError):
+        log_app_error(f"Payload de invalidación inválido: {payload!r}", function="handle_notification")
+        return
+    bump_cache_version(table, data.get('key'))
+
+
+class InvalidationListener(threading.Thread):
+    """Hilo que mantiene una conexión dedicada en LISTEN sobre el canal de invalidación"""
+
+    def __init__(self, connect_kwargs, poll_timeout=5.0, retry_seconds=5.0):
+        super().__init__(name="cache-invalidation-listener", daemon=True)
+        self._connect_kwargs = dict(connect_kwargs)
+        self.poll_timeout = poll_timeout
+        self.retry_seconds = retry_seconds
+        self._stop_event = threading.Event()
+        self.connected = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _listen(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            conn.cursor().execute(f"LISTEN {CACHE_INVALIDATION_CHANNEL}")
+            self.connected.set()
+            while not self._stop_event.is_set():
+                if select.select([conn], [], [], self.poll_timeout) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    handle_notification(conn.notifies.pop(0).payload)
+        finally:
+            self.connected.clear()
+            conn.close()
+
+    def run(self):
+        first = True
+        while not self._stop_event.is_set():
+            if not first:
+                # Pudimos perder notificaciones mientras no escuchábamos
+                invalidate_all()
+            first = False
+            try:
+                self._listen()
+            except Exception as e:
+                log_app_error(f"Listener de invalidación desconectado: {e}", function="InvalidationListener.run")
+                self._stop_event.wait(self.retry_seconds)
+
+
+_LISTENER = {'thread': None, 'key': None}
+_LISTENER_LOCK = threading.Lock()
+
+
+def start_invalidation_listener(connect_kwargs):
+    """Arranca el listener del proceso (o lo reemplaza si cambió la base configurada)"""
+    key = tuple(sorted((k, str(v)) for k, v in connect_kwargs.items()))
+    with _LISTENER_LOCK:
+        current = _LISTENER['thread']
+        if current is not None and current.is_alive() and _LISTENER['key'] == key:
+            return current
+        if current is not None:
+            current.stop()
+        listener = InvalidationListener(connect_kwargs)
+        listener.start()
+        _LISTENER['thread'] = listener
+        _LISTENER['key'] = key
+        return listener
+
+
+def stop_invalidation_listener():
+    with _LISTENER_LOCK:
+        if _LISTENER['thread'] is not None:
+            _LISTENER['thread'].stop()
+        _LISTENER['thread'] = None
+        _LISTENER['key'] = None
@@ -8,6 +8,7 @@ import streamlit.components.v1 as components
 import pandas as pd
 from sqlalchemy import text
 from .config import PROJECT_UPLOADS_DIR
+from .query_cache import invalidate_tables
 from .database import (
     get_users_dataframe,
     get_clientes_dataframe,
@@ -232,6 +233,7 @@ def manual_client_form(user_id):
                                         pass
                                     c.execute("DELETE FROM clientes WHERE id_cliente = %s", (int(temp_cliente_id),))
                                     conn.commit()
+                                    invalidate_tables('clientes', 'clientes_puntajes')
                                     conn.close()
                                 except Exception:
                                     try:
@@ -393,10 +393,31 @@ POSTGRES_CONFIG = {
     'password': os.getenv('POSTGRES_PASSWORD', 'sigo')
 }
 
+# Pool de conexiones a PostgreSQL (compartido por get_connection y get_engine)
+def _load_db_pool_config() -> dict:
+    def _int_env(name, default):
+        try:
+            return int(os.getenv(name, default))
+        except (TypeError, ValueError):
+            return default
+    min_size = max(0, _int_env('DB_POOL_MIN_SIZE', 1))
+    max_size = max(1, _int_env('DB_POOL_MAX_SIZE', 20))
+    return {
+        'min_size': min(min_size, max_size),
+        'max_size': max_size,
+        'timeout': max(1, _int_env('DB_POOL_TIMEOUT', 30)),
+        'idle_timeout': max(0, _int_env('DB_POOL_IDLE_TIMEOUT', 300)),
+        'max_lifetime': max(0, _int_env('DB_POOL_MAX_LIFETIME', 1800)),
+        'health_check_interval': max(0, _int_env('DB_POOL_HEALTH_CHECK_INTERVAL', 30)),
+    }
+
+DB_POOL_CONFIG = _load_db_pool_config()
+
 # Rutas configurables
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 UPLOADS_DIR = os.getenv('UPLOADS_DIR', os.path.join(BASE_DIR, 'uploads'))
 PROJECT_UPLOADS_DIR = os.getenv('PROJECT_UPLOADS_DIR', os.path.join(UPLOADS_DIR, 'projects'))
+REGISTROS_EXPORT_DIR = os.getenv('REGISTROS_EXPORT_DIR', os.path.join(BASE_DIR, 'exports', 'registros'))
 SMTP_CONFIG = {
     'enabled': _env_flag('SMTP_ENABLED', False),
     'host': os.getenv('SMTP_HOST', 'smtp.gmail.com'),
@@ -440,6 +461,7 @@ def reload_env():
         'user': os.getenv('POSTGRES_USER', 'postgres'),
         'password': os.getenv('POSTGRES_PASSWORD', 'postgres')
     })
+    DB_POOL_CONFIG.update(_load_db_pool_config())
     SMTP_CONFIG.update({
         'enabled': _env_flag('SMTP_ENABLED', False),
         'host': os.getenv('SMTP_HOST', 'smtp.gmail.com'),
@@ -1,16 +1,18 @@
+import functools
 import json
 import re
-import smtplib
-from email.message import EmailMessage
+import threading
+import time
 import psycopg2
 import psycopg2.extras
 import pandas as pd
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from .logging_utils import log_app_error, log_sql_error
 from contextlib import contextmanager
 from .config import (
     POSTGRES_CONFIG,
+    DB_POOL_CONFIG,
     DEFAULT_ADMIN_USERNAME,
     DEFAULT_ADMIN_PASSWORD,
     SYSTEM_ROLES,
@@ -19,37 +21,49 @@ from .config import (
     get_notification_policy,
     get_notification_template,
 )
+from .db_pool import get_pool
+from .query_cache import REFERENCE_CACHE, cached_query, invalidate_tables, invalidates
+from .cache_invalidation import cache_version, start_invalidation_listener
+from .schema_migrations import apply_migrations
 from .utils import month_name_es, normalize_cuit, normalize_web
 from sqlalchemy import create_engine, text
-from sqlalchemy.engine import URL
+from sqlalchemy.pool import NullPool
 _ENGINE = None
 
+def get_connect_kwargs():
+    """Parámetros de conexión de la configuración actual"""
+    return {
+        'host': POSTGRES_CONFIG['host'],
+        'port': POSTGRES_CONFIG['port'],
+        'database': POSTGRES_CONFIG['database'],
+        'user': POSTGRES_CONFIG['user'],
+        'password': POSTGRES_CONFIG['password'],
+    }
+
+def get_connection_pool():
+    """Devuelve el pool de conexiones del proceso para la configuración actual"""
+    return get_pool(get_connect_kwargs(), DB_POOL_CONFIG)
+
+# La caché de tablas de referencia se descarta si cambia la base configurada
+REFERENCE_CACHE.set_scope_provider(get_connection_pool)
+
 def get_engine():
-    """Devuelve un engine de SQLAlchemy para PostgreSQL usando POSTGRES_CONFIG"""
+    """Devuelve un engine de SQLAlchemy para PostgreSQL que comparte el pool de get_connection()"""
     global _ENGINE
     if _ENGINE is None:
-        db_url = URL.create(
-            "postgresql+psycopg2",
-            username=POSTGRES_CONFIG['user'],
-            password=POSTGRES_CONFIG['password'],
-            host=POSTGRES_CONFIG['host'],
-            port=int(POSTGRES_CONFIG['port']),
-            database=POSTGRES_CONFIG['database'],
+        # NullPool: SQLAlchemy no mantiene conexiones propias; al cerrarlas vuelven a nuestro pool
+        _ENGINE = create_engine(
+            "postgresql+psycopg2://",
+            creator=lambda: get_connection_pool().acquire(),
+            poolclass=NullPool,
+            use_native_hstore=False,
         )
-        _ENGINE = create_engine(db_url, pool_pre_ping=True)
     return _ENGINE
 
 def get_connection():
-    """Establece conexión con PostgreSQL"""
-    try:
-        conn = psycopg2.connect(
-            host=POSTGRES_CONFIG['host'],
-            port=POSTGRES_CONFIG['port'],
-            database=POSTGRES_CONFIG['database'],
-            user=POSTGRES_CONFIG['user'],
-            password=POSTGRES_CONFIG['password']
-        )
-        return conn
+    """Obtiene una conexión del pool de PostgreSQL (conn.close() la devuelve al pool)"""
+    try:
+        return get_connection_pool().acquire()
     except UnicodeDecodeError:
         # Esto sucede cuando el mensaje de error de Postgres (ej: autenticación falló)
         # tiene caracteres que no son UTF-8 (ej: tildes en CP1252) y psycopg2 intenta decodificarlos.
@@ -64,7 +78,12 @@ def test_connection():
     """Prueba la conexión a la base de datos"""
     try:
         conn = get_connection()
-        conn.close()
+        try:
+            c = conn.cursor()
+            c.execute("SELECT 1")
+            c.fetchone()
+        finally:
+            conn.close()
         return True
     except Exception as e:
         log_sql_error(f"Error en test de conexión: {e}")
@@ -80,6 +99,196 @@ def db_connection():
         conn.close()
 
 
+_SCHEMA_STATE = {'pool': None, 'retry_at': 0.0, 'maintenance_pool': None}
+_SCHEMA_LOCK = threading.RLock()
+SCHEMA_RETRY_SECONDS = 60
+
+def ensure_schema(force=False):
+    """Aplica las migraciones pendientes (ver schema_migrations) una vez por proceso.
+
+    Tras la primera ejecución exitosa es un chequeo en memoria, por lo que las
+    funciones ensure_* y las rutas de lectura ya no emiten DDL en cada rerun.
+    Con force=True se vuelve a verificar contra la base y se propaga cualquier error.
+    """
+    pool = get_connection_pool()
+    if not force and _SCHEMA_STATE['pool'] is pool:
+        return True
+    with _SCHEMA_LOCK:
+        if not force and _SCHEMA_STATE['pool'] is pool:
+            return True
+        if not force and time.monotonic() < _SCHEMA_STATE['retry_at']:
+            return False
+        try:
+            with db_connection() as conn:
+                apply_migrations(conn)
+            _SCHEMA_STATE['pool'] = pool
+            _SCHEMA_STATE['retry_at'] = 0.0
+            return True
+        except Exception as e:
+            _SCHEMA_STATE['retry_at'] = time.monotonic() + SCHEMA_RETRY_SECONDS
+            log_sql_error(f"Error aplicando migraciones de esquema: {e}")
+            if force:
+                raise
+            return False
+
+def run_startup_maintenance():
+    """Migraciones y normalización de roles del sistema, una vez por proceso (y por base configurada)"""
+    if not ensure_schema():
+        return False
+    pool = get_connection_pool()
+    if _SCHEMA_STATE['maintenance_pool'] is pool:
+        return True
+    with _SCHEMA_LOCK:
+        if _SCHEMA_STATE['maintenance_pool'] is pool:
+            return True
+        ensure_system_roles()
+        merge_role_alias('Sin Rol', 'sin_rol')
+        fix_administracion_department_role()
+        _SCHEMA_STATE['maintenance_pool'] = pool
+    start_registros_fecha_backfill()
+    start_invalidation_listener(get_connect_kwargs())
+    return True
+
+
+# Los antiguos ensure_*/migrate_* por tabla: el DDL vive en schema_migrations y
+# ensure_schema lo aplica una vez por proceso. Aceptan (e ignoran) la conn que
+# algunos llamadores todavía pasan.
+def _ensure_schema_compat(conn=None):
+    return ensure_schema()
+
+
+ensure_notifications_schema = _ensure_schema_compat
+ensure_contactos_schema = _ensure_schema_compat
+ensure_clientes_schema = _ensure_schema_compat
+ensure_cliente_solicitudes_schema = _ensure_schema_compat
+ensure_projects_schema = _ensure_schema_compat
+ensure_feriados_schema = _ensure_schema_compat
+ensure_user_modality_schedule_exists = _ensure_schema_compat
+ensure_user_default_schedule_exists = _ensure_schema_compat
+ensure_roles_view_type_column = _ensure_schema_compat
+migrate_nomina_remove_unique_constraint = _ensure_schema_compat
+ensure_vacaciones_schema = _ensure_schema_compat
+ensure_clientes_favoritos_exists = _ensure_schema_compat
+
+
+# Backfill de registros.fecha_date: mientras no termine, las lecturas usan COALESCE con el texto
+_FECHA_BACKFILL_STATE = {'pool': None, 'running': False}
+
+
+def backfill_registros_fecha_date(batch_size=5000):
+    """Completa registros.fecha_date en lotes por id; devuelve la cantidad de filas actualizadas.
+
+    Solo toca filas cuya fecha se puede leer: las ilegibles quedan en NULL sin
+    reescribirse en cada arranque (dispararían updated_at, NOTIFY y el resumen mensual).
+    """
+    ensure_schema()
+    total = 0
+    last_id = 0
+    while True:
+        conn = get_connection()
+        try:
+            c = conn.cursor()
+            c.execute("""
+                WITH lote AS (
+                    SELECT id FROM registros
+                    WHERE fecha_date IS NULL AND id > %s
+                      AND registro_fecha_to_date(fecha) IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                )
+                UPDATE registros r
+                SET fecha_date = registro_fecha_to_date(r.fecha)
+                FROM lote
+                WHERE r.id = lote.id
+                RETURNING r.id
+            """, (last_id, batch_size))
+            ids = [row[0] for row in c.fetchall()]
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            log_sql_error(f"Error en backfill de fecha_date: {e}")
+            return total
+        finally:
+            conn.close()
+        if not ids:
+            break
+        total += len(ids)
+        last_id = max(ids)
+    _FECHA_BACKFILL_STATE['pool'] = get_connection_pool()
+    return total
+
+
+def start_registros_fecha_backfill():
+    """Lanza el backfill de fecha_date en segundo plano, una vez por proceso y pool"""
+    pool = get_connection_pool()
+    with _SCHEMA_LOCK:
+        if _FECHA_BACKFILL_STATE['pool'] is pool or _FECHA_BACKFILL_STATE['running']:
+            return
+        _FECHA_BACKFILL_STATE['running'] = True
+
+    def _run():
+        try:
+            backfill_registros_fecha_date()
+        finally:
+            _FECHA_BACKFILL_STATE['running'] = False
+
+    threading.Thread(target=_run, name="registros-fecha-backfill", daemon=True).start()
+
+
+def registros_fecha_sql(alias='r'):
+    """Expresión SQL con la fecha tipada del registro (lectura dual hasta completar el backfill)"""
+    prefix = f"{alias}." if alias else ""
+    if _FECHA_BACKFILL_STATE['pool'] is get_connection_pool():
+        return f"{prefix}fecha_date"
+    return f"COALESCE({prefix}fecha_date, registro_fecha_to_date({prefix}fecha))"
+
+
+def get_table_scan_stats_dataframe():
+    """Lecturas secuenciales vs. por índice de cada tabla (pg_stat_user_tables)"""
+    try:
+        query = """
+            SELECT relname AS tabla, n_live_tup AS filas, seq_scan, seq_tup_read,
+                   COALESCE(idx_scan, 0) AS idx_scan,
+                   CASE WHEN seq_scan + COALESCE(idx_scan, 0) > 0
+                        THEN ROUND(100.0 * COALESCE(idx_scan, 0) / (seq_scan + COALESCE(idx_scan, 0)), 1)
+                   END AS pct_idx,
+                   last_analyze, last_autoanalyze
+            FROM pg_stat_user_tables
+            ORDER BY seq_tup_read DESC
+        """
+        return pd.read_sql_query(query, con=get_engine())
+    except Exception as e:
+        log_sql_error(f"Error obteniendo estadísticas de tablas: {e}")
+        return pd.DataFrame()
+
+
+def get_index_usage_dataframe():
+    """Uso y tamaño de cada índice, marcando los gestionados por schema_migrations"""
+    from .schema_migrations import MANAGED_INDEXES
+    try:
+        query = """
+            SELECT s.relname AS tabla, s.indexrelname AS indice, s.idx_scan,
+                   s.idx_tup_read, s.idx_tup_fetch,
+                   pg_size_pretty(pg_relation_size(s.indexrelid)) AS tamano
+            FROM pg_stat_user_indexes s
+            ORDER BY s.relname, s.idx_scan DESC
+        """
+        df = pd.read_sql_query(query, con=get_engine())
+        managed = {name for name, _, _ in MANAGED_INDEXES}
+        df['gestionado'] = df['indice'].isin(managed)
+        missing = managed - set(df['indice'])
+        if missing:
+            faltantes = pd.DataFrame([
+                {'tabla': table, 'indice': name, 'gestionado': True}
+                for name, table, _ in MANAGED_INDEXES if name in missing
+            ])
+            df = pd.concat([df, faltantes], ignore_index=True)
+        return df
+    except Exception as e:
+        log_sql_error(f"Error obteniendo uso de índices: {e}")
+        return pd.DataFrame()
+
+
 NOTIFICATION_WEEKDAY_INDEX = {
     'monday': 0,
     'tuesday': 1,
@@ -89,53 +298,6 @@ NOTIFICATION_WEEKDAY_INDEX = {
 }
 
 
-def ensure_notifications_schema():
-    conn = get_connection()
-    try:
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS notification_event_queue (
-                id SERIAL PRIMARY KEY,
-                event_key VARCHAR(100) NOT NULL,
-                dedupe_key VARCHAR(255) UNIQUE,
-                payload JSONB NOT NULL DEFAULT '{}'::jsonb,
-                status VARCHAR(20) NOT NULL DEFAULT 'pending',
-                last_error TEXT,
-                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                processed_at TIMESTAMP
-            )
-        """)
-        c.execute("""
-            CREATE INDEX IF NOT EXISTS idx_notification_event_queue_status_created
-            ON notification_event_queue (status, created_at)
-        """)
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS notification_delivery_log (
-                id SERIAL PRIMARY KEY,
-                event_key VARCHAR(100) NOT NULL,
-                frequency VARCHAR(20) NOT NULL,
-                recipient_user_id INTEGER NULL REFERENCES usuarios(id) ON DELETE SET NULL,
-                recipient_email VARCHAR(200) NOT NULL,
-                dedupe_key VARCHAR(255) NOT NULL UNIQUE,
-                source_queue_id INTEGER NULL REFERENCES notification_event_queue(id) ON DELETE SET NULL,
-                subject TEXT NOT NULL,
-                body TEXT NOT NULL,
-                created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        c.execute("""
-            CREATE INDEX IF NOT EXISTS idx_notification_delivery_log_event_created
-            ON notification_delivery_log (event_key, created_at)
-        """)
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        log_sql_error(f"Error asegurando esquema de notificaciones: {e}")
-        raise
-    finally:
-        conn.close()
-
-
 def _normalize_notification_email(value):
     email = str(value or '').strip()
     if not email or email.lower() == 'none':
@@ -190,31 +352,47 @@ def _notification_compact_name(nombre, apellido='', fallback='Usuario'):
     return full_name or fallback
 
 
-def _notification_fetch_user(conn, user_id):
-    if user_id in (None, ''):
-        return None
+def _notification_fetch_users(conn, user_ids):
+    """{id: datos} de varios usuarios con una sola consulta (ids inválidos se ignoran)"""
+    ids = set()
+    for user_id in user_ids:
+        try:
+            ids.add(int(user_id))
+        except (TypeError, ValueError):
+            continue
+    if not ids:
+        return {}
     try:
         c = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
         c.execute(
             """
             SELECT id, username, nombre, apellido, email, is_admin, is_active
             FROM usuarios
-            WHERE id = %s
+            WHERE id = ANY(%s)
             """,
-            (int(user_id),)
+            (sorted(ids),)
         )
-        row = c.fetchone()
-        if not row:
-            return None
-        data = dict(row)
-        data['email'] = _normalize_notification_email(data.get('email'))
-        data['display_name'] = _notification_compact_name(
-            data.get('nombre'),
-            data.get('apellido'),
-            data.get('username') or data['email'] or 'Usuario'
-        )
-        return data
+        users = {}
+        for row in c.fetchall():
+            data = dict(row)
+            data['email'] = _normalize_notification_email(data.get('email'))
+            data['display_name'] = _notification_compact_name(
+                data.get('nombre'),
+                data.get('apellido'),
+                data.get('username') or data['email'] or 'Usuario'
+            )
+            users[int(data['id'])] = data
+        return users
     except Exception:
+        return {}
+
+
+def _notification_fetch_user(conn, user_id):
+    if user_id in (None, ''):
+        return None
+    try:
+        return _notification_fetch_users(conn, [user_id]).get(int(user_id))
+    except (TypeError, ValueError):
         return None
 
 
@@ -261,7 +439,18 @@ def _notification_delivery_exists(conn, dedupe_key):
     return c.fetchone() is not None
 
 
-def _notification_record_delivery(conn, event_key, frequency, recipient, dedupe_key, subject, body, source_queue_id=None):
+def _notification_existing_dedupe_keys(conn, dedupe_keys):
+    """Subconjunto de dedupe_keys que ya tiene un envío registrado"""
+    keys = [str(k).strip() for k in dedupe_keys]
+    if not keys:
+        return set()
+    c = conn.cursor()
+    c.execute("SELECT dedupe_key FROM notification_delivery_log WHERE dedupe_key = ANY(%s)", (keys,))
+    return {row[0] for row in c.fetchall()}
+
+
+def _notification_record_delivery(conn, delivery):
+    """Registra un envío hecho (fila de _notification_deliver); se confirma enseguida del envío"""
     c = conn.cursor()
     c.execute(
         """
@@ -278,16 +467,7 @@ def _notification_record_delivery(conn, event_key, frequency, recipient, dedupe_
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (dedupe_key) DO NOTHING
         """,
-        (
-            str(event_key or '').strip(),
-            str(frequency or '').strip(),
-            recipient.get('user_id'),
-            recipient.get('email'),
-            str(dedupe_key).strip(),
-            source_queue_id,
-            str(subject or ''),
-            str(body or ''),
-        )
+        delivery,
     )
 
 
@@ -318,49 +498,41 @@ def _notification_effective_template(event_key):
     return default_template
 
 
+_NOTIFICATION_PLACEHOLDER_RE = re.compile(r"\{([^{}]+)\}")
+
+
+@functools.lru_cache(maxsize=256)
+def _notification_compile_text(template_text):
+    """Convierte el texto de una plantilla en una función context -> texto.
+
+    Se parsea una sola vez por texto: al cambiar la plantilla (nueva versión en la
+    configuración) cambia la clave y se compila de nuevo.
+    """
+    parts = _NOTIFICATION_PLACEHOLDER_RE.split(str(template_text or ''))
+    literals = parts[0::2]
+    keys = parts[1::2]
+
+    def render(context):
+        out = [literals[0]]
+        for key, literal in zip(keys, literals[1:]):
+            out.append(str(context.get(key, '')))
+            out.append(literal)
+        return ''.join(out)
+
+    return render
+
+
 def _notification_render_text(template_text, context):
-    return re.sub(
-        r"\{([^{}]+)\}",
-        lambda match: str(context.get(match.group(1), '')),
-        str(template_text or '')
-    )
+    return _notification_compile_text(str(template_text or ''))(context)
 
 
 def _notification_send_email(recipient_email, subject, body):
+    """Envío suelto (abre y cierra su propia sesión); los lotes usan un SMTPSender compartido"""
     if not _notification_is_smtp_ready():
         raise RuntimeError("SMTP no está configurado para envíos automáticos.")
-    host = str(SMTP_CONFIG.get('host') or '').strip()
-    port = int(str(SMTP_CONFIG.get('port') or '587').strip())
-    security = str(SMTP_CONFIG.get('security') or 'tls').strip().lower()
-    sender_email = _normalize_notification_email(SMTP_CONFIG.get('from_email'))
-    sender_name = str(SMTP_CONFIG.get('from_name') or 'SIGO').strip() or 'SIGO'
-    username = str(SMTP_CONFIG.get('user') or '').strip()
-    password = str(SMTP_CONFIG.get('password') or '')
-
-    message = EmailMessage()
-    message['Subject'] = str(subject or '').strip() or 'Notificación SIGO'
-    message['From'] = f"{sender_name} <{sender_email}>"
-    message['To'] = recipient_email
-    message.set_content(str(body or ''), subtype='plain', charset='utf-8')
-
-    smtp_client = None
-    try:
-        if security == 'ssl':
-            smtp_client = smtplib.SMTP_SSL(host, port, timeout=20)
-        else:
-            smtp_client = smtplib.SMTP(host, port, timeout=20)
-            smtp_client.ehlo()
-            smtp_client.starttls()
-            smtp_client.ehlo()
-        if username:
-            smtp_client.login(username, password)
-        smtp_client.send_message(message)
-    finally:
-        if smtp_client is not None:
-            try:
-                smtp_client.quit()
-            except Exception:
-                pass
+    from .smtp_sender import SMTPSender
+    with SMTPSender() as sender:
+        sender.send(recipient_email, subject, body)
 
 
 def _notification_event_label(event_key):
@@ -368,14 +540,9 @@ def _notification_event_label(event_key):
     return str(definition.get('label') or event_key or 'Notificación')
 
 
-def _notification_build_context(conn, event_key, payload, recipient, now):
-    payload = dict(payload or {})
-    requester = _notification_fetch_user(conn, payload.get('requested_by'))
-    recipient_name = recipient.get('display_name') or recipient.get('email') or 'Usuario'
-    context = {
-        'nombre': recipient_name,
-        'usuario': payload.get('usuario') or recipient_name,
-        'email': recipient.get('email') or '',
+def _notification_event_context(event_key, payload, requester, now):
+    """Parte del contexto común a todos los destinatarios de un evento"""
+    return {
         'evento': _notification_event_label(event_key),
         'detalle': payload.get('detalle') or '',
         'fecha': now.strftime("%d/%m/%Y %H:%M"),
@@ -394,14 +561,56 @@ def _notification_build_context(conn, event_key, payload, recipient, now):
         'dias_vencido': payload.get('dias_vencido') or '-',
         'estado': payload.get('estado') or '-',
     }
+
+
+def _notification_payload_overrides(payload):
+    overrides = {}
     for key, value in payload.items():
         if value is None:
             continue
         if isinstance(value, (dict, list)):
-            context[key] = json.dumps(value, ensure_ascii=False)
+            overrides[key] = json.dumps(value, ensure_ascii=False)
         else:
-            context[key] = value
-    return context
+            overrides[key] = value
+    return overrides
+
+
+def _notification_prepare_event(conn, event_key, payload, now, users=None):
+    """Plantilla compilada y armado de contexto de un evento, para renderizar a cada destinatario.
+
+    Lo que no depende del destinatario (plantilla, solicitante, campos del payload)
+    se resuelve una vez; users puede traer los usuarios ya leídos en lote.
+    """
+    payload = dict(payload or {})
+    template = _notification_effective_template(event_key)
+    requested_by = payload.get('requested_by')
+    if users is None:
+        users = _notification_fetch_users(conn, [requested_by])
+    try:
+        requester = users.get(int(requested_by)) if requested_by not in (None, '') else None
+    except (TypeError, ValueError):
+        requester = None
+    event_context = _notification_event_context(event_key, payload, requester, now)
+    overrides = _notification_payload_overrides(payload)
+    render_subject = _notification_compile_text(template.get('subject'))
+    render_body = _notification_compile_text(template.get('body'))
+
+    def context_for(recipient):
+        recipient_name = recipient.get('display_name') or recipient.get('email') or 'Usuario'
+        context = {
+            'nombre': recipient_name,
+            'usuario': payload.get('usuario') or recipient_name,
+            'email': recipient.get('email') or '',
+        }
+        context.update(event_context)
+        context.update(overrides)
+        return context
+
+    def render(recipient):
+        context = context_for(recipient)
+        return render_subject(context).strip(), render_body(context).strip()
+
+    return {'enabled': bool(template.get('enabled')), 'context': context_for, 'render': render}
 
 
 def _notification_admin_recipients(conn):
@@ -446,131 +655,187 @@ def _notification_recipients_for_event(conn, event_key, payload):
     return []
 
 
-def _notification_send_for_recipient(conn, event_key, frequency, payload, recipient, dedupe_key, source_queue_id=None, now=None):
-    now = now or datetime.now()
-    template = _notification_effective_template(event_key)
-    if not template.get('enabled'):
+def _notification_deliver(sender, prepared, event_key, frequency, recipient, dedupe_key, source_queue_id=None):
+    """Renderiza y envía el correo de un destinatario; devuelve la fila para _notification_record_delivery"""
+    if not prepared['enabled']:
         raise RuntimeError("No hay una plantilla habilitada para este evento.")
-    context = _notification_build_context(conn, event_key, payload, recipient, now)
-    subject = _notification_render_text(template.get('subject'), context).strip()
-    body = _notification_render_text(template.get('body'), context).strip()
-    _notification_send_email(recipient['email'], subject, body)
-    _notification_record_delivery(
-        conn,
-        event_key,
-        frequency,
-        recipient,
-        dedupe_key,
-        subject,
-        body,
-        source_queue_id=source_queue_id,
+    subject, body = prepared['render'](recipient)
+    sender.send(recipient['email'], subject, body)
+    return (
+        str(event_key or '').strip(),
+        str(frequency or '').strip(),
+        recipient.get('user_id'),
+        recipient.get('email'),
+        str(dedupe_key).strip(),
+        source_queue_id,
+        str(subject or ''),
+        str(body or ''),
     )
 
 
-def _notification_process_event_queue(now):
-    results = {'sent': 0, 'processed': 0, 'discarded': 0, 'errors': 0}
-    conn = get_connection()
-    try:
-        c = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        c.execute(
-            """
-            SELECT id, event_key, payload, created_at
+# Un evento reservado por un worker que no lo liberó en este plazo (p.ej. se cayó) vuelve a estar disponible
+NOTIFICATION_CLAIM_LEASE_SECONDS = 600
+
+
+def _notification_claim_event(conn, exclude_event_keys=(), exclude_ids=(), event_keys=None):
+    """Reserva el evento pendiente más antiguo que ningún otro worker tenga tomado.
+
+    FOR UPDATE SKIP LOCKED evita que dos workers elijan la misma fila; la reserva
+    (locked_at) se confirma enseguida para que el envío de correos, que confirma
+    por destinatario, no dependa del bloqueo de fila.
+    """
+    c = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    c.execute(
+        """
+        UPDATE notification_event_queue q
+        SET locked_at = CURRENT_TIMESTAMP
+        WHERE q.id = (
+            SELECT id
             FROM notification_event_queue
             WHERE status = 'pending'
+              AND (locked_at IS NULL OR locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+              AND event_key <> ALL(%s)
+              AND id <> ALL(%s)
+              AND (%s::text[] IS NULL OR event_key = ANY(%s::text[]))
             ORDER BY created_at ASC, id ASC
-            LIMIT 100
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING q.id, q.event_key, q.payload, q.created_at
+        """,
+        (
+            NOTIFICATION_CLAIM_LEASE_SECONDS,
+            list(exclude_event_keys),
+            [int(i) for i in exclude_ids],
+            None if event_keys is None else list(event_keys),
+            None if event_keys is None else list(event_keys),
+        )
+    )
+    row = c.fetchone()
+    conn.commit()
+    return row
+
+
+def _notification_release_event(conn, queue_id):
+    conn.rollback()
+    c = conn.cursor()
+    c.execute("UPDATE notification_event_queue SET locked_at = NULL WHERE id = %s", (int(queue_id),))
+    conn.commit()
+
+
+def _notification_process_event(conn, sender, row, now, results):
+    """Envía un evento reservado; devuelve False si su política todavía no corresponde"""
+    event_key = str(row['event_key'] or '').strip()
+    payload = dict(row.get('payload') or {})
+    policy = get_notification_policy(event_key)
+    if not policy.get('enabled') or not policy.get('email_enabled'):
+        _notification_update_queue_status(conn, row['id'], 'discarded', 'Política deshabilitada.')
+        conn.commit()
+        results['discarded'] += 1
+        return True
+    if not _notification_policy_due_now(policy, now):
+        return False
+    recipients = _notification_recipients_for_event(conn, event_key, payload)
+    if not recipients:
+        _notification_update_queue_status(conn, row['id'], 'discarded', 'No se encontraron destinatarios válidos.')
+        conn.commit()
+        results['discarded'] += 1
+        return True
+    pending_errors = []
+    dedupe_keys = {
+        recipient['dedupe_key']: f"{event_key}:{int(row['id'])}:{recipient['dedupe_key']}"
+        for recipient in recipients
+    }
+    already_sent = _notification_existing_dedupe_keys(conn, dedupe_keys.values())
+    sent_this_event = bool(already_sent)
+    # Plantilla y contexto común una vez por evento; todos los destinatarios por la misma sesión
+    # SMTP. Cada envío se registra y confirma enseguida: si el proceso se cae o la reserva vence
+    # a mitad del evento, quien lo retome no vuelve a enviar a los que ya lo recibieron
+    prepared = _notification_prepare_event(conn, event_key, payload, now)
+    for recipient in recipients:
+        delivery_dedupe_key = dedupe_keys[recipient['dedupe_key']]
+        if delivery_dedupe_key in already_sent:
+            continue
+        try:
+            delivery = _notification_deliver(
+                sender,
+                prepared,
+                event_key,
+                policy.get('frequency'),
+                recipient,
+                delivery_dedupe_key,
+                source_queue_id=int(row['id']),
+            )
+            _notification_record_delivery(conn, delivery)
+            conn.commit()
+            sent_this_event = True
+            results['sent'] += 1
+        except Exception as e:
+            conn.rollback()
+            pending_errors.append(str(e))
+            results['errors'] += 1
+            log_app_error(e, module="database", function="_notification_process_event")
+    if pending_errors:
+        c_retry = conn.cursor()
+        c_retry.execute(
             """
+            UPDATE notification_event_queue
+            SET last_error = %s
+            WHERE id = %s
+            """,
+            ("\n".join(pending_errors), int(row['id']))
         )
-        rows = c.fetchall()
-        for row in rows:
-            event_key = str(row['event_key'] or '').strip()
-            payload = dict(row.get('payload') or {})
-            policy = get_notification_policy(event_key)
-            if not policy.get('enabled') or not policy.get('email_enabled'):
-                _notification_update_queue_status(conn, row['id'], 'discarded', 'Política deshabilitada.')
-                conn.commit()
-                results['discarded'] += 1
-                continue
-            if not _notification_policy_due_now(policy, now):
-                continue
-            recipients = _notification_recipients_for_event(conn, event_key, payload)
-            if not recipients:
-                _notification_update_queue_status(conn, row['id'], 'discarded', 'No se encontraron destinatarios válidos.')
-                conn.commit()
-                results['discarded'] += 1
-                continue
-            pending_errors = []
-            sent_this_event = False
-            for recipient in recipients:
-                delivery_dedupe_key = f"{event_key}:{int(row['id'])}:{recipient['dedupe_key']}"
-                if _notification_delivery_exists(conn, delivery_dedupe_key):
-                    sent_this_event = True
-                    continue
-                try:
-                    _notification_send_for_recipient(
-                        conn,
-                        event_key,
-                        policy.get('frequency'),
-                        payload,
-                        recipient,
-                        delivery_dedupe_key,
-                        source_queue_id=int(row['id']),
-                        now=now,
-                    )
-                    conn.commit()
-                    sent_this_event = True
-                    results['sent'] += 1
-                except Exception as e:
-                    conn.rollback()
-                    pending_errors.append(str(e))
-                    results['errors'] += 1
-                    log_app_error(e, module="database", function="_notification_process_event_queue")
-            if pending_errors:
-                c_retry = conn.cursor()
-                c_retry.execute(
-                    """
-                    UPDATE notification_event_queue
-                    SET last_error = %s
-                    WHERE id = %s
-                    """,
-                    ("\n".join(pending_errors), int(row['id']))
-                )
-                conn.commit()
-            elif sent_this_event:
-                _notification_update_queue_status(conn, row['id'], 'processed')
-                conn.commit()
-                results['processed'] += 1
+    elif sent_this_event:
+        _notification_update_queue_status(conn, row['id'], 'processed')
+        results['processed'] += 1
+    conn.commit()
+    return True
+
+
+def _notification_process_event_queue(now, max_events=100, event_keys=None):
+    """Procesa eventos pendientes de a uno, reservándolos; varios workers pueden correrlo a la vez.
+
+    event_keys limita los tipos de evento a tomar (p.ej. el benchmark solo toma los suyos).
+    """
+    results = {'sent': 0, 'processed': 0, 'discarded': 0, 'errors': 0}
+    # Eventos cuya política aún no corresponde o que fallaron: no se vuelven a reservar en esta pasada
+    deferred_event_keys = set()
+    failed_ids = set()
+    from .smtp_sender import SMTPSender
+    conn = get_connection()
+    sender = SMTPSender()
+    try:
+        for _ in range(max_events):
+            row = _notification_claim_event(conn, deferred_event_keys, failed_ids, event_keys=event_keys)
+            if row is None:
+                break
+            try:
+                if not _notification_process_event(conn, sender, row, now, results):
+                    deferred_event_keys.add(str(row['event_key'] or '').strip())
+            except Exception as e:
+                failed_ids.add(int(row['id']))
+                results['errors'] += 1
+                log_app_error(e, module="database", function="_notification_process_event_queue")
+            finally:
+                _notification_release_event(conn, row['id'])
         return results
     finally:
+        sender.close()
         conn.close()
 
 
-def _notification_pending_load_alerts(user_id, reference_now=None):
+def _notification_pending_load_alerts(user_ids, reference_now=None, conn=None):
+    """{user_id: [alertas]} del mes en curso para todos los usuarios, en una sola pasada"""
+    from .workday_coverage import get_pending_load_alerts
     reference_now = reference_now or datetime.now()
-    alerts = []
     try:
-        df_regs = get_user_registros_dataframe(user_id)
-        if not df_regs.empty:
-            if pd.api.types.is_datetime64_any_dtype(df_regs['fecha']):
-                df_regs['fecha_dt'] = df_regs['fecha']
-            else:
-                df_regs['fecha_dt'] = pd.to_datetime(df_regs['fecha'], dayfirst=True, errors='coerce')
-        start_date = reference_now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_date = reference_now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        current = start_date
-        while current <= end_date:
-            if current.weekday() < 5 and not is_feriado(current.date()):
-                day_hours = 0
-                if not df_regs.empty:
-                    mask = df_regs['fecha_dt'].dt.date == current.date()
-                    day_hours = float(df_regs.loc[mask, 'tiempo'].sum())
-                if day_hours < 4:
-                    status = "Sin carga" if day_hours == 0 else f"{day_hours:g}hs"
-                    alerts.append(f"{current.strftime('%d/%m')} ({status})")
-            current += timedelta(days=1)
+        today = reference_now.date()
+        return get_pending_load_alerts(user_ids, today.replace(day=1), today, conn=conn)
     except Exception as e:
+        if conn is not None:
+            conn.rollback()
         log_app_error(e, module="database", function="_notification_pending_load_alerts")
-    return alerts
+        return {}
 
 
 def _notification_pending_load_candidates(conn):
@@ -617,6 +882,7 @@ def _notification_pending_load_period_key(now, frequency):
 
 
 def _notification_process_pending_load(now):
+    from .smtp_sender import SMTPSender
     event_key = 'dia_pendiente_carga'
     policy = get_notification_policy(event_key)
     results = {'sent': 0, 'errors': 0}
@@ -625,18 +891,25 @@ def _notification_process_pending_load(now):
     if not _notification_policy_due_now(policy, now):
         return results
     conn = get_connection()
+    sender = SMTPSender()
     try:
         recipients = _notification_pending_load_candidates(conn)
         frequency = str(policy.get('frequency') or 'daily').strip().lower()
         period_key = _notification_pending_load_period_key(now, frequency)
         period_label = _notification_pending_load_period_label(now, frequency)
+        dedupe_keys = {
+            recipient['user_id']: f"{event_key}:{frequency}:{period_key}:user:{recipient['user_id']}"
+            for recipient in recipients
+        }
+        # Una consulta para los envíos ya hechos en el período y otra para los déficits de todos
+        already_sent = _notification_existing_dedupe_keys(conn, dedupe_keys.values())
+        recipients = [r for r in recipients if dedupe_keys[r['user_id']] not in already_sent]
+        alerts_by_user = _notification_pending_load_alerts([r['user_id'] for r in recipients], reference_now=now, conn=conn)
         for recipient in recipients:
-            alerts = _notification_pending_load_alerts(recipient['user_id'], reference_now=now)
+            alerts = alerts_by_user.get(recipient['user_id'])
             if not alerts:
                 continue
-            delivery_dedupe_key = f"{event_key}:{frequency}:{period_key}:user:{recipient['user_id']}"
-            if _notification_delivery_exists(conn, delivery_dedupe_key):
-                continue
+            delivery_dedupe_key = dedupe_keys[recipient['user_id']]
             payload = {
                 'usuario': recipient['display_name'],
                 'periodo': period_label,
@@ -645,16 +918,18 @@ def _notification_process_pending_load(now):
                 'detalle': 'Se detectaron jornadas hábiles con menos de 4 horas registradas.',
             }
             try:
-                _notification_send_for_recipient(
-                    conn,
+                # Sin solicitante en el payload: no hay usuarios que leer
+                prepared = _notification_prepare_event(conn, event_key, payload, now, users={})
+                delivery = _notification_deliver(
+                    sender,
+                    prepared,
                     event_key,
                     frequency,
-                    payload,
                     recipient,
                     delivery_dedupe_key,
                     source_queue_id=None,
-                    now=now,
                 )
+                _notification_record_delivery(conn, delivery)
                 conn.commit()
                 results['sent'] += 1
             except Exception as e:
@@ -663,14 +938,12 @@ def _notification_process_pending_load(now):
                 log_app_error(e, module="database", function="_notification_process_pending_load")
         return results
     finally:
+        sender.close()
         conn.close()
 
 
-def process_automatic_notifications(now=None):
-    now = now or datetime.now()
-    if not _notification_is_smtp_ready():
-        return {'sent': 0, 'processed': 0, 'discarded': 0, 'errors': 0}
-    ensure_notifications_schema()
+def _notification_process_pending_load_locked(now):
+    """Resumen de carga pendiente con un advisory lock: un solo proceso lo arma por vez"""
     lock_conn = get_connection()
     lock_key = 874221
     try:
@@ -678,15 +951,8 @@ def process_automatic_notifications(now=None):
         c.execute("SELECT pg_try_advisory_lock(%s)", (lock_key,))
         lock_row = c.fetchone()
         if not lock_row or not bool(lock_row[0]):
-            return {'sent': 0, 'processed': 0, 'discarded': 0, 'errors': 0}
-        event_results = _notification_process_event_queue(now)
-        pending_results = _notification_process_pending_load(now)
-        return {
-            'sent': event_results['sent'] + pending_results['sent'],
-            'processed': event_results['processed'],
-            'discarded': event_results['discarded'],
-            'errors': event_results['errors'] + pending_results['errors'],
-        }
+            return {'sent': 0, 'errors': 0}
+        return _notification_process_pending_load(now)
     finally:
         try:
             c = lock_conn.cursor()
@@ -696,6 +962,44 @@ def process_automatic_notifications(now=None):
         lock_conn.close()
 
 
+def _notification_run_event_queue(now, event_workers=1, event_keys=None):
+    """Vacía la cola de eventos con event_workers hilos y suma sus resultados"""
+    results = {'sent': 0, 'processed': 0, 'discarded': 0, 'errors': 0}
+    if event_workers > 1:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=event_workers, thread_name_prefix="notification-event") as executor:
+            partials = list(executor.map(
+                lambda _: _notification_process_event_queue(now, event_keys=event_keys),
+                range(event_workers),
+            ))
+    else:
+        partials = [_notification_process_event_queue(now, event_keys=event_keys)]
+    for partial in partials:
+        for key in results:
+            results[key] += partial[key]
+    return results
+
+
+def process_automatic_notifications(now=None, event_workers=1):
+    """Una pasada de envíos automáticos: cola de eventos y resumen de carga pendiente.
+
+    La ejecuta el worker de notificaciones (python -m modules.notification_worker),
+    no la interfaz. event_workers > 1 procesa la cola con varios hilos a la vez.
+    """
+    now = now or datetime.now()
+    if not _notification_is_smtp_ready():
+        return {'sent': 0, 'processed': 0, 'discarded': 0, 'errors': 0}
+    ensure_notifications_schema()
+    event_results = _notification_run_event_queue(now, event_workers=event_workers)
+    pending_results = _notification_process_pending_load_locked(now)
+    return {
+        'sent': event_results['sent'] + pending_results['sent'],
+        'processed': event_results['processed'],
+        'discarded': event_results['discarded'],
+        'errors': event_results['errors'] + pending_results['errors'],
+    }
+
+
 def send_test_notification_email():
     recipient_email = _normalize_notification_email(SMTP_CONFIG.get('user') or SMTP_CONFIG.get('from_email'))
     if not recipient_email:
@@ -729,418 +1033,86 @@ def get_current_project_id_sequence(conn=None):
         
         # 1. Obtener nombre de la secuencia de forma segura
         c.execute("SELECT pg_get_serial_sequence('proyectos', 'id')")
-        row_seq = c.fetchone()
-        
-        if row_seq and row_seq[0]:
-            seq_name = row_seq[0]
-            # 2. Consultar valor actual directamente de la secuencia
-            # Usamos SQL dinámico seguro porque seq_name viene de pg_get_serial_sequence
-            query = f"SELECT last_value FROM {seq_name}"
-            c.execute(query)
-            row = c.fetchone()
-            if row:
-                return row[0]
-        
-        return 0
-    except Exception as e:
-        log_sql_error(f"Error obteniendo secuencia de proyectos: {e}")
-        return 0
-    finally:
-        if close_conn:
-            conn.close()
-
-def get_user_info_safe(user_id):
-    """Obtiene información del usuario de manera segura"""
-    try:
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT id, username, is_admin, rol_id, nombre, apellido, email
-            FROM usuarios 
-            WHERE id = %s AND is_active = TRUE
-        """, (user_id,))
-        result = c.fetchone()
-        conn.close()
-        
-        if result:
-            return {
-                'id': result[0],
-                'username': result[1],
-                'is_admin': result[2],
-                'rol_id': result[3],
-                'nombre': result[4] or '',
-                'apellido': result[5] or '',
-                'email': result[6] or ''
-            }
-        return None
-    except Exception as e:
-        log_sql_error(f"Error en get_user_info_safe: {e}")
-        return None
-
-def set_project_id_sequence(new_start_value, conn=None):
-    """Establece el valor de reinicio de la secuencia de IDs de proyectos"""
-    close_conn = False
-    if conn is None:
-        conn = get_connection()
-        close_conn = True
-        conn.autocommit = True # Necesario para setval a veces, o commit explícito
-    
-    try:
-        c = conn.cursor()
-        # setval(sequence, value, is_called)
-        # Si is_called es false, el próximo nextval devolverá value.
-        # Si is_called es true (default), el próximo nextval devolverá value + increment.
-        # Queremos que el PRÓXIMO proyecto tenga el ID new_start_value.
-        # Entonces usamos is_called=false.
-        
-        # Primero obtenemos el nombre de la secuencia dinámicamente para ser seguros
-        c.execute("SELECT pg_get_serial_sequence('proyectos', 'id')")
-        seq_name = c.fetchone()[0]
-        
-        if seq_name:
-            query = f"SELECT setval('{seq_name}', %s, false)"
-            c.execute(query, (new_start_value,))
-            return True, f"Secuencia actualizada. El próximo proyecto tendrá ID {new_start_value}."
-        else:
-            return False, "No se encontró la secuencia de proyectos."
-            
-    except Exception as e:
-        log_sql_error(f"Error actualizando secuencia de proyectos: {e}")
-        return False, str(e)
-    finally:
-        if close_conn:
-            conn.close()
-
-
-def ensure_contactos_schema():
-    """Asegura el esquema de la tabla contactos"""
-    conn = get_connection()
-    try:
-        conn.autocommit = True
-        c = conn.cursor()
-        for ddl in [
-            "ALTER TABLE contactos ADD COLUMN IF NOT EXISTS celular VARCHAR(50)",
-            "ALTER TABLE contactos ADD COLUMN IF NOT EXISTS notes TEXT",
-            "ALTER TABLE contactos ADD COLUMN IF NOT EXISTS direccion VARCHAR(300)", # Re-ensure just in case
-        ]:
-            try:
-                c.execute(ddl)
-            except Exception:
-                pass
-    finally:
-        conn.close()
-
-def ensure_clientes_schema():
-    """Asegura que la tabla clientes tenga todas las columnas necesarias"""
-    conn = get_connection()
-    try:
-        # Usar autocommit para evitar problemas de transacción con DDLs
-        conn.autocommit = True
-        c = conn.cursor()
-        for ddl in [
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS alias VARCHAR(200)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS celular VARCHAR(20)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS web VARCHAR(300)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS organizacion VARCHAR(300)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS email VARCHAR(100)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS telefono VARCHAR(50)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS direccion VARCHAR(300)",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS activo BOOLEAN DEFAULT TRUE",
-            "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS notes TEXT"
-        ]:
-            try:
-                c.execute(ddl)
-            except Exception as e:
-                log_sql_error(f"Error ejecutando DDL en clientes: {e}")
-        
-        try:
-            c.execute("ALTER TABLE clientes ALTER COLUMN celular TYPE VARCHAR(30)")
-        except Exception:
-            pass
-                
-    except Exception as e:
-        log_sql_error(f"Error asegurando esquema de clientes: {e}")
-    finally:
-        conn.close()
-
-
-def ensure_cliente_solicitudes_schema():
-    """Asegura que la tabla cliente_solicitudes tenga todas las columnas necesarias"""
-    conn = get_connection()
-    try:
-        conn.autocommit = True
-        c = conn.cursor()
-        
-        # Crear tabla si no existe
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS cliente_solicitudes (
-                id SERIAL PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                organizacion VARCHAR(200),
-                telefono VARCHAR(50),
-                email VARCHAR(100),
-                cuit VARCHAR(32),
-                celular VARCHAR(20),
-                web VARCHAR(300),
-                tipo VARCHAR(50),
-                requested_by INTEGER NOT NULL REFERENCES usuarios(id),
-                estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                temp_cliente_id INTEGER
-            )
-        ''')
-        
-        # Asegurar columnas individuales
-        ddls = [
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS email VARCHAR(100)",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS celular VARCHAR(20)",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS web VARCHAR(300)",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS tipo VARCHAR(50)",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS temp_cliente_id INTEGER",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS notes TEXT"
-        ]
-        
-        for ddl in ddls:
-            try:
-                c.execute(ddl)
-            except Exception as e:
-                log_sql_error(f"Error executing DDL '{ddl}': {e}")
-                
-    except Exception as e:
-        log_sql_error(f"Error asegurando esquema de cliente_solicitudes: {e}")
-    finally:
-        conn.close()
-
-
-def ensure_projects_schema(conn=None):
-    """Crea las tablas relacionadas con proyectos si no existen"""
-    try:
-        if conn is None:
-            conn = get_connection()
-            # Usar autocommit para operaciones DDL y evitar transacciones abortadas
-            try:
-                conn.autocommit = True
-            except Exception:
-                pass
-            close_conn = True
-        else:
-            close_conn = False
-
-        c = conn.cursor()
-        try:
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS marcas (
-                    id_marca SERIAL PRIMARY KEY,
-                    nombre VARCHAR(100) UNIQUE NOT NULL
-                )
-            ''')
-        except Exception as e:
-            log_sql_error(f"No se pudo asegurar tabla marcas: {e}")
-        
-        try:
-            c.execute("ALTER TABLE marcas ADD COLUMN IF NOT EXISTS activa BOOLEAN DEFAULT TRUE")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE marcas ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE marcas ADD COLUMN IF NOT EXISTS email VARCHAR(200)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE marcas ADD COLUMN IF NOT EXISTS telefono VARCHAR(100)")
-        except Exception:
-            pass
-        try:
-             c.execute("ALTER TABLE marcas ALTER COLUMN telefono TYPE VARCHAR(100)")
-        except Exception:
-             pass
-        try:
-            c.execute("ALTER TABLE marcas ADD COLUMN IF NOT EXISTS celular VARCHAR(50)")
-        except Exception:
-            pass
-        # Ensure celular is large enough
-        try:
-            c.execute("ALTER TABLE marcas ALTER COLUMN celular TYPE VARCHAR(50)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE marcas ADD COLUMN IF NOT EXISTS web VARCHAR(300)")
-        except Exception:
-            pass
-
-        # Tabla de contactos (asociables a clientes o marcas)
-        try:
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS contactos (
-                    id_contacto SERIAL PRIMARY KEY,
-                    nombre VARCHAR(100) NOT NULL,
-                    apellido VARCHAR(100),
-                    puesto VARCHAR(100),
-                    telefono VARCHAR(50),
-                    email VARCHAR(200),
-                    direccion VARCHAR(300),
-                    notes TEXT,
-                    etiqueta_tipo VARCHAR(20) NOT NULL CHECK (etiqueta_tipo IN ('cliente','marca')),
-                    etiqueta_id INTEGER NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            # Ensure column notes if table exists
-            c.execute("ALTER TABLE contactos ADD COLUMN IF NOT EXISTS notes TEXT")
-        except Exception as e:
-            log_sql_error(f"No se pudo asegurar tabla contactos: {e}")
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS proyectos (
-                id SERIAL PRIMARY KEY,
-                owner_user_id INTEGER NOT NULL REFERENCES usuarios(id),
-                cliente_id INTEGER NULL REFERENCES clientes(id_cliente),
-                titulo VARCHAR(200) NOT NULL,
-                descripcion TEXT,
-                estado VARCHAR(20) NOT NULL DEFAULT 'Prospecto',
-                valor INTEGER NULL,
-                moneda VARCHAR(10),
-                etiqueta VARCHAR(100),
-                probabilidad INTEGER,
-                embudo VARCHAR(200),
-                marca_id INTEGER NULL REFERENCES marcas(id_marca),
-                fecha_cierre DATE,
-                trato_id BIGINT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        # Constraint de estado permitido: forzar recreación para asegurar conjunto correcto
-        try:
-            c.execute("ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_estado_check")
-            c.execute("ALTER TABLE proyectos ADD CONSTRAINT proyectos_estado_check CHECK (estado IN ('Prospecto','Presupuestado','Negociación','Objeción','Ganado','Perdido','Abierto','En Progreso'))")
-        except Exception as e:
-            log_sql_error(f"No se pudo asegurar constraint proyectos_estado_check: {e}")
-        try:
-            c.execute("ALTER TABLE proyectos ALTER COLUMN estado SET DEFAULT 'Prospecto'")
-        except Exception:
-            pass
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS proyecto_compartidos (
-                proyecto_id INTEGER NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
-                user_id INTEGER NOT NULL REFERENCES usuarios(id),
-                shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (proyecto_id, user_id)
-            )
-        ''')
-
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS proyecto_documentos (
-                id SERIAL PRIMARY KEY,
-                proyecto_id INTEGER NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
-                filename VARCHAR(255) NOT NULL,
-                file_path TEXT NOT NULL,
-                mime_type VARCHAR(100),
-                file_size INTEGER,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS valor BIGINT")
-        except Exception:
-            pass
-        # Asegurar tipo BIGINT para evitar overflow
-        try:
-            c.execute("ALTER TABLE proyectos ALTER COLUMN valor TYPE BIGINT USING valor::bigint")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS moneda VARCHAR(10)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS etiqueta VARCHAR(100)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS probabilidad INTEGER")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS tipo_venta VARCHAR(40)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_tipo_venta_check")
-            c.execute("ALTER TABLE proyectos ADD CONSTRAINT proyectos_tipo_venta_check CHECK (tipo_venta IS NULL OR tipo_venta IN ('Venta de equipo','Licencia','Soporte y mantenimiento','Servicios','Contratos'))")
-        except Exception as e:
-            log_sql_error(f"No se pudo asegurar constraint proyectos_tipo_venta_check: {e}")
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS embudo VARCHAR(200)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS fecha_cierre DATE")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS trato_id BIGINT")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_trato_id_unique")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD CONSTRAINT proyectos_trato_id_unique UNIQUE (trato_id)")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS marca_id INTEGER")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS contacto_id INTEGER")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_marca_fk")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD CONSTRAINT proyectos_marca_fk FOREIGN KEY (marca_id) REFERENCES marcas(id_marca) ON DELETE SET NULL")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_contacto_fk")
-        except Exception:
-            pass
-        try:
-            c.execute("ALTER TABLE proyectos ADD CONSTRAINT proyectos_contacto_fk FOREIGN KEY (contacto_id) REFERENCES contactos(id_contacto) ON DELETE SET NULL")
-        except Exception:
-            pass
+        row_seq = c.fetchone()
+        
+        if row_seq and row_seq[0]:
+            seq_name = row_seq[0]
+            # 2. Consultar valor actual directamente de la secuencia
+            # Usamos SQL dinámico seguro porque seq_name viene de pg_get_serial_sequence
+            query = f"SELECT last_value FROM {seq_name}"
+            c.execute(query)
+            row = c.fetchone()
+            if row:
+                return row[0]
+        
+        return 0
+    except Exception as e:
+        log_sql_error(f"Error obteniendo secuencia de proyectos: {e}")
+        return 0
+    finally:
+        if close_conn:
+            conn.close()
 
-        try:
-            c.execute("ALTER TABLE proyectos ALTER COLUMN owner_user_id DROP NOT NULL")
-        except Exception as e:
-            # log_sql_error(f"No se pudo alterar owner_user_id a NULL (puede que ya sea nullable): {e}")
-            pass
+def get_user_info_safe(user_id):
+    """Obtiene información del usuario de manera segura"""
+    try:
+        conn = get_connection()
+        c = conn.cursor()
+        c.execute("""
+            SELECT id, username, is_admin, rol_id, nombre, apellido, email
+            FROM usuarios 
+            WHERE id = %s AND is_active = TRUE
+        """, (user_id,))
+        result = c.fetchone()
+        conn.close()
+        
+        if result:
+            return {
+                'id': result[0],
+                'username': result[1],
+                'is_admin': result[2],
+                'rol_id': result[3],
+                'nombre': result[4] or '',
+                'apellido': result[5] or '',
+                'email': result[6] or ''
+            }
+        return None
+    except Exception as e:
+        log_sql_error(f"Error en get_user_info_safe: {e}")
+        return None
 
-        # Si autocommit no está habilitado (conn provisto externamente), confirmar cambios
-        try:
-            if not getattr(conn, 'autocommit', False):
-                conn.commit()
-        except Exception:
-            pass
+def set_project_id_sequence(new_start_value, conn=None):
+    """Establece el valor de reinicio de la secuencia de IDs de proyectos"""
+    close_conn = False
+    if conn is None:
+        conn = get_connection()
+        close_conn = True
+        conn.autocommit = True # Necesario para setval a veces, o commit explícito
+    
+    try:
+        c = conn.cursor()
+        # setval(sequence, value, is_called)
+        # Si is_called es false, el próximo nextval devolverá value.
+        # Si is_called es true (default), el próximo nextval devolverá value + increment.
+        # Queremos que el PRÓXIMO proyecto tenga el ID new_start_value.
+        # Entonces usamos is_called=false.
+        
+        # Primero obtenemos el nombre de la secuencia dinámicamente para ser seguros
+        c.execute("SELECT pg_get_serial_sequence('proyectos', 'id')")
+        seq_name = c.fetchone()[0]
+        
+        if seq_name:
+            query = f"SELECT setval('{seq_name}', %s, false)"
+            c.execute(query, (new_start_value,))
+            return True, f"Secuencia actualizada. El próximo proyecto tendrá ID {new_start_value}."
+        else:
+            return False, "No se encontró la secuencia de proyectos."
+            
     except Exception as e:
-        try:
-            conn.rollback()
-        except Exception:
-            pass
-        log_sql_error(f"Error asegurando esquema de proyectos: {e}")
+        log_sql_error(f"Error actualizando secuencia de proyectos: {e}")
+        return False, str(e)
     finally:
-        if 'close_conn' in locals() and close_conn:
+        if close_conn:
             conn.close()
 
 
@@ -1184,32 +1156,6 @@ def create_proyecto(owner_user_id, titulo, descripcion, cliente_id=None, estado=
     finally:
         conn.close()
 
-def ensure_feriados_schema():
-    conn = get_connection()
-    try:
-        c = conn.cursor()
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS feriados (
-                id SERIAL PRIMARY KEY,
-                fecha DATE NOT NULL UNIQUE,
-                nombre VARCHAR(200) NOT NULL,
-                tipo VARCHAR(20),
-                activo BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        conn.commit()
-        return True
-    except Exception as e:
-        try:
-            conn.rollback()
-        except Exception:
-            pass
-        log_sql_error(f"Error asegurando feriados: {e}")
-        return False
-    finally:
-        conn.close()
-
 def get_feriados_dataframe(year=None, include_inactive=False):
     ensure_feriados_schema()
     engine = get_engine()
@@ -1227,6 +1173,7 @@ def get_feriados_dataframe(year=None, include_inactive=False):
     except Exception:
         return pd.DataFrame()
 
+@invalidates('feriados')
 def add_feriado(fecha, nombre, tipo="nacional", activo=True):
     ensure_feriados_schema()
     conn = get_connection()
@@ -1254,6 +1201,7 @@ def add_feriado(fecha, nombre, tipo="nacional", activo=True):
     finally:
         conn.close()
 
+@invalidates('feriados')
 def toggle_feriado(feriado_id, activo=True):
     ensure_feriados_schema()
     conn = get_connection()
@@ -1272,6 +1220,7 @@ def toggle_feriado(feriado_id, activo=True):
     finally:
         conn.close()
 
+@invalidates('feriados')
 def delete_feriado(feriado_id):
     ensure_feriados_schema()
     conn = get_connection()
@@ -1291,12 +1240,11 @@ def delete_feriado(feriado_id):
         conn.close()
 
 def is_feriado(d):
+    """Indica si la fecha es un feriado activo (vía el calendario en memoria del año)"""
+    from .holiday_calendar import get_holiday_calendar
     ensure_feriados_schema()
     try:
-        engine = get_engine()
-        q = text("SELECT 1 FROM feriados WHERE fecha = :f AND activo IS TRUE LIMIT 1")
-        df = pd.read_sql_query(q, con=engine, params={"f": pd.to_datetime(d).date()})
-        return not df.empty
+        return get_holiday_calendar(d).is_holiday(d)
     except Exception:
         return False
 
@@ -1536,11 +1484,14 @@ def add_registros_comerciales_batch(df, default_user_id=None):
     Retorna (count_success, errors_list).
     """
     import unicodedata
+    from .entity_resolver import load_entity_resolver
     
     conn = get_connection()
     c = conn.cursor()
     success_count = 0
     errors = []
+    # Clientes indexados una vez para todo el lote
+    clientes_resolver = load_entity_resolver('clientes', conn)
     
     # Ensure schemas once
     ensure_projects_schema()
@@ -1693,7 +1644,7 @@ def add_registros_comerciales_batch(df, default_user_id=None):
                 
             if pd.notna(cliente_nombre):
                 # Using existing get_or_create_cliente function
-                cliente_id = get_or_create_cliente(str(cliente_nombre).strip(), conn=conn)
+                cliente_id = get_or_create_cliente(str(cliente_nombre).strip(), conn=conn, resolver=clientes_resolver)
             
             contacto_id = None
             if cliente_id:
@@ -1807,6 +1758,8 @@ def add_registros_comerciales_batch(df, default_user_id=None):
         except Exception as e:
             conn.rollback() # Rollback solo de la transacción actual (fila actual si se hizo commit anterior)
             errors.append(f"Fila {index}: {str(e)}")
+            # Un cliente creado en la fila descartada no existe: volver a indexar
+            clientes_resolver = load_entity_resolver('clientes', conn)
             
     # Sincronizar secuencia de IDs al final de la importación
     try:
@@ -2070,447 +2023,63 @@ def remove_proyecto_document(doc_id, owner_user_id, bypass_owner=False):
             """, (int(doc_id),))
             row = c.fetchone()
             if not row or int(row[1]) != int(owner_user_id):
-                return False
-            file_path = row[0]
-
-        c.execute("DELETE FROM proyecto_documentos WHERE id = %s", (int(doc_id),))
-        conn.commit()
-        try:
-            import os
-            if file_path and os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception:
-            pass
-        return True
-    except Exception as e:
-        conn.rollback()
-        log_sql_error(f"Error borrando documento: {e}")
-        return False
-    finally:
-        conn.close()
-
-def update_proyecto_document_path(doc_id, new_path):
-    """Actualiza la ruta del archivo almacenada para un documento."""
-    ensure_projects_schema()
-    conn = get_connection()
-    try:
-        c = conn.cursor()
-        c.execute(
-            "UPDATE proyecto_documentos SET file_path = %s WHERE id = %s",
-            (str(new_path), int(doc_id))
-        )
-        conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        log_sql_error(f"Error actualizando ruta de documento: {e}")
-        return False
-    finally:
-        conn.close()
-
-def init_db():
-    """Inicializa la estructura de la base de datos"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    try:
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS usuarios (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(50) UNIQUE NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
-                nombre VARCHAR(100),
-                apellido VARCHAR(100),
-                email VARCHAR(100),
-                is_admin BOOLEAN DEFAULT FALSE,
-                is_active BOOLEAN DEFAULT TRUE,
-                is_2fa_enabled BOOLEAN DEFAULT FALSE,
-                rol_id INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Asegurar columna para secreto TOTP (si no existe)
-        c.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS totp_secret VARCHAR(255)")
-        
-        # Bloqueo por intentos fallidos (si no existen)
-        c.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS failed_attempts INTEGER DEFAULT 0")
-        c.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS lockout_until TIMESTAMP NULL")
-        
-        # Tabla de roles
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS roles (
-                id_rol SERIAL PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL UNIQUE,
-                descripcion TEXT,
-                is_hidden BOOLEAN DEFAULT FALSE,
-                view_type VARCHAR(50),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        c.execute("ALTER TABLE roles ADD COLUMN IF NOT EXISTS is_hidden BOOLEAN DEFAULT FALSE")
-        
-        # Tabla de grupos
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS grupos (
-                id_grupo SERIAL PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL UNIQUE,
-                descripcion TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla grupos_roles
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS grupos_roles (
-                id SERIAL PRIMARY KEY,
-                id_grupo INTEGER NOT NULL,
-                id_rol INTEGER NOT NULL,
-                FOREIGN KEY (id_grupo) REFERENCES grupos (id_grupo),
-                FOREIGN KEY (id_rol) REFERENCES roles (id_rol),
-                UNIQUE(id_grupo, id_rol)
-            )
-        ''')
-        
-        # Tabla de grupos_puntajes
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS grupos_puntajes (
-                id SERIAL PRIMARY KEY,
-                id_grupo INTEGER NOT NULL,
-                puntaje INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY (id_grupo) REFERENCES grupos (id_grupo),
-                UNIQUE(id_grupo)
-            )
-        ''')
-        
-        # Tabla de tipos_tarea_puntajes
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS tipos_tarea_puntajes (
-                id SERIAL PRIMARY KEY,
-                id_tipo INTEGER NOT NULL,
-                puntaje INTEGER NOT NULL DEFAULT 0,
-                UNIQUE(id_tipo)
-            )
-        ''')
-        
-        # Tabla de técnicos
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS tecnicos (
-                id_tecnico SERIAL PRIMARY KEY,
-                nombre VARCHAR(200) NOT NULL,
-                apellido VARCHAR(100),
-                email VARCHAR(100),
-                telefono VARCHAR(20),
-                activo BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de clientes
-        c.execute('''CREATE TABLE IF NOT EXISTS clientes (
-                id_cliente SERIAL PRIMARY KEY,
-                nombre VARCHAR(200) NOT NULL UNIQUE,
-                alias VARCHAR(200),
-                direccion VARCHAR(300),
-                telefono VARCHAR(20),
-                email VARCHAR(100),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Solicitudes de nuevos clientes (aprobación por admin)
-        c.execute('''CREATE TABLE IF NOT EXISTS cliente_solicitudes (
-                id SERIAL PRIMARY KEY,
-                nombre VARCHAR(200) NOT NULL,
-                organizacion VARCHAR(300),
-                telefono VARCHAR(20),
-                requested_by INTEGER NOT NULL REFERENCES usuarios(id),
-                estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de clientes_puntajes
-        c.execute('''CREATE TABLE IF NOT EXISTS clientes_puntajes (
-                id SERIAL PRIMARY KEY,
-                id_cliente INTEGER NOT NULL,
-                puntaje INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY (id_cliente) REFERENCES clientes (id_cliente),
-                UNIQUE(id_cliente)
-            )
-        ''')
-        
-        # Asegurar esquema de proyectos (depende de usuarios y clientes)
-        ensure_projects_schema(conn)
-
-        # Tabla de tipos de tarea
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS tipos_tarea (
-                id_tipo SERIAL PRIMARY KEY,
-                descripcion VARCHAR(200) NOT NULL UNIQUE,
-                hidden BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de vacaciones
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS vacaciones (
-                id SERIAL PRIMARY KEY,
-                usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
-                fecha_inicio DATE NOT NULL,
-                fecha_fin DATE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de modalidades de tarea
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS modalidades_tarea (
-                id_modalidad SERIAL PRIMARY KEY,
-                descripcion VARCHAR(200) NOT NULL UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Sembrar modalidades requeridas (si no existen)
-        required_modalidades = [
-            "Cliente",
-            "Presencial",
-            "Remoto",
-            "Feriado",
-            "Base en Casa",
-        ]
-        for nombre in required_modalidades:
-            c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = %s", (nombre,))
-            if not c.fetchone():
-                c.execute("INSERT INTO modalidades_tarea (descripcion) VALUES (%s)", (nombre,))
-
-        # Asegurar columna is_hidden en modalidades_tarea
-        conn.commit()
-        try:
-            c.execute("ALTER TABLE modalidades_tarea ADD COLUMN IF NOT EXISTS is_hidden BOOLEAN DEFAULT FALSE")
-            conn.commit()
-        except Exception:
-            conn.rollback()
-
-        # Sembrar modalidad Vacaciones (oculta)
-        try:
-            c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = 'Vacaciones'")
-            if not c.fetchone():
-                c.execute("INSERT INTO modalidades_tarea (descripcion, is_hidden) VALUES ('Vacaciones', TRUE)")
-            else:
-                c.execute("UPDATE modalidades_tarea SET is_hidden = TRUE WHERE descripcion = 'Vacaciones'")
-            conn.commit()
-        except Exception:
-            conn.rollback()
-
-        # Asegurar columna hidden en tipos_tarea
-        conn.commit()
-        try:
-            c.execute("ALTER TABLE tipos_tarea ADD COLUMN IF NOT EXISTS hidden BOOLEAN DEFAULT FALSE")
-            conn.commit()
-        except Exception:
-            conn.rollback()
-
-        # Sembrar tipo Vacaciones
-        try:
-            c.execute("SELECT id_tipo FROM tipos_tarea WHERE descripcion = 'Vacaciones'")
-            if not c.fetchone():
-                c.execute("INSERT INTO tipos_tarea (descripcion, hidden) VALUES ('Vacaciones', TRUE)")
-            else:
-                # Asegurar que esté oculto si ya existe
-                c.execute("UPDATE tipos_tarea SET hidden = TRUE WHERE descripcion = 'Vacaciones'")
-            conn.commit()
-        except Exception:
-            conn.rollback()
-
-        # Tabla tipos_tarea_roles
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS tipos_tarea_roles (
-                id SERIAL PRIMARY KEY,
-                id_tipo INTEGER NOT NULL,
-                id_rol INTEGER NOT NULL,
-                FOREIGN KEY (id_tipo) REFERENCES tipos_tarea (id_tipo),
-                FOREIGN KEY (id_rol) REFERENCES roles (id_rol),
-                UNIQUE(id_tipo, id_rol)
-            )
-        ''')
-        # Tabla de registros de trabajo
-        c.execute('''CREATE TABLE IF NOT EXISTS registros (
-            id SERIAL PRIMARY KEY,
-            fecha VARCHAR(20) NOT NULL,
-            id_tecnico INTEGER NOT NULL,
-            id_cliente INTEGER NOT NULL,
-            id_tipo INTEGER NOT NULL,
-            id_modalidad INTEGER NOT NULL,
-            tarea_realizada TEXT NOT NULL,
-            numero_ticket VARCHAR(50) NOT NULL,
-            tiempo INTEGER NOT NULL,
-            descripcion TEXT,
-            mes VARCHAR(20) NOT NULL,
-            usuario_id INTEGER,
-            grupo VARCHAR(100),
-            es_hora_extra BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (id_tecnico) REFERENCES tecnicos (id_tecnico),
-            FOREIGN KEY (id_cliente) REFERENCES clientes (id_cliente),
-            FOREIGN KEY (id_tipo) REFERENCES tipos_tarea (id_tipo),
-            FOREIGN KEY (id_modalidad) REFERENCES modalidades_tarea (id_modalidad),
-            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-        )''')
-        
-        # Asegurar columna es_hora_extra en registros
-        try:
-            c.execute("ALTER TABLE registros ADD COLUMN IF NOT EXISTS es_hora_extra BOOLEAN DEFAULT FALSE")
-            conn.commit()
-        except Exception:
-            conn.rollback()
-        
-        # Asegurar tipo decimal para 'tiempo' en registros
-        try:
-            c.execute("""
-                SELECT data_type 
-                FROM information_schema.columns
-                WHERE table_name = 'registros' AND column_name = 'tiempo'
-            """)
-            row = c.fetchone()
-            if row and row[0] == 'integer':
-                c.execute("""
-                    ALTER TABLE registros
-                    ALTER COLUMN tiempo TYPE NUMERIC(6,2)
-                    USING tiempo::numeric
-                """)
-        except Exception:
-            pass
-        
-        # Tabla de nómina
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS nomina (
-                id SERIAL PRIMARY KEY,
-                nombre VARCHAR(100) NOT NULL,
-                apellido VARCHAR(100),
-                email VARCHAR(100),
-                documento VARCHAR(50),
-                cargo VARCHAR(150),
-                departamento VARCHAR(100),
-                fecha_ingreso DATE,
-                fecha_nacimiento DATE,
-                activo BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabla de registro de actividades de usuarios
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS actividades_usuarios (
-                id SERIAL PRIMARY KEY,
-                usuario_id INTEGER,
-                username VARCHAR(50),
-                tipo_actividad VARCHAR(50) NOT NULL,
-                descripcion TEXT,
-                fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        # Tabla de códigos de recuperación
-        c.execute('''
-            CREATE TABLE IF NOT EXISTS recovery_codes (
-                id SERIAL PRIMARY KEY,
-                user_id INTEGER,
-                code VARCHAR(100),
-                used INTEGER DEFAULT 0,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES usuarios (id)
-            )
-        ''')
-        
-        # Agregar foreign keys a usuarios después de crear las tablas
-        conn.commit()
-        try:
-            c.execute('''
-                ALTER TABLE usuarios 
-                ADD CONSTRAINT fk_usuarios_rol 
-                FOREIGN KEY (rol_id) REFERENCES roles (id_rol)
-            ''')
-            conn.commit()
-        except Exception:
-            conn.rollback()  # La constraint ya existe o error
-            
-        try:
-            c.execute('''
-                ALTER TABLE tipos_tarea_puntajes 
-                ADD CONSTRAINT fk_tipos_tarea_puntajes_tipo 
-                FOREIGN KEY (id_tipo) REFERENCES tipos_tarea (id_tipo)
-            ''')
-            conn.commit()
-        except Exception:
-            conn.rollback()  # La constraint ya existe o error
-        
-        # Insertar roles del sistema si no existen
-        # Primero obtenemos todos los roles existentes para comparar normalizados
-        c.execute('SELECT nombre FROM roles')
-        existing_roles_raw = [r[0] for r in c.fetchall()]
-        
-        from .utils import clean_role_name
-        
-        for role_key, role_desc in SYSTEM_ROLES.items():
-            try:
-                # Normalizamos el rol que queremos insertar
-                target_clean = clean_role_name(role_desc)
-                
-                # Verificamos si ya existe algún rol que normalizado sea igual
-                exists = False
-                for ex_role in existing_roles_raw:
-                    if clean_role_name(ex_role) == target_clean:
-                        exists = True
-                        break
-                
-                if not exists:
-                    # SIN_ROL y HIPERVISOR deben estar ocultos
-                    is_hidden = True if role_key in ['SIN_ROL', 'HIPERVISOR'] else False
-                    
-                    # Asignar view_type para admin y otros roles de sistema
-                    view_type = None
-                    if role_key == 'ADMIN':
-                        view_type = 'administrador'
-                    elif role_key == 'ADM_COMERCIAL':
-                        view_type = 'admin_comercial'
-                    elif role_key == 'DPTO_COMERCIAL':
-                        view_type = 'comercial'
-                    
-                    if view_type:
-                         c.execute('INSERT INTO roles (nombre, descripcion, is_hidden, view_type) VALUES (%s, %s, %s, %s)',
-                             (role_desc, f'Rol del sistema: {role_desc}', is_hidden, view_type))
-                    else:
-                         c.execute('INSERT INTO roles (nombre, descripcion, is_hidden) VALUES (%s, %s, %s)',
-                             (role_desc, f'Rol del sistema: {role_desc}', is_hidden))
-                    
-                    # Actualizamos la lista local para futuras iteraciones en este mismo loop
-                    existing_roles_raw.append(role_desc)
+                return False
+            file_path = row[0]
 
-                conn.commit()
-            except Exception:
-                conn.rollback()
-        
-        # Verificar si el usuario admin existe, si no, crearlo
+        c.execute("DELETE FROM proyecto_documentos WHERE id = %s", (int(doc_id),))
+        conn.commit()
         try:
-            from .auth import hash_password
-            c.execute('SELECT * FROM usuarios WHERE username = %s', (DEFAULT_ADMIN_USERNAME,))
-            if not c.fetchone():
-                # Obtener el ID del rol admin
-                c.execute('SELECT id_rol FROM roles WHERE nombre = %s', (SYSTEM_ROLES['ADMIN'],))
-                admin_role = c.fetchone()
-                admin_rol_id = admin_role[0] if admin_role else None
-                
-                c.execute('INSERT INTO usuarios (username, password_hash, is_admin, is_active, rol_id) VALUES (%s, %s, %s, %s, %s)',
-                          (DEFAULT_ADMIN_USERNAME, hash_password(DEFAULT_ADMIN_PASSWORD), True, True, admin_rol_id))
-            conn.commit()
+            import os
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
         except Exception:
-            conn.rollback()
-        
+            pass
+        return True
+    except Exception as e:
+        conn.rollback()
+        log_sql_error(f"Error borrando documento: {e}")
+        return False
+    finally:
+        conn.close()
+
+def update_proyecto_document_path(doc_id, new_path):
+    """Actualiza la ruta del archivo almacenada para un documento."""
+    ensure_projects_schema()
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            "UPDATE proyecto_documentos SET file_path = %s WHERE id = %s",
+            (str(new_path), int(doc_id))
+        )
+        conn.commit()
+        return True
+    except Exception as e:
+        conn.rollback()
+        log_sql_error(f"Error actualizando ruta de documento: {e}")
+        return False
+    finally:
+        conn.close()
+
+def init_db():
+    """Inicializa la estructura de la base de datos aplicando todas las migraciones pendientes"""
+    ensure_schema(force=True)
+
+    conn = get_connection()
+    c = conn.cursor()
+    try:
+        # Verificar si el usuario admin existe, si no, crearlo
+        from .auth import hash_password
+        c.execute('SELECT * FROM usuarios WHERE username = %s', (DEFAULT_ADMIN_USERNAME,))
+        if not c.fetchone():
+            # Obtener el ID del rol admin
+            c.execute('SELECT id_rol FROM roles WHERE nombre = %s', (SYSTEM_ROLES['ADMIN'],))
+            admin_role = c.fetchone()
+            admin_rol_id = admin_role[0] if admin_role else None
+
+            c.execute('INSERT INTO usuarios (username, password_hash, is_admin, is_active, rol_id) VALUES (%s, %s, %s, %s, %s)',
+                      (DEFAULT_ADMIN_USERNAME, hash_password(DEFAULT_ADMIN_PASSWORD), True, True, admin_rol_id))
+        conn.commit()
     except Exception as e:
         conn.rollback()
         log_sql_error(f"Error inicializando base de datos: {e}")
@@ -2518,6 +2087,7 @@ def init_db():
     finally:
         conn.close()
 
+
 def create_default_admin():
     """Crea el usuario admin por defecto si no existe"""
     from .auth import hash_password
@@ -2575,42 +2145,58 @@ def get_users_dataframe():
         log_sql_error(f"Error obteniendo usuarios: {e}")
         return pd.DataFrame()
 
+def _month_bounds(year, month):
+    """Parámetros [month_start, month_end) de un mes para filtros por rango"""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return {"month_start": start, "month_end": end}
+
+
+# Formatos de registros.fecha en orden de prioridad (el resto se parsea con dayfirst)
+_FECHA_FORMATS = ('%Y-%m-%d', '%d/%m/%y', '%d/%m/%Y')
+_MESES_ES = [month_name_es(m) for m in range(1, 13)]
+
+
+def parse_fecha_series(fechas):
+    """Convierte una Serie de fechas en texto a datetime, un formato a la vez sobre toda la columna"""
+    if pd.api.types.is_datetime64_any_dtype(fechas):
+        return fechas
+    result = pd.Series(pd.NaT, index=fechas.index, dtype='datetime64[ns]')
+    texto = fechas.where(fechas.notna()).astype(str).str.strip()
+    pendientes = fechas.notna() & (texto != '')
+    for fmt in _FECHA_FORMATS:
+        if not pendientes.any():
+            return result
+        parsed = pd.to_datetime(texto[pendientes], format=fmt, errors='coerce')
+        parsed = parsed[parsed.notna()]
+        result.loc[parsed.index] = parsed
+        pendientes.loc[parsed.index] = False
+    if pendientes.any():
+        # Solo las filas con formatos no reconocidos pasan por el parser flexible
+        result.loc[pendientes] = pd.to_datetime(texto[pendientes], format='mixed', dayfirst=True, errors='coerce')
+    return result
+
+
 def process_registros_df(df):
     """Procesa el DataFrame de registros: fechas, ordenamiento y mes"""
     if df.empty:
         return df
 
-    # Función auxiliar para convertir fecha
-    def convert_fecha_to_datetime(fecha_str):
-        if pd.isna(fecha_str):
-            return pd.NaT
-        if hasattr(fecha_str, 'date'):
-            return pd.to_datetime(fecha_str)
-        s = str(fecha_str).strip()
-        try:
-            return pd.to_datetime(s, format='%Y-%m-%d')
-        except:
-            pass
-        try:
-            return pd.to_datetime(s, format='%d/%m/%y')
-        except:
-            pass
-        try:
-            return pd.to_datetime(s, format='%d/%m/%Y')
-        except:
-            pass
-        try:
-            return pd.to_datetime(s, dayfirst=True)
-        except:
-            return pd.NaT
-
     # Convertir fecha a datetime para ordenamiento y extracción de mes
     if 'fecha' in df.columns:
         # Guardar string original por si acaso se necesita
         df['fecha_str'] = df['fecha'].astype(str)
         
-        # Convertir a datetime
-        df['fecha_dt'] = df['fecha'].apply(convert_fecha_to_datetime)
+        # Convertir a datetime: fecha_date (DATE tipada) si viene en la consulta,
+        # parseando el texto solo para filas aún sin backfill
+        if 'fecha_date' in df.columns:
+            df['fecha_dt'] = pd.to_datetime(df['fecha_date'], errors='coerce')
+            mask_missing = df['fecha_dt'].isna()
+            if mask_missing.any():
+                df.loc[mask_missing, 'fecha_dt'] = parse_fecha_series(df.loc[mask_missing, 'fecha'])
+            df = df.drop(columns=['fecha_date'])
+        else:
+            df['fecha_dt'] = parse_fecha_series(df['fecha'])
         
         # Calcular columna mes si existe fecha válida
         # Aseguramos que 'mes' exista
@@ -2620,8 +2206,10 @@ def process_registros_df(df):
         # Rellenar mes basado en la fecha
         mask_valid = df['fecha_dt'].notna()
         if mask_valid.any():
-            # Extraer número de mes y convertir a nombre
-            df.loc[mask_valid, 'mes'] = df.loc[mask_valid, 'fecha_dt'].dt.month.apply(month_name_es)
+            # Número de mes -> nombre vía categórico (se guarda como texto para no alterar el dtype de 'mes')
+            codes = df.loc[mask_valid, 'fecha_dt'].dt.month.to_numpy() - 1
+            meses = pd.Categorical.from_codes(codes, categories=_MESES_ES)
+            df.loc[mask_valid, 'mes'] = meses.astype(object)
             
         # Ordenar por fecha descendente (más reciente primero)
         df = df.sort_values(by='fecha_dt', ascending=False)
@@ -2638,8 +2226,8 @@ def process_registros_df(df):
 def get_registros_dataframe():
     """Obtiene DataFrame de registros con información completa"""
     try:
-        query = '''
-            SELECT r.id, r.fecha, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
+        query = f'''
+            SELECT r.id, r.fecha, {registros_fecha_sql()} AS fecha_date, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
                    tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
                    r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes, 
                    r.created_at as "Fecha Creación"
@@ -2678,21 +2266,20 @@ def get_registros_dataframe_with_date_filter(filter_type='current_month', custom
         date_filter = ""
         params = {}
         
+        fecha_sql = registros_fecha_sql()
+        month_range = None
         if filter_type == 'current_month':
             from datetime import datetime
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            year_2digit = str(current_year)[-2:]
-            date_filter = "WHERE (substring(r.fecha, 4, 2) = :month AND substring(r.fecha, 7, 2) = :year2)"
-            params.update({"month": f"{current_month:02d}", "year2": year_2digit})
+            month_range = (datetime.now().year, datetime.now().month)
         elif filter_type == 'custom_month' and custom_month and custom_year:
-            year_2digit = str(custom_year)[-2:]
-            date_filter = "WHERE (substring(r.fecha, 4, 2) = :month AND substring(r.fecha, 7, 2) = :year2)"
-            params.update({"month": f"{custom_month:02d}", "year2": year_2digit})
+            month_range = (int(custom_year), int(custom_month))
         # Para 'all_time' no agregamos filtro de fecha
+        if month_range:
+            date_filter = f"WHERE {fecha_sql} >= :month_start AND {fecha_sql} < :month_end"
+            params.update(_month_bounds(*month_range))
         
         query = f'''
-            SELECT r.id, r.fecha, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
+            SELECT r.id, r.fecha, {fecha_sql} AS fecha_date, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
                    tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
                    r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes,
                    r.created_at as "Fecha Creación"
@@ -2715,24 +2302,68 @@ def get_registros_dataframe_with_date_filter(filter_type='current_month', custom
         log_sql_error(f"Error obteniendo registros con filtro de fecha: {e}")
         return pd.DataFrame()
 
+# Margen al pedir cambios desde la última sincronización: una transacción que empezó
+# antes (updated_at = su CURRENT_TIMESTAMP) puede confirmarse después de la consulta
+USER_REGISTROS_SYNC_OVERLAP = timedelta(minutes=10)
+
+
+def _query_user_registros(user_id, since=None, after_id=None):
+    """
+    Registros de un usuario sin procesar, con la hora del servidor de la consulta.
+
+    Con since trae solo los nuevos (id > after_id) o modificados (updated_at > since)
+    y los ids de las bajas desde since. Devuelve (df, ids_eliminados, synced_at).
+    """
+    from .schema_migrations import REGISTROS_TOMBSTONE_TABLE
+
+    params = {"user_id": user_id}
+    delta_filter = ""
+    if since is not None:
+        params.update(since=since, after_id=after_id or 0)
+        delta_filter = "AND (r.id > :after_id OR r.updated_at > :since)"
+    query = f'''
+        SELECT r.fecha, {registros_fecha_sql()} AS fecha_date, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
+               tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
+               r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes, r.id,
+               r.created_at as "Fecha Creación"
+        FROM registros r
+        LEFT JOIN tecnicos t ON r.id_tecnico = t.id_tecnico
+        LEFT JOIN clientes c ON r.id_cliente = c.id_cliente
+        LEFT JOIN tipos_tarea tt ON r.id_tipo = tt.id_tipo
+        LEFT JOIN modalidades_tarea mt ON r.id_modalidad = mt.id_modalidad
+        WHERE r.usuario_id = :user_id {delta_filter}
+        ORDER BY fecha_date DESC NULLS LAST, r.id DESC
+    '''
+    deleted_ids = []
+    with get_engine().connect() as conn:
+        synced_at = conn.execute(text("SELECT LOCALTIMESTAMP")).scalar()
+        df = pd.read_sql_query(text(query), con=conn, params=params)
+        if since is not None:
+            deleted_ids = [row[0] for row in conn.execute(text(f"""
+                SELECT registro_id FROM {REGISTROS_TOMBSTONE_TABLE}
+                WHERE usuario_id = :user_id AND deleted_at > :since
+            """), params)]
+    return df, deleted_ids, synced_at
+
+
+def merge_registros_delta(cached_df, delta_df, deleted_ids):
+    """Aplica a un DataFrame procesado de registros las filas nuevas o modificadas y las bajas"""
+    drop_ids = set(deleted_ids) | set(delta_df['id'] if not delta_df.empty else [])
+    base = cached_df[~cached_df['id'].isin(drop_ids)] if drop_ids and not cached_df.empty else cached_df
+    if delta_df.empty:
+        return base
+    if base.empty:
+        merged = delta_df
+    else:
+        # Solo las columnas de la consulta: quien lee el caché puede haberle agregado auxiliares
+        merged = pd.concat([base[list(delta_df.columns)], delta_df], ignore_index=True)
+    return merged.sort_values(['fecha', 'id'], ascending=False, na_position='last').reset_index(drop=True)
+
+
 def get_user_registros_dataframe(user_id):
     """Obtiene DataFrame de registros de un usuario específico"""
     try:
-        query = '''
-            SELECT r.fecha, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
-                   tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
-                   r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes, r.id,
-                   r.created_at as "Fecha Creación"
-            FROM registros r
-            LEFT JOIN tecnicos t ON r.id_tecnico = t.id_tecnico
-            LEFT JOIN clientes c ON r.id_cliente = c.id_cliente
-            LEFT JOIN tipos_tarea tt ON r.id_tipo = tt.id_tipo
-            LEFT JOIN modalidades_tarea mt ON r.id_modalidad = mt.id_modalidad
-            WHERE r.usuario_id = :user_id
-            ORDER BY r.fecha DESC
-        '''
-        engine = get_engine()
-        df = pd.read_sql_query(text(query), con=engine, params={"user_id": user_id})
+        df, _, _ = _query_user_registros(user_id)
         
         # Procesar fechas y meses
         df = process_registros_df(df)
@@ -2743,43 +2374,61 @@ def get_user_registros_dataframe(user_id):
         return pd.DataFrame()
 
 def get_user_registros_dataframe_cached(user_id):
-    """Obtiene DataFrame de registros de un usuario específico con caché en session_state"""
+    """
+    Obtiene DataFrame de registros de un usuario específico con caché en session_state.
+
+    El caché se actualiza por diferencia: cuando cambia la versión del usuario
+    (LISTEN/NOTIFY) o se marcó con clear_user_registros_cache, solo se consultan los
+    registros nuevos o modificados y las bajas desde la última sincronización. Se
+    recarga completo la primera vez, ante una invalidación de toda la tabla o si el
+    caché es más viejo que la retención de bajas.
+    """
     import streamlit as st
+    from .schema_migrations import REGISTROS_TOMBSTONE_RETENTION_DAYS
     
-    # Usar caché en session_state para evitar consultas repetidas
     cache_key = f"user_registros_{user_id}"
+    version = cache_version('registros', user_id)
+    cached = st.session_state.get(cache_key)
+    if not isinstance(cached, dict):
+        cached = None
     
-    if cache_key not in st.session_state:
-        query = '''
-            SELECT r.fecha, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
-                   tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
-                   r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes, r.id,
-                   r.created_at as "Fecha Creación"
-            FROM registros r
-            LEFT JOIN tecnicos t ON r.id_tecnico = t.id_tecnico
-            LEFT JOIN clientes c ON r.id_cliente = c.id_cliente
-            LEFT JOIN tipos_tarea tt ON r.id_tipo = tt.id_tipo
-            LEFT JOIN modalidades_tarea mt ON r.id_modalidad = mt.id_modalidad
-            WHERE r.usuario_id = :user_id
-            ORDER BY r.fecha DESC
-        '''
-        engine = get_engine()
-        df = pd.read_sql_query(text(query), con=engine, params={"user_id": user_id})
-            
+    if cached is not None and cached['version'] == version and not cached['stale']:
+        return cached['df']
+    
+    full_reload = (
+        cached is None
+        or cached['version'][:2] != version[:2]
+        or datetime.now() - cached['synced_at'] > timedelta(days=REGISTROS_TOMBSTONE_RETENTION_DAYS - 1)
+    )
+    if not full_reload:
+        try:
+            delta_df, deleted_ids, synced_at = _query_user_registros(
+                user_id, since=cached['synced_at'] - USER_REGISTROS_SYNC_OVERLAP, after_id=cached['max_id'])
+            df = merge_registros_delta(cached['df'], process_registros_df(delta_df), deleted_ids)
+        except Exception as e:
+            log_sql_error(f"Error sincronizando registros de usuario, se recargan completos: {e}")
+            full_reload = True
+    if full_reload:
+        df, _, synced_at = _query_user_registros(user_id)
         # Procesar fechas y meses usando la función centralizada
         if not df.empty:
             df = process_registros_df(df)
-            
-        st.session_state[cache_key] = df
     
-    return st.session_state[cache_key]
+    max_id = int(df['id'].max()) if not df.empty else 0
+    st.session_state[cache_key] = {
+        'version': version, 'df': df, 'max_id': max_id, 'synced_at': synced_at, 'stale': False,
+    }
+    return df
 
 def clear_user_registros_cache(user_id):
-    """Limpia el caché de registros de un usuario específico"""
+    """Marca el caché de registros de un usuario para sincronizarlo en la próxima lectura"""
     import streamlit as st
     
     cache_key = f"user_registros_{user_id}"
-    if cache_key in st.session_state:
+    cached = st.session_state.get(cache_key)
+    if isinstance(cached, dict):
+        cached['stale'] = True
+    elif cached is not None:
         del st.session_state[cache_key]
 
 def get_tecnicos_dataframe():
@@ -2788,6 +2437,7 @@ def get_tecnicos_dataframe():
     df = pd.read_sql_query("SELECT * FROM tecnicos", con=engine)
     return df
 
+@cached_query('clientes')
 def get_clientes_dataframe(only_active=False):
     """Obtiene DataFrame de clientes"""
     engine = get_engine()
@@ -2800,13 +2450,13 @@ def get_clientes_dataframe(only_active=False):
     try:
         df = pd.read_sql_query(query, con=engine)
     except Exception:
-        # Fallback por si la columna activo aún no existe en tiempo de ejecución (aunque ensure debería haber corrido)
-        # O intentar correr ensure_clientes_schema() y reintentar
-        ensure_clientes_schema()
+        # Fallback por si la columna activo aún no existe (migraciones no aplicadas en este proceso)
+        ensure_schema(force=True)
         df = pd.read_sql_query(query, con=engine)
         
     return df
 
+@cached_query('marcas')
 def get_marcas_dataframe(only_active=False):
     engine = get_engine()
     query = "SELECT id_marca, cuit, nombre, email, telefono, celular, web, activa FROM marcas"
@@ -2816,6 +2466,7 @@ def get_marcas_dataframe(only_active=False):
     df = pd.read_sql_query(query, con=engine)
     return df
 
+@invalidates('marcas')
 def add_marca(nombre, cuit=None, email=None, telefono=None, celular=None, web=None, conn=None):
     close_conn = False
     if conn is None:
@@ -2860,6 +2511,7 @@ def add_marca(nombre, cuit=None, email=None, telefono=None, celular=None, web=No
         if close_conn:
             conn.close()
 
+@invalidates('marcas')
 def update_marca(id_marca, nombre, activa=True, cuit=None, email=None, telefono=None, celular=None, web=None):
     conn = get_connection()
     try:
@@ -2902,6 +2554,7 @@ def update_marca(id_marca, nombre, activa=True, cuit=None, email=None, telefono=
     finally:
         conn.close()
 
+@invalidates('marcas')
 def delete_marca(id_marca):
     ensure_projects_schema()
     conn = get_connection()
@@ -2917,6 +2570,7 @@ def delete_marca(id_marca):
     finally:
         conn.close()
 
+@cached_query('tipos_tarea', 'tipos_tarea_roles')
 def get_tipos_dataframe(rol_id=None):
     """Obtiene DataFrame de tipos de tarea
     
@@ -2937,6 +2591,7 @@ def get_tipos_dataframe(rol_id=None):
         df = pd.read_sql_query("SELECT * FROM tipos_tarea WHERE (hidden IS FALSE OR hidden IS NULL) ORDER BY descripcion", con=engine)
     return df
 
+@cached_query('tipos_tarea', 'tipos_tarea_roles', 'roles')
 def get_tipos_dataframe_with_roles():
     """Obtiene DataFrame de tipos de tarea con sus roles asociados"""
     try:
@@ -2956,6 +2611,7 @@ def get_tipos_dataframe_with_roles():
         log_sql_error(f"Error obteniendo tipos de tarea con roles: {e}")
         return pd.DataFrame()
 
+@cached_query('tipos_tarea', 'tipos_tarea_roles')
 def get_tipos_by_rol(rol_id):
     """Obtiene los tipos de tarea disponibles para un rol específico"""
     try:
@@ -2973,6 +2629,7 @@ def get_tipos_by_rol(rol_id):
         log_sql_error(f"Error obteniendo tipos por rol: {e}")
         return pd.DataFrame()
 
+@cached_query('modalidades_tarea')
 def get_modalidades_dataframe(exclude_hidden=True):
     """Obtiene DataFrame de modalidades"""
     engine = get_engine()
@@ -2984,41 +2641,6 @@ def get_modalidades_dataframe(exclude_hidden=True):
     return df
 
 
-def ensure_user_modality_schedule_exists(conn=None):
-    """Asegura que existe la tabla de programación de modalidades de usuario"""
-    if conn is None:
-        conn = get_connection()
-        close_conn = True
-    else:
-        close_conn = False
-
-    c = conn.cursor()
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS user_modalidad_schedule (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            rol_id INTEGER NOT NULL,
-            fecha DATE NOT NULL,
-            modalidad_id INTEGER NOT NULL,
-            cliente_id INTEGER NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, fecha),
-            FOREIGN KEY (user_id) REFERENCES usuarios (id),
-            FOREIGN KEY (rol_id) REFERENCES roles (id_rol),
-            FOREIGN KEY (modalidad_id) REFERENCES modalidades_tarea (id_modalidad)
-        )
-    ''')
-    # Intentar agregar la columna si la tabla ya existía sin cliente_id (PostgreSQL)
-    try:
-        c.execute("ALTER TABLE user_modalidad_schedule ADD COLUMN IF NOT EXISTS cliente_id INTEGER NULL")
-    except Exception:
-        pass
-    conn.commit()
-    if close_conn:
-        conn.close()
-
-
 def get_users_by_rol(rol_id, exclude_hidden=True):
     """Obtiene usuarios por rol_id"""
     try:
@@ -3184,39 +2806,6 @@ def upsert_user_modality_for_date(user_id, rol_id, fecha, modalidad_id, cliente_
     finally:
         conn.close()
 
-def ensure_user_default_schedule_exists(conn=None):
-    """Crea la tabla de cronograma por defecto por usuario y día de semana si no existe"""
-    if conn is None:
-        conn = get_connection()
-        close_conn = True
-    else:
-        close_conn = False
-
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS user_default_schedule (
-            id SERIAL PRIMARY KEY,
-            user_id INTEGER NOT NULL,
-            day_of_week INTEGER NOT NULL,  -- 0=Lunes ... 4=Viernes
-            modalidad_id INTEGER NOT NULL,
-            cliente_id INTEGER NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(user_id, day_of_week),
-            FOREIGN KEY (user_id) REFERENCES usuarios (id),
-            FOREIGN KEY (modalidad_id) REFERENCES modalidades_tarea (id_modalidad)
-        )
-    """)
-    # Asegurar columna cliente_id si la tabla existía sin ella
-    try:
-        c.execute("ALTER TABLE user_default_schedule ADD COLUMN IF NOT EXISTS cliente_id INTEGER NULL")
-    except Exception:
-        pass
-
-    conn.commit()
-    if close_conn:
-        conn.close()
-
 def get_user_default_schedule(user_id):
     """Devuelve DataFrame con el cronograma por defecto para un usuario"""
     try:
@@ -3277,6 +2866,7 @@ def upsert_user_default_schedule_bulk(user_id, schedule_dict):
         modalidad_id, cliente_id = pair
         upsert_user_default_schedule(user_id, int(dow), int(modalidad_id), cliente_id)
 
+@cached_query('roles')
 def get_roles_dataframe(exclude_admin=False, exclude_sin_rol=False, exclude_hidden=True):
     """Obtiene DataFrame de roles
     
@@ -3302,6 +2892,7 @@ def get_roles_dataframe(exclude_admin=False, exclude_sin_rol=False, exclude_hidd
     df = pd.read_sql_query(query, con=engine)
     return df
 
+@invalidates('roles')
 def update_rol_visibility(rol_id, is_hidden):
     """Actualiza la visibilidad de un rol"""
     conn = get_connection()
@@ -3317,6 +2908,7 @@ def update_rol_visibility(rol_id, is_hidden):
     finally:
         conn.close()
 
+@invalidates('tipos_tarea')
 def add_task_type(descripcion):
     """Agrega un nuevo tipo de tarea a la base de datos con validación de duplicados"""
     # Normalizar la descripción: eliminar espacios extra y convertir a formato título
@@ -3341,6 +2933,7 @@ def add_task_type(descripcion):
     finally:
         conn.close()
 
+@invalidates('clientes')
 def add_client(nombre):
     """Agrega un nuevo cliente a la base de datos"""
     try:
@@ -3352,6 +2945,7 @@ def add_client(nombre):
     except Exception:
         return False  # Ya existe un cliente con ese nombre
 
+@invalidates('clientes')
 def add_client_full(nombre, organizacion=None, telefono=None, email=None, cuit=None, celular=None, web=None, notes=None, alias=None):
     try:
         with db_connection() as conn:
@@ -3438,53 +3032,6 @@ def add_cliente_solicitud(nombre, organizacion=None, telefono=None, requested_by
     conn = get_connection()
     try:
         c = conn.cursor()
-        try:
-            c.execute('''
-                CREATE TABLE IF NOT EXISTS cliente_solicitudes (
-                    id SERIAL PRIMARY KEY,
-                    nombre VARCHAR(200) NOT NULL,
-                    organizacion VARCHAR(300),
-                    telefono VARCHAR(50),
-                    email VARCHAR(100),
-                    cuit VARCHAR(32),
-                    celular VARCHAR(50),
-                    web VARCHAR(300),
-                    tipo VARCHAR(50),
-                    requested_by INTEGER NOT NULL REFERENCES usuarios(id),
-                    estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    temp_cliente_id INTEGER,
-                    notes TEXT
-                )
-            ''')
-            # Asegurar columna email si la tabla existía previamente sin ella
-            try:
-                c.execute("ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS email VARCHAR(100)")
-            except Exception:
-                pass
-            # Asegurar nuevas columnas si no existían
-            for ddl in [
-                "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)",
-                "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS celular VARCHAR(50)",
-                "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS web VARCHAR(300)",
-                "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS tipo VARCHAR(50)",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS temp_cliente_id INTEGER",
-            "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS notes TEXT"
-        ]:
-                try:
-                    c.execute(ddl)
-                except Exception:
-                    pass
-            for ddl in [
-                "ALTER TABLE cliente_solicitudes ALTER COLUMN telefono TYPE VARCHAR(50)",
-                "ALTER TABLE cliente_solicitudes ALTER COLUMN celular TYPE VARCHAR(50)",
-            ]:
-                try:
-                    c.execute(ddl)
-                except Exception:
-                    pass
-        except Exception as e:
-            log_sql_error(f"No se pudo asegurar tabla cliente_solicitudes: {e}")
         c.execute(
             """
             INSERT INTO cliente_solicitudes (nombre, organizacion, telefono, email, cuit, celular, web, tipo, requested_by, temp_cliente_id, notes)
@@ -3544,6 +3091,7 @@ def get_cliente_solicitudes_df(estado='pendiente'):
         log_sql_error(f"Error listando solicitudes de clientes: {e}")
         return pd.DataFrame()
 
+@invalidates('clientes')
 def approve_cliente_solicitud(solicitud_id):
     """Aprueba solicitud: crea cliente y marca como aprobada"""
     conn = get_connection()
@@ -3675,6 +3223,7 @@ def approve_cliente_solicitud(solicitud_id):
     finally:
         conn.close()
 
+@invalidates('clientes', 'clientes_puntajes')
 def reject_cliente_solicitud(solicitud_id):
     """Rechaza solicitud. Si tiene cliente temporal asociado, elimina también ese cliente y sus datos."""
     conn = get_connection()
@@ -3759,6 +3308,7 @@ def add_tecnico(nombre):
     finally:
         conn.close()
 
+@invalidates('modalidades_tarea')
 def add_modalidad(modalidad):
     """Agrega una nueva modalidad a la base de datos"""
     conn = get_connection()
@@ -3772,9 +3322,11 @@ def add_modalidad(modalidad):
     finally:
         conn.close()
 
-def get_or_create_tecnico(nombre, conn=None):
-    """Obtiene el ID de un técnico o lo crea si no existe"""
+def get_or_create_tecnico(nombre, conn=None, resolver=None):
+    """Obtiene el ID de un técnico o lo crea si no existe.
+    resolver: EntityResolver de tecnicos ya cargado (cargas masivas); si no se pasa se usa el compartido"""
     from .utils import normalize_text  # Importar la función de normalización
+    from .entity_resolver import shared_entity_resolver
     
     # Mapeo de nombres antiguos a nuevos para mantener consistencia
     KNOWN_ALIASES = {
@@ -3804,20 +3356,24 @@ def get_or_create_tecnico(nombre, conn=None):
         nombre_normalizado = normalize_text(nombre)
     
     # Buscar técnico existente por nombre normalizado
-    c.execute("SELECT id_tecnico, nombre FROM tecnicos")
-    tecnicos = c.fetchall()
-    
-    for tecnico_id, tecnico_nombre in tecnicos:
-        if normalize_text(tecnico_nombre) == nombre_normalizado:
-            if close_conn:
-                conn.close()
-            return tecnico_id
+    caller_resolver = resolver is not None
+    if not caller_resolver:
+        resolver = shared_entity_resolver('tecnicos')
+    tecnico_id = resolver.get('text', nombre_normalizado)
+    if tecnico_id is not None:
+        if close_conn:
+            conn.close()
+        return tecnico_id
     
     # Si no se encontró, crear nuevo técnico con el nombre (posiblemente corregido)
     try:
         c.execute("INSERT INTO tecnicos (nombre) VALUES (%s) RETURNING id_tecnico", (nombre,))
         tecnico_id = c.fetchone()[0]
         conn.commit()
+        # El índice compartido no se modifica: se descarta y se relee en la próxima búsqueda
+        if caller_resolver:
+            resolver.add(tecnico_id, nombre)
+        invalidate_tables('tecnicos')
         if close_conn:
             conn.close()
         return tecnico_id
@@ -3826,8 +3382,10 @@ def get_or_create_tecnico(nombre, conn=None):
             conn.close()
         raise e
 
-def get_or_create_cliente(nombre, conn=None):
-    """Obtiene el ID de un cliente o lo crea si no existe (con búsqueda robusta)"""
+@invalidates('clientes')
+def get_or_create_cliente(nombre, conn=None, resolver=None):
+    """Obtiene el ID de un cliente o lo crea si no existe (con búsqueda robusta).
+    resolver: EntityResolver de clientes ya cargado; evita las consultas de búsqueda en cargas masivas"""
     nombre_str = str(nombre).strip()
     if not nombre_str:
         return None
@@ -3840,6 +3398,19 @@ def get_or_create_cliente(nombre, conn=None):
     try:
         c = conn.cursor()
         
+        if resolver is not None:
+            # Mismos criterios que las búsquedas 1-3, resueltos en memoria
+            for kind in ('exact', 'lower', 'nopunct'):
+                cliente_id = resolver.get(kind, nombre_str)
+                if cliente_id is not None:
+                    return cliente_id
+            c.execute("INSERT INTO clientes (nombre) VALUES (%s) RETURNING id_cliente", (nombre_str,))
+            cliente_id = c.fetchone()[0]
+            resolver.add(cliente_id, nombre_str)
+            if should_close:
+                conn.commit()
+            return cliente_id
+
         # 1. Búsqueda Exacta
         c.execute("SELECT id_cliente FROM clientes WHERE nombre = %s", (nombre_str,))
         result = c.fetchone()
@@ -4006,9 +3577,11 @@ def get_tecnico_rol_id(tecnico_nombre, conn=None):
     # Mantener compatibilidad hacia atrás llamando a la nueva función
     return get_empleado_rol_id(tecnico_nombre, conn)
 
-def get_or_create_tipo_tarea(descripcion, conn=None, empleado_nombre=None, tecnico_nombre=None):
+@invalidates('tipos_tarea', 'tipos_tarea_roles')
+def get_or_create_tipo_tarea(descripcion, conn=None, empleado_nombre=None, tecnico_nombre=None, resolver=None):
     """Obtiene el ID de un tipo de tarea o lo crea si no existe (con validación de duplicados)
-    Si se crea un nuevo tipo de tarea y se proporciona empleado_nombre o tecnico_nombre, lo asocia automáticamente al rol del empleado"""
+    Si se crea un nuevo tipo de tarea y se proporciona empleado_nombre o tecnico_nombre, lo asocia automáticamente al rol del empleado
+    resolver: EntityResolver de tipos_tarea ya cargado (cargas masivas)"""
     # Normalizar la descripción
     descripcion_normalizada = ' '.join(descripcion.strip().split()).title()
     
@@ -4020,9 +3593,13 @@ def get_or_create_tipo_tarea(descripcion, conn=None, empleado_nombre=None, tecni
     c = conn.cursor()
     
     # Buscar tipo de tarea existente (insensible a mayúsculas/minúsculas)
-    c.execute("SELECT id_tipo FROM tipos_tarea WHERE LOWER(TRIM(descripcion)) = LOWER(TRIM(%s))", 
-             (descripcion_normalizada,))
-    result = c.fetchone()
+    if resolver is not None:
+        tipo_id = resolver.get('lower', descripcion_normalizada)
+        result = (tipo_id,) if tipo_id is not None else None
+    else:
+        c.execute("SELECT id_tipo FROM tipos_tarea WHERE LOWER(TRIM(descripcion)) = LOWER(TRIM(%s))", 
+                 (descripcion_normalizada,))
+        result = c.fetchone()
     
     if result:
         if close_conn:
@@ -4050,6 +3627,8 @@ def get_or_create_tipo_tarea(descripcion, conn=None, empleado_nombre=None, tecni
                                  (tipo_id, rol_id))
             
             conn.commit()
+            if resolver is not None:
+                resolver.add(tipo_id, descripcion_normalizada)
             if close_conn:
                 conn.close()
             return tipo_id
@@ -4058,8 +3637,10 @@ def get_or_create_tipo_tarea(descripcion, conn=None, empleado_nombre=None, tecni
                 conn.close()
             raise e
 
-def get_or_create_modalidad(modalidad, conn=None):
-    """Obtiene el ID de una modalidad o la crea si no existe"""
+@invalidates('modalidades_tarea')
+def get_or_create_modalidad(modalidad, conn=None, resolver=None):
+    """Obtiene el ID de una modalidad o la crea si no existe
+    resolver: EntityResolver de modalidades_tarea ya cargado (cargas masivas)"""
     close_conn = False
     if conn is None:
         conn = get_connection()
@@ -4068,8 +3649,12 @@ def get_or_create_modalidad(modalidad, conn=None):
     c = conn.cursor()
     
     # Buscar modalidad existente
-    c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = %s", (modalidad,))
-    result = c.fetchone()
+    if resolver is not None:
+        modalidad_id = resolver.get('exact', modalidad)
+        result = (modalidad_id,) if modalidad_id is not None else None
+    else:
+        c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = %s", (modalidad,))
+        result = c.fetchone()
     
     if result:
         if close_conn:
@@ -4081,6 +3666,8 @@ def get_or_create_modalidad(modalidad, conn=None):
             c.execute("INSERT INTO modalidades_tarea (descripcion) VALUES (%s) RETURNING id_modalidad", (modalidad,))
             modalidad_id = c.fetchone()[0]
             conn.commit()
+            if resolver is not None:
+                resolver.add(modalidad_id, modalidad)
             if close_conn:
                 conn.close()
             return modalidad_id
@@ -4104,8 +3691,8 @@ def get_unassigned_records_for_user(user_id):
         nombre_completo = f"{user_data[0]} {user_data[1]}"
         conn.close()
         
-        query = '''
-            SELECT r.id, r.fecha, t.nombre as tecnico, c.nombre as cliente, 
+        query = f'''
+            SELECT r.id, r.fecha, {registros_fecha_sql()} AS fecha_date, t.nombre as tecnico, c.nombre as cliente, 
                    tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
                    r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes
             FROM registros r
@@ -4235,53 +3822,31 @@ def get_registros_by_rol_with_date_filter(rol_id, filter_type='all_time', custom
         # Preparar parámetros y filtro de fecha (usando binds de SQLAlchemy)
         params = {}
         date_filter = ""
+        fecha_sql = registros_fecha_sql()
         
+        month_range = None
         if filter_type == 'current_month':
             # Filtro para el mes actual
             from datetime import datetime
-            current_month = datetime.now().month
-            current_year = datetime.now().year
-            
-            if use_created_at:
-                # Filtrar puramente por created_at (timestamp) - SQL es eficiente y seguro aquí
-                date_filter = """
-                    AND (EXTRACT(MONTH FROM r.created_at) = :month_int AND EXTRACT(YEAR FROM r.created_at) = :year_int)
-                """
-                params.update({
-                    "month_int": current_month,
-                    "year_int": current_year
-                })
-            else:
-                # Filtro por fecha string: Hacemos el filtrado en Python para mayor robustez
-                # Evitamos lógica SQL frágil con SUBSTRING para formatos de fecha variables
-                pass
-            
+            month_range = (datetime.now().year, datetime.now().month)
         elif filter_type == 'custom_month' and custom_month and custom_year:
+            month_range = (int(custom_year), int(custom_month))
+        
+        if month_range:
+            params.update(_month_bounds(*month_range))
             if use_created_at:
-                date_filter = """
-                    AND (EXTRACT(MONTH FROM r.created_at) = :month_int AND EXTRACT(YEAR FROM r.created_at) = :year_int)
-                """
-                params.update({
-                    "month_int": int(custom_month),
-                    "year_int": int(custom_year)
-                })
+                # Filtrar puramente por created_at (timestamp) con rango para usar idx_registros_created_at
+                date_filter = "AND r.created_at >= :month_start AND r.created_at < :month_end"
             else:
-                # Filtro por fecha string: Hacemos el filtrado en Python
-                pass
+                # Filtro por la fecha tipada del registro (idx_registros_fecha_date)
+                date_filter = f"AND {fecha_sql} >= :month_start AND {fecha_sql} < :month_end"
                 
         elif filter_type == 'custom_range' and start_date and end_date:
             if use_created_at:
-                date_filter = "AND r.created_at::date BETWEEN :start_date AND :end_date"
+                date_filter = "AND r.created_at >= :start_date AND r.created_at < CAST(:end_date AS date) + 1"
             else:
-                date_filter = """
-                    AND (
-                        CASE 
-                            WHEN r.fecha IS NOT NULL AND LENGTH(r.fecha) >= 8 THEN 
-                                to_date(r.fecha, 'DD/MM/YY') BETWEEN :start_date AND :end_date
-                            ELSE 
-                                r.created_at::date BETWEEN :start_date AND :end_date
-                        END
-                    )
+                date_filter = f"""
+                    AND COALESCE({fecha_sql}, r.created_at::date) BETWEEN :start_date AND :end_date
                 """
             params.update({"start_date": start_date, "end_date": end_date})
         
@@ -4291,8 +3856,8 @@ def get_registros_by_rol_with_date_filter(rol_id, filter_type='all_time', custom
         engine = get_engine()
         
         # Query base común
-        select_clause = '''
-            SELECT r.fecha, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
+        select_clause = f'''
+            SELECT r.fecha, {fecha_sql} AS fecha_date, t.nombre as tecnico, r.grupo, c.nombre as cliente, 
                    tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada, 
                    r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes, r.id,
                    r.created_at as "Fecha Creación"
@@ -4336,21 +3901,6 @@ def get_registros_by_rol_with_date_filter(rol_id, filter_type='all_time', custom
         # Procesar fechas y meses
         df = process_registros_df(df)
         
-        # Aplicar filtrado por fecha en Python si se omitió en SQL (para mayor robustez con fechas string)
-        if not use_created_at and not df.empty:
-            if filter_type == 'current_month':
-                # Filtramos por el mes y año actuales
-                from datetime import datetime
-                now = datetime.now()
-                # Asegurar que la columna fecha es datetime (process_registros_df ya lo hace)
-                if pd.api.types.is_datetime64_any_dtype(df['fecha']):
-                    df = df[(df['fecha'].dt.month == now.month) & (df['fecha'].dt.year == now.year)]
-            
-            elif filter_type == 'custom_month' and custom_month and custom_year:
-                # Filtramos por el mes y año personalizados
-                if pd.api.types.is_datetime64_any_dtype(df['fecha']):
-                    df = df[(df['fecha'].dt.month == int(custom_month)) & (df['fecha'].dt.year == int(custom_year))]
-        
         return df
     except Exception as e:
         log_sql_error(f"Error obteniendo registros por rol con filtro de fecha: {e}")
@@ -4599,6 +4149,7 @@ def delete_empleado_nomina(id_empleado):
     finally:
         conn.close()
 
+@invalidates('grupos', 'roles')
 def process_nomina_excel(excel_df):
     """Procesa un DataFrame de Excel y guarda los empleados en la nómina"""
     success_count = 0
@@ -5192,6 +4743,7 @@ def get_user_info(user_id):
     return None
 
 
+@invalidates('roles')
 def get_or_create_role_from_sector(sector):
     """Obtiene o crea un rol basado en el sector de nómina
     
@@ -5298,6 +4850,7 @@ def get_or_create_role_from_sector(sector):
     finally:
         conn.close()
 
+@invalidates('roles')
 def get_or_create_role_ids_from_sector(sector):
     from .utils import clean_role_name
 
@@ -5394,6 +4947,7 @@ def get_or_create_role_ids_from_sector(sector):
     finally:
         conn.close()
 
+@invalidates('roles', 'grupos_roles', 'tipos_tarea_roles')
 def ensure_system_roles():
     conn = get_connection()
     c = conn.cursor()
@@ -5470,22 +5024,6 @@ def ensure_system_roles():
         conn.close()
         return False
 
-def ensure_roles_view_type_column():
-    conn = get_connection()
-    c = conn.cursor()
-    try:
-        try:
-            c.execute("ALTER TABLE roles ADD COLUMN IF NOT EXISTS view_type VARCHAR(64)")
-        except Exception:
-            pass
-        conn.commit()
-        conn.close()
-        return True
-    except Exception:
-        conn.rollback()
-        conn.close()
-        return False
-
 def fix_administracion_department_role():
     conn = get_connection()
     c = conn.cursor()
@@ -5521,6 +5059,7 @@ def fix_administracion_department_role():
         conn.close()
         return False
 
+@invalidates('roles', 'grupos_roles', 'tipos_tarea_roles')
 def merge_role_alias(source_name, target_name):
     conn = get_connection()
     c = conn.cursor()
@@ -5564,31 +5103,9 @@ def merge_role_alias(source_name, target_name):
         conn.close()
         return False
 
-def migrate_nomina_remove_unique_constraint():
-    """Migra la tabla nomina para remover la restricción UNIQUE del campo documento"""
-    conn = get_connection()
-    c = conn.cursor()
-    
-    try:
-        # En PostgreSQL, simplemente eliminar la restricción si existe
-        c.execute("""
-            ALTER TABLE nomina 
-            DROP CONSTRAINT IF EXISTS nomina_documento_key
-        """)
-        
-        conn.commit()
-        conn.close()
-        print("✅ Migración completada: restricción UNIQUE removida del campo documento")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error en migración: {str(e)}")
-        conn.rollback()
-        conn.close()
-        return False
-
 
 
+@invalidates('tipos_tarea', 'tipos_tarea_roles', 'tipos_tarea_puntajes')
 def clean_duplicate_task_types():
     """Limpia tipos de tarea duplicados, manteniendo solo uno de cada tipo"""
     conn = get_connection()
@@ -5704,6 +5221,7 @@ def update_user_profile_complete(user_id, nombre=None, apellido=None, email=None
     finally:
         conn.close()
 
+@cached_query('clientes_puntajes')
 def get_cliente_puntaje(id_cliente):
     """Obtiene el puntaje de un cliente específico"""
     conn = get_connection()
@@ -5713,6 +5231,7 @@ def get_cliente_puntaje(id_cliente):
     conn.close()
     return resultado[0] if resultado else 0
 
+@cached_query('clientes', 'clientes_puntajes')
 def get_cliente_puntaje_by_nombre(nombre_cliente):
     """Obtiene el puntaje de un cliente por su nombre"""
     conn = get_connection()
@@ -5727,6 +5246,7 @@ def get_cliente_puntaje_by_nombre(nombre_cliente):
     conn.close()
     return resultado[0] if resultado else 0
 
+@invalidates('clientes_puntajes')
 def set_cliente_puntaje(id_cliente, puntaje):
     """Establece el puntaje para un cliente específico"""
     conn = get_connection()
@@ -5767,6 +5287,7 @@ def set_cliente_puntaje_by_nombre(nombre_cliente, puntaje):
     finally:
         conn.close()
 
+@cached_query('clientes', 'clientes_puntajes')
 def get_clientes_puntajes_dataframe(only_active=False):
     """Obtiene un DataFrame con todos los clientes y sus puntajes"""
     query = """
@@ -5785,6 +5306,7 @@ def get_clientes_puntajes_dataframe(only_active=False):
     
     return df
 
+@cached_query('grupos', 'grupos_roles', 'roles')
 def get_grupos_dataframe():
     """Obtiene DataFrame de grupos con sus roles asignados"""
     query = """
@@ -5807,6 +5329,7 @@ def get_grupos_dataframe():
     
     return df
 
+@cached_query('grupos_puntajes')
 def get_grupo_puntaje(id_grupo):
     """Obtiene el puntaje de un grupo específico"""
     conn = get_connection()
@@ -5816,6 +5339,7 @@ def get_grupo_puntaje(id_grupo):
     conn.close()
     return resultado[0] if resultado else 0
 
+@cached_query('grupos', 'grupos_puntajes')
 def get_grupo_puntaje_by_nombre(nombre_grupo):
     """Obtiene el puntaje de un grupo por su nombre"""
     conn = get_connection()
@@ -5830,6 +5354,7 @@ def get_grupo_puntaje_by_nombre(nombre_grupo):
     conn.close()
     return resultado[0] if resultado else 0
 
+@invalidates('grupos_puntajes')
 def set_grupo_puntaje(id_grupo, puntaje):
     """Establece el puntaje para un grupo específico"""
     conn = get_connection()
@@ -5870,6 +5395,7 @@ def set_grupo_puntaje_by_nombre(nombre_grupo, puntaje):
     finally:
         conn.close()
 
+@cached_query('grupos', 'grupos_puntajes', 'grupos_roles', 'roles')
 def get_grupos_puntajes_dataframe():
     """Obtiene un DataFrame con todos los grupos y sus puntajes"""
     query = """
@@ -5966,6 +5492,7 @@ def get_actividades_dataframe(limit=1000):
         log_sql_error(e, query, limit)
         return pd.DataFrame()
 
+@cached_query('tipos_tarea_puntajes')
 def get_tipo_puntaje(id_tipo):
     """Obtiene el puntaje de un tipo de tarea específico"""
     conn = get_connection()
@@ -5976,6 +5503,7 @@ def get_tipo_puntaje(id_tipo):
     return resultado[0] if resultado else 0
 
 
+@cached_query('tipos_tarea', 'tipos_tarea_puntajes')
 def get_tipo_puntaje_by_descripcion(descripcion_tipo):
     """Obtiene el puntaje de un tipo de tarea por su descripción"""
     conn = get_connection()
@@ -5991,6 +5519,7 @@ def get_tipo_puntaje_by_descripcion(descripcion_tipo):
     return resultado[0] if resultado else 0
 
 
+@invalidates('tipos_tarea_puntajes')
 def set_tipo_puntaje(id_tipo, puntaje):
     """Establece el puntaje para un tipo de tarea específico"""
     conn = get_connection()
@@ -6033,6 +5562,7 @@ def set_tipo_puntaje_by_descripcion(descripcion_tipo, puntaje):
         conn.close()
 
 
+@cached_query('tipos_tarea', 'tipos_tarea_puntajes', 'tipos_tarea_roles', 'roles')
 def get_tipos_puntajes_dataframe():
     """Obtiene un DataFrame con todos los tipos de tarea y sus puntajes"""
     query = """
@@ -6053,6 +5583,7 @@ def get_tipos_puntajes_dataframe():
     df['roles_asociados'] = df['roles_asociados'].fillna('')
     return df
 
+@invalidates('grupos', 'grupos_roles')
 def add_grupo(nombre, descripcion=None):
     """Agrega un nuevo grupo a la base de datos"""
     from .utils import normalize_text
@@ -6149,6 +5680,7 @@ def get_grupos_by_rol(rol_id):
     finally:
         conn.close()
 
+@invalidates('grupos_roles')
 def assign_grupo_to_rol(grupo_id, rol_id):
     """Asigna un grupo a un rol específico"""
     conn = get_connection()
@@ -6165,6 +5697,7 @@ def assign_grupo_to_rol(grupo_id, rol_id):
     finally:
         conn.close()
 
+@invalidates('grupos_roles')
 def remove_grupo_from_rol(grupo_id, rol_id):
     """Elimina la asignación de un grupo a un rol"""
     conn = get_connection()
@@ -6179,6 +5712,7 @@ def remove_grupo_from_rol(grupo_id, rol_id):
     finally:
         conn.close()
 
+@invalidates('grupos_roles')
 def update_grupo_roles(grupo_id, rol_ids):
     """Actualiza los roles asignados a un grupo"""
     conn = get_connection()
@@ -6225,6 +5759,7 @@ def generate_standard_password(apellido_completo):
     apellido_formatted = primer_apellido.capitalize()
     return f"{apellido_formatted}{year}."
 
+@invalidates('grupos')
 def generate_users_from_nomina(enable_users=False):
     """Genera usuarios desde los datos de nómina"""
     conn = get_connection()
@@ -6455,6 +5990,7 @@ def get_user_departamento_from_nomina(user_id, conn=None):
         log_sql_error(e, "get_user_departamento_from_nomina")
         return None
 
+@invalidates('grupos')
 def get_or_create_grupo_with_department_association(nombre_grupo, user_id=None, conn=None):
     """Obtiene o crea un grupo por nombre y lo asocia automáticamente al departamento del usuario"""
     from .utils import normalize_text
@@ -6503,6 +6039,7 @@ def get_or_create_grupo_with_department_association(nombre_grupo, user_id=None,
             conn.close()
         raise e
 
+@invalidates('grupos_roles')
 def asociar_grupo_a_departamento_usuario(grupo_id, user_id, conn=None):
     """Asocia un grupo al departamento del usuario que lo está creando/usando"""
     close_conn = False
@@ -6663,6 +6200,7 @@ def get_departamento_by_tecnico_name(tecnico_nombre, conn=None):
         log_sql_error(e, "get_departamento_by_tecnico_name")
         return None
 
+@invalidates('grupos_roles')
 def asociar_grupo_a_departamento_por_tecnico(grupo_id, tecnico_nombre, conn=None):
     """Asocia un grupo al departamento basándose en el técnico del registro"""
     close_conn = False
@@ -6885,6 +6423,7 @@ def restore_user_defaults_for_range(user_id, start_date, end_date, conn=None):
     except Exception as e:
         log_sql_error(f"Error restoring defaults for range: {e}")
 
+@invalidates('modalidades_tarea')
 def get_or_create_modalidad_vacaciones(conn=None):
     """Obtiene o crea la modalidad 'Vacaciones'"""
     close_conn = False
@@ -6916,6 +6455,7 @@ def get_or_create_modalidad_vacaciones(conn=None):
         if close_conn:
             conn.close()
 
+@invalidates('tipos_tarea')
 def get_or_create_tipo_tarea_vacaciones(conn=None):
     """Obtiene o crea el tipo de tarea 'Vacaciones'"""
     close_conn = False
@@ -6952,18 +6492,7 @@ def get_or_create_tipo_tarea_vacaciones(conn=None):
         if close_conn:
             conn.close()
 
-def ensure_vacaciones_schema():
-    """Asegura que la tabla vacaciones tenga la columna tipo"""
-    conn = get_connection()
-    try:
-        c = conn.cursor()
-        c.execute("ALTER TABLE vacaciones ADD COLUMN IF NOT EXISTS tipo VARCHAR(50) DEFAULT 'vacaciones'")
-        conn.commit()
-    except Exception as e:
-        pass
-    finally:
-        conn.close()
-
+@invalidates('tipos_tarea')
 def get_or_create_tipo_tarea_generic(descripcion, conn=None):
     """Obtiene o crea un tipo de tarea genérico (oculto)"""
     close_conn = False
@@ -6997,6 +6526,7 @@ def get_or_create_tipo_tarea_generic(descripcion, conn=None):
         if close_conn:
             conn.close()
 
+@invalidates('modalidades_tarea')
 def get_or_create_modalidad_generic(descripcion, conn=None):
     """Obtiene o crea una modalidad genérica (oculta)"""
     close_conn = False
@@ -7201,8 +6731,7 @@ def delete_vacaciones(vac_id):
                     DELETE FROM registros 
                     WHERE usuario_id = %s 
                     AND id_tipo IN ({placeholders})
-                    AND to_date(fecha, 'DD/MM/YY') >= %s 
-                    AND to_date(fecha, 'DD/MM/YY') <= %s
+                    AND {registros_fecha_sql(alias=None)} BETWEEN %s AND %s
                 """
                 params = [user_id] + tipos_ids + [start_date, end_date]
                 c.execute(query, tuple(params))
@@ -7296,8 +6825,7 @@ def update_vacaciones(vac_id, new_start_date, new_end_date, tipo=None):
                 DELETE FROM registros 
                 WHERE usuario_id = %s 
                 AND id_tipo IN ({placeholders})
-                AND to_date(fecha, 'DD/MM/YY') >= %s 
-                AND to_date(fecha, 'DD/MM/YY') <= %s
+                AND {registros_fecha_sql(alias=None)} BETWEEN %s AND %s
             """
             params = [user_id] + tipos_ids + [old_start_date, old_end_date]
             c.execute(query, tuple(params))
@@ -7451,6 +6979,7 @@ def delete_registros_batch(registro_ids):
     finally:
         conn.close()
 
+@invalidates('grupos')
 def get_or_create_grupo_with_tecnico_department_association(nombre_grupo, tecnico_nombre, conn=None):
     """Obtiene o crea un grupo por nombre y lo asocia automáticamente al departamento del técnico
     
@@ -7525,6 +7054,7 @@ def get_or_create_grupo_with_tecnico_department_association(nombre_grupo, tecnic
             conn.close()
         raise e
 
+@invalidates('roles', 'grupos', 'grupos_roles')
 def generate_roles_from_nomina():
     """Genera roles desde los cargos únicos en nómina"""
     conn = get_connection()
@@ -7690,6 +7220,7 @@ def generate_roles_from_nomina():
     finally:
         conn.close()
 
+@invalidates('grupos')
 def generate_grupos_from_nomina():
     """Genera grupos desde los equipos únicos en nómina"""
     conn = get_connection()
@@ -7743,18 +7274,10 @@ def generate_grupos_from_nomina():
 
 def toggle_contacto_favorito(user_id, contacto_id):
     """Alterna el estado de favorito de un contacto para un usuario"""
+    ensure_schema()
     conn = get_connection()
     try:
         c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS contactos_favoritos (
-                user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                contacto_id INTEGER NOT NULL REFERENCES contactos(id_contacto) ON DELETE CASCADE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, contacto_id)
-            )
-        """)
-        
         c.execute("SELECT 1 FROM contactos_favoritos WHERE user_id = %s AND contacto_id = %s", (user_id, contacto_id))
         exists = c.fetchone()
         
@@ -7776,17 +7299,10 @@ def toggle_contacto_favorito(user_id, contacto_id):
 
 def get_contactos_favoritos(user_id):
     """Devuelve una lista de IDs de contactos favoritos para un usuario"""
+    ensure_schema()
     conn = get_connection()
     try:
         c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS contactos_favoritos (
-                user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                contacto_id INTEGER NOT NULL REFERENCES contactos(id_contacto) ON DELETE CASCADE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, contacto_id)
-            )
-        """)
         c.execute("SELECT contacto_id FROM contactos_favoritos WHERE user_id = %s", (user_id,))
         rows = c.fetchall()
         return [r[0] for r in rows]
@@ -7798,18 +7314,10 @@ def get_contactos_favoritos(user_id):
 
 def log_contacto_reciente(user_id, contacto_id):
     """Registra o actualiza el acceso reciente a un contacto"""
+    ensure_schema()
     conn = get_connection()
     try:
         c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS contactos_recientes (
-                user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                contacto_id INTEGER NOT NULL REFERENCES contactos(id_contacto) ON DELETE CASCADE,
-                accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, contacto_id)
-            )
-        """)
-        
         c.execute("SELECT 1 FROM contactos_recientes WHERE user_id = %s AND contacto_id = %s", (user_id, contacto_id))
         if c.fetchone():
              c.execute("UPDATE contactos_recientes SET accessed_at = CURRENT_TIMESTAMP WHERE user_id = %s AND contacto_id = %s", (user_id, contacto_id))
@@ -7827,17 +7335,10 @@ def log_contacto_reciente(user_id, contacto_id):
 
 def get_contactos_recientes(user_id, limit=5):
     """Devuelve una lista de IDs de contactos recientes para un usuario"""
+    ensure_schema()
     conn = get_connection()
     try:
         c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS contactos_recientes (
-                user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                contacto_id INTEGER NOT NULL REFERENCES contactos(id_contacto) ON DELETE CASCADE,
-                accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, contacto_id)
-            )
-        """)
         c.execute("""
             SELECT contacto_id FROM contactos_recientes 
             WHERE user_id = %s 
@@ -7852,26 +7353,6 @@ def get_contactos_recientes(user_id, limit=5):
     finally:
         conn.close()
 
-def ensure_clientes_favoritos_exists(conn=None):
-    close_conn = False
-    if conn is None:
-        conn = get_connection()
-        close_conn = True
-    try:
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS clientes_favoritos (
-                user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
-                cliente_id INTEGER NOT NULL REFERENCES clientes(id_cliente) ON DELETE CASCADE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                PRIMARY KEY (user_id, cliente_id)
-            )
-        """)
-        conn.commit()
-    finally:
-        if close_conn:
-            conn.close()
-
 def toggle_cliente_favorito(user_id, cliente_id):
     conn = get_connection()
     try:
@@ -0,0 +1,250 @@
+"""
+Pool de conexiones PostgreSQL compartido por todo el proceso.
+
+get_connection()/db_connection() y el engine de SQLAlchemy toman conexiones de
+este pool. Las conexiones entregadas son instancias de PooledConnection, por lo
+que el código existente que hace conn.close() las devuelve al pool sin cambios.
+"""
+import os
+import threading
+import time
+import weakref
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """No se liberó ninguna conexión del pool dentro del tiempo de espera"""
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """Conexión psycopg2 cuyo close() la devuelve al pool en vez de cerrarla"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._checked_out = False
+        self._created_at = time.monotonic()
+        self._last_used_at = self._created_at
+
+    def close(self):
+        pool = self._pool
+        if pool is None or self.closed:
+            return super().close()
+        if self._checked_out:
+            pool.release(self)
+
+    def discard(self):
+        """Cierra físicamente la conexión sin devolverla al pool"""
+        self._pool = None
+        self._checked_out = False
+        try:
+            super().close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Pool thread-safe con tamaño mínimo/máximo, health check y reciclado por inactividad"""
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=20, timeout=30,
+                 idle_timeout=300, max_lifetime=1800, health_check_interval=30):
+        self._connect_kwargs = dict(connect_kwargs)
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size))
+        self.timeout = float(timeout)
+        self.idle_timeout = float(idle_timeout)
+        self.max_lifetime = float(max_lifetime)
+        self.health_check_interval = float(health_check_interval)
+        self._cond = threading.Condition()
+        self._idle = []
+        self._in_use = weakref.WeakSet()
+        self._pending = 0
+        self._closed = False
+        self._pid = os.getpid()
+
+    def _connect(self):
+        conn = psycopg2.connect(connection_factory=PooledConnection, **self._connect_kwargs)
+        conn._pool = self
+        return conn
+
+    def _size_locked(self):
+        return len(self._idle) + len(self._in_use) + self._pending
+
+    def _expired(self, conn, now):
+        if conn.closed:
+            return True
+        return self.max_lifetime > 0 and now - conn._created_at > self.max_lifetime
+
+    def _collect_stale_locked(self, now):
+        """Retira conexiones ociosas vencidas o excedentes respecto de min_size"""
+        stale = []
+        keep = []
+        total = self._size_locked()
+        # _idle es LIFO: las más antiguas quedan al principio
+        for conn in self._idle:
+            idle_for = now - conn._last_used_at
+            too_idle = self.idle_timeout > 0 and idle_for > self.idle_timeout and total > self.min_size
+            if self._expired(conn, now) or too_idle:
+                stale.append(conn)
+                total -= 1
+            else:
+                keep.append(conn)
+        self._idle = keep
+        return stale
+
+    def _check_fork(self):
+        # Una conexión libpq no puede compartirse entre procesos
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._in_use = weakref.WeakSet()
+            self._pending = 0
+
+    def _is_healthy(self, conn, now):
+        if conn.closed:
+            return False
+        if self.health_check_interval <= 0 or now - conn._last_used_at < self.health_check_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Entrega una conexión del pool, creando una nueva si hay cupo"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            create = False
+            with self._cond:
+                self._check_fork()
+                if self._closed:
+                    raise psycopg2.InterfaceError("El pool de conexiones está cerrado")
+                now = time.monotonic()
+                stale = self._collect_stale_locked(now)
+                if self._idle:
+                    conn = self._idle.pop()
+                    self._pending += 1
+                elif self._size_locked() < self.max_size:
+                    create = True
+                    self._pending += 1
+                elif not stale:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Sin conexiones libres en el pool (máximo {self.max_size}) tras {self.timeout:.0f}s"
+                        )
+                    self._cond.wait(remaining)
+                    continue
+            for old in stale:
+                old.discard()
+            if conn is None and not create:
+                continue
+            try:
+                if create:
+                    conn = self._connect()
+                elif not self._is_healthy(conn, time.monotonic()):
+                    conn.discard()
+                    conn = self._connect()
+            except BaseException:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._pending -= 1
+                conn._pool = self
+                conn._checked_out = True
+                self._in_use.add(conn)
+            return conn
+
+    def _reset(self, conn):
+        """Deja la conexión lista para reutilizarse; False si debe descartarse"""
+        if conn.closed:
+            return False
+        try:
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            if conn.autocommit:
+                conn.autocommit = False
+            return conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        except Exception:
+            return False
+
+    def release(self, conn):
+        """Devuelve una conexión al pool (idempotente)"""
+        with self._cond:
+            if conn not in self._in_use:
+                return
+            self._in_use.discard(conn)
+            conn._checked_out = False
+            self._pending += 1
+        reusable = not self._closed and self._reset(conn)
+        now = time.monotonic()
+        with self._cond:
+            self._pending -= 1
+            if reusable and not self._closed and not self._expired(conn, now):
+                conn._last_used_at = now
+                self._idle.append(conn)
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            conn.discard()
+
+    def close(self):
+        """Cierra las conexiones ociosas; las que estén en uso se cierran al devolverse"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn in idle:
+            conn.discard()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'pending': self._pending,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            }
+
+
+_POOL = None
+_POOL_KEY = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool(connect_kwargs, pool_config):
+    """Devuelve el pool del proceso, recreándolo si cambió la configuración de conexión"""
+    global _POOL, _POOL_KEY
+    key = (tuple(sorted((k, str(v)) for k, v in connect_kwargs.items())),
+           tuple(sorted(pool_config.items())))
+    pool = _POOL
+    if pool is not None and _POOL_KEY == key:
+        return pool
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_KEY != key:
+            old = _POOL
+            _POOL = ConnectionPool(connect_kwargs, **pool_config)
+            _POOL_KEY = key
+            if old is not None:
+                old.close()
+        return _POOL
+
+
+def close_pool():
+    """Cierra el pool del proceso (p.ej. antes de regenerar la base de datos)"""
+    global _POOL, _POOL_KEY
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.close()
+        _POOL = None
+        _POOL_KEY = None
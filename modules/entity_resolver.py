@@ -0,0 +1,156 @@
+"""
+Índice en memoria para resolver nombres de técnicos, clientes, tipos de tarea y
+modalidades a sus IDs.
+
+Cada EntityResolver carga la tabla una sola vez y arma:
+
+- un mapa hash por cada forma de normalización (nombre exacto, mayúsculas,
+  texto sin acentos, minúsculas sin puntuación, alfanumérico compacto), de modo
+  que cada búsqueda exacta es O(1);
+- un índice invertido de trigramas sobre el nombre compacto, para las búsquedas
+  por contención ("ACME" dentro de "ACMESA" o viceversa) que antes recorrían
+  todos los clientes normalizando cada nombre.
+
+Las entidades creadas durante una carga se agregan con add() sin releer la tabla.
+Para cargas masivas se usa load_entity_resolver() (lectura fresca, vive lo que
+dure la operación); para búsquedas sueltas, shared_entity_resolver(), que queda en
+la caché de referencia hasta que una escritura sobre la tabla la invalida.
+"""
+from .database import get_connection
+from .query_cache import cached_query, invalidate_tables
+from .utils import normalize_name, normalize_text
+
+# tabla -> (columna id, columna nombre)
+ENTITY_TABLES = {
+    'tecnicos': ('id_tecnico', 'nombre'),
+    'clientes': ('id_cliente', 'nombre'),
+    'tipos_tarea': ('id_tipo', 'descripcion'),
+    'modalidades_tarea': ('id_modalidad', 'descripcion'),
+}
+
+
+def _lower_key(nombre):
+    return ' '.join(str(nombre).split()).lower()
+
+
+def _nopunct_key(nombre):
+    return _lower_key(nombre).replace('.', '').replace(',', '')
+
+
+# Formas de normalización indexadas: tipo de clave -> función
+KEY_FUNCS = {
+    'exact': lambda nombre: str(nombre).strip(),
+    'upper': lambda nombre: str(nombre).upper(),
+    'text': normalize_text,
+    'lower': _lower_key,
+    'nopunct': _nopunct_key,
+    'compact': normalize_name,
+}
+
+
+def _trigrams(s):
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+
+class EntityResolver:
+    """Índice (id, nombre) con búsquedas por clave normalizada y por contención"""
+
+    def __init__(self, rows=()):
+        self._maps = {kind: {} for kind in KEY_FUNCS}
+        self._compact = []          # posición -> (id, nombre compacto), en orden de carga
+        self._compact_positions = {}  # nombre compacto -> [posiciones]
+        self._trigram_index = {}    # trigrama -> {posiciones}
+        for entity_id, nombre in rows:
+            self.add(entity_id, nombre)
+
+    def __len__(self):
+        return len(self._compact)
+
+    def add(self, entity_id, nombre):
+        """Agrega una entidad (p.ej. recién creada); ante claves repetidas gana la primera"""
+        for kind, func in KEY_FUNCS.items():
+            key = func(nombre)
+            if kind == 'compact':
+                # Igual que el normalized_client_map que reemplaza: gana la última
+                self._maps[kind][key] = entity_id
+            else:
+                self._maps[kind].setdefault(key, entity_id)
+        compact = normalize_name(nombre)
+        pos = len(self._compact)
+        self._compact.append((entity_id, compact))
+        self._compact_positions.setdefault(compact, []).append(pos)
+        for tri in _trigrams(compact):
+            self._trigram_index.setdefault(tri, set()).add(pos)
+
+    def get(self, kind, nombre):
+        """ID de la entidad cuya clave `kind` coincide con la de nombre (o None)"""
+        return self._maps[kind].get(KEY_FUNCS[kind](nombre))
+
+    def _first_containment(self, compact):
+        # Posiciones cuyo nombre contiene al buscado: deben tener todos sus trigramas
+        postings = sorted((self._trigram_index.get(t, set()) for t in _trigrams(compact)), key=len)
+        candidates = set.intersection(*postings) if postings else set()
+        matches = [pos for pos in candidates if compact in self._compact[pos][1]]
+        # Posiciones cuyo nombre (de 3+ caracteres) está contenido en el buscado
+        for start in range(len(compact)):
+            for end in range(start + 3, len(compact) + 1):
+                matches.extend(self._compact_positions.get(compact[start:end], ()))
+        return min(matches) if matches else None
+
+    def find(self, nombre):
+        """Búsqueda jerárquica de clientes: exacta sin mayúsculas, compacta y por contención"""
+        entity_id = self.get('upper', nombre)
+        compact = normalize_name(nombre)
+        if entity_id is None and compact:
+            entity_id = self._maps['compact'].get(compact)
+        if entity_id is None and len(compact) >= 3:
+            pos = self._first_containment(compact)
+            if pos is not None:
+                entity_id = self._compact[pos][0]
+        return entity_id
+
+
+def load_entity_resolver(table, conn=None):
+    """Lee la tabla completa y devuelve su índice"""
+    id_col, name_col = ENTITY_TABLES[table]
+    close_conn = conn is None
+    if close_conn:
+        conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(f"SELECT {id_col}, {name_col} FROM {table} WHERE {name_col} IS NOT NULL ORDER BY {id_col}")
+        return EntityResolver(c.fetchall())
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def _shared_loader(table):
+    """Getter cacheado solo bajo su tabla: una escritura en clientes no descarta el índice de tecnicos"""
+    def load():
+        return load_entity_resolver(table)
+    # La caché arma la clave con __qualname__: uno distinto por tabla
+    load.__qualname__ = f"shared_entity_resolver.{table}"
+    return cached_query(table)(load)
+
+
+_SHARED_LOADERS = {table: _shared_loader(table) for table in ENTITY_TABLES}
+
+
+def shared_entity_resolver(table):
+    """Índice de la tabla compartido por el proceso (se descarta al escribir en la tabla)"""
+    return _SHARED_LOADERS[table]()
+
+
+def lookup_entity_id(table, nombre, kind='exact'):
+    """ID de una entidad existente por nombre usando el índice compartido.
+
+    Si no está (p.ej. se creó en otra réplica y la notificación aún no llegó), se
+    descarta el índice de esa tabla y se relee una vez, así las búsquedas
+    siguientes ya usan el índice actualizado.
+    """
+    entity_id = shared_entity_resolver(table).get(kind, nombre)
+    if entity_id is None:
+        invalidate_tables(table)
+        entity_id = shared_entity_resolver(table).get(kind, nombre)
+    return entity_id
@@ -0,0 +1,135 @@
+"""
+Lectura de planillas Excel por bloques con openpyxl en modo read-only.
+
+pd.read_excel arma el DataFrame completo (y con sheet_name=None, el de todas las
+hojas) antes de devolver nada. Aquí las filas se leen en streaming y se entregan
+en DataFrames de a lo sumo `chunk_size` filas, con los tipos que ya trae la celda
+(fechas, números, texto), de modo que las importaciones procesan e insertan un
+bloque por vez con memoria acotada.
+
+Los .xls (formato binario) no se pueden leer en streaming: se leen con pandas y
+se entregan igualmente por bloques.
+"""
+import unicodedata
+import zipfile
+from itertools import islice
+
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 5000
+
+
+def normalize_excel_column(col):
+    """Nombre de columna sin espacios extremos ni acentos ('Técnico ' -> 'Tecnico')"""
+    col = str(col).strip()
+    col = unicodedata.normalize('NFD', col)
+    return ''.join(char for char in col if unicodedata.category(char) != 'Mn')
+
+
+def _rewind(source):
+    if hasattr(source, 'seek'):
+        source.seek(0)
+
+
+def _open_workbook(source):
+    """Abre el libro en modo read-only, o devuelve None si no es un .xlsx"""
+    import openpyxl
+    from openpyxl.utils.exceptions import InvalidFileException
+
+    _rewind(source)
+    try:
+        return openpyxl.load_workbook(source, read_only=True, data_only=True)
+    except (InvalidFileException, zipfile.BadZipFile):
+        _rewind(source)
+        return None
+
+
+def excel_sheet_names(source):
+    """Nombres de las hojas sin leer su contenido"""
+    wb = _open_workbook(source)
+    if wb is None:
+        return pd.ExcelFile(source).sheet_names
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def _header_names(raw_header):
+    """Encabezados como los arma pandas: 'Unnamed: i' si faltan y sufijo .N si se repiten"""
+    names = []
+    seen = {}
+    for idx, value in enumerate(raw_header):
+        name = f"Unnamed: {idx}" if value is None or str(value).strip() == '' else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def iter_excel_chunks(source, sheet_name=None, chunk_size=DEFAULT_CHUNK_ROWS, normalize_columns=False, na_values=None):
+    """Genera DataFrames de hasta chunk_size filas de una hoja (la primera si no se indica).
+
+    La primera fila es el encabezado. Se omiten las filas completamente vacías.
+    normalize_columns aplica normalize_excel_column a los encabezados y na_values
+    indica textos que deben leerse como nulos (p.ej. ['NaT']).
+    """
+    na_values = set(na_values or ())
+    wb = _open_workbook(source)
+    if wb is None:
+        df = pd.read_excel(source, sheet_name=sheet_name or 0, na_values=list(na_values) or None)
+        if normalize_columns:
+            df.columns = [normalize_excel_column(c) for c in df.columns]
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size].reset_index(drop=True)
+        return
+
+    try:
+        ws = wb[sheet_name] if sheet_name is not None else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        raw_header = next(rows, None)
+        if raw_header is None:
+            return
+        # Como pandas: las celdas vacías al final del encabezado no son columnas
+        raw_header = list(raw_header)
+        while raw_header and (raw_header[-1] is None or str(raw_header[-1]).strip() == ''):
+            raw_header.pop()
+        columns = _header_names(raw_header)
+        if normalize_columns:
+            columns = [normalize_excel_column(c) for c in columns]
+        width = len(columns)
+
+        def clean_row(row):
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if na_values:
+                row = tuple(None if isinstance(v, str) and v in na_values else v for v in row)
+            return row
+
+        while True:
+            block = [clean_row(r) for r in islice(rows, chunk_size)]
+            if not block:
+                break
+            block = [r for r in block if any(v is not None for v in r)]
+            if block:
+                yield pd.DataFrame(block, columns=columns)
+    finally:
+        wb.close()
+
+
+def read_excel_sheet(source, sheet_name=None, max_rows=None, **kwargs):
+    """Lee una hoja completa (o sus primeras max_rows filas) usando el lector por bloques"""
+    chunk_size = min(max_rows, DEFAULT_CHUNK_ROWS) if max_rows else DEFAULT_CHUNK_ROWS
+    chunks = []
+    total = 0
+    for chunk in iter_excel_chunks(source, sheet_name, chunk_size=chunk_size, **kwargs):
+        chunks.append(chunk)
+        total += len(chunk)
+        if max_rows and total >= max_rows:
+            break
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    return df.head(max_rows) if max_rows else df
@@ -0,0 +1,101 @@
+"""
+Calendario de feriados en memoria.
+
+is_feriado() hacía una consulta por fecha, y los recorridos de días hábiles (alertas
+de carga pendiente, planificación semanal) la llamaban una vez por día y por
+usuario. HolidayCalendar carga una sola vez los feriados activos de un rango de
+años y responde en memoria, también sobre arrays de fechas (numpy.is_busday).
+
+get_holiday_calendar() queda en la caché de referencia hasta que se escribe en
+feriados (add/toggle/delete_feriado o el trigger de invalidación de otra réplica).
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .database import get_connection
+from .logging_utils import log_sql_error
+from .query_cache import cached_query
+
+
+def _to_day(d):
+    return pd.to_datetime(d).date()
+
+
+class HolidayCalendar:
+    """Feriados activos de los años start_year..end_year"""
+
+    def __init__(self, fechas=(), start_year=None, end_year=None):
+        self.feriados = frozenset(_to_day(f) for f in fechas)
+        years = [f.year for f in self.feriados]
+        self.start_year = start_year if start_year is not None else min(years, default=date.today().year)
+        self.end_year = end_year if end_year is not None else max(years, default=self.start_year)
+        self._holidays = np.array(sorted(self.feriados), dtype='datetime64[D]')
+
+    def covers(self, d):
+        """Indica si la fecha cae en los años cargados"""
+        return self.start_year <= _to_day(d).year <= self.end_year
+
+    def is_holiday(self, d):
+        return _to_day(d) in self.feriados
+
+    def is_business_day(self, dates):
+        """Lunes a viernes y no feriado; acepta una fecha o un array/Series/índice de fechas"""
+        if np.isscalar(dates) or isinstance(dates, (date, pd.Timestamp)):
+            d = _to_day(dates)
+            return d.weekday() < 5 and d not in self.feriados
+        days = pd.to_datetime(pd.Series(np.asarray(dates)), errors='coerce')
+        valid = days.notna().to_numpy()
+        result = np.zeros(len(days), dtype=bool)
+        if valid.any():
+            result[valid] = np.is_busday(days[valid].to_numpy().astype('datetime64[D]'), holidays=self._holidays)
+        return result
+
+    def business_days(self, start, end):
+        """Días hábiles entre start y end (ambos incluidos) como lista de date"""
+        start, end = _to_day(start), _to_day(end)
+        if end < start:
+            return []
+        days = np.arange(np.datetime64(start), np.datetime64(end + timedelta(days=1)), dtype='datetime64[D]')
+        return [d.item() for d in days[np.is_busday(days, holidays=self._holidays)]]
+
+
+def load_holiday_calendar(start_year, end_year=None, conn=None):
+    """Lee los feriados activos del rango de años"""
+    end_year = end_year if end_year is not None else start_year
+    close_conn = conn is None
+    if close_conn:
+        conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            "SELECT fecha FROM feriados WHERE activo IS TRUE AND fecha >= %s AND fecha < %s",
+            (date(int(start_year), 1, 1), date(int(end_year) + 1, 1, 1)),
+        )
+        return HolidayCalendar([row[0] for row in c.fetchall()], int(start_year), int(end_year))
+    finally:
+        if close_conn:
+            conn.close()
+
+
+@cached_query('feriados')
+def _cached_holiday_calendar(start_year, end_year):
+    return load_holiday_calendar(start_year, end_year)
+
+
+def get_holiday_calendar(start, end=None):
+    """Calendario compartido que cubre las fechas (o años) start..end.
+
+    Ante un error de lectura devuelve un calendario sin feriados (solo fines de
+    semana), igual que is_feriado() devolvía False, sin guardarlo en la caché.
+    """
+    start_year = start if isinstance(start, int) else _to_day(start).year
+    end = start if end is None else end
+    end_year = end if isinstance(end, int) else _to_day(end).year
+    end_year = max(start_year, end_year)
+    try:
+        return _cached_holiday_calendar(start_year, end_year)
+    except Exception as e:
+        log_sql_error(f"Error cargando feriados: {e}")
+        return HolidayCalendar((), start_year, end_year)
@@ -0,0 +1,146 @@
+"""
+Lectura del resumen mensual de horas (tabla registros_resumen_mensual).
+
+La tabla guarda horas y cantidad de registros por (mes, usuario, técnico, cliente,
+tipo, modalidad, grupo) y la mantienen los triggers de la migración 15 en cada
+INSERT/UPDATE/DELETE sobre registros, sea cual sea el camino de escritura. Los
+tableros que solo necesitan totales por mes o acumulados leen unos miles de filas
+de resumen en vez de recorrer todos los registros.
+
+El mes es el de la fecha tipada del registro (la misma que usan los filtros
+mensuales); los registros con fecha ilegible quedan con mes NULL y solo suman en
+'all_time'.
+"""
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from .config import SYSTEM_ROLES
+from .database import _month_bounds, get_connection, get_engine
+from .query_cache import cached_query
+from .schema_migrations import ROLLUP_KEY_COLUMNS, ROLLUP_TABLE, _rollup_delta_sql
+
+# Dimensión -> expresión SQL sobre el resumen (m) y sus tablas de nombres
+ROLLUP_DIMENSIONS = {
+    'mes': "m.mes",
+    'usuario_id': "m.usuario_id",
+    'tecnico': "t.nombre",
+    'cliente': "c.nombre",
+    'tipo_tarea': "tt.descripcion",
+    'modalidad': "mt.descripcion",
+    'grupo': "m.grupo",
+}
+
+
+def rollup_month_range(filter_type, custom_month=None, custom_year=None):
+    """(año, mes) del filtro de fecha de los tableros; None para 'all_time'"""
+    if filter_type == 'current_month':
+        return (datetime.now().year, datetime.now().month)
+    if filter_type == 'custom_month' and custom_month and custom_year:
+        return (int(custom_year), int(custom_month))
+    return None
+
+
+@cached_query('registros', 'roles', 'usuarios', 'tecnicos', 'clientes', 'tipos_tarea', 'modalidades_tarea')
+def get_hours_rollup(group_by=('tecnico', 'cliente', 'tipo_tarea', 'grupo'), filter_type='all_time',
+                     custom_month=None, custom_year=None, rol_id=None):
+    """
+    Horas y cantidad de registros agrupadas por las dimensiones de group_by.
+
+    filter_type es el de los tableros ('current_month', 'custom_month', 'all_time').
+    Con rol_id se limita a los usuarios del rol, salvo el rol admin que ve todo
+    (como get_registros_by_rol_with_date_filter). Columnas: group_by + horas, registros.
+    """
+    group_by = tuple(group_by)
+    unknown = [d for d in group_by if d not in ROLLUP_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Dimensiones de resumen desconocidas: {unknown}")
+
+    params = {}
+    filters = []
+    month_range = rollup_month_range(filter_type, custom_month, custom_year)
+    if month_range:
+        params.update(_month_bounds(*month_range))
+        filters.append("m.mes >= :month_start AND m.mes < :month_end")
+    if rol_id is not None:
+        params['rol_id'] = int(rol_id)
+        filters.append("""
+            (EXISTS (SELECT 1 FROM roles WHERE id_rol = :rol_id AND nombre = :admin_rol)
+             OR m.usuario_id IN (SELECT id FROM usuarios WHERE rol_id = :rol_id))
+        """)
+        params['admin_rol'] = SYSTEM_ROLES['ADMIN']
+
+    select = ", ".join(f"{ROLLUP_DIMENSIONS[d]} AS {d}" for d in group_by)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    group = f"GROUP BY {', '.join(str(i) for i in range(1, len(group_by) + 1))}" if group_by else ""
+    query = f"""
+        SELECT {select + ',' if select else ''}
+               SUM(m.horas)::float8 AS horas, SUM(m.registros)::bigint AS registros
+        FROM {ROLLUP_TABLE} m
+        LEFT JOIN tecnicos t ON m.id_tecnico = t.id_tecnico
+        LEFT JOIN clientes c ON m.id_cliente = c.id_cliente
+        LEFT JOIN tipos_tarea tt ON m.id_tipo = tt.id_tipo
+        LEFT JOIN modalidades_tarea mt ON m.id_modalidad = mt.id_modalidad
+        {where}
+        {group}
+        HAVING SUM(m.registros) > 0
+    """
+    df = pd.read_sql_query(text(query), con=get_engine(), params=params or None)
+    return df[list(group_by) + ['horas', 'registros']]
+
+
+def rebuild_hours_rollup(conn=None):
+    """
+    Recalcula el resumen completo desde registros (reparación; los triggers lo mantienen al día).
+
+    Con conn se ejecuta dentro de la transacción de quien llama, sin commit ni rollback.
+    """
+    close_conn = conn is None
+    if close_conn:
+        conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("LOCK TABLE registros IN SHARE MODE")
+        c.execute(f"TRUNCATE {ROLLUP_TABLE}")
+        c.execute(_rollup_delta_sql("registros", ""))
+        c.execute(f"SELECT COUNT(*) FROM {ROLLUP_TABLE}")
+        rows = c.fetchone()[0]
+        if close_conn:
+            conn.commit()
+        return rows
+    except Exception:
+        if close_conn:
+            conn.rollback()
+        raise
+    finally:
+        if close_conn:
+            conn.close()
+
+
+def check_hours_rollup(conn=None):
+    """Filas en las que el resumen difiere de un GROUP BY sobre registros (lista vacía si coinciden)"""
+    keys = ", ".join(ROLLUP_KEY_COLUMNS)
+    close_conn = conn is None
+    if close_conn:
+        conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(f"""
+            WITH esperado AS (
+                SELECT date_trunc('month', COALESCE(fecha_date, registro_fecha_to_date(fecha)))::date AS mes,
+                       usuario_id, id_tecnico, id_cliente, id_tipo, id_modalidad, grupo,
+                       SUM(tiempo) AS horas, COUNT(*)::int AS registros
+                FROM registros
+                GROUP BY {', '.join(str(i) for i in range(1, len(ROLLUP_KEY_COLUMNS) + 1))}
+            ), actual AS (
+                SELECT {keys}, horas, registros FROM {ROLLUP_TABLE}
+            )
+            (SELECT 'esperado', * FROM esperado EXCEPT SELECT 'esperado', * FROM actual)
+            UNION ALL
+            (SELECT 'resumen', * FROM actual EXCEPT SELECT 'resumen', * FROM esperado)
+        """)
+        return c.fetchall()
+    finally:
+        if close_conn:
+            conn.close()
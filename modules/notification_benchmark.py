@@ -0,0 +1,230 @@
+"""
+Benchmark del circuito de notificaciones contra el servidor SMTP local.
+
+    python -m modules.notification_benchmark --events 20 --recipients 50 [--concurrency 4]
+        [--smtp-delay-ms 5] [--smtp-connect-delay-ms 50] [--keep]
+
+Encola `events` eventos de un tipo propio del benchmark, cada uno con `recipients`
+destinatarios sintéticos, y los procesa con el mismo camino que el worker
+(_notification_run_event_queue) enviando a un SMTPSink en un puerto libre. Informa
+mensajes por segundo, consultas SQL por mensaje, sesiones SMTP y la latencia p50/p95
+de cada mensaje (render + envío).
+
+Solo toma los eventos que encola (los pendientes reales no se tocan) y al terminar
+borra sus filas de la cola y del log de envíos, salvo --keep. Usar contra una base de
+desarrollo: escribe en notification_event_queue y notification_delivery_log.
+"""
+import argparse
+import contextlib
+import time
+import uuid
+from datetime import datetime
+
+import psycopg2.extras
+
+from . import database as db
+from .db_pool import PooledConnection
+from .smtp_sink import SMTPSink
+
+BENCHMARK_EVENT_KEY = 'benchmark_notificaciones'
+
+
+class _CountingCursor:
+    """Envoltorio de cursor que cuenta execute/executemany (execute_values pasa por execute)"""
+
+    def __init__(self, cursor, counter):
+        self._cursor = cursor
+        self._counter = counter
+
+    def execute(self, *args, **kwargs):
+        self._counter.append(1)
+        return self._cursor.execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        self._counter.append(1)
+        return self._cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._cursor.__exit__(exc_type, exc, tb)
+
+
+@contextlib.contextmanager
+def count_queries():
+    """Cuenta las sentencias ejecutadas por conexiones del pool mientras dura el bloque"""
+    counter = []
+    original = PooledConnection.cursor
+
+    def cursor(self, *args, **kwargs):
+        return _CountingCursor(original(self, *args, **kwargs), counter)
+
+    PooledConnection.cursor = cursor
+    try:
+        yield counter
+    finally:
+        PooledConnection.cursor = original
+
+
+@contextlib.contextmanager
+def _patched(obj, name, value):
+    original = getattr(obj, name)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        setattr(obj, name, original)
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _seed_events(run_id, events):
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        psycopg2.extras.execute_values(
+            c,
+            "INSERT INTO notification_event_queue (event_key, dedupe_key, payload) VALUES %s",
+            [
+                (BENCHMARK_EVENT_KEY, f"benchmark:{run_id}:{i}", psycopg2.extras.Json({'run': run_id, 'n': i, 'detalle': 'Benchmark'}))
+                for i in range(events)
+            ],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _cleanup(run_id):
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute(
+            """
+            DELETE FROM notification_delivery_log
+            WHERE source_queue_id IN (SELECT id FROM notification_event_queue WHERE dedupe_key LIKE %s)
+            """,
+            (f"benchmark:{run_id}:%",)
+        )
+        c.execute("DELETE FROM notification_event_queue WHERE dedupe_key LIKE %s", (f"benchmark:{run_id}:%",))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_benchmark(events=20, recipients=50, concurrency=1, smtp_delay=0.0, smtp_connect_delay=0.0, keep=False):
+    """Ejecuta el benchmark y devuelve las métricas en un dict"""
+    if not db.ensure_schema():
+        raise RuntimeError("No se pudo preparar el esquema de la base de datos.")
+    run_id = uuid.uuid4().hex[:12]
+    fake_recipients = [
+        {
+            'user_id': None,
+            'email': f"destinatario{i}@benchmark.local",
+            'display_name': f"Destinatario {i}",
+            'dedupe_key': f"benchmark:{i}",
+        }
+        for i in range(recipients)
+    ]
+    original_recipients = db._notification_recipients_for_event
+    original_policy = db.get_notification_policy
+    original_deliver = db._notification_deliver
+    latencies = []
+
+    def recipients_for_event(conn, event_key, payload):
+        if event_key == BENCHMARK_EVENT_KEY:
+            return fake_recipients
+        return original_recipients(conn, event_key, payload)
+
+    def get_policy(event_key):
+        if event_key == BENCHMARK_EVENT_KEY:
+            return {'enabled': True, 'email_enabled': True, 'frequency': 'immediate', 'send_time': '00:00', 'weekday': 'monday'}
+        return original_policy(event_key)
+
+    def timed_deliver(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return original_deliver(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    with SMTPSink(delay=smtp_delay, connect_delay=smtp_connect_delay, keep_messages=False) as sink:
+        smtp_config = dict(db.SMTP_CONFIG)
+        db.SMTP_CONFIG.update(sink.smtp_config())
+        try:
+            _seed_events(run_id, events)
+            with _patched(db, '_notification_recipients_for_event', recipients_for_event), \
+                    _patched(db, 'get_notification_policy', get_policy), \
+                    _patched(db, '_notification_deliver', timed_deliver), \
+                    count_queries() as queries:
+                started = time.perf_counter()
+                results = db._notification_run_event_queue(
+                    datetime.now(), event_workers=concurrency, event_keys=[BENCHMARK_EVENT_KEY]
+                )
+                elapsed = time.perf_counter() - started
+        finally:
+            db.SMTP_CONFIG.clear()
+            db.SMTP_CONFIG.update(smtp_config)
+            if not keep:
+                _cleanup(run_id)
+        messages = sink.message_count
+        sessions = sink.session_count
+    return {
+        'run_id': run_id,
+        'events': events,
+        'recipients': recipients,
+        'concurrency': concurrency,
+        'results': results,
+        'messages': messages,
+        'smtp_sessions': sessions,
+        'elapsed_s': elapsed,
+        'messages_per_s': messages / elapsed if elapsed > 0 else 0.0,
+        'queries': len(queries),
+        'queries_per_message': len(queries) / messages if messages else float(len(queries)),
+        'latency_p50_ms': _percentile(latencies, 50) * 1000.0,
+        'latency_p95_ms': _percentile(latencies, 95) * 1000.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de envío de notificaciones contra un SMTP local")
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--recipients", type=int, default=50, help="Destinatarios por evento")
+    parser.add_argument("--concurrency", type=int, default=1, help="Hilos procesando la cola")
+    parser.add_argument("--smtp-delay-ms", type=float, default=0.0, help="Demora simulada por mensaje en el SMTP local")
+    parser.add_argument("--smtp-connect-delay-ms", type=float, default=0.0, help="Demora simulada por conexión SMTP")
+    parser.add_argument("--keep", action="store_true", help="No borrar los eventos y envíos generados")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(
+        events=args.events,
+        recipients=args.recipients,
+        concurrency=args.concurrency,
+        smtp_delay=args.smtp_delay_ms / 1000.0,
+        smtp_connect_delay=args.smtp_connect_delay_ms / 1000.0,
+        keep=args.keep,
+    )
+    print(f"Eventos: {report['events']} x {report['recipients']} destinatarios, concurrencia {report['concurrency']}")
+    print(f"Resultado: {report['results']}")
+    print(f"Mensajes recibidos: {report['messages']} en {report['smtp_sessions']} sesiones SMTP")
+    print(f"Tiempo: {report['elapsed_s']:.2f} s  ->  {report['messages_per_s']:.1f} mensajes/s")
+    print(f"Consultas SQL: {report['queries']} ({report['queries_per_message']:.2f} por mensaje)")
+    print(f"Latencia por mensaje: p50 {report['latency_p50_ms']:.1f} ms, p95 {report['latency_p95_ms']:.1f} ms")
+    return 0 if report['results']['errors'] == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+"""
+Worker de notificaciones por correo, separado del proceso de Streamlit.
+
+    python -m modules.notification_worker [--concurrency N] [--poll-interval SEG] [--once]
+
+Antes los envíos automáticos corrían dentro del render de la página de un usuario
+(cada 60 s por sesión) y el SMTP lento se sentía como una demora de la interfaz.
+Este proceso:
+
+- procesa la cola con `concurrency` hilos; cada uno reserva eventos con
+  SELECT ... FOR UPDATE SKIP LOCKED, así que también se pueden levantar varios
+  workers;
+- escucha NOTIFICATION_QUEUE_CHANNEL (el trigger de la migración 14 avisa en cada
+  encolado) para enviar los eventos inmediatos sin esperar al próximo ciclo;
+- cada `poll_interval` segundos hace igual una pasada, que cubre las políticas
+  diarias/semanales y el resumen de carga pendiente.
+
+La configuración (.env) se relee en cada pasada, de modo que los cambios de SMTP,
+políticas y plantillas hechos desde el panel de administración aplican sin reiniciar.
+"""
+import argparse
+import os
+import select
+import threading
+import time
+from datetime import datetime
+
+import psycopg2
+import psycopg2.extensions
+
+from .config import reload_env
+from .database import get_connect_kwargs, process_automatic_notifications, run_startup_maintenance
+from .logging_utils import log_app_error
+from .schema_migrations import NOTIFICATION_QUEUE_CHANNEL
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_POLL_INTERVAL = 60
+
+
+class NotificationWorker:
+    """Bucle de envío: una pasada por aviso de la cola o por poll_interval, lo que ocurra antes"""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, poll_interval=DEFAULT_POLL_INTERVAL, retry_seconds=5.0):
+        self.concurrency = max(1, int(concurrency))
+        self.poll_interval = max(1.0, float(poll_interval))
+        self.retry_seconds = retry_seconds
+        self._stop_event = threading.Event()
+        self._listen_conn = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run_once(self, now=None):
+        reload_env()
+        return process_automatic_notifications(now or datetime.now(), event_workers=self.concurrency)
+
+    def _connect_listener(self):
+        conn = psycopg2.connect(**get_connect_kwargs())
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        conn.cursor().execute(f"LISTEN {NOTIFICATION_QUEUE_CHANNEL}")
+        return conn
+
+    def _close_listener(self):
+        if self._listen_conn is not None:
+            try:
+                self._listen_conn.close()
+            except Exception:
+                pass
+        self._listen_conn = None
+
+    def _wait_for_work(self, timeout):
+        """Espera un aviso de la cola hasta timeout segundos; sin conexión de LISTEN, solo espera"""
+        deadline = time.monotonic() + timeout
+        while not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                if self._listen_conn is None:
+                    self._listen_conn = self._connect_listener()
+                if select.select([self._listen_conn], [], [], min(remaining, 1.0)) == ([], [], []):
+                    continue
+                self._listen_conn.poll()
+                if self._listen_conn.notifies:
+                    self._listen_conn.notifies.clear()
+                    return
+            except Exception as e:
+                log_app_error(f"LISTEN de notificaciones desconectado: {e}", module="notification_worker", function="_wait_for_work")
+                self._close_listener()
+                self._stop_event.wait(min(self.retry_seconds, max(0.0, deadline - time.monotonic())))
+
+    def run(self):
+        run_startup_maintenance()
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    # Escuchar antes de la pasada: un evento encolado durante ella despierta la siguiente
+                    if self._listen_conn is None:
+                        self._listen_conn = self._connect_listener()
+                except Exception as e:
+                    log_app_error(f"No se pudo escuchar la cola de notificaciones: {e}", module="notification_worker", function="run")
+                try:
+                    results = self.run_once()
+                except Exception as e:
+                    log_app_error(e, module="notification_worker", function="run")
+                    results = {}
+                if results.get('sent') or results.get('errors'):
+                    print(f"[{datetime.now():%Y-%m-%d %H:%M:%S}] notificaciones: {results}", flush=True)
+                # Si hubo eventos puede haber más en la cola: seguir sin esperar
+                if results.get('processed', 0) + results.get('discarded', 0) > 0:
+                    continue
+                self._wait_for_work(self.poll_interval)
+        finally:
+            self._close_listener()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker de notificaciones por correo de SIGO")
+    parser.add_argument(
+        "--concurrency", type=int,
+        default=int(os.getenv("NOTIFICATION_WORKER_CONCURRENCY", DEFAULT_CONCURRENCY)),
+        help="Hilos que procesan la cola de eventos en paralelo",
+    )
+    parser.add_argument(
+        "--poll-interval", type=float,
+        default=float(os.getenv("NOTIFICATION_WORKER_POLL_INTERVAL", DEFAULT_POLL_INTERVAL)),
+        help="Segundos máximos entre pasadas si no llegan avisos de la cola",
+    )
+    parser.add_argument("--once", action="store_true", help="Hacer una sola pasada y salir")
+    args = parser.parse_args(argv)
+
+    worker = NotificationWorker(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    if args.once:
+        run_startup_maintenance()
+        print(worker.run_once(), flush=True)
+        return 0
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        worker.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
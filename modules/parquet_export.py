@@ -0,0 +1,245 @@
+"""
+Exportación de registros a Parquet particionado por año y mes.
+
+    python -m modules.parquet_export [--dest DIR] [--full]
+
+Escribe un dataset con particiones estilo Hive que pandas, pyarrow, DuckDB o Spark
+leen directamente (pd.read_parquet(DIR)):
+
+    DIR/anio=2026/mes_numero=3/registros.parquet
+    DIR/anio=__HIVE_DEFAULT_PARTITION__/mes_numero=__HIVE_DEFAULT_PARTITION__/...  (fecha ilegible)
+
+Cada fila trae los nombres de técnico, cliente, tipo y modalidad. Los registros se
+leen con un cursor del servidor y se escriben por bloques, sin armar la partición
+entera en memoria.
+
+La exportación es incremental: _manifest.json guarda por partición la cantidad de
+registros, la suma de ids y el último updated_at, y solo se reescriben las
+particiones cuya huella cambió (altas, bajas o modificaciones) o todas si cambió
+algún nombre de los catálogos. Huellas y datos se leen en la misma transacción
+REPEATABLE READ, así que el manifiesto describe exactamente lo escrito.
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import zipfile
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .config import REGISTROS_EXPORT_DIR
+from .database import get_connection, registros_fecha_sql
+
+MANIFEST_NAME = "_manifest.json"
+PARTITION_FILE = "registros.parquet"
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+DEFAULT_BATCH_ROWS = 50000
+
+REGISTROS_PARQUET_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('fecha', pa.string()),
+    ('fecha_date', pa.date32()),
+    ('tecnico', pa.string()),
+    ('grupo', pa.string()),
+    ('cliente', pa.string()),
+    ('tipo_tarea', pa.string()),
+    ('modalidad', pa.string()),
+    ('tarea_realizada', pa.string()),
+    ('numero_ticket', pa.string()),
+    ('tiempo', pa.float64()),
+    ('es_hora_extra', pa.bool_()),
+    ('descripcion', pa.string()),
+    ('mes', pa.string()),
+    ('usuario_id', pa.int64()),
+    ('created_at', pa.timestamp('us')),
+    ('updated_at', pa.timestamp('us')),
+])
+
+_CATALOG_FINGERPRINT_SQL = """
+    SELECT md5(concat_ws('|',
+        (SELECT string_agg(id_tecnico || '=' || nombre, ',' ORDER BY id_tecnico) FROM tecnicos),
+        (SELECT string_agg(id_cliente || '=' || nombre, ',' ORDER BY id_cliente) FROM clientes),
+        (SELECT string_agg(id_tipo || '=' || descripcion, ',' ORDER BY id_tipo) FROM tipos_tarea),
+        (SELECT string_agg(id_modalidad || '=' || descripcion, ',' ORDER BY id_modalidad) FROM modalidades_tarea)
+    ))
+"""
+
+
+def partition_key(month_start):
+    """Clave del manifiesto: 'AAAA-MM', o 'sin_fecha' para la partición de fechas ilegibles"""
+    return month_start.strftime("%Y-%m") if month_start else "sin_fecha"
+
+
+def partition_path(dest_dir, month_start):
+    if month_start is None:
+        anio = mes = NULL_PARTITION
+    else:
+        anio, mes = month_start.year, month_start.month
+    return os.path.join(dest_dir, f"anio={anio}", f"mes_numero={mes}")
+
+
+def _partition_fingerprints(c, fecha_sql):
+    """{mes (date o None): huella} con la cantidad, suma de ids y último updated_at de cada mes"""
+    c.execute(f"""
+        SELECT date_trunc('month', {fecha_sql})::date, COUNT(*), SUM(r.id), MAX(r.updated_at)
+        FROM registros r
+        GROUP BY 1
+    """)
+    return {
+        month_start: {
+            'registros': count,
+            'suma_id': int(id_sum),
+            'max_updated_at': max_updated.isoformat() if max_updated else None,
+        }
+        for month_start, count, id_sum, max_updated in c.fetchall()
+    }
+
+
+def _write_partition(conn, fecha_sql, month_start, path, batch_rows):
+    """Escribe los registros de un mes en path (vía archivo temporal) y devuelve cuántos escribió"""
+    if month_start is None:
+        where, params = f"{fecha_sql} IS NULL", ()
+    else:
+        next_month = date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+        where, params = f"{fecha_sql} >= %s AND {fecha_sql} < %s", (month_start, next_month)
+
+    os.makedirs(path, exist_ok=True)
+    target = os.path.join(path, PARTITION_FILE)
+    # Con punto al inicio: los lectores de datasets ignoran el temporal si queda a medias
+    tmp = os.path.join(path, f".{PARTITION_FILE}.tmp")
+    written = 0
+    # Cursor con nombre = cursor del servidor: trae de a batch_rows filas
+    with conn.cursor(name="registros_parquet_export") as c:
+        c.itersize = batch_rows
+        c.execute(f"""
+            SELECT r.id, r.fecha, {fecha_sql}, t.nombre, r.grupo, c.nombre,
+                   tt.descripcion, mt.descripcion, r.tarea_realizada, r.numero_ticket::text,
+                   r.tiempo::float8, r.es_hora_extra, r.descripcion, r.mes, r.usuario_id,
+                   r.created_at, r.updated_at
+            FROM registros r
+            LEFT JOIN tecnicos t ON r.id_tecnico = t.id_tecnico
+            LEFT JOIN clientes c ON r.id_cliente = c.id_cliente
+            LEFT JOIN tipos_tarea tt ON r.id_tipo = tt.id_tipo
+            LEFT JOIN modalidades_tarea mt ON r.id_modalidad = mt.id_modalidad
+            WHERE {where}
+            ORDER BY r.id
+        """, params)
+        with pq.ParquetWriter(tmp, REGISTROS_PARQUET_SCHEMA, compression='zstd') as writer:
+            while True:
+                rows = c.fetchmany(batch_rows)
+                if not rows:
+                    break
+                columns = list(zip(*rows))
+                writer.write_batch(pa.record_batch(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, REGISTROS_PARQUET_SCHEMA)],
+                    schema=REGISTROS_PARQUET_SCHEMA,
+                ))
+                written += len(rows)
+    os.replace(tmp, target)
+    return written
+
+
+def _read_manifest(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(dest_dir, manifest):
+    target = os.path.join(dest_dir, MANIFEST_NAME)
+    with open(f"{target}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(f"{target}.tmp", target)
+
+
+def export_registros_parquet(dest_dir=None, full=False, batch_rows=DEFAULT_BATCH_ROWS):
+    """
+    Exporta registros a dest_dir (REGISTROS_EXPORT_DIR por defecto) reescribiendo
+    solo las particiones que cambiaron desde la exportación anterior (todas con full).
+
+    Devuelve un dict con 'escritas' y 'eliminadas' (claves 'AAAA-MM'), 'sin_cambios'
+    (cantidad de particiones) y 'registros' (filas escritas).
+    """
+    dest_dir = dest_dir or REGISTROS_EXPORT_DIR
+    os.makedirs(dest_dir, exist_ok=True)
+    previous = _read_manifest(dest_dir)
+    previous_partitions = {} if full else previous.get('particiones', {})
+    fecha_sql = registros_fecha_sql()
+
+    conn = get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        c.execute(_CATALOG_FINGERPRINT_SQL)
+        catalog = c.fetchone()[0]
+        fingerprints = _partition_fingerprints(c, fecha_sql)
+        if catalog != previous.get('catalogo'):
+            previous_partitions = {}
+
+        summary = {'escritas': [], 'eliminadas': [], 'sin_cambios': 0, 'registros': 0}
+        partitions = {}
+        for month_start, fingerprint in sorted(fingerprints.items(), key=lambda item: partition_key(item[0])):
+            key = partition_key(month_start)
+            partitions[key] = fingerprint
+            path = partition_path(dest_dir, month_start)
+            if previous_partitions.get(key) == fingerprint and os.path.exists(os.path.join(path, PARTITION_FILE)):
+                summary['sin_cambios'] += 1
+                continue
+            summary['registros'] += _write_partition(conn, fecha_sql, month_start, path, batch_rows)
+            summary['escritas'].append(key)
+    finally:
+        conn.rollback()
+        conn.close()
+
+    # Meses que ya no tienen registros
+    for key in sorted(set(previous.get('particiones', {})) - set(partitions)):
+        month_start = None if key == "sin_fecha" else date(int(key[:4]), int(key[5:7]), 1)
+        path = partition_path(dest_dir, month_start)
+        shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(path))  # la carpeta del año, si quedó vacía
+        except OSError:
+            pass
+        summary['eliminadas'].append(key)
+
+    _write_manifest(dest_dir, {'catalogo': catalog, 'particiones': partitions})
+    return summary
+
+
+def zip_parquet_export(dest_dir=None):
+    """Dataset exportado (particiones y manifiesto) en un .zip en memoria para descargar"""
+    dest_dir = dest_dir or REGISTROS_EXPORT_DIR
+    output = io.BytesIO()
+    # Parquet ya viene comprimido (zstd): se guarda sin volver a comprimir
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for root, _, files in os.walk(dest_dir):
+            for name in sorted(files):
+                if name.startswith('.'):
+                    continue
+                full_path = os.path.join(root, name)
+                zf.write(full_path, os.path.relpath(full_path, dest_dir))
+    output.seek(0)
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta registros a Parquet particionado por año/mes")
+    parser.add_argument("--dest", default=REGISTROS_EXPORT_DIR, help="carpeta del dataset")
+    parser.add_argument("--full", action="store_true", help="reescribir todas las particiones")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args(argv)
+
+    summary = export_registros_parquet(args.dest, full=args.full, batch_rows=args.batch_rows)
+    print(f"Particiones escritas: {len(summary['escritas'])} ({summary['registros']} registros), "
+          f"sin cambios: {summary['sin_cambios']}, eliminadas: {len(summary['eliminadas'])}")
+    print(f"Dataset: {os.path.abspath(args.dest)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+"""
+Caché en memoria de consultas a tablas de referencia, compartida por el proceso.
+
+Los getters decorados con @cached_query(tabla, ...) sirven el resultado desde
+memoria hasta que una escritura sobre alguna de esas tablas llama a
+invalidate_tables() (directamente o vía el decorador @invalidates). No hay TTL:
+una escritura hecha por este proceso es visible en la siguiente lectura.
+"""
+import functools
+import threading
+
+import pandas as pd
+
+
+class QueryCache:
+    """Resultados por (función, argumentos) agrupados por las tablas que leen"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}      # (nombre, args, kwargs) -> (scope, tablas, valor)
+        self._generations = {}  # tabla -> contador de invalidaciones
+        self._scope_provider = None
+        self._hits = 0
+        self._misses = 0
+
+    def set_scope_provider(self, provider):
+        """Función cuyo resultado identifica la base actual (p.ej. el pool); si cambia, se descarta la caché"""
+        self._scope_provider = provider
+
+    def _scope(self):
+        return self._scope_provider() if self._scope_provider else None
+
+    def _generation_locked(self, tables):
+        return tuple(self._generations.get(t, 0) for t in tables)
+
+    def cached(self, *tables):
+        """Decorador: cachea el resultado de un getter que lee las tablas indicadas"""
+        tables = tuple(sorted(tables))
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+                try:
+                    hash(key)
+                except TypeError:
+                    return func(*args, **kwargs)
+                scope = self._scope()
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[0] is scope:
+                        self._hits += 1
+                        return _copy(entry[2])
+                    self._misses += 1
+                    generation = self._generation_locked(tables)
+                value = func(*args, **kwargs)
+                # Un DataFrame sin columnas es el fallback de error de los getters: no se cachea
+                if not (isinstance(value, pd.DataFrame) and len(value.columns) == 0):
+                    with self._lock:
+                        # Si hubo una escritura mientras se consultaba, el resultado puede estar viejo
+                        if self._generation_locked(tables) == generation:
+                            self._entries[key] = (scope, tables, value)
+                return _copy(value)
+
+            wrapper.cache_tables = tables
+            return wrapper
+
+        return decorator
+
+    def invalidate(self, *tables):
+        """Descarta los resultados que dependen de alguna de las tablas"""
+        tables = set(tables)
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [k for k, (_, deps, _) in self._entries.items() if tables.intersection(deps)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            for table in list(self._generations):
+                self._generations[table] += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self._hits, 'misses': self._misses}
+
+
+def _copy(value):
+    # Los llamadores suelen modificar los DataFrames recibidos (columnas nuevas, fillna inplace)
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    return value
+
+
+REFERENCE_CACHE = QueryCache()
+
+
+def cached_query(*tables):
+    return REFERENCE_CACHE.cached(*tables)
+
+
+def invalidate_tables(*tables):
+    return REFERENCE_CACHE.invalidate(*tables)
+
+
+def invalidates(*tables):
+    """Decorador para funciones de escritura: invalida las tablas al terminar (con o sin error)"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REFERENCE_CACHE.invalidate(*tables)
+        return wrapper
+    return decorator
+
+
+def clear_query_cache():
+    REFERENCE_CACHE.clear()
@@ -0,0 +1,233 @@
+"""
+Paginación de registros en el servidor (keyset sobre id).
+
+Las tablas de registros cargaban el historial completo del departamento o del
+usuario en un DataFrame y lo mandaban entero al navegador. Aquí se trae una página
+por vez: WHERE r.id < :after_id ORDER BY r.id DESC LIMIT n usa la clave primaria,
+así que el costo no depende de cuántas páginas se avanzó (a diferencia de OFFSET) y
+borrar o insertar registros no corre los límites de las páginas ya vistas.
+
+Filtros (dict, todos opcionales):
+    rol_id          usuarios del rol (el rol admin ve todo)
+    usuario_id      registros del usuario
+    incluir_sin_asignar  con usuario_id: suma los registros sin usuario cuyo técnico
+                    se llama como el usuario (get_unassigned_records_for_user)
+    tecnico, cliente    nombre exacto
+    fecha_desde, fecha_hasta    rango inclusivo sobre la fecha tipada
+    sin_fecha_por_creacion  con el rango: los registros sin fecha legible se ubican por
+                    created_at (como el filtro 'custom_range' de get_registros_by_rol_with_date_filter)
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+import pandas as pd
+from sqlalchemy import text
+
+from .config import SYSTEM_ROLES
+from .database import get_engine, process_registros_df, registros_fecha_sql
+from .query_cache import cached_query
+from .schema_migrations import ROLLUP_TABLE
+
+DEFAULT_PAGE_SIZE = 50
+# Hasta cuántas filas se cuentan exacto; por encima se informa "más de COUNT_LIMIT"
+COUNT_LIMIT = 10000
+
+RegistrosPage = namedtuple('RegistrosPage', ['df', 'has_next', 'last_id'])
+
+_FILTER_KEYS = ('rol_id', 'usuario_id', 'incluir_sin_asignar', 'tecnico', 'cliente', 'fecha_desde', 'fecha_hasta',
+                'sin_fecha_por_creacion')
+
+
+def period_bounds(filter_type, custom_month=None, custom_year=None, start_date=None, end_date=None):
+    """(fecha_desde, fecha_hasta) inclusivas de los filtros de fecha de los tableros; (None, None) = todo"""
+    if filter_type == 'current_month':
+        today = date.today()
+        custom_year, custom_month = today.year, today.month
+        filter_type = 'custom_month'
+    if filter_type == 'custom_month' and custom_month and custom_year:
+        start = date(int(custom_year), int(custom_month), 1)
+        next_month = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+        return start, next_month - timedelta(days=1)
+    if filter_type == 'custom_range' and start_date and end_date:
+        return pd.to_datetime(start_date).date(), pd.to_datetime(end_date).date()
+    return None, None
+
+
+def _filter_sql(filters):
+    filters = dict(filters or {})
+    unknown = set(filters) - set(_FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Filtros de registros desconocidos: {sorted(unknown)}")
+    clauses = []
+    params = {}
+    fecha_sql = registros_fecha_sql()
+    if filters.get('sin_fecha_por_creacion'):
+        fecha_sql = f"COALESCE({fecha_sql}, r.created_at::date)"
+    if filters.get('rol_id') is not None:
+        params.update(rol_id=int(filters['rol_id']), admin_rol=SYSTEM_ROLES['ADMIN'])
+        clauses.append("""
+            (EXISTS (SELECT 1 FROM roles WHERE id_rol = :rol_id AND nombre = :admin_rol)
+             OR r.usuario_id IN (SELECT id FROM usuarios WHERE rol_id = :rol_id))
+        """)
+    if filters.get('usuario_id') is not None:
+        params['usuario_id'] = int(filters['usuario_id'])
+        if filters.get('incluir_sin_asignar'):
+            clauses.append("""
+                (r.usuario_id = :usuario_id
+                 OR (r.usuario_id IS NULL AND r.id_tecnico IN (
+                        SELECT t2.id_tecnico FROM tecnicos t2 JOIN usuarios u ON u.id = :usuario_id
+                        WHERE t2.nombre = u.nombre || ' ' || u.apellido)))
+            """)
+        else:
+            clauses.append("r.usuario_id = :usuario_id")
+    if filters.get('tecnico'):
+        params['tecnico'] = filters['tecnico']
+        clauses.append("t.nombre = :tecnico")
+    if filters.get('cliente'):
+        params['cliente'] = filters['cliente']
+        clauses.append("c.nombre = :cliente")
+    if filters.get('fecha_desde'):
+        params['fecha_desde'] = filters['fecha_desde']
+        clauses.append(f"{fecha_sql} >= :fecha_desde")
+    if filters.get('fecha_hasta'):
+        params['fecha_hasta'] = filters['fecha_hasta']
+        clauses.append(f"{fecha_sql} <= :fecha_hasta")
+    return clauses, params
+
+
+_FROM_SQL = """
+    FROM registros r
+    LEFT JOIN tecnicos t ON r.id_tecnico = t.id_tecnico
+    LEFT JOIN clientes c ON r.id_cliente = c.id_cliente
+    LEFT JOIN tipos_tarea tt ON r.id_tipo = tt.id_tipo
+    LEFT JOIN modalidades_tarea mt ON r.id_modalidad = mt.id_modalidad
+"""
+
+
+def fetch_registros_page(filters=None, after_id=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Página de registros con id < after_id (la primera si after_id es None), del más nuevo al más viejo.
+
+    Devuelve RegistrosPage(df, has_next, last_id); last_id es el after_id de la página
+    siguiente. df tiene las columnas de get_registros_by_rol_with_date_filter más usuario_id.
+    """
+    page_size = max(1, int(page_size))
+    clauses, params = _filter_sql(filters)
+    if after_id is not None:
+        params['after_id'] = int(after_id)
+        clauses.append("r.id < :after_id")
+    params['limit'] = page_size + 1
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT r.fecha, {registros_fecha_sql()} AS fecha_date, t.nombre as tecnico, r.grupo, c.nombre as cliente,
+               tt.descripcion as tipo_tarea, mt.descripcion as modalidad, r.tarea_realizada,
+               r.numero_ticket, r.tiempo, r.es_hora_extra, r.descripcion, r.mes, r.id,
+               r.created_at as "Fecha Creación", r.usuario_id
+        {_FROM_SQL}
+        {where}
+        ORDER BY r.id DESC
+        LIMIT :limit
+    """
+    df = pd.read_sql_query(text(query), con=get_engine(), params=params)
+    has_next = len(df) > page_size
+    df = df.iloc[:page_size]
+    last_id = int(df['id'].iloc[-1]) if not df.empty else None
+    return RegistrosPage(process_registros_df(df), has_next, last_id)
+
+
+def count_registros(filters=None, limit=COUNT_LIMIT):
+    """(cantidad, exacta): cuenta hasta limit filas; si hay más devuelve (limit, False)"""
+    clauses, params = _filter_sql(filters)
+    params['limit'] = int(limit) + 1
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"SELECT COUNT(*) FROM (SELECT 1 {_FROM_SQL} {where} LIMIT :limit) sub"
+    with get_engine().connect() as conn:
+        total = conn.execute(text(query), params).scalar()
+    if total > limit:
+        return int(limit), False
+    return int(total), True
+
+
+@cached_query('registros', 'roles', 'usuarios', 'tecnicos')
+def get_registros_tecnicos(rol_id=None, fecha_desde=None, fecha_hasta=None, incluir_sin_fecha=False):
+    """
+    Técnicos con registros en el rol y período, desde el resumen mensual (opciones de filtro).
+
+    incluir_sin_fecha suma los técnicos con registros de fecha ilegible (mes NULL en el
+    resumen), que el filtro sin_fecha_por_creacion puede ubicar en el rango.
+    """
+    clauses = []
+    params = {}
+    if rol_id is not None:
+        params.update(rol_id=int(rol_id), admin_rol=SYSTEM_ROLES['ADMIN'])
+        clauses.append("""
+            (EXISTS (SELECT 1 FROM roles WHERE id_rol = :rol_id AND nombre = :admin_rol)
+             OR m.usuario_id IN (SELECT id FROM usuarios WHERE rol_id = :rol_id))
+        """)
+    # El resumen es mensual: se toman los meses que tocan el rango
+    periodo = []
+    if fecha_desde:
+        params['mes_desde'] = pd.to_datetime(fecha_desde).date().replace(day=1)
+        periodo.append("m.mes >= :mes_desde")
+    if fecha_hasta:
+        params['mes_hasta'] = pd.to_datetime(fecha_hasta).date()
+        periodo.append("m.mes <= :mes_hasta")
+    if periodo:
+        periodo_sql = " AND ".join(periodo)
+        clauses.append(f"(({periodo_sql}) OR m.mes IS NULL)" if incluir_sin_fecha else periodo_sql)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT DISTINCT t.nombre
+        FROM {ROLLUP_TABLE} m
+        JOIN tecnicos t ON m.id_tecnico = t.id_tecnico
+        {where}
+        ORDER BY t.nombre
+    """
+    with get_engine().connect() as conn:
+        return [row[0] for row in conn.execute(text(query), params)]
+
+
+def render_registros_pager(key, filters, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Controles Anterior/Siguiente y la página actual de registros (DataFrame).
+
+    Guarda en session_state la pila de cursores de las páginas visitadas; si cambian
+    los filtros vuelve a la primera página.
+    """
+    import streamlit as st
+    from .utils import safe_rerun
+
+    state_key = f"registros_pager_{key}"
+    signature = tuple(sorted((k, str(v)) for k, v in (filters or {}).items()))
+    state = st.session_state.get(state_key)
+    if state is None or state['signature'] != signature:
+        state = {'signature': signature, 'cursors': [None]}
+        st.session_state[state_key] = state
+
+    page = fetch_registros_page(filters, after_id=state['cursors'][-1], page_size=page_size)
+    if page.df.empty and len(state['cursors']) > 1:
+        # La página quedó vacía (p. ej. se borraron sus registros): volver a la anterior
+        state['cursors'].pop()
+        page = fetch_registros_page(filters, after_id=state['cursors'][-1], page_size=page_size)
+    total, exact = count_registros(filters)
+
+    page_number = len(state['cursors'])
+    first = (page_number - 1) * page_size + 1
+    last = first + len(page.df) - 1
+    total_text = f"{total:,}".replace(",", ".") if exact else f"más de {total:,}".replace(",", ".")
+
+    col_prev, col_info, col_next = st.columns([1, 3, 1])
+    with col_prev:
+        if st.button("⬅️ Anterior", key=f"{state_key}_prev", disabled=page_number == 1, use_container_width=True):
+            state['cursors'].pop()
+            safe_rerun()
+    with col_info:
+        if page.df.empty:
+            st.caption("Sin registros para los filtros seleccionados")
+        else:
+            st.caption(f"Página {page_number} · registros {first}–{last} de {total_text}")
+    with col_next:
+        if st.button("Siguiente ➡️", key=f"{state_key}_next", disabled=not page.has_next, use_container_width=True):
+            state['cursors'].append(page.last_id)
+            safe_rerun()
+    return page.df
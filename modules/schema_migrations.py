@@ -0,0 +1,993 @@
+"""
+Migraciones versionadas del esquema de base de datos.
+
+Cada migración es un paso idempotente que se aplica una única vez y queda
+registrado en la tabla schema_version. Los pasos iniciales reúnen el DDL que
+antes ejecutaban init_db() y las funciones ensure_* en cada rerun.
+
+Para agregar un cambio de esquema, añadir una nueva función al final de
+MIGRATIONS con el siguiente número de versión (nunca modificar una ya aplicada).
+"""
+from .config import SYSTEM_ROLES
+
+# Clave del advisory lock que serializa migraciones entre réplicas
+MIGRATIONS_LOCK_KEY = 874222
+
+
+def _try_execute(c, sql, params=None):
+    """Ejecuta una sentencia tolerando errores sin abortar la transacción de la migración"""
+    c.execute("SAVEPOINT migration_step")
+    try:
+        c.execute(sql, params)
+    except Exception:
+        c.execute("ROLLBACK TO SAVEPOINT migration_step")
+        return False
+    c.execute("RELEASE SAVEPOINT migration_step")
+    return True
+
+
+def _migration_base_schema(c):
+    """Tablas núcleo y datos semilla (antes en init_db)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id SERIAL PRIMARY KEY,
+            username VARCHAR(50) UNIQUE NOT NULL,
+            password_hash VARCHAR(255) NOT NULL,
+            nombre VARCHAR(100),
+            apellido VARCHAR(100),
+            email VARCHAR(100),
+            is_admin BOOLEAN DEFAULT FALSE,
+            is_active BOOLEAN DEFAULT TRUE,
+            is_2fa_enabled BOOLEAN DEFAULT FALSE,
+            rol_id INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Secreto TOTP y bloqueo por intentos fallidos
+    c.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS totp_secret VARCHAR(255)")
+    c.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS failed_attempts INTEGER DEFAULT 0")
+    c.execute("ALTER TABLE usuarios ADD COLUMN IF NOT EXISTS lockout_until TIMESTAMP NULL")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS roles (
+            id_rol SERIAL PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL UNIQUE,
+            descripcion TEXT,
+            is_hidden BOOLEAN DEFAULT FALSE,
+            view_type VARCHAR(50),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute("ALTER TABLE roles ADD COLUMN IF NOT EXISTS is_hidden BOOLEAN DEFAULT FALSE")
+    c.execute("ALTER TABLE roles ADD COLUMN IF NOT EXISTS view_type VARCHAR(64)")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS grupos (
+            id_grupo SERIAL PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL UNIQUE,
+            descripcion TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS grupos_roles (
+            id SERIAL PRIMARY KEY,
+            id_grupo INTEGER NOT NULL,
+            id_rol INTEGER NOT NULL,
+            FOREIGN KEY (id_grupo) REFERENCES grupos (id_grupo),
+            FOREIGN KEY (id_rol) REFERENCES roles (id_rol),
+            UNIQUE(id_grupo, id_rol)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS grupos_puntajes (
+            id SERIAL PRIMARY KEY,
+            id_grupo INTEGER NOT NULL,
+            puntaje INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (id_grupo) REFERENCES grupos (id_grupo),
+            UNIQUE(id_grupo)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tipos_tarea_puntajes (
+            id SERIAL PRIMARY KEY,
+            id_tipo INTEGER NOT NULL,
+            puntaje INTEGER NOT NULL DEFAULT 0,
+            UNIQUE(id_tipo)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tecnicos (
+            id_tecnico SERIAL PRIMARY KEY,
+            nombre VARCHAR(200) NOT NULL,
+            apellido VARCHAR(100),
+            email VARCHAR(100),
+            telefono VARCHAR(20),
+            activo BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS clientes (
+            id_cliente SERIAL PRIMARY KEY,
+            nombre VARCHAR(200) NOT NULL UNIQUE,
+            alias VARCHAR(200),
+            direccion VARCHAR(300),
+            telefono VARCHAR(20),
+            email VARCHAR(100),
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Solicitudes de nuevos clientes (aprobación por admin)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS cliente_solicitudes (
+            id SERIAL PRIMARY KEY,
+            nombre VARCHAR(200) NOT NULL,
+            organizacion VARCHAR(300),
+            telefono VARCHAR(20),
+            requested_by INTEGER NOT NULL REFERENCES usuarios(id),
+            estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS clientes_puntajes (
+            id SERIAL PRIMARY KEY,
+            id_cliente INTEGER NOT NULL,
+            puntaje INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (id_cliente) REFERENCES clientes (id_cliente),
+            UNIQUE(id_cliente)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tipos_tarea (
+            id_tipo SERIAL PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL UNIQUE,
+            hidden BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute("ALTER TABLE tipos_tarea ADD COLUMN IF NOT EXISTS hidden BOOLEAN DEFAULT FALSE")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS vacaciones (
+            id SERIAL PRIMARY KEY,
+            usuario_id INTEGER NOT NULL REFERENCES usuarios(id),
+            fecha_inicio DATE NOT NULL,
+            fecha_fin DATE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS modalidades_tarea (
+            id_modalidad SERIAL PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute("ALTER TABLE modalidades_tarea ADD COLUMN IF NOT EXISTS is_hidden BOOLEAN DEFAULT FALSE")
+
+    # Modalidades requeridas y modalidad/tipo Vacaciones (ocultos)
+    for nombre in ["Cliente", "Presencial", "Remoto", "Feriado", "Base en Casa"]:
+        c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = %s", (nombre,))
+        if not c.fetchone():
+            c.execute("INSERT INTO modalidades_tarea (descripcion) VALUES (%s)", (nombre,))
+    c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = 'Vacaciones'")
+    if not c.fetchone():
+        c.execute("INSERT INTO modalidades_tarea (descripcion, is_hidden) VALUES ('Vacaciones', TRUE)")
+    else:
+        c.execute("UPDATE modalidades_tarea SET is_hidden = TRUE WHERE descripcion = 'Vacaciones'")
+    c.execute("SELECT id_tipo FROM tipos_tarea WHERE descripcion = 'Vacaciones'")
+    if not c.fetchone():
+        c.execute("INSERT INTO tipos_tarea (descripcion, hidden) VALUES ('Vacaciones', TRUE)")
+    else:
+        c.execute("UPDATE tipos_tarea SET hidden = TRUE WHERE descripcion = 'Vacaciones'")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS tipos_tarea_roles (
+            id SERIAL PRIMARY KEY,
+            id_tipo INTEGER NOT NULL,
+            id_rol INTEGER NOT NULL,
+            FOREIGN KEY (id_tipo) REFERENCES tipos_tarea (id_tipo),
+            FOREIGN KEY (id_rol) REFERENCES roles (id_rol),
+            UNIQUE(id_tipo, id_rol)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS registros (
+            id SERIAL PRIMARY KEY,
+            fecha VARCHAR(20) NOT NULL,
+            id_tecnico INTEGER NOT NULL,
+            id_cliente INTEGER NOT NULL,
+            id_tipo INTEGER NOT NULL,
+            id_modalidad INTEGER NOT NULL,
+            tarea_realizada TEXT NOT NULL,
+            numero_ticket VARCHAR(50) NOT NULL,
+            tiempo INTEGER NOT NULL,
+            descripcion TEXT,
+            mes VARCHAR(20) NOT NULL,
+            usuario_id INTEGER,
+            grupo VARCHAR(100),
+            es_hora_extra BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (id_tecnico) REFERENCES tecnicos (id_tecnico),
+            FOREIGN KEY (id_cliente) REFERENCES clientes (id_cliente),
+            FOREIGN KEY (id_tipo) REFERENCES tipos_tarea (id_tipo),
+            FOREIGN KEY (id_modalidad) REFERENCES modalidades_tarea (id_modalidad),
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+    ''')
+    c.execute("ALTER TABLE registros ADD COLUMN IF NOT EXISTS es_hora_extra BOOLEAN DEFAULT FALSE")
+    # Tipo decimal para 'tiempo'
+    c.execute("""
+        SELECT data_type
+        FROM information_schema.columns
+        WHERE table_name = 'registros' AND column_name = 'tiempo'
+    """)
+    row = c.fetchone()
+    if row and row[0] == 'integer':
+        c.execute("ALTER TABLE registros ALTER COLUMN tiempo TYPE NUMERIC(6,2) USING tiempo::numeric")
+
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS nomina (
+            id SERIAL PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            apellido VARCHAR(100),
+            email VARCHAR(100),
+            documento VARCHAR(50),
+            cargo VARCHAR(150),
+            departamento VARCHAR(100),
+            fecha_ingreso DATE,
+            fecha_nacimiento DATE,
+            activo BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Versiones anteriores definían documento como UNIQUE
+    c.execute("ALTER TABLE nomina DROP CONSTRAINT IF EXISTS nomina_documento_key")
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS actividades_usuarios (
+            id SERIAL PRIMARY KEY,
+            usuario_id INTEGER,
+            username VARCHAR(50),
+            tipo_actividad VARCHAR(50) NOT NULL,
+            descripcion TEXT,
+            fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS recovery_codes (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER,
+            code VARCHAR(100),
+            used INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES usuarios (id)
+        )
+    ''')
+
+    # Foreign keys diferidas (pueden existir de instalaciones previas)
+    _try_execute(c, '''
+        ALTER TABLE usuarios
+        ADD CONSTRAINT fk_usuarios_rol
+        FOREIGN KEY (rol_id) REFERENCES roles (id_rol)
+    ''')
+    _try_execute(c, '''
+        ALTER TABLE tipos_tarea_puntajes
+        ADD CONSTRAINT fk_tipos_tarea_puntajes_tipo
+        FOREIGN KEY (id_tipo) REFERENCES tipos_tarea (id_tipo)
+    ''')
+
+    # Roles del sistema (comparando nombres normalizados)
+    from .utils import clean_role_name
+    c.execute('SELECT nombre FROM roles')
+    existing_clean = {clean_role_name(r[0]) for r in c.fetchall()}
+    view_types = {'ADMIN': 'administrador', 'ADM_COMERCIAL': 'admin_comercial', 'DPTO_COMERCIAL': 'comercial'}
+    for role_key, role_desc in SYSTEM_ROLES.items():
+        target_clean = clean_role_name(role_desc)
+        if target_clean in existing_clean:
+            continue
+        is_hidden = role_key in ['SIN_ROL', 'HIPERVISOR']
+        c.execute(
+            'INSERT INTO roles (nombre, descripcion, is_hidden, view_type) VALUES (%s, %s, %s, %s)',
+            (role_desc, f'Rol del sistema: {role_desc}', is_hidden, view_types.get(role_key)),
+        )
+        existing_clean.add(target_clean)
+
+
+def _migration_projects_schema(c):
+    """Marcas, contactos, proyectos y tablas asociadas (antes en ensure_projects_schema)"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS marcas (
+            id_marca SERIAL PRIMARY KEY,
+            nombre VARCHAR(100) UNIQUE NOT NULL
+        )
+    ''')
+    for ddl in [
+        "ALTER TABLE marcas ADD COLUMN IF NOT EXISTS activa BOOLEAN DEFAULT TRUE",
+        "ALTER TABLE marcas ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)",
+        "ALTER TABLE marcas ADD COLUMN IF NOT EXISTS email VARCHAR(200)",
+        "ALTER TABLE marcas ADD COLUMN IF NOT EXISTS telefono VARCHAR(100)",
+        "ALTER TABLE marcas ALTER COLUMN telefono TYPE VARCHAR(100)",
+        "ALTER TABLE marcas ADD COLUMN IF NOT EXISTS celular VARCHAR(50)",
+        "ALTER TABLE marcas ALTER COLUMN celular TYPE VARCHAR(50)",
+        "ALTER TABLE marcas ADD COLUMN IF NOT EXISTS web VARCHAR(300)",
+    ]:
+        _try_execute(c, ddl)
+
+    # Contactos (asociables a clientes o marcas)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS contactos (
+            id_contacto SERIAL PRIMARY KEY,
+            nombre VARCHAR(100) NOT NULL,
+            apellido VARCHAR(100),
+            puesto VARCHAR(100),
+            telefono VARCHAR(50),
+            email VARCHAR(200),
+            direccion VARCHAR(300),
+            notes TEXT,
+            etiqueta_tipo VARCHAR(20) NOT NULL CHECK (etiqueta_tipo IN ('cliente','marca')),
+            etiqueta_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS proyectos (
+            id SERIAL PRIMARY KEY,
+            owner_user_id INTEGER NOT NULL REFERENCES usuarios(id),
+            cliente_id INTEGER NULL REFERENCES clientes(id_cliente),
+            titulo VARCHAR(200) NOT NULL,
+            descripcion TEXT,
+            estado VARCHAR(20) NOT NULL DEFAULT 'Prospecto',
+            valor INTEGER NULL,
+            moneda VARCHAR(10),
+            etiqueta VARCHAR(100),
+            probabilidad INTEGER,
+            embudo VARCHAR(200),
+            marca_id INTEGER NULL REFERENCES marcas(id_marca),
+            fecha_cierre DATE,
+            trato_id BIGINT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS proyecto_compartidos (
+            proyecto_id INTEGER NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+            user_id INTEGER NOT NULL REFERENCES usuarios(id),
+            shared_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (proyecto_id, user_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS proyecto_documentos (
+            id SERIAL PRIMARY KEY,
+            proyecto_id INTEGER NOT NULL REFERENCES proyectos(id) ON DELETE CASCADE,
+            filename VARCHAR(255) NOT NULL,
+            file_path TEXT NOT NULL,
+            mime_type VARCHAR(100),
+            file_size INTEGER,
+            uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    for ddl in [
+        "ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_estado_check",
+        "ALTER TABLE proyectos ADD CONSTRAINT proyectos_estado_check CHECK (estado IN ('Prospecto','Presupuestado','Negociación','Objeción','Ganado','Perdido','Abierto','En Progreso'))",
+        "ALTER TABLE proyectos ALTER COLUMN estado SET DEFAULT 'Prospecto'",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS valor BIGINT",
+        # BIGINT para evitar overflow
+        "ALTER TABLE proyectos ALTER COLUMN valor TYPE BIGINT USING valor::bigint",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS moneda VARCHAR(10)",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS etiqueta VARCHAR(100)",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS probabilidad INTEGER",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS tipo_venta VARCHAR(40)",
+        "ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_tipo_venta_check",
+        "ALTER TABLE proyectos ADD CONSTRAINT proyectos_tipo_venta_check CHECK (tipo_venta IS NULL OR tipo_venta IN ('Venta de equipo','Licencia','Soporte y mantenimiento','Servicios','Contratos'))",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS embudo VARCHAR(200)",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS fecha_cierre DATE",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS trato_id BIGINT",
+        "ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_trato_id_unique",
+        "ALTER TABLE proyectos ADD CONSTRAINT proyectos_trato_id_unique UNIQUE (trato_id)",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS marca_id INTEGER",
+        "ALTER TABLE proyectos ADD COLUMN IF NOT EXISTS contacto_id INTEGER",
+        "ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_marca_fk",
+        "ALTER TABLE proyectos ADD CONSTRAINT proyectos_marca_fk FOREIGN KEY (marca_id) REFERENCES marcas(id_marca) ON DELETE SET NULL",
+        "ALTER TABLE proyectos DROP CONSTRAINT IF EXISTS proyectos_contacto_fk",
+        "ALTER TABLE proyectos ADD CONSTRAINT proyectos_contacto_fk FOREIGN KEY (contacto_id) REFERENCES contactos(id_contacto) ON DELETE SET NULL",
+        "ALTER TABLE proyectos ALTER COLUMN owner_user_id DROP NOT NULL",
+    ]:
+        _try_execute(c, ddl)
+
+
+def _migration_clientes_columns(c):
+    """Columnas extendidas de clientes, contactos y cliente_solicitudes"""
+    for ddl in [
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS alias VARCHAR(200)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS celular VARCHAR(20)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS web VARCHAR(300)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS organizacion VARCHAR(300)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS email VARCHAR(100)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS telefono VARCHAR(50)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS direccion VARCHAR(300)",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS activo BOOLEAN DEFAULT TRUE",
+        "ALTER TABLE clientes ADD COLUMN IF NOT EXISTS notes TEXT",
+        "ALTER TABLE clientes ALTER COLUMN celular TYPE VARCHAR(30)",
+        "ALTER TABLE contactos ADD COLUMN IF NOT EXISTS celular VARCHAR(50)",
+        "ALTER TABLE contactos ADD COLUMN IF NOT EXISTS notes TEXT",
+        "ALTER TABLE contactos ADD COLUMN IF NOT EXISTS direccion VARCHAR(300)",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS email VARCHAR(100)",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS cuit VARCHAR(32)",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS celular VARCHAR(50)",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS web VARCHAR(300)",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS tipo VARCHAR(50)",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS temp_cliente_id INTEGER",
+        "ALTER TABLE cliente_solicitudes ADD COLUMN IF NOT EXISTS notes TEXT",
+        "ALTER TABLE cliente_solicitudes ALTER COLUMN telefono TYPE VARCHAR(50)",
+        "ALTER TABLE cliente_solicitudes ALTER COLUMN celular TYPE VARCHAR(50)",
+    ]:
+        _try_execute(c, ddl)
+
+
+def _migration_feriados(c):
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS feriados (
+            id SERIAL PRIMARY KEY,
+            fecha DATE NOT NULL UNIQUE,
+            nombre VARCHAR(200) NOT NULL,
+            tipo VARCHAR(20),
+            activo BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _migration_notifications(c):
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS notification_event_queue (
+            id SERIAL PRIMARY KEY,
+            event_key VARCHAR(100) NOT NULL,
+            dedupe_key VARCHAR(255) UNIQUE,
+            payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            last_error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            processed_at TIMESTAMP
+        )
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notification_event_queue_status_created
+        ON notification_event_queue (status, created_at)
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS notification_delivery_log (
+            id SERIAL PRIMARY KEY,
+            event_key VARCHAR(100) NOT NULL,
+            frequency VARCHAR(20) NOT NULL,
+            recipient_user_id INTEGER NULL REFERENCES usuarios(id) ON DELETE SET NULL,
+            recipient_email VARCHAR(200) NOT NULL,
+            dedupe_key VARCHAR(255) NOT NULL UNIQUE,
+            source_queue_id INTEGER NULL REFERENCES notification_event_queue(id) ON DELETE SET NULL,
+            subject TEXT NOT NULL,
+            body TEXT NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notification_delivery_log_event_created
+        ON notification_delivery_log (event_key, created_at)
+    """)
+
+
+def _migration_schedules(c):
+    """Planificación semanal y cronograma por defecto de modalidades"""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS user_modalidad_schedule (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            rol_id INTEGER NOT NULL,
+            fecha DATE NOT NULL,
+            modalidad_id INTEGER NOT NULL,
+            cliente_id INTEGER NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, fecha),
+            FOREIGN KEY (user_id) REFERENCES usuarios (id),
+            FOREIGN KEY (rol_id) REFERENCES roles (id_rol),
+            FOREIGN KEY (modalidad_id) REFERENCES modalidades_tarea (id_modalidad)
+        )
+    ''')
+    c.execute("ALTER TABLE user_modalidad_schedule ADD COLUMN IF NOT EXISTS cliente_id INTEGER NULL")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS user_default_schedule (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            day_of_week INTEGER NOT NULL,  -- 0=Lunes ... 4=Viernes
+            modalidad_id INTEGER NOT NULL,
+            cliente_id INTEGER NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, day_of_week),
+            FOREIGN KEY (user_id) REFERENCES usuarios (id),
+            FOREIGN KEY (modalidad_id) REFERENCES modalidades_tarea (id_modalidad)
+        )
+    """)
+    c.execute("ALTER TABLE user_default_schedule ADD COLUMN IF NOT EXISTS cliente_id INTEGER NULL")
+
+
+def _migration_vacaciones_tipo(c):
+    c.execute("ALTER TABLE vacaciones ADD COLUMN IF NOT EXISTS tipo VARCHAR(50) DEFAULT 'vacaciones'")
+
+
+def _migration_favoritos(c):
+    """Favoritos y recientes de contactos/clientes por usuario"""
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS contactos_favoritos (
+            user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+            contacto_id INTEGER NOT NULL REFERENCES contactos(id_contacto) ON DELETE CASCADE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, contacto_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS contactos_recientes (
+            user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+            contacto_id INTEGER NOT NULL REFERENCES contactos(id_contacto) ON DELETE CASCADE,
+            accessed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, contacto_id)
+        )
+    """)
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS clientes_favoritos (
+            user_id INTEGER NOT NULL REFERENCES usuarios(id) ON DELETE CASCADE,
+            cliente_id INTEGER NOT NULL REFERENCES clientes(id_cliente) ON DELETE CASCADE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, cliente_id)
+        )
+    """)
+
+
+def _migration_registros_fecha_date(c):
+    """Columna DATE tipada para registros.fecha, mantenida por trigger en cada escritura.
+
+    registros.fecha sigue siendo VARCHAR ('DD/MM/YY' y variantes) por compatibilidad;
+    fecha_date se completa para filas existentes con backfill_registros_fecha_date().
+    """
+    c.execute("ALTER TABLE registros ADD COLUMN IF NOT EXISTS fecha_date DATE")
+    c.execute(r"""
+        CREATE OR REPLACE FUNCTION registro_fecha_to_date(valor TEXT) RETURNS DATE AS $$
+        DECLARE
+            v TEXT := btrim(valor);
+        BEGIN
+            IF v ~ '^\d{4}-\d{1,2}-\d{1,2}' THEN
+                RETURN to_date(split_part(v, ' ', 1), 'YYYY-MM-DD');
+            ELSIF v ~ '^\d{1,2}/\d{1,2}/\d{4}$' THEN
+                RETURN to_date(v, 'DD/MM/YYYY');
+            ELSIF v ~ '^\d{1,2}/\d{1,2}/\d{2}$' THEN
+                RETURN to_date(v, 'DD/MM/YY');
+            END IF;
+            RETURN NULL;
+        EXCEPTION WHEN OTHERS THEN
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql IMMUTABLE
+    """)
+    c.execute("""
+        CREATE OR REPLACE FUNCTION registros_set_fecha_date() RETURNS trigger AS $$
+        BEGIN
+            NEW.fecha_date := registro_fecha_to_date(NEW.fecha);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute("DROP TRIGGER IF EXISTS trg_registros_fecha_date ON registros")
+    c.execute("""
+        CREATE TRIGGER trg_registros_fecha_date
+        BEFORE INSERT OR UPDATE OF fecha ON registros
+        FOR EACH ROW EXECUTE PROCEDURE registros_set_fecha_date()
+    """)
+
+
+# Índices secundarios gestionados por el esquema: (nombre, tabla, definición)
+MANAGED_INDEXES = [
+    ("idx_registros_usuario_id", "registros", "(usuario_id)"),
+    ("idx_registros_tecnico_fecha_date", "registros", "(id_tecnico, fecha_date)"),
+    # Sondeo de duplicados (importación Excel y check_record_duplicate); tarea_realizada
+    # queda fuera por el límite de tamaño de B-tree y se filtra sobre las filas del índice
+    ("idx_registros_duplicados", "registros",
+     "(id_tecnico, fecha, id_cliente, id_tipo, id_modalidad, tiempo, es_hora_extra)"),
+    ("idx_registros_created_at", "registros", "(created_at)"),
+    ("idx_registros_fecha_date", "registros", "(fecha_date)"),
+    ("idx_user_modalidad_schedule_rol_fecha", "user_modalidad_schedule", "(rol_id, fecha)"),
+]
+
+
+def _migration_managed_indexes(c):
+    """Índices para las consultas frecuentes sobre registros y planificación"""
+    for name, table, definition in MANAGED_INDEXES:
+        c.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}")
+    c.execute("ANALYZE registros")
+    c.execute("ANALYZE user_modalidad_schedule")
+
+
+# Canal de NOTIFY con invalidaciones de caché entre réplicas (ver cache_invalidation.py)
+CACHE_INVALIDATION_CHANNEL = "sigo_cache_invalidation"
+
+# Tablas que publican invalidaciones por fila con la clave que identifica la entrada de caché
+CACHE_KEYED_TABLES = {
+    "registros": "usuario_id",
+    "clientes": "id_cliente",
+    "user_modalidad_schedule": "rol_id",
+    "user_default_schedule": "user_id",
+    "proyectos": "id",
+}
+# Tablas de referencia: una invalidación por sentencia para toda la tabla
+CACHE_TABLE_LEVEL_TABLES = [
+    "roles", "modalidades_tarea", "tipos_tarea", "tipos_tarea_roles", "tipos_tarea_puntajes",
+    "marcas", "grupos", "grupos_roles", "grupos_puntajes", "clientes_puntajes",
+]
+
+
+def _migration_cache_invalidation_triggers(c):
+    """Triggers que publican {table, key} en el canal de invalidación de caché"""
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_cache_invalidation() RETURNS trigger AS $$
+        DECLARE
+            key_col TEXT := TG_ARGV[0];
+            new_key TEXT;
+            old_key TEXT;
+        BEGIN
+            IF key_col IS NULL OR TG_LEVEL = 'STATEMENT' THEN
+                PERFORM pg_notify('{CACHE_INVALIDATION_CHANNEL}', json_build_object('table', TG_TABLE_NAME)::text);
+                RETURN NULL;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_key := to_jsonb(NEW) ->> key_col;
+                IF new_key IS NOT NULL THEN
+                    PERFORM pg_notify('{CACHE_INVALIDATION_CHANNEL}',
+                                      json_build_object('table', TG_TABLE_NAME, 'key', new_key)::text);
+                END IF;
+            END IF;
+            IF TG_OP <> 'INSERT' THEN
+                old_key := to_jsonb(OLD) ->> key_col;
+                IF old_key IS NOT NULL AND old_key IS DISTINCT FROM new_key THEN
+                    PERFORM pg_notify('{CACHE_INVALIDATION_CHANNEL}',
+                                      json_build_object('table', TG_TABLE_NAME, 'key', old_key)::text);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table, key_col in CACHE_KEYED_TABLES.items():
+        c.execute(f"DROP TRIGGER IF EXISTS trg_{table}_cache_notify ON {table}")
+        c.execute(f"""
+            CREATE TRIGGER trg_{table}_cache_notify
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE notify_cache_invalidation('{key_col}')
+        """)
+        c.execute(f"DROP TRIGGER IF EXISTS trg_{table}_cache_notify_truncate ON {table}")
+        c.execute(f"""
+            CREATE TRIGGER trg_{table}_cache_notify_truncate
+            AFTER TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE PROCEDURE notify_cache_invalidation()
+        """)
+    for table in CACHE_TABLE_LEVEL_TABLES:
+        c.execute(f"DROP TRIGGER IF EXISTS trg_{table}_cache_notify ON {table}")
+        c.execute(f"""
+            CREATE TRIGGER trg_{table}_cache_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {table}
+            FOR EACH STATEMENT EXECUTE PROCEDURE notify_cache_invalidation()
+        """)
+
+
+def _migration_tecnicos_cache_trigger(c):
+    """tecnicos también publica invalidaciones: su índice de nombres se cachea (entity_resolver.py)"""
+    c.execute("DROP TRIGGER IF EXISTS trg_tecnicos_cache_notify ON tecnicos")
+    c.execute("""
+        CREATE TRIGGER trg_tecnicos_cache_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON tecnicos
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_cache_invalidation()
+    """)
+
+
+def _migration_feriados_cache_trigger(c):
+    """feriados publica invalidaciones: el calendario de feriados se cachea (holiday_calendar.py)"""
+    c.execute("DROP TRIGGER IF EXISTS trg_feriados_cache_notify ON feriados")
+    c.execute("""
+        CREATE TRIGGER trg_feriados_cache_notify
+        AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON feriados
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_cache_invalidation()
+    """)
+
+
+# Canal de NOTIFY que despierta al worker de notificaciones (ver notification_worker.py)
+NOTIFICATION_QUEUE_CHANNEL = "sigo_notification_queue"
+
+
+def _migration_notification_worker(c):
+    """Reserva de eventos por el worker (locked_at) y aviso por NOTIFY al encolar"""
+    c.execute("ALTER TABLE notification_event_queue ADD COLUMN IF NOT EXISTS locked_at TIMESTAMP")
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_notification_queue() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{NOTIFICATION_QUEUE_CHANNEL}', NEW.id::text);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute("DROP TRIGGER IF EXISTS trg_notification_event_queue_notify ON notification_event_queue")
+    c.execute("""
+        CREATE TRIGGER trg_notification_event_queue_notify
+        AFTER INSERT ON notification_event_queue
+        FOR EACH ROW EXECUTE PROCEDURE notify_notification_queue()
+    """)
+
+
+# Dimensiones del resumen mensual de horas (ver hours_rollup.py)
+ROLLUP_TABLE = "registros_resumen_mensual"
+ROLLUP_KEY_COLUMNS = ["mes", "usuario_id", "id_tecnico", "id_cliente", "id_tipo", "id_modalidad", "grupo"]
+
+
+def _rollup_delta_sql(rows_table, sign):
+    """INSERT ... ON CONFLICT que suma (o resta) las horas de rows_table agrupadas por las dimensiones"""
+    keys = ", ".join(ROLLUP_KEY_COLUMNS)
+    dims = ", ".join(ROLLUP_KEY_COLUMNS[1:])
+    # Por posición: registros también tiene una columna "mes" (texto) que taparía al alias
+    positions = ", ".join(str(i) for i in range(1, len(ROLLUP_KEY_COLUMNS) + 1))
+    return f"""
+        INSERT INTO {ROLLUP_TABLE} AS m ({keys}, horas, registros)
+        SELECT date_trunc('month', COALESCE(fecha_date, registro_fecha_to_date(fecha)))::date, {dims},
+               {sign} SUM(tiempo), {sign} COUNT(*)
+        FROM {rows_table}
+        GROUP BY {positions}
+        ORDER BY {positions}
+        ON CONFLICT ({keys}) DO UPDATE
+        SET horas = m.horas + EXCLUDED.horas, registros = m.registros + EXCLUDED.registros
+    """
+
+
+def _migration_registros_monthly_rollup(c):
+    """
+    Resumen de horas por (mes, usuario, técnico, cliente, tipo, modalidad, grupo).
+
+    Lo mantienen triggers por sentencia con tablas de transición: una importación
+    masiva hace un solo upsert agrupado en vez de uno por fila.
+    """
+    keys = ", ".join(ROLLUP_KEY_COLUMNS)
+    c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+            mes DATE,
+            usuario_id INTEGER,
+            id_tecnico INTEGER NOT NULL,
+            id_cliente INTEGER NOT NULL,
+            id_tipo INTEGER NOT NULL,
+            id_modalidad INTEGER NOT NULL,
+            grupo VARCHAR(100),
+            horas NUMERIC(14,2) NOT NULL DEFAULT 0,
+            registros INTEGER NOT NULL DEFAULT 0,
+            CONSTRAINT {ROLLUP_TABLE}_key UNIQUE NULLS NOT DISTINCT ({keys})
+        )
+    """)
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{ROLLUP_TABLE}_usuario_mes ON {ROLLUP_TABLE} (usuario_id, mes)")
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION registros_resumen_mensual_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                {_rollup_delta_sql('old_rows', '-')};
+                DELETE FROM {ROLLUP_TABLE} WHERE registros <= 0;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                {_rollup_delta_sql('new_rows', '')};
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION registros_resumen_mensual_truncate() RETURNS trigger AS $$
+        BEGIN
+            TRUNCATE {ROLLUP_TABLE};
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # Postgres no admite tablas de transición en triggers de más de un evento: uno por operación
+    transitions = {
+        "INSERT": "REFERENCING NEW TABLE AS new_rows",
+        "UPDATE": "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows",
+        "DELETE": "REFERENCING OLD TABLE AS old_rows",
+    }
+    for op, referencing in transitions.items():
+        c.execute(f"DROP TRIGGER IF EXISTS trg_registros_resumen_{op.lower()} ON registros")
+        c.execute(f"""
+            CREATE TRIGGER trg_registros_resumen_{op.lower()}
+            AFTER {op} ON registros {referencing}
+            FOR EACH STATEMENT EXECUTE PROCEDURE registros_resumen_mensual_apply()
+        """)
+    c.execute("DROP TRIGGER IF EXISTS trg_registros_resumen_truncate ON registros")
+    c.execute("""
+        CREATE TRIGGER trg_registros_resumen_truncate
+        AFTER TRUNCATE ON registros
+        FOR EACH STATEMENT EXECUTE PROCEDURE registros_resumen_mensual_truncate()
+    """)
+    c.execute(f"TRUNCATE {ROLLUP_TABLE}")
+    c.execute(_rollup_delta_sql("registros", ""))
+
+
+# Bajas de registros por usuario para el caché incremental (ver get_user_registros_dataframe_cached)
+REGISTROS_TOMBSTONE_TABLE = "registros_eliminados"
+REGISTROS_TOMBSTONE_RETENTION_DAYS = 30
+
+
+def _migration_registros_sync_columns(c):
+    """
+    registros.updated_at y tabla de bajas para sincronizar cachés por diferencia.
+
+    updated_at se fija al insertar (DEFAULT) y en cada UPDATE (trigger). Un registro
+    borrado, o reasignado a otro usuario, deja una baja (registro_id, usuario_id)
+    para el usuario que lo tenía; las bajas de más de REGISTROS_TOMBSTONE_RETENTION_DAYS
+    días se purgan y un caché más viejo que eso se recarga completo.
+    """
+    c.execute("ALTER TABLE registros ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_registros_usuario_updated_at ON registros (usuario_id, updated_at)")
+    c.execute("""
+        CREATE OR REPLACE FUNCTION registros_set_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at := CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute("DROP TRIGGER IF EXISTS trg_registros_updated_at ON registros")
+    c.execute("""
+        CREATE TRIGGER trg_registros_updated_at
+        BEFORE UPDATE ON registros
+        FOR EACH ROW EXECUTE PROCEDURE registros_set_updated_at()
+    """)
+
+    c.execute(f"""
+        CREATE TABLE IF NOT EXISTS {REGISTROS_TOMBSTONE_TABLE} (
+            registro_id INTEGER NOT NULL,
+            usuario_id INTEGER NOT NULL,
+            deleted_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{REGISTROS_TOMBSTONE_TABLE}_usuario_deleted_at
+        ON {REGISTROS_TOMBSTONE_TABLE} (usuario_id, deleted_at)
+    """)
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION registros_eliminados_delete() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO {REGISTROS_TOMBSTONE_TABLE} (registro_id, usuario_id)
+            SELECT id, usuario_id FROM old_rows WHERE usuario_id IS NOT NULL;
+            DELETE FROM {REGISTROS_TOMBSTONE_TABLE}
+            WHERE deleted_at < CURRENT_TIMESTAMP - interval '{REGISTROS_TOMBSTONE_RETENTION_DAYS} days';
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION registros_eliminados_reasignado() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO {REGISTROS_TOMBSTONE_TABLE} (registro_id, usuario_id) VALUES (OLD.id, OLD.usuario_id);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute("DROP TRIGGER IF EXISTS trg_registros_eliminados_delete ON registros")
+    c.execute("""
+        CREATE TRIGGER trg_registros_eliminados_delete
+        AFTER DELETE ON registros REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE PROCEDURE registros_eliminados_delete()
+    """)
+    c.execute("DROP TRIGGER IF EXISTS trg_registros_eliminados_reasignado ON registros")
+    c.execute("""
+        CREATE TRIGGER trg_registros_eliminados_reasignado
+        AFTER UPDATE OF usuario_id ON registros
+        FOR EACH ROW
+        WHEN (OLD.usuario_id IS NOT NULL AND OLD.usuario_id IS DISTINCT FROM NEW.usuario_id)
+        EXECUTE PROCEDURE registros_eliminados_reasignado()
+    """)
+
+
+def _migration_usuarios_cache_trigger(c):
+    """usuarios publica invalidaciones al cambiar de rol: el filtro por rol de los resúmenes se cachea"""
+    c.execute("DROP TRIGGER IF EXISTS trg_usuarios_cache_notify ON usuarios")
+    c.execute("""
+        CREATE TRIGGER trg_usuarios_cache_notify
+        AFTER INSERT OR UPDATE OF rol_id OR DELETE ON usuarios
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_cache_invalidation()
+    """)
+    c.execute("DROP TRIGGER IF EXISTS trg_usuarios_cache_notify_truncate ON usuarios")
+    c.execute("""
+        CREATE TRIGGER trg_usuarios_cache_notify_truncate
+        AFTER TRUNCATE ON usuarios
+        FOR EACH STATEMENT EXECUTE PROCEDURE notify_cache_invalidation()
+    """)
+
+
+def _migration_registro_fecha_to_date_stable(c):
+    """registro_fecha_to_date atrapa errores de to_date en un bloque EXCEPTION: es STABLE, no IMMUTABLE"""
+    c.execute("ALTER FUNCTION registro_fecha_to_date(TEXT) STABLE")
+
+
+# (versión, descripción, función). Orden estricto y solo se agregan al final.
+MIGRATIONS = [
+    (1, "Esquema base y datos semilla", _migration_base_schema),
+    (2, "Marcas, contactos y proyectos", _migration_projects_schema),
+    (3, "Columnas extendidas de clientes, contactos y solicitudes", _migration_clientes_columns),
+    (4, "Feriados", _migration_feriados),
+    (5, "Cola y log de notificaciones", _migration_notifications),
+    (6, "Planificación de modalidades", _migration_schedules),
+    (7, "Tipo de licencia en vacaciones", _migration_vacaciones_tipo),
+    (8, "Favoritos y recientes", _migration_favoritos),
+    (9, "registros.fecha_date tipada", _migration_registros_fecha_date),
+    (10, "Índices de registros y planificación", _migration_managed_indexes),
+    (11, "Triggers de invalidación de caché", _migration_cache_invalidation_triggers),
+    (12, "Invalidación de caché para tecnicos", _migration_tecnicos_cache_trigger),
+    (13, "Invalidación de caché para feriados", _migration_feriados_cache_trigger),
+    (14, "Worker de notificaciones", _migration_notification_worker),
+    (15, "Resumen mensual de horas", _migration_registros_monthly_rollup),
+    (16, "registros.updated_at y bajas para caché incremental", _migration_registros_sync_columns),
+    (17, "Invalidación de caché para usuarios", _migration_usuarios_cache_trigger),
+    (18, "registro_fecha_to_date STABLE", _migration_registro_fecha_to_date_stable),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_applied_versions(conn):
+    """Versiones registradas en schema_version (vacío si la tabla no existe)"""
+    c = conn.cursor()
+    c.execute("SELECT to_regclass('public.schema_version')")
+    if c.fetchone()[0] is None:
+        return set()
+    c.execute("SELECT version FROM schema_version")
+    return {int(r[0]) for r in c.fetchall()}
+
+
+def apply_migrations(conn):
+    """Aplica en orden las migraciones pendientes y devuelve las versiones aplicadas.
+
+    Cada paso corre en su propia transacción bajo un advisory lock, de modo que
+    varias réplicas arrancando a la vez no aplican dos veces la misma versión.
+    Si un paso falla se revierte y se propaga la excepción.
+    """
+    conn.autocommit = False
+    c = conn.cursor()
+    c.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion VARCHAR(200) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute("SELECT version FROM schema_version")
+    applied = {int(r[0]) for r in c.fetchall()}
+    conn.commit()
+
+    newly_applied = []
+    for version, descripcion, step in MIGRATIONS:
+        if version in applied:
+            continue
+        try:
+            c.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATIONS_LOCK_KEY,))
+            c.execute("SELECT 1 FROM schema_version WHERE version = %s", (version,))
+            if c.fetchone():
+                conn.commit()
+                continue
+            step(c)
+            c.execute(
+                "INSERT INTO schema_version (version, descripcion) VALUES (%s, %s)",
+                (version, descripcion),
+            )
+            conn.commit()
+            newly_applied.append(version)
+        except Exception:
+            conn.rollback()
+            raise
+    return newly_applied
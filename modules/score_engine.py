@@ -0,0 +1,113 @@
+"""
+Cálculo de puntajes PT = (T × C × N) × H por cliente y por técnico.
+
+Las vistas de puntajes recorrían los registros con iterrows haciendo tres
+búsquedas en diccionarios por fila. Como PT es lineal en las horas, alcanza con
+las horas y la cantidad de registros por combinación (técnico, cliente, tipo de
+tarea, grupo), que salen del resumen mensual (hours_rollup.py): el factor
+T × C × N es el mismo para toda la combinación. Sobre ese agregado los factores se
+mapean como columnas y los totales, cantidades y promedios por cliente y por
+técnico salen de una sola llamada a compute_scores.
+
+Igual que antes, un factor sin puntaje (0 o inexistente) cuenta como 1 y esas
+combinaciones se informan en el diagnóstico de puntajes cero.
+"""
+import pandas as pd
+
+from .database import get_clientes_puntajes_dataframe, get_grupos_puntajes_dataframe, get_tipos_puntajes_dataframe
+from .hours_rollup import get_hours_rollup
+from .logging_utils import log_sql_error
+
+SCORE_BASE_COLUMNS = ('tecnico', 'cliente', 'tipo_tarea', 'grupo', 'horas', 'registros')
+DIAGNOSTICO_COLUMNS = [
+    'tecnico', 'tipo_tarea', 'cliente', 'grupo',
+    'puntaje_tipo', 'puntaje_cliente', 'puntaje_grupo', 'horas', 'registros',
+]
+
+
+def load_score_base(rol_id, filter_type='all_time', custom_month=None, custom_year=None):
+    """Horas y cantidad de registros por (técnico, cliente, tipo de tarea, grupo) del rol y período"""
+    return get_hours_rollup(SCORE_BASE_COLUMNS[:4], filter_type, custom_month, custom_year, rol_id=rol_id)
+
+
+def _puntaje_map(puntajes_df, key_column):
+    """Serie nombre -> puntaje; ante nombres repetidos gana el último (como dict(zip(...)))"""
+    if puntajes_df is None or puntajes_df.empty:
+        return pd.Series(dtype=float)
+    df = puntajes_df.drop_duplicates(subset=key_column, keep='last')
+    return pd.Series(df['puntaje'].astype(float).values, index=df[key_column])
+
+
+def _summarize(scored, by):
+    grouped = scored.groupby(by).agg(puntaje=('puntaje', 'sum'), cantidad_registros=('registros', 'sum'))
+    grouped = grouped.reset_index()
+    grouped['cantidad_registros'] = grouped['cantidad_registros'].astype(int)
+    grouped['promedio'] = (grouped['puntaje'] / grouped['cantidad_registros']).round().astype(int)
+    grouped['puntaje'] = grouped['puntaje'].round().astype(int)
+    return grouped[[by, 'puntaje', 'cantidad_registros', 'promedio']]
+
+
+def compute_scores(base_df, tipos_puntajes_df, clientes_puntajes_df, grupos_puntajes_df):
+    """
+    Puntajes por cliente y por técnico a partir del agregado de load_score_base.
+
+    También acepta registros sueltos (columna 'tiempo', sin 'registros'): cada fila
+    cuenta como un registro. Devuelve un dict con 'por_cliente' y 'por_tecnico'
+    (puntaje, cantidad_registros y promedio redondeados) y 'diagnostico_ceros'.
+    """
+    base = base_df.copy()
+    if 'registros' not in base.columns:
+        base['horas'] = base['tiempo']
+        base['registros'] = 1
+    base['horas'] = pd.to_numeric(base['horas'], errors='coerce').fillna(0.0).astype(float)
+
+    base['puntaje_tipo'] = base['tipo_tarea'].map(_puntaje_map(tipos_puntajes_df, 'descripcion')).fillna(0.0)
+    base['puntaje_cliente'] = base['cliente'].map(_puntaje_map(clientes_puntajes_df, 'nombre')).fillna(0.0)
+    base['puntaje_grupo'] = base['grupo'].map(_puntaje_map(grupos_puntajes_df, 'nombre')).fillna(0.0)
+
+    factores = base[['puntaje_tipo', 'puntaje_cliente', 'puntaje_grupo']]
+    base['puntaje'] = factores.clip(lower=1).prod(axis=1) * base['horas']
+
+    diagnostico = base.loc[(factores == 0).any(axis=1), DIAGNOSTICO_COLUMNS].reset_index(drop=True)
+    return {
+        'por_cliente': _summarize(base, 'cliente'),
+        'por_tecnico': _summarize(base, 'tecnico'),
+        'diagnostico_ceros': diagnostico,
+    }
+
+
+def get_scores(rol_id, filter_type='all_time', custom_month=None, custom_year=None):
+    """Puntajes del rol y período (ver compute_scores); None si no hay registros o falla la consulta"""
+    try:
+        base = load_score_base(rol_id, filter_type, custom_month, custom_year)
+    except Exception as e:
+        log_sql_error(f"Error obteniendo la base de puntajes: {e}")
+        return None
+    if base.empty:
+        return None
+    return compute_scores(
+        base,
+        get_tipos_puntajes_dataframe(),
+        get_clientes_puntajes_dataframe(),
+        get_grupos_puntajes_dataframe(),
+    )
+
+
+def compute_client_efficiency(base_df, tipos_puntajes_df, grupos_puntajes_df):
+    """
+    Eficiencia por cliente: valor = Σ (T × N) × H (sin C), Rc = valor / horas.
+
+    Columnas: cliente, horas_totales, puntaje (valor del cliente) y relacion_horas_valor.
+    """
+    base = base_df.copy()
+    if 'registros' not in base.columns:
+        base['horas'] = base['tiempo']
+    base['horas'] = pd.to_numeric(base['horas'], errors='coerce').fillna(0.0).astype(float)
+    puntaje_tipo = base['tipo_tarea'].map(_puntaje_map(tipos_puntajes_df, 'descripcion')).fillna(0.0)
+    puntaje_grupo = base['grupo'].map(_puntaje_map(grupos_puntajes_df, 'nombre')).fillna(0.0)
+    base['puntaje'] = puntaje_tipo.clip(lower=1) * puntaje_grupo.clip(lower=1) * base['horas']
+
+    eficiencia = base.groupby('cliente').agg(horas_totales=('horas', 'sum'), puntaje=('puntaje', 'sum')).reset_index()
+    horas = eficiencia['horas_totales']
+    eficiencia['relacion_horas_valor'] = (eficiencia['puntaje'] / horas.where(horas > 0)).fillna(0.0)
+    return eficiencia
@@ -0,0 +1,126 @@
+"""
+Envío de correos por SMTP reutilizando la sesión.
+
+Abrir la conexión, negociar TLS y autenticarse cuesta más que enviar el mensaje:
+un evento con 50 destinatarios hacía 50 handshakes. SMTPSender abre la sesión al
+primer envío y la mantiene para todo el lote (se cierra con close() o al salir del
+`with`), reconectando si el servidor la corta o tras `max_messages_per_session`.
+
+Los errores transitorios (desconexión, timeouts, respuestas 4xx) se reintentan con
+espera exponencial; los permanentes (5xx, destinatario rechazado) se propagan de
+inmediato para no demorar el resto del lote.
+"""
+import smtplib
+import socket
+import ssl
+import time
+from email.message import EmailMessage
+
+from .config import SMTP_CONFIG
+from .database import _normalize_notification_email
+
+
+_MESSAGE_REFUSED_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def _is_transient(error):
+    # Los errores de smtplib y ssl también son OSError: se clasifican antes que los de red
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= int(error.smtp_code) < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, (smtplib.SMTPException, ssl.SSLError)):
+        # Sin código 4xx (STARTTLS/AUTH no soportados, certificado inválido, ...): permanente
+        return False
+    return isinstance(error, (socket.timeout, ConnectionError, OSError))
+
+
+class SMTPSender:
+    """Sesión SMTP para un lote de mensajes; no es thread-safe (una instancia por hilo)"""
+
+    def __init__(self, config=None, max_retries=3, backoff_seconds=1.0, max_messages_per_session=100, timeout=20):
+        config = SMTP_CONFIG if config is None else config
+        self.host = str(config.get('host') or '').strip()
+        self.port = int(str(config.get('port') or '587').strip())
+        self.security = str(config.get('security') or 'tls').strip().lower()
+        self.username = str(config.get('user') or '').strip()
+        self.password = str(config.get('password') or '')
+        self.sender_email = _normalize_notification_email(config.get('from_email'))
+        self.sender_name = str(config.get('from_name') or 'SIGO').strip() or 'SIGO'
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_seconds = backoff_seconds
+        self.max_messages_per_session = max(1, int(max_messages_per_session))
+        self.timeout = timeout
+        self._client = None
+        self._session_messages = 0
+        self.stats = {'sessions': 0, 'sent': 0, 'retries': 0}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _connect(self):
+        if self.security == 'ssl':
+            client = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            client.ehlo()
+            if self.security != 'none':
+                client.starttls()
+                client.ehlo()
+        try:
+            if self.username:
+                client.login(self.username, self.password)
+        except Exception:
+            client.close()
+            raise
+        self._client = client
+        self._session_messages = 0
+        self.stats['sessions'] += 1
+
+    def close(self):
+        if self._client is not None:
+            try:
+                self._client.quit()
+            except Exception:
+                try:
+                    self._client.close()
+                except Exception:
+                    pass
+        self._client = None
+
+    def build_message(self, recipient_email, subject, body):
+        message = EmailMessage()
+        message['Subject'] = str(subject or '').strip() or 'Notificación SIGO'
+        message['From'] = f"{self.sender_name} <{self.sender_email}>"
+        message['To'] = recipient_email
+        message.set_content(str(body or ''), subtype='plain', charset='utf-8')
+        return message
+
+    def send(self, recipient_email, subject, body):
+        """Envía un mensaje por la sesión abierta (la abre o la renueva si hace falta)"""
+        message = self.build_message(recipient_email, subject, body)
+        attempt = 0
+        while True:
+            try:
+                if self._client is not None and self._session_messages >= self.max_messages_per_session:
+                    self.close()
+                if self._client is None:
+                    self._connect()
+                self._client.send_message(message)
+                self._session_messages += 1
+                self.stats['sent'] += 1
+                return
+            except Exception as e:
+                # Un rechazo del mensaje deja la sesión usable (smtplib ya envió RSET); otros errores, no
+                if not isinstance(e, _MESSAGE_REFUSED_ERRORS):
+                    self.close()
+                if attempt >= self.max_retries or not _is_transient(e):
+                    raise
+                self.stats['retries'] += 1
+                time.sleep(self.backoff_seconds * (2 ** attempt))
+                attempt += 1
@@ -0,0 +1,174 @@
+"""
+Servidor SMTP local que acepta y descarta (o guarda en memoria) los correos.
+
+Sirve para medir el circuito de notificaciones sin un servidor de correo real:
+
+    python -m modules.smtp_sink --port 8025 [--delay-ms 20] [--connect-delay-ms 100]
+
+y en .env: SMTP_HOST=127.0.0.1, SMTP_PORT=8025, SMTP_SECURITY=none, SMTP_USER vacío.
+
+Solo usa la biblioteca estándar (socketserver): implementa lo que necesita
+smtplib (EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT), sin TLS.
+connect_delay y delay simulan el costo del handshake y de cada envío de un
+servidor remoto.
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b"\r\n")
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b".\r\n", b".\n"):
+                return b"".join(lines)
+            if line.startswith(b".."):
+                line = line[1:]
+            lines.append(line)
+
+    def handle(self):
+        sink = self.server.sink
+        sink._register_session()
+        if sink.connect_delay:
+            time.sleep(sink.connect_delay)
+        self._reply("220 sigo-smtp-sink ESMTP")
+        mail_from, rcpt_to = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode('utf-8', 'replace').rstrip("\r\n")
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                for line in ("250-sigo-smtp-sink", "250-8BITMIME", "250-SMTPUTF8", "250-AUTH PLAIN LOGIN"):
+                    self._reply(line)
+                self._reply("250 SIZE 52428800")
+            elif verb == 'HELO':
+                self._reply("250 sigo-smtp-sink")
+            elif verb == 'AUTH':
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == 'MAIL':
+                mail_from, rcpt_to = command[10:].strip(), []
+                self._reply("250 OK")
+            elif verb == 'RCPT':
+                rcpt_to.append(command[8:].strip())
+                self._reply("250 OK")
+            elif verb == 'DATA':
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = self._read_data()
+                if sink.delay:
+                    time.sleep(sink.delay)
+                sink._store(mail_from, rcpt_to, data)
+                mail_from, rcpt_to = None, []
+                self._reply("250 OK queued")
+            elif verb == 'RSET':
+                mail_from, rcpt_to = None, []
+                self._reply("250 OK")
+            elif verb == 'NOOP':
+                self._reply("250 OK")
+            elif verb == 'QUIT':
+                self._reply("221 Bye")
+                return
+            elif verb == 'STARTTLS':
+                self._reply("454 TLS not available")
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _ThreadingSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Servidor SMTP en un hilo; cuenta sesiones y mensajes recibidos"""
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, connect_delay=0.0, keep_messages=True):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.connect_delay = connect_delay
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.message_count = 0
+        self.session_count = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _register_session(self):
+        with self._lock:
+            self.session_count += 1
+
+    def _store(self, mail_from, rcpt_to, data):
+        with self._lock:
+            self.message_count += 1
+            if self.keep_messages:
+                self.messages.append({
+                    'mail_from': mail_from,
+                    'rcpt_to': list(rcpt_to),
+                    'data': data,
+                    'received_at': time.time(),
+                })
+
+    def start(self):
+        self._server = _ThreadingSMTPServer((self.host, self.port), _SMTPSinkHandler)
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="smtp-sink", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def smtp_config(self, from_email='sigo@localhost'):
+        """Configuración para SMTPSender / SMTP_CONFIG que apunta a este servidor"""
+        return {
+            'enabled': True,
+            'host': self.host,
+            'port': str(self.port),
+            'security': 'none',
+            'user': '',
+            'password': '',
+            'from_email': from_email,
+            'from_name': 'SIGO',
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor SMTP local de prueba (descarta los correos)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Demora simulada por mensaje")
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0, help="Demora simulada por conexión")
+    args = parser.parse_args(argv)
+    sink = SMTPSink(args.host, args.port, args.delay_ms / 1000.0, args.connect_delay_ms / 1000.0, keep_messages=False)
+    sink.start()
+    print(f"SMTP sink escuchando en {sink.host}:{sink.port} (Ctrl+C para salir)", flush=True)
+    try:
+        while True:
+            time.sleep(5)
+            print(f"sesiones={sink.session_count} mensajes={sink.message_count}", flush=True)
+    except KeyboardInterrupt:
+        sink.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,10 +5,10 @@ from datetime import datetime, timedelta
 import calendar
 import time
 from .database import (
-    get_connection, get_user_registros_dataframe, get_user_registros_dataframe_cached,
+    get_connection, get_user_registros_dataframe_cached,
     get_tecnicos_dataframe, get_clientes_dataframe, 
     get_tipos_dataframe, get_modalidades_dataframe,
-    get_unassigned_records_for_user, get_user_rol_id,
+    get_user_rol_id,
     get_grupos_by_rol, clear_user_registros_cache,
     get_users_by_rol, get_user_weekly_modalities, get_weekly_modalities_by_rol,
     upsert_user_modality_for_date,
@@ -16,12 +16,14 @@ from .database import (
     get_clientes_favoritos, toggle_cliente_favorito,
     get_vacaciones_activas, get_user_vacaciones, save_vacaciones, delete_vacaciones, update_vacaciones,
     get_upcoming_vacaciones,
-    is_feriado,
+    registros_fecha_sql,
     get_vacaciones_by_users_and_range
 )
 from .utils import get_week_dates, format_week_range, prepare_weekly_chart_data, show_success_message, month_name_es, safe_rerun
 from .admin_planning import cached_get_weekly_modalities_by_rol, cached_get_user_default_schedule
 from .ui_components import inject_project_card_css
+from .cache_invalidation import cache_version
+from .holiday_calendar import get_holiday_calendar
 
 def clear_chart_cache():
     """Limpia la caché de los gráficos en session_state para forzar recálculo"""
@@ -89,26 +91,18 @@ def render_user_dashboard(user_id, nombre_completo_usuario):
         start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
         end_date = now.replace(hour=23, minute=59, second=59)
         
-        # 4. Iterate and check
-        current = start_date
-        while current <= end_date:
-            # Skip weekends (5=Sat, 6=Sun)
-            if current.weekday() < 5:
-                if is_feriado(current.date()):
-                    current += timedelta(days=1)
-                    continue
-                day_hours = 0
-                if not df_regs.empty:
-                    # Filter for this day
-                    mask = (df_regs['fecha_dt'].dt.date == current.date())
-                    day_hours = df_regs.loc[mask, 'tiempo'].sum()
-                
-                if day_hours < 4:
-                    date_str = current.strftime("%d/%m")
-                    status = "Sin carga" if day_hours == 0 else f"{day_hours}hs"
-                    alerts.append(f"{date_str} ({status})")
-            
-            current += timedelta(days=1)
+        # 4. Iterate over business days (weekends and holidays excluded)
+        for day in get_holiday_calendar(start_date).business_days(start_date, end_date):
+            day_hours = 0
+            if not df_regs.empty:
+                # Filter for this day
+                mask = (df_regs['fecha_dt'].dt.date == day)
+                day_hours = df_regs.loc[mask, 'tiempo'].sum()
+
+            if day_hours < 4:
+                date_str = day.strftime("%d/%m")
+                status = "Sin carga" if day_hours == 0 else f"{day_hours}hs"
+                alerts.append(f"{date_str} ({status})")
             
     except Exception as e:
         # Fail silently to not crash dashboard
@@ -356,13 +350,16 @@ def render_weekly_chart_optimized(user_registros_df):
     
     if not weekly_df.empty:
         # Preparar datos para el gráfico (usar caché si es posible)
+        # Una entrada por semana con (versión, datos): se sobrescribe cuando cambian los registros
+        registros_version = cache_version('registros', st.session_state.get('user_id'))
         chart_cache_key = f"chart_data_{st.session_state.week_offset}"
+        cached_chart = st.session_state.get(chart_cache_key)
         
-        if chart_cache_key not in st.session_state:
+        if cached_chart is None or cached_chart[0] != registros_version:
             horas_por_dia_final = prepare_weekly_chart_data(weekly_df, start_of_selected_week)
-            st.session_state[chart_cache_key] = horas_por_dia_final
+            st.session_state[chart_cache_key] = (registros_version, horas_por_dia_final)
         else:
-            horas_por_dia_final = st.session_state[chart_cache_key]
+            horas_por_dia_final = cached_chart[1]
         
         fig = px.bar(horas_por_dia_final, x='dia_con_fecha', y='tiempo', 
                    labels={'dia_con_fecha': 'Día de la Semana', 'tiempo': 'Horas Totales'})
@@ -547,38 +544,13 @@ def render_add_record_form(user_id, nombre_completo_usuario):
 
 def render_edit_delete_expanders(user_id, nombre_completo_usuario):
     """Renderiza los desplegables para editar y eliminar registros"""
-    user_registros_df = get_user_registros_dataframe(user_id)
-    unassigned_registros_df = get_unassigned_records_for_user(user_id)
-    
-    def convert_fecha_to_datetime(fecha_val):
-        """Convierte fecha a datetime de forma segura"""
-        if pd.isna(fecha_val): return pd.NaT
-        if hasattr(fecha_val, 'date'): return fecha_val
-        s = str(fecha_val).strip()
-        try: return pd.to_datetime(s, format='%Y-%m-%d')
-        except: pass
-        try: return pd.to_datetime(s, format='%d/%m/%y')
-        except: pass
-        try: return pd.to_datetime(s, format='%d/%m/%Y')
-        except: return pd.to_datetime(s, dayfirst=True)
-    
-    # Aplicar la conversión a ambos dataframes
-    if not user_registros_df.empty:
-        user_registros_df['fecha_dt'] = user_registros_df['fecha'].apply(convert_fecha_to_datetime)
+    from .registros_paging import render_registros_pager
     
-    if not unassigned_registros_df.empty:
-        unassigned_registros_df['fecha_dt'] = unassigned_registros_df['fecha'].apply(convert_fecha_to_datetime)
-    
-    # Combinar ambos DataFrames
-    if not unassigned_registros_df.empty:
-        combined_df = pd.concat([user_registros_df, unassigned_registros_df], ignore_index=True)
-        # Ordenar por fecha_dt en lugar de fecha
-        combined_df = combined_df.sort_values('fecha_dt', ascending=False)
-    else:
-        combined_df = user_registros_df
-        if not combined_df.empty:
-            # Ordenar por fecha_dt en lugar de fecha
-            combined_df = combined_df.sort_values('fecha_dt', ascending=False)
+    # Una página por vez: registros propios y los sin asignar con el nombre del usuario como técnico
+    st.markdown("**Registros para editar o eliminar**")
+    combined_df = render_registros_pager(
+        f"user_{user_id}", {'usuario_id': user_id, 'incluir_sin_asignar': True}
+    )
     
     if not combined_df.empty:
         # Desplegable para editar registros
@@ -676,7 +648,7 @@ def render_edit_delete_expanders(user_id, nombre_completo_usuario):
                     
                     # Validar permisos (solo registros propios)
                     # Aunque la lista ya viene filtrada por usuario en combined_df, es bueno doble chequear si fuera necesario.
-                    # Aquí confiamos en combined_df que viene de get_user_registros_dataframe(user_id)
+                    # Aquí confiamos en combined_df, que viene de la página filtrada por usuario_id
                     
                     from .database import delete_registros_batch, registrar_eliminacion
                     
@@ -702,46 +674,34 @@ def render_edit_delete_expanders(user_id, nombre_completo_usuario):
                         st.error("Hubo un error al intentar eliminar los registros.")
 
         # Mostrar información sobre registros no asignados
-        if not unassigned_registros_df.empty:
-            st.info(f"ℹ️ Se encontraron {len(unassigned_registros_df)} registros no asignados que coinciden con tu nombre. Estos registros se incluyen en las opciones de edición/eliminación.")
+        sin_asignar = int(combined_df['usuario_id'].isna().sum())
+        if sin_asignar:
+            st.info(f"ℹ️ En esta página hay {sin_asignar} registros no asignados que coinciden con tu nombre. Estos registros se incluyen en las opciones de edición/eliminación.")
     else:
         st.info("No hay registros para editar o eliminar.")
 
 def get_total_hours_for_tecnico_on_date(conn, id_tecnico, fecha, exclude_registro_id=None):
     c = conn.cursor()
     fecha_str = fecha.strftime('%Y-%m-%d') if hasattr(fecha, 'strftime') else str(fecha)
+    fecha_sql = registros_fecha_sql(alias=None)
     if exclude_registro_id is not None:
         c.execute(
-            '''
+            f'''
             SELECT COALESCE(SUM(tiempo), 0)
             FROM registros
             WHERE id_tecnico = %s
-              AND (
-                    CASE
-                        WHEN fecha ~ '^\\d{4}-\\d{2}-\\d{2}$' THEN to_date(fecha, 'YYYY-MM-DD')
-                        WHEN fecha ~ '^\\d{2}/\\d{2}/\\d{2}$' THEN to_date(fecha, 'DD/MM/YY')
-                        WHEN fecha ~ '^\\d{2}/\\d{2}/\\d{4}$' THEN to_date(fecha, 'DD/MM/YYYY')
-                        ELSE NULL
-                    END
-                  ) = %s::date
+              AND {fecha_sql} = %s::date
               AND id != %s
             ''',
             (id_tecnico, fecha_str, exclude_registro_id)
         )
     else:
         c.execute(
-            '''
+            f'''
             SELECT COALESCE(SUM(tiempo), 0)
             FROM registros
             WHERE id_tecnico = %s
-              AND (
-                    CASE
-                        WHEN fecha ~ '^\\d{4}-\\d{2}-\\d{2}$' THEN to_date(fecha, 'YYYY-MM-DD')
-                        WHEN fecha ~ '^\\d{2}/\\d{2}/\\d{2}$' THEN to_date(fecha, 'DD/MM/YY')
-                        WHEN fecha ~ '^\\d{2}/\\d{2}/\\d{4}$' THEN to_date(fecha, 'DD/MM/YYYY')
-                        ELSE NULL
-                    END
-                  ) = %s::date
+              AND {fecha_sql} = %s::date
             ''',
             (id_tecnico, fecha_str)
         )
@@ -752,24 +712,29 @@ def get_total_hours_for_tecnico_on_date(conn, id_tecnico, fecha, exclude_registr
         return 0.0
 
 
+def _resolve_record_entity_ids(tecnico, cliente, tipo, modalidad):
+    """IDs de las entidades elegidas en el formulario de registro (None si alguna no existe)"""
+    from .entity_resolver import lookup_entity_id
+    return (
+        lookup_entity_id('tecnicos', tecnico),
+        lookup_entity_id('clientes', cliente),
+        lookup_entity_id('tipos_tarea', tipo),
+        lookup_entity_id('modalidades_tarea', modalidad),
+    )
+
+
 def save_new_user_record(user_id, fecha, tecnico, cliente, tipo, modalidad, tarea, ticket, tiempo, descripcion, mes, grupo="General", es_hora_extra=False):
     """Guarda un nuevo registro de usuario con validación de duplicados"""
     try:
         conn = get_connection()
         c = conn.cursor()
         
-        # Obtener IDs de las entidades
-        c.execute("SELECT id_tecnico FROM tecnicos WHERE nombre = %s", (tecnico,))
-        id_tecnico = c.fetchone()[0]
-        
-        c.execute("SELECT id_cliente FROM clientes WHERE nombre = %s", (cliente,))
-        id_cliente = c.fetchone()[0]
-        
-        c.execute("SELECT id_tipo FROM tipos_tarea WHERE descripcion = %s", (tipo,))
-        id_tipo = c.fetchone()[0]
-        
-        c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = %s", (modalidad,))
-        id_modalidad = c.fetchone()[0]
+        # Obtener IDs de las entidades (índice en memoria compartido)
+        id_tecnico, id_cliente, id_tipo, id_modalidad = _resolve_record_entity_ids(tecnico, cliente, tipo, modalidad)
+        if None in (id_tecnico, id_cliente, id_tipo, id_modalidad):
+            st.error("No se encontró el técnico, cliente, tipo de tarea o modalidad seleccionados.")
+            conn.close()
+            return
         
         # Usar la función centralizada para verificar duplicados
         from .database import check_record_duplicate
@@ -1011,19 +976,12 @@ def save_user_record_changes(registro_id, fecha, tecnico, cliente, tipo, modalid
     conn = get_connection()
     c = conn.cursor()
     
-    # Obtener IDs
-    c.execute("SELECT id_tecnico FROM tecnicos WHERE nombre = %s", (tecnico,))
-    id_tecnico = c.fetchone()[0]
-    
-    c.execute("SELECT id_cliente FROM clientes WHERE nombre = %s", (cliente,))
-    id_cliente = c.fetchone()[0]
-    
-    c.execute("SELECT id_tipo FROM tipos_tarea WHERE descripcion = %s", (tipo,))
-    id_tipo = c.fetchone()[0]
-    
-    # En la función de actualización de registros
-    c.execute("SELECT id_modalidad FROM modalidades_tarea WHERE descripcion = %s", (modalidad,))
-    id_modalidad = c.fetchone()[0]
+    # Obtener IDs (índice en memoria compartido)
+    id_tecnico, id_cliente, id_tipo, id_modalidad = _resolve_record_entity_ids(tecnico, cliente, tipo, modalidad)
+    if None in (id_tecnico, id_cliente, id_tipo, id_modalidad):
+        st.error("No se encontró el técnico, cliente, tipo de tarea o modalidad seleccionados.")
+        conn.close()
+        return
     try:
         tiempo = round(float(tiempo), 2)
     except Exception:
@@ -1329,7 +1287,8 @@ def render_weekly_modality_planner(user_id, nombre_completo_usuario):
         week_dates.append(current_date)
         current_date += timedelta(days=1)
 
-    feriados_set = {d for d in week_dates if is_feriado(d)}
+    feriados_cal = get_holiday_calendar(week_dates[0], week_dates[-1])
+    feriados_set = {d for d in week_dates if feriados_cal.is_holiday(d)}
 
     # Mapeo de días
     day_mapping = {
@@ -1569,12 +1528,13 @@ def render_weekly_modality_planner(user_id, nombre_completo_usuario):
                         except Exception:
                             future_vac_days = set()
 
+                        future_cal = get_holiday_calendar(future_start, future_end)
                         cursor_day = future_start
                         while cursor_day <= future_end:
                             if cursor_day.weekday() >= 5:
                                 cursor_day += timedelta(days=1)
                                 continue
-                            if is_feriado(cursor_day):
+                            if future_cal.is_holiday(cursor_day):
                                 cursor_day += timedelta(days=1)
                                 continue
                             if cursor_day in future_vac_days:
@@ -322,20 +322,25 @@ def month_name_es(month_num):
     }
     return meses.get(month_num, "")
 
-def render_excel_uploader(key="excel_uploader", label="Cargar archivo Excel", expanded=False, enable_sheet_selection=True):
-    """Renderiza un uploader de Excel y devuelve el DF"""
+def render_excel_uploader(key="excel_uploader", label="Cargar archivo Excel", expanded=False, enable_sheet_selection=True, preview_rows=None):
+    """Renderiza un uploader de Excel y devuelve el DF.
+
+    Con preview_rows solo se leen esas primeras filas (para validar/mostrar); el
+    llamador procesa la hoja completa por bloques con excel_stream.iter_excel_chunks.
+    """
+    from .excel_stream import excel_sheet_names, read_excel_sheet
+
     uploaded_file = st.file_uploader(label, type=["xlsx", "xls"], key=key)
     if uploaded_file:
         try:
-            excel_file = pd.ExcelFile(uploaded_file)
-            sheet_names = excel_file.sheet_names
+            sheet_names = excel_sheet_names(uploaded_file)
             
             selected_sheet = sheet_names[0]
             if enable_sheet_selection and len(sheet_names) > 1:
                 selected_sheet = st.selectbox("Seleccionar hoja", sheet_names, key=f"{key}_sheet_selector")
                 
-            # Usar el objeto ExcelFile ya creado para parsear la hoja, evitando leer el stream dos veces
-            df = excel_file.parse(selected_sheet)
+            # Lectura en streaming (openpyxl read-only): no se carga el libro completo en memoria
+            df = read_excel_sheet(uploaded_file, selected_sheet, max_rows=preview_rows)
             return uploaded_file, df, selected_sheet
         except Exception as e:
             st.error(f"Error al leer el archivo: {e}")
@@ -599,7 +604,11 @@ def find_cliente_id(cliente, all_clients_data, normalized_client_map):
                 break
     return cid
 
-def parse_planning_cell(cell_val, mod_map, all_clients_data, normalized_client_map, cliente_mod_id):
+def parse_planning_cell(cell_val, mod_map, clientes, cliente_mod_id):
+    """Interpreta una celda de planificación como (id_modalidad, id_cliente).
+
+    clientes es un EntityResolver de la tabla clientes (ver entity_resolver.py).
+    """
     import difflib
     import re
     s_raw = str(cell_val if cell_val is not None else "").strip()
@@ -614,12 +623,12 @@ def parse_planning_cell(cell_val, mod_map, all_clients_data, normalized_client_m
         pk = normalize_text(p)
         if pk in mod_map:
             mod_fallback = mod_map[pk]
-        cid = find_cliente_id(p, all_clients_data, normalized_client_map)
+        cid = clientes.find(p)
         if cid is not None:
             return (cliente_mod_id, cid)
     if mod_fallback is not None:
         return (mod_fallback, None)
-    cid = find_cliente_id(s_raw, all_clients_data, normalized_client_map)
+    cid = clientes.find(s_raw)
     if cid is not None:
         return (cliente_mod_id, cid)
     best_mod = difflib.get_close_matches(key, list(mod_map.keys()), n=1, cutoff=0.85)
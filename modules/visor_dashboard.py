@@ -1,13 +1,13 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import calendar
 from .utils import month_name_es, get_general_alerts
 # Actualizar las importaciones al principio del archivo
 from .database import (
-    get_connection, get_registros_dataframe, get_registros_dataframe_with_date_filter,
+    get_connection, get_registros_dataframe,
     get_tecnicos_dataframe, get_clientes_dataframe, get_tipos_dataframe,
     get_modalidades_dataframe, get_roles_dataframe, get_users_dataframe,
     get_grupos_dataframe, get_grupos_puntajes_dataframe, get_grupo_puntaje_by_nombre,
@@ -26,6 +26,8 @@ from .admin_visualizations import render_role_visualizations
 from .commercial_projects import render_project_detail_screen, render_create_project
 from .admin_brands import render_brand_management
 from .admin_clients import render_client_management, render_client_crud_management
+from .hours_rollup import get_hours_rollup
+from .score_engine import compute_client_efficiency, get_scores
 from .database import get_cliente_solicitudes_df, approve_cliente_solicitud, reject_cliente_solicitud, check_client_duplicate
 
 def render_visor_dashboard(user_id, nombre_completo_usuario):
@@ -118,11 +120,10 @@ def render_score_calculation():
         custom_month = selected_month
         custom_year = selected_year
     
-    # Obtener los datos necesarios con filtro de fecha (Restringido a Dpto Tecnico ID 6)
-    # get_registros_by_rol_with_date_filter maneja la conversión de rol_id a int
-    registros_df = get_registros_by_rol_with_date_filter(6, filter_type, custom_month, custom_year, use_created_at=False)
+    # Puntajes agregados en la base (Restringido a Dpto Tecnico ID 6)
+    scores = get_scores(6, filter_type, custom_month, custom_year)
     
-    if registros_df.empty:
+    if scores is None:
         period_text = {
             "current_month": "el mes actual",
             "custom_month": f"{month_name_es(custom_month)} {custom_year}" if custom_month and custom_year else "el período seleccionado",
@@ -131,106 +132,48 @@ def render_score_calculation():
         st.info(f"No hay datos para mostrar en {period_text}")
         return
     
-    # El resto de la función se mantiene igual
-    # Obtener los puntajes de tipos de tarea
-    tipos_puntajes_df = get_tipos_puntajes_dataframe()
-    tipos_dict = dict(zip(tipos_puntajes_df['descripcion'], tipos_puntajes_df['puntaje']))
-    
-    # Obtener los puntajes de clientes
-    clientes_puntajes_df = get_clientes_puntajes_dataframe()
-    clientes_dict = dict(zip(clientes_puntajes_df['nombre'], clientes_puntajes_df['puntaje']))
-    
-    # Obtener los puntajes de grupos
-    grupos_puntajes_df = get_grupos_puntajes_dataframe()
-    grupos_dict = dict(zip(grupos_puntajes_df['nombre'], grupos_puntajes_df['puntaje']))
-    
-    # Crear un DataFrame para almacenar los resultados
-    resultados = []
-    
-    # Calcular puntajes para cada registro según la fórmula PT=(T×C×N)×H
-    for _, registro in registros_df.iterrows():
-        tipo_tarea = registro['tipo_tarea']
-        cliente = registro['cliente']
-        grupo = registro['grupo']
-        horas = registro['tiempo']
-        
-        # Obtener los puntajes (T, C, N) con valor mínimo de 1 para evitar puntajes cero
-        puntaje_tipo = max(1, tipos_dict.get(tipo_tarea, 0))  # T
-        puntaje_cliente = max(1, clientes_dict.get(cliente, 0))  # C
-        puntaje_grupo = max(1, grupos_dict.get(grupo, 0))  # N
-    
-        # Aplicar la fórmula PT=(T×C×N)×H directamente sin raíz cúbica
-        puntaje_total = (puntaje_tipo * puntaje_cliente * puntaje_grupo) * horas
-        
-        # Agregar al resultado
-        resultados.append({
-            'cliente': cliente,
-            'puntaje': puntaje_total,
-            'registro_id': registro.get('id', 0)
-        })
-    
-    # Convertir a DataFrame
-    resultados_df = pd.DataFrame(resultados)
-    
-    # Agrupar por cliente y sumar los puntajes
-    if not resultados_df.empty:
-        # Calcular puntaje total por cliente
-        puntajes_por_cliente = resultados_df.groupby('cliente')['puntaje'].sum().reset_index()
-        
-        # Calcular cantidad de registros por cliente para el promedio
-        conteo_por_cliente = resultados_df.groupby('cliente').size().reset_index(name='cantidad_registros')
-        
-        # Unir los dataframes
-        puntajes_por_cliente = pd.merge(puntajes_por_cliente, conteo_por_cliente, on='cliente')
+    # Puntaje PT=(T×C×N)×H total, cantidad de registros y promedio por cliente
+    puntajes_por_cliente = scores['por_cliente']
+    
+    if not puntajes_por_cliente.empty:
+        # Crear gráfico de barras para el promedio
+        st.subheader("Visualización de Promedio de Puntajes por Cliente")
+        fig = px.bar(
+            puntajes_por_cliente,
+            x='cliente',
+            y='promedio',
+            labels={'cliente': 'Cliente', 'promedio': 'Puntaje Promedio'},
+            title="Promedio de Puntajes por Cliente",
+            color='promedio',
+            color_continuous_scale='Viridis'
+        )
         
-        # Calcular promedio
-        puntajes_por_cliente['promedio'] = puntajes_por_cliente['puntaje'] / puntajes_por_cliente['cantidad_registros']
+        # Personalizar el gráfico
+        fig.update_layout(
+            xaxis_title="Cliente",
+            yaxis_title="Puntaje Promedio",
+            height=500,
+            font=dict(color="var(--text-color)"),
+            paper_bgcolor="rgba(0,0,0,0)",
+            plot_bgcolor="rgba(0,0,0,0)"
+        )
         
-        # Redondear los puntajes al entero más cercano
-        puntajes_por_cliente['puntaje'] = puntajes_por_cliente['puntaje'].round().astype(int)
-        puntajes_por_cliente['promedio'] = puntajes_por_cliente['promedio'].round().astype(int)
+        # Mostrar el gráfico
+        st.plotly_chart(fig, use_container_width=True)
         
-        if not puntajes_por_cliente.empty:
-            # Crear gráfico de barras para el promedio
-            st.subheader("Visualización de Promedio de Puntajes por Cliente")
-            fig = px.bar(
-                puntajes_por_cliente,
-                x='cliente',
-                y='promedio',
-                labels={'cliente': 'Cliente', 'promedio': 'Puntaje Promedio'},
-                title="Promedio de Puntajes por Cliente",
-                color='promedio',
-                color_continuous_scale='Viridis'
-            )
-            
-            # Personalizar el gráfico
-            fig.update_layout(
-                xaxis_title="Cliente",
-                yaxis_title="Puntaje Promedio",
-                height=500,
-                font=dict(color="var(--text-color)"),
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)"
-            )
-            
-            # Mostrar el gráfico
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Mostrar tabla de resultados
-            st.subheader("Puntajes Calculados por Cliente")
-            st.dataframe(
-                puntajes_por_cliente.rename(columns={
-                    'cliente': 'Cliente',
-                    'puntaje': 'Puntaje Total',
-                    'cantidad_registros': 'Cantidad de Registros',
-                    'promedio': 'Promedio'
-                }),
-                use_container_width=True
-            )
-        else:
-            st.info("No hay clientes con puntajes calculados")
+        # Mostrar tabla de resultados
+        st.subheader("Puntajes Calculados por Cliente")
+        st.dataframe(
+            puntajes_por_cliente.rename(columns={
+                'cliente': 'Cliente',
+                'puntaje': 'Puntaje Total',
+                'cantidad_registros': 'Cantidad de Registros',
+                'promedio': 'Promedio'
+            }),
+            use_container_width=True
+        )
     else:
-        st.info("No hay datos suficientes para calcular puntajes")
+        st.info("No hay clientes con puntajes calculados")
 
 # Función para calcular y visualizar puntajes por técnico
 def render_score_calculation_by_technician():
@@ -279,10 +222,10 @@ def render_score_calculation_by_technician():
         custom_month = selected_month
         custom_year = selected_year
     
-    # Obtener los datos necesarios con filtro de fecha
-    registros_df = get_registros_by_rol_with_date_filter(6, filter_type, custom_month, custom_year, use_created_at=False)
+    # Puntajes agregados en la base (Restringido a Dpto Tecnico ID 6)
+    scores = get_scores(6, filter_type, custom_month, custom_year)
     
-    if registros_df.empty:
+    if scores is None:
         period_text = {
             "current_month": "el mes actual",
             "custom_month": f"{calendar.month_name[custom_month]} {custom_year}" if custom_month and custom_year else "el período seleccionado",
@@ -291,167 +234,89 @@ def render_score_calculation_by_technician():
         st.info(f"No hay datos para mostrar en {period_text}")
         return
     
-    # El resto de la función se mantiene igual
-    # Obtener los puntajes de tipos de tarea
-    tipos_puntajes_df = get_tipos_puntajes_dataframe()
-    tipos_dict = dict(zip(tipos_puntajes_df['descripcion'], tipos_puntajes_df['puntaje']))
-    
-    # Obtener los puntajes de clientes
-    clientes_puntajes_df = get_clientes_puntajes_dataframe()
-    clientes_dict = dict(zip(clientes_puntajes_df['nombre'], clientes_puntajes_df['puntaje']))
-    
-    # Obtener los puntajes de grupos
-    grupos_puntajes_df = get_grupos_puntajes_dataframe()
-    grupos_dict = dict(zip(grupos_puntajes_df['nombre'], grupos_puntajes_df['puntaje']))
-    
-    # Crear un DataFrame para almacenar los resultados
-    resultados = []
-    
-    # DataFrame para diagnóstico de puntajes cero
-    diagnostico_ceros = []
-    
-    # Calcular puntajes para cada registro según la fórmula PT=(T×C×N)×H
-    for _, registro in registros_df.iterrows():
-        tipo_tarea = registro['tipo_tarea']
-        cliente = registro['cliente']
-        grupo = registro['grupo']
-        tecnico = registro['tecnico']
-        horas = registro['tiempo']
-        
-        # Obtener los puntajes originales (T, C, N)
-        puntaje_tipo_orig = tipos_dict.get(tipo_tarea, 0)  # T
-        puntaje_cliente_orig = clientes_dict.get(cliente, 0)  # C
-        puntaje_grupo_orig = grupos_dict.get(grupo, 0)  # N
-        
-        # Verificar si algún puntaje es cero para diagnóstico
-        if puntaje_tipo_orig == 0 or puntaje_cliente_orig == 0 or puntaje_grupo_orig == 0:
-            diagnostico_ceros.append({
-                'tecnico': tecnico,
-                'tipo_tarea': tipo_tarea,
-                'cliente': cliente,
-                'grupo': grupo,
-                'puntaje_tipo': puntaje_tipo_orig,
-                'puntaje_cliente': puntaje_cliente_orig,
-                'puntaje_grupo': puntaje_grupo_orig,
-                'horas': horas
-            })
-        
-        # Aplicar valor mínimo de 1 para evitar puntajes cero
-        puntaje_tipo = max(1, puntaje_tipo_orig)  # T
-        puntaje_cliente = max(1, puntaje_cliente_orig)  # C
-        puntaje_grupo = max(1, puntaje_grupo_orig)  # N
-    
-        # Aplicar la fórmula PT=(T×C×N)×H directamente sin raíz cúbica
-        puntaje_total = (puntaje_tipo * puntaje_cliente * puntaje_grupo) * horas
-        
-        # Agregar al resultado
-        resultados.append({
-            'tecnico': tecnico,
-            'puntaje': puntaje_total,
-            'registro_id': registro.get('id', 0)
-        })
-    
-    # Convertir a DataFrame
-    resultados_df = pd.DataFrame(resultados)
-    
-    # Agrupar por técnico y sumar los puntajes
-    if not resultados_df.empty:
-        # Calcular puntaje total por técnico
-        puntajes_por_tecnico = resultados_df.groupby('tecnico')['puntaje'].sum().reset_index()
-        
-        # Calcular cantidad de registros por técnico para el promedio
-        conteo_por_tecnico = resultados_df.groupby('tecnico').size().reset_index(name='cantidad_registros')
+    # Puntaje PT=(T×C×N)×H total, cantidad de registros y promedio por técnico
+    puntajes_por_tecnico = scores['por_tecnico']
+    
+    # Combinaciones con algún factor de puntaje en cero (se calcularon con factor 1)
+    diagnostico_df = scores['diagnostico_ceros']
+    
+    if not puntajes_por_tecnico.empty:
+        # Crear gráfico de barras para el promedio
+        st.subheader("Visualización de Promedio de Puntajes por Técnico")
+        fig = px.bar(
+            puntajes_por_tecnico,
+            x='tecnico',
+            y='promedio',
+            labels={'tecnico': 'Técnico', 'promedio': 'Puntaje Promedio'},
+            title="Promedio de Puntajes por Técnico",
+            color='promedio',
+            color_continuous_scale='Viridis'
+        )
         
-        # Unir los dataframes
-        puntajes_por_tecnico = pd.merge(puntajes_por_tecnico, conteo_por_tecnico, on='tecnico')
+        # Personalizar el gráfico
+        fig.update_layout(
+            xaxis_title="Técnico",
+            yaxis_title="Puntaje Promedio",
+            height=500,
+            font=dict(color="var(--text-color)"),
+            paper_bgcolor="rgba(0,0,0,0)",
+            plot_bgcolor="rgba(0,0,0,0)"
+        )
         
-        # Calcular promedio
-        puntajes_por_tecnico['promedio'] = puntajes_por_tecnico['puntaje'] / puntajes_por_tecnico['cantidad_registros']
+        # Mostrar el gráfico
+        st.plotly_chart(fig, use_container_width=True)
         
-        # Redondear los puntajes al entero más cercano
-        puntajes_por_tecnico['puntaje'] = puntajes_por_tecnico['puntaje'].round().astype(int)
-        puntajes_por_tecnico['promedio'] = puntajes_por_tecnico['promedio'].round().astype(int)
+        # Mostrar tabla de resultados
+        st.subheader("Puntajes Calculados por Técnico")
+        st.dataframe(
+            puntajes_por_tecnico.rename(columns={
+                'tecnico': 'Técnico',
+                'puntaje': 'Puntaje Total',
+                'cantidad_registros': 'Cantidad de Registros',
+                'promedio': 'Promedio'
+            }),
+            use_container_width=True
+        )
         
-        if not puntajes_por_tecnico.empty:
-            # Crear gráfico de barras para el promedio
-            st.subheader("Visualización de Promedio de Puntajes por Técnico")
-            fig = px.bar(
-                puntajes_por_tecnico,
-                x='tecnico',
-                y='promedio',
-                labels={'tecnico': 'Técnico', 'promedio': 'Puntaje Promedio'},
-                title="Promedio de Puntajes por Técnico",
-                color='promedio',
-                color_continuous_scale='Viridis'
-            )
-            
-            # Personalizar el gráfico
-            fig.update_layout(
-                xaxis_title="Técnico",
-                yaxis_title="Puntaje Promedio",
-                height=500,
-                font=dict(color="var(--text-color)"),
-                paper_bgcolor="rgba(0,0,0,0)",
-                plot_bgcolor="rgba(0,0,0,0)"
-            )
-            
-            # Mostrar el gráfico
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Mostrar tabla de resultados
-            st.subheader("Puntajes Calculados por Técnico")
-            st.dataframe(
-                puntajes_por_tecnico.rename(columns={
-                    'tecnico': 'Técnico',
-                    'puntaje': 'Puntaje Total',
-                    'cantidad_registros': 'Cantidad de Registros',
-                    'promedio': 'Promedio'
-                }),
-                use_container_width=True
-            )
-            
-            # Mostrar diagnóstico de puntajes cero si hay datos
-            if diagnostico_ceros:
-                with st.expander("Diagnóstico de Puntajes Cero", expanded=False):
-                    st.subheader("Registros con Factores de Puntaje Cero")
-                    diagnostico_df = pd.DataFrame(diagnostico_ceros)
-                    st.dataframe(diagnostico_df, use_container_width=True)
-                    
-                    # Análisis de factores que causan puntajes cero
-                    st.subheader("Análisis de Factores que Causan Puntajes Cero")
-                    
-                    # Contar ocurrencias de cada factor
-                    factor_tipo = (diagnostico_df['puntaje_tipo'] == 0).sum()
-                    factor_cliente = (diagnostico_df['puntaje_cliente'] == 0).sum()
-                    factor_grupo = (diagnostico_df['puntaje_grupo'] == 0).sum()
-                    
-                    # Crear DataFrame para visualización
-                    factores_df = pd.DataFrame({
-                        'Factor': ['Tipo de Tarea', 'Cliente', 'Grupo'],
-                        'Ocurrencias': [factor_tipo, factor_cliente, factor_grupo]
-                    })
-                    
-                    # Mostrar gráfico de barras
-                    fig_factores = px.bar(
-                        factores_df,
-                        x='Factor',
-                        y='Ocurrencias',
-                        title="Factores que Causan Puntajes Cero",
-                        color='Ocurrencias',
-                        color_continuous_scale='Reds'
-                    )
-                    
-                    fig_factores.update_layout(
-                        font=dict(color="var(--text-color)"),
-                        paper_bgcolor="rgba(0,0,0,0)",
-                        plot_bgcolor="rgba(0,0,0,0)"
-                    )
-                    
-                    st.plotly_chart(fig_factores, use_container_width=True)
-        else:
-            st.info("No hay técnicos con puntajes calculados")
+        # Mostrar diagnóstico de puntajes cero si hay datos
+        if not diagnostico_df.empty:
+            with st.expander("Diagnóstico de Puntajes Cero", expanded=False):
+                st.subheader("Registros con Factores de Puntaje Cero")
+                st.dataframe(diagnostico_df, use_container_width=True)
+                
+                # Análisis de factores que causan puntajes cero
+                st.subheader("Análisis de Factores que Causan Puntajes Cero")
+                
+                # Contar ocurrencias de cada factor (en registros, no en combinaciones)
+                factor_tipo = diagnostico_df.loc[diagnostico_df['puntaje_tipo'] == 0, 'registros'].sum()
+                factor_cliente = diagnostico_df.loc[diagnostico_df['puntaje_cliente'] == 0, 'registros'].sum()
+                factor_grupo = diagnostico_df.loc[diagnostico_df['puntaje_grupo'] == 0, 'registros'].sum()
+                
+                # Crear DataFrame para visualización
+                factores_df = pd.DataFrame({
+                    'Factor': ['Tipo de Tarea', 'Cliente', 'Grupo'],
+                    'Ocurrencias': [factor_tipo, factor_cliente, factor_grupo]
+                })
+                
+                # Mostrar gráfico de barras
+                fig_factores = px.bar(
+                    factores_df,
+                    x='Factor',
+                    y='Ocurrencias',
+                    title="Factores que Causan Puntajes Cero",
+                    color='Ocurrencias',
+                    color_continuous_scale='Reds'
+                )
+                
+                fig_factores.update_layout(
+                    font=dict(color="var(--text-color)"),
+                    paper_bgcolor="rgba(0,0,0,0)",
+                    plot_bgcolor="rgba(0,0,0,0)"
+                )
+                
+                st.plotly_chart(fig_factores, use_container_width=True)
     else:
-        st.info("No hay datos suficientes para calcular puntajes")
+        st.info("No hay técnicos con puntajes calculados")
 
 def render_records_management(user_id):
     """Renderiza la sección de gestión para hipervisores"""
@@ -693,10 +558,10 @@ def render_efficiency_analysis():
         custom_month = selected_month
         custom_year = selected_year
     
-    # Obtener los datos necesarios con filtro de fecha
-    registros_df = get_registros_dataframe_with_date_filter(filter_type, custom_month, custom_year)
+    # Horas por (cliente, tipo de tarea, grupo) desde el resumen mensual
+    base_df = get_hours_rollup(('cliente', 'tipo_tarea', 'grupo'), filter_type, custom_month, custom_year)
     
-    if registros_df.empty:
+    if base_df.empty:
         period_text = {
             "current_month": "el mes actual",
             "custom_month": f"{month_name_es(custom_month)} {custom_year}" if custom_month and custom_year else "el período seleccionado",
@@ -705,62 +570,19 @@ def render_efficiency_analysis():
         st.info(f"No hay datos para mostrar en {period_text}")
         return
     
-    # Obtener los puntajes de tipos de tarea
-    tipos_puntajes_df = get_tipos_puntajes_dataframe()
-    tipos_dict = dict(zip(tipos_puntajes_df['descripcion'], tipos_puntajes_df['puntaje']))
-    
-    # Obtener los puntajes de clientes
+    # Obtener los puntajes de clientes (para el umbral beta)
     clientes_puntajes_df = get_clientes_puntajes_dataframe()
     clientes_dict = dict(zip(clientes_puntajes_df['nombre'], clientes_puntajes_df['puntaje']))
     
-    # Obtener los puntajes de grupos
-    grupos_puntajes_df = get_grupos_puntajes_dataframe()
-    grupos_dict = dict(zip(grupos_puntajes_df['nombre'], grupos_puntajes_df['puntaje']))
-    
     # Calcular eficiencia para cada cliente
     # Eficiencia (Rc) = Valor del Cliente / Horas Invertidas
     # Valor del Cliente = Suma de (T x N x H) para todos los registros de ese cliente
     # T = Puntaje del tipo de tarea
     # N = Puntaje del grupo
     # H = Horas
-    
-    resultados_eficiencia = []
-    
-    # Agrupar registros por cliente
-    for cliente, grupo_registros in registros_df.groupby('cliente'):
-        # Calcular valor total del cliente
-        valor_total = 0
-        horas_totales = 0
-        
-        for _, registro in grupo_registros.iterrows():
-            tipo_tarea = registro['tipo_tarea']
-            grupo = registro['grupo']
-            horas = registro['tiempo']
-            
-            # Obtener puntajes (mínimo 1)
-            puntaje_tipo = max(1, tipos_dict.get(tipo_tarea, 0))  # T
-            puntaje_grupo = max(1, grupos_dict.get(grupo, 0))  # N
-            
-            # Calcular valor del registro: (T x N) x H
-            # Nota: No incluimos el puntaje del cliente (C) en el cálculo del valor
-            # porque queremos comparar este valor con las horas invertidas
-            valor_registro = (puntaje_tipo * puntaje_grupo) * horas
-            
-            valor_total += valor_registro
-            horas_totales += horas
-        
-        # Calcular relación Rc = Valor / Horas
-        relacion = valor_total / horas_totales if horas_totales > 0 else 0
-        
-        resultados_eficiencia.append({
-            'cliente': cliente,
-            'horas_totales': horas_totales,
-            'puntaje': valor_total,
-            'relacion_horas_valor': relacion
-        })
-    
-    # Convertir a DataFrame
-    eficiencia_df = pd.DataFrame(resultados_eficiencia)
+    # Nota: No incluimos el puntaje del cliente (C) en el cálculo del valor
+    # porque queremos comparar este valor con las horas invertidas
+    eficiencia_df = compute_client_efficiency(base_df, get_tipos_puntajes_dataframe(), get_grupos_puntajes_dataframe())
     
     if eficiencia_df.empty:
         st.info("No hay datos suficientes para calcular la eficiencia")
@@ -917,87 +739,18 @@ def get_technical_alerts_data():
         if not users:
             return {}
             
-        # 3. Obtener registros del mes actual para estos usuarios
-        now = datetime.now()
-        start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_date = now.replace(hour=23, minute=59, second=59)
-        
-        user_ids = [u[0] for u in users]
-        if not user_ids:
-            return {}
-            
-        user_placeholders = ','.join(['%s'] * len(user_ids))
-        
-        c.execute(f"""
-            SELECT usuario_id, fecha, tiempo
-            FROM registros
-            WHERE usuario_id IN ({user_placeholders})
-        """, tuple(user_ids))
-        
-        regs = c.fetchall() # list of (usuario_id, fecha, tiempo)
-        
-        # Organizar registros por usuario
-        regs_by_user = {}
-        for uid, fecha, tiempo in regs:
-            if uid not in regs_by_user:
-                regs_by_user[uid] = []
-            
-            # Asegurar fecha como date object
-            fecha_obj = None
-            if isinstance(fecha, str):
-                # Intentar varios formatos comunes
-                formats = ['%d/%m/%y', '%d/%m/%Y', '%Y-%m-%d']
-                for fmt in formats:
-                    try:
-                        fecha_obj = datetime.strptime(fecha, fmt).date()
-                        break
-                    except ValueError:
-                        continue
-                if fecha_obj is None:
-                    # Fallback pandas
-                    try:
-                        fecha_obj = pd.to_datetime(fecha, dayfirst=True).date()
-                    except:
-                        continue
-            elif isinstance(fecha, datetime):
-                fecha_obj = fecha.date()
-            else:
-                fecha_obj = fecha # asume date object
-            
-            if fecha_obj:
-                regs_by_user[uid].append({'fecha': fecha_obj, 'tiempo': float(tiempo)})
-            
-        # 4. Verificar días incompletos para cada usuario
+        # 3. Días hábiles del mes en curso con menos de 4 horas, para todos los usuarios a la vez
+        from .workday_coverage import get_pending_load_alerts
+        today = datetime.now().date()
+        alerts_by_user = get_pending_load_alerts([u[0] for u in users], today.replace(day=1), today, conn=conn)
+
         for uid, nombre, apellido, username in users:
             full_name = f"{nombre or ''} {apellido or ''}".strip()
             if not full_name:
                 full_name = username
-                
-            user_alerts = []
-            current = start_date
-            
-            user_regs = regs_by_user.get(uid, [])
-            
-            while current <= end_date:
-                # Solo Lunes a Viernes (0-4)
-                if current.weekday() < 5:
-                    day_hours = 0
-                    current_date = current.date()
-                    
-                    for r in user_regs:
-                        if r['fecha'] == current_date:
-                            day_hours += r['tiempo']
-                    
-                    if day_hours < 4:
-                        date_str = current.strftime("%d/%m")
-                        status = "Sin carga" if day_hours == 0 else f"{day_hours}hs"
-                        user_alerts.append(f"{date_str} ({status})")
-                        
-                current += timedelta(days=1)
-            
-            if user_alerts:
-                alerts[full_name] = user_alerts
-                
+            if alerts_by_user.get(uid):
+                alerts[full_name] = alerts_by_user[uid]
+
     except Exception as e:
         print(f"Error getting technical alerts: {e}")
         pass
@@ -1230,7 +983,7 @@ def render_visor_only_dashboard():
             icon_str = "🔔" if has_alerts else "🔕"
             with st.popover(icon_str, use_container_width=False):
                 st.markdown("### ⚠️ Técnicos con carga incompleta")
-                st.caption("Umbral mínimo: 4 horas (lun-vie) - Mes en curso")
+                st.caption("Umbral mínimo: 4 horas (lun-vie, sin feriados) - Mes en curso")
                 if not has_alerts:
                     st.info("Todo el equipo al día. ¡Excelente!")
                 else:
@@ -0,0 +1,79 @@
+"""
+Cobertura de horas cargadas por día hábil.
+
+Las alertas de carga incompleta (panel del visor y notificación de carga
+pendiente) recorrían día por día y, para cada uno, los registros del usuario. Aquí
+las horas se agregan por (usuario, día) con un único GROUP BY para todos los
+usuarios del rango, se cruzan con los días hábiles del calendario de feriados y
+se obtiene de una vez la matriz usuarios × días con los déficits.
+"""
+import numpy as np
+import pandas as pd
+
+from .database import get_connection, registros_fecha_sql
+from .holiday_calendar import get_holiday_calendar
+
+MIN_DAILY_HOURS = 4
+
+
+def load_daily_hours(user_ids, start, end, conn=None):
+    """Horas cargadas por (usuario_id, fecha) entre start y end, con una sola consulta"""
+    user_ids = [int(u) for u in user_ids]
+    if not user_ids:
+        return pd.DataFrame(columns=['usuario_id', 'fecha', 'horas'])
+    close_conn = conn is None
+    if close_conn:
+        conn = get_connection()
+    try:
+        c = conn.cursor()
+        fecha_sql = registros_fecha_sql(alias=None)
+        c.execute(f"""
+            SELECT usuario_id, {fecha_sql} AS fecha, SUM(tiempo) AS horas
+            FROM registros
+            WHERE usuario_id = ANY(%s)
+              AND {fecha_sql} BETWEEN %s AND %s
+            GROUP BY 1, 2
+        """, (user_ids, pd.to_datetime(start).date(), pd.to_datetime(end).date()))
+        rows = c.fetchall()
+    finally:
+        if close_conn:
+            conn.close()
+    df = pd.DataFrame(rows, columns=['usuario_id', 'fecha', 'horas'])
+    df['horas'] = df['horas'].astype(float)
+    return df
+
+
+def coverage_matrix(user_ids, start, end, conn=None):
+    """Horas por usuario (filas) y día hábil (columnas, date) entre start y end; 0 si no cargó"""
+    user_ids = [int(u) for u in user_ids]
+    days = get_holiday_calendar(start, end).business_days(start, end)
+    matrix = pd.DataFrame(0.0, index=pd.Index(user_ids, name='usuario_id'), columns=days)
+    if not user_ids or not days:
+        return matrix
+    daily = load_daily_hours(user_ids, start, end, conn=conn)
+    if not daily.empty:
+        pivot = daily.pivot_table(index='usuario_id', columns='fecha', values='horas', aggfunc='sum')
+        matrix = pivot.reindex(index=matrix.index, columns=days).fillna(0.0).rename_axis(columns=None)
+    return matrix
+
+
+def coverage_deficits(matrix, min_hours=MIN_DAILY_HOURS):
+    """{usuario_id: [(fecha, horas), ...]} con los días hábiles por debajo de min_hours"""
+    values = matrix.to_numpy()
+    rows, cols = np.nonzero(values < min_hours)
+    deficits = {}
+    for r, col in zip(rows, cols):
+        deficits.setdefault(int(matrix.index[r]), []).append((matrix.columns[col], float(values[r, col])))
+    return deficits
+
+
+def format_deficit(fecha, horas):
+    """Texto de alerta de un día: '05/03 (Sin carga)' o '05/03 (2.5hs)'"""
+    status = "Sin carga" if horas == 0 else f"{horas:g}hs"
+    return f"{fecha.strftime('%d/%m')} ({status})"
+
+
+def get_pending_load_alerts(user_ids, start, end, min_hours=MIN_DAILY_HOURS, conn=None):
+    """{usuario_id: [textos de alerta]} para los usuarios con días hábiles incompletos"""
+    deficits = coverage_deficits(coverage_matrix(user_ids, start, end, conn=conn), min_hours)
+    return {uid: [format_deficit(fecha, horas) for fecha, horas in days] for uid, days in deficits.items()}
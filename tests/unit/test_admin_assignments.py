@@ -0,0 +1,36 @@
+import random
+
+from modules.admin_assignments import (
+    UserNameIndex, find_matching_user_by_components,
+    _calcular_coincidencia_componentes, _extraer_componentes, _puntuar_coincidencia,
+)
+
+
+def _mejor_por_recorrido_completo(tecnico_nombre, usuarios):
+    componentes_tecnico = _extraer_componentes(tecnico_nombre)
+    if not componentes_tecnico:
+        return None, 0
+    mejor_id, mejor_puntuacion = None, 0
+    for usuario_id, nombre, apellido, _, _ in usuarios:
+        componentes_usuario = _extraer_componentes(f"{nombre} {apellido}".strip())
+        if not componentes_usuario:
+            continue
+        resultado = _calcular_coincidencia_componentes(componentes_tecnico, componentes_usuario)
+        puntuacion = _puntuar_coincidencia(resultado, componentes_tecnico)
+        if puntuacion > mejor_puntuacion:
+            mejor_id, mejor_puntuacion = usuario_id, puntuacion
+    return mejor_id, mejor_puntuacion
+
+
+def test_indice_puntua_igual_que_recorrido_completo():
+    rng = random.Random(11)
+    palabras = ["Juan", "José", "Pérez", "Gomez", "Ana", "María", "Lopez", "Díaz", "Sosa", "de", "la", "Torres"]
+    usuarios = [(i, " ".join(rng.sample(palabras, rng.randint(0, 3))), " ".join(rng.sample(palabras, rng.randint(0, 3))), 1, "Rol")
+                for i in range(150)]
+    indice = UserNameIndex(usuarios)
+    assert len(indice) == 150
+
+    for tecnico in [" ".join(rng.sample(palabras, rng.randint(0, 5))) for _ in range(500)] + ["Zoe", "jose"]:
+        mejor_usuario, puntuacion = find_matching_user_by_components(tecnico, indice)
+        esperado = _mejor_por_recorrido_completo(tecnico, usuarios)
+        assert ((mejor_usuario or {}).get("id"), puntuacion) == esperado, tecnico
@@ -0,0 +1,45 @@
+import pytest
+from modules import database as db
+from modules.admin_panel import bulk_load_registros
+
+
+def test_bulk_load_registros_duplicados():
+    """COPY + INSERT set-based: omite claves existentes y repetidas, actualiza grupo/hora extra"""
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO tecnicos (nombre) VALUES ('Tecnico Bulk Test') RETURNING id_tecnico")
+        id_tecnico = c.fetchone()[0]
+        c.execute("INSERT INTO clientes (nombre) VALUES ('Cliente Bulk Test') RETURNING id_cliente")
+        id_cliente = c.fetchone()[0]
+        c.execute("INSERT INTO tipos_tarea (descripcion) VALUES ('Tipo Bulk Test') RETURNING id_tipo")
+        id_tipo = c.fetchone()[0]
+        c.execute("INSERT INTO modalidades_tarea (descripcion) VALUES ('Modalidad Bulk Test') RETURNING id_modalidad")
+        id_modalidad = c.fetchone()[0]
+        ids = (id_tecnico, id_cliente, id_tipo, id_modalidad)
+
+        def fila(fecha, tarea, grupo, hora_extra):
+            return (fecha,) + ids + (tarea, 'N/A', 2, 'desc, con "comillas"', 3, grupo, hora_extra)
+
+        assert bulk_load_registros(conn, [fila('01/03/25', 'A', 'General', False)]) == 1
+        inserted = bulk_load_registros(conn, [
+            fila('01/03/25', 'A', 'Soporte', True),   # ya existe: solo actualiza
+            fila('02/03/25', 'B', 'General', False),
+            fila('02/03/25', 'B', 'Redes', True),     # repetida en la planilla: gana la última
+        ])
+        assert inserted == 1
+
+        c.execute("""
+            SELECT fecha, tarea_realizada, grupo, es_hora_extra, descripcion FROM registros
+            WHERE id_tecnico = %s ORDER BY fecha
+        """, (id_tecnico,))
+        assert c.fetchall() == [
+            ('01/03/25', 'A', 'Soporte', True, 'desc, con "comillas"'),
+            ('02/03/25', 'B', 'Redes', True, 'desc, con "comillas"'),
+        ]
+    finally:
+        conn.rollback()
+        conn.close()
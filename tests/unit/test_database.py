@@ -1,6 +1,7 @@
 import pytest
 import psycopg2
-from datetime import datetime
+import pandas as pd
+from datetime import date, datetime
 from modules import database as db
 
 def test_get_connection():
@@ -50,6 +51,16 @@ def test_notification_policy_due_now_weekly():
     assert db._notification_policy_due_now(policy, datetime(2026, 3, 26, 17, 0)) is False
 
 
+def test_prepare_event_renderiza_por_destinatario(monkeypatch):
+    monkeypatch.setattr(db, "get_notification_template", lambda key: {
+        'enabled': True, 'subject': 'Hola {nombre}', 'body': '{solicitante} pidió {cliente} ({extra}) {faltante}.',
+    })
+    users = {7: {'display_name': 'Ana Pérez'}}
+    prepared = db._notification_prepare_event(None, 'cliente_solicitud_creada', {'requested_by': 7, 'cliente': 'ACME', 'extra': [1]}, datetime(2024, 5, 2, 9, 0), users=users)
+    assert prepared['render']({'display_name': 'Admin', 'email': 'a@example.com'}) == ('Hola Admin', 'Ana Pérez pidió ACME ([1]) .')
+    assert prepared['render']({'email': 'b@example.com'})[0] == 'Hola b@example.com'
+
+
 def test_send_test_notification_email_uses_smtp_account(monkeypatch):
     captured = {}
 
@@ -73,3 +84,158 @@ def test_send_test_notification_email_uses_smtp_account(monkeypatch):
     assert captured["recipient_email"] == "admin@example.com"
     assert "Prueba de correo SMTP" in captured["subject"]
     assert "SIGO" in captured["body"]
+
+
+def test_migraciones_registradas_e_idempotentes():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    from modules.schema_migrations import apply_migrations, get_applied_versions, LATEST_SCHEMA_VERSION
+
+    assert db.ensure_schema(force=True) is True
+    with db.db_connection() as conn:
+        assert apply_migrations(conn) == []
+        assert max(get_applied_versions(conn)) == LATEST_SCHEMA_VERSION
+
+
+def test_claim_de_eventos_no_se_repite_entre_workers():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+    event_id = db.queue_notification_event('test_claim', {}, dedupe_key='test_claim:1')
+    conn_a = db.get_connection()
+    conn_b = db.get_connection()
+    otros = []
+    try:
+        row = db._notification_claim_event(conn_a)
+        while row is not None and row['id'] != event_id:
+            otros.append(row['id'])
+            row = db._notification_claim_event(conn_a, exclude_ids=otros)
+        assert row is not None
+        # Reservado por conn_a: otro worker no lo toma
+        again = db._notification_claim_event(conn_b, exclude_ids=otros)
+        assert again is None or again['id'] != event_id
+        if again is not None:
+            db._notification_release_event(conn_b, again['id'])
+        db._notification_release_event(conn_a, event_id)
+        assert db._notification_claim_event(conn_b, exclude_ids=otros)['id'] == event_id
+    finally:
+        for other_id in otros:
+            db._notification_release_event(conn_a, other_id)
+        c = conn_a.cursor()
+        c.execute("DELETE FROM notification_event_queue WHERE event_key = 'test_claim'")
+        conn_a.commit()
+        conn_a.close()
+        conn_b.close()
+
+
+def test_resumen_mensual_sigue_a_registros():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+    from modules.hours_rollup import check_hours_rollup
+
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("""
+            SELECT (SELECT MIN(id_tecnico) FROM tecnicos), (SELECT MIN(id_cliente) FROM clientes),
+                   (SELECT MIN(id_tipo) FROM tipos_tarea), (SELECT MIN(id_modalidad) FROM modalidades_tarea)
+        """)
+        ids = c.fetchone()
+        if None in ids:
+            pytest.skip("Faltan técnicos, clientes o tipos para insertar registros de prueba.")
+        c.execute("""
+            INSERT INTO registros (id_tecnico, id_cliente, id_tipo, id_modalidad, numero_ticket, mes,
+                                   tarea_realizada, fecha, tiempo, grupo)
+            SELECT %s, %s, %s, %s, 'T', 'Marzo', 'test', fecha, 1.5, grupo
+            FROM (VALUES ('05/03/26', 'G'), ('2026-03-20', NULL), ('sin fecha', 'G')) v(fecha, grupo)
+            RETURNING id
+        """, ids)
+        nuevos = [r[0] for r in c.fetchall()]
+        assert check_hours_rollup(conn) == []
+        c.execute("UPDATE registros SET fecha = '2026-04-01', tiempo = 3 WHERE id = %s", (nuevos[0],))
+        c.execute("DELETE FROM registros WHERE id = %s", (nuevos[1],))
+        assert check_hours_rollup(conn) == []
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def test_bajas_de_registros_por_usuario():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+
+    conn = db.get_connection()
+    try:
+        c = conn.cursor()
+        c.execute("""
+            SELECT (SELECT MIN(id_tecnico) FROM tecnicos), (SELECT MIN(id_cliente) FROM clientes),
+                   (SELECT MIN(id_tipo) FROM tipos_tarea), (SELECT MIN(id_modalidad) FROM modalidades_tarea),
+                   (SELECT MIN(id) FROM usuarios), (SELECT MAX(id) FROM usuarios)
+        """)
+        ids = c.fetchone()
+        if None in ids:
+            pytest.skip("Faltan datos de referencia para insertar registros de prueba.")
+        c.execute("""
+            INSERT INTO registros (id_tecnico, id_cliente, id_tipo, id_modalidad, numero_ticket, mes,
+                                   tarea_realizada, fecha, tiempo, usuario_id)
+            SELECT %s, %s, %s, %s, 'T', 'Marzo', 'test', '05/03/26', 1, %s FROM generate_series(1, 2)
+            RETURNING id
+        """, ids[:5])
+        borrado, reasignado = sorted(r[0] for r in c.fetchall())
+        c.execute("DELETE FROM registros WHERE id = %s", (borrado,))
+        c.execute("UPDATE registros SET usuario_id = NULL WHERE id = %s", (reasignado,))
+        c.execute("SELECT registro_id FROM registros_eliminados WHERE usuario_id = %s AND registro_id IN %s",
+                  (ids[4], (borrado, reasignado)))
+        assert sorted(r[0] for r in c.fetchall()) == [borrado, reasignado]
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def test_merge_registros_delta():
+    cached = pd.DataFrame({
+        "id": [3, 2, 1],
+        "fecha": pd.to_datetime(["2026-03-05", "2026-03-04", "2026-03-01"]),
+        "tiempo": [1.0, 2.0, 3.0],
+    })
+    cached["fecha_dt"] = cached["fecha"]  # columna auxiliar agregada por quien lee el caché
+    delta = pd.DataFrame({
+        "id": [4, 2],
+        "fecha": pd.to_datetime(["2026-03-02", "2026-03-06"]),
+        "tiempo": [4.0, 5.0],
+    })
+    merged = db.merge_registros_delta(cached, delta, deleted_ids=[1])
+    assert merged["id"].tolist() == [2, 3, 4]
+    assert merged["tiempo"].tolist() == [5.0, 1.0, 4.0]
+    assert list(merged.columns) == ["id", "fecha", "tiempo"]
+    assert db.merge_registros_delta(cached, delta.iloc[0:0], deleted_ids=[])["id"].tolist() == [3, 2, 1]
+
+
+def test_registro_fecha_to_date_formatos():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+    with db.db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT registro_fecha_to_date('05/03/26'), registro_fecha_to_date('05/03/2026'),
+                   registro_fecha_to_date('2026-03-05'), registro_fecha_to_date('31/02/26'),
+                   registro_fecha_to_date('sin fecha')
+        """)
+        assert c.fetchone() == (date(2026, 3, 5), date(2026, 3, 5), date(2026, 3, 5), None, None)
+
+
+def test_process_registros_df_formatos_mixtos():
+    df = pd.DataFrame({
+        "fecha": ["05/03/26", "2026-04-07", "9/12/2025", None, "sin fecha"],
+        "mes": ["", "", "", "", ""],
+    })
+    result = db.process_registros_df(df)
+
+    assert result["fecha"].tolist()[:3] == [
+        pd.Timestamp(2026, 4, 7), pd.Timestamp(2026, 3, 5), pd.Timestamp(2025, 12, 9)
+    ]
+    assert result["mes"].tolist()[:3] == ["Abril", "Marzo", "Diciembre"]
+    assert result["fecha"].isna().sum() == 2
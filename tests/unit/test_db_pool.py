@@ -0,0 +1,68 @@
+import pytest
+from modules import database as db
+from modules.config import POSTGRES_CONFIG
+from modules.db_pool import ConnectionPool, PoolTimeoutError
+
+
+def _make_pool(**kwargs):
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    connect_kwargs = {k: POSTGRES_CONFIG[k] for k in ('host', 'port', 'database', 'user', 'password')}
+    return ConnectionPool(connect_kwargs, **kwargs)
+
+
+def test_pool_reutiliza_conexiones():
+    pool = _make_pool(min_size=1, max_size=2)
+    conn = pool.acquire()
+    backend_pid = conn.get_backend_pid()
+    conn.close()
+    conn.close()  # cerrar dos veces no debe duplicar la conexión en el pool
+    assert pool.stats()['idle'] == 1
+
+    again = pool.acquire()
+    assert again.get_backend_pid() == backend_pid
+    again.close()
+    pool.close()
+
+
+def test_pool_revierte_transaccion_pendiente_al_devolver():
+    pool = _make_pool(min_size=1, max_size=1)
+    conn = pool.acquire()
+    c = conn.cursor()
+    c.execute("CREATE TEMP TABLE pool_tmp (id INTEGER)")
+    conn.close()
+
+    again = pool.acquire()
+    assert again.autocommit is False
+    c = again.cursor()
+    c.execute("SELECT to_regclass('pg_temp.pool_tmp')")
+    assert c.fetchone()[0] is None
+    again.rollback()
+    again.autocommit = True
+    again.close()
+
+    third = pool.acquire()
+    assert third.autocommit is False
+    third.close()
+    pool.close()
+
+
+def test_pool_timeout_cuando_se_agota():
+    pool = _make_pool(min_size=0, max_size=1, timeout=1)
+    conn = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    conn.close()
+    pool.acquire().close()
+    pool.close()
+
+
+def test_get_engine_comparte_pool():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    pool = db.get_connection_pool()
+    with db.get_engine().connect() as sa_conn:
+        in_use = pool.stats()['in_use']
+        assert in_use >= 1
+        assert sa_conn.exec_driver_sql("SELECT 1").scalar() == 1
+    assert pool.stats()['in_use'] == in_use - 1
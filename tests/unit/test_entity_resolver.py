@@ -0,0 +1,62 @@
+import random
+
+from modules.entity_resolver import EntityResolver
+from modules.utils import find_cliente_id, normalize_name
+
+
+def test_find_equivale_a_busqueda_lineal_de_clientes():
+    rng = random.Random(7)
+    palabras = ["Acme", "S.A.", "Sur", "Norte", "Sistemas", "SRL", "Banco", "Río", "de", "la", "Plata", "X"]
+    clientes = [(i + 1, " ".join(rng.sample(palabras, rng.randint(1, 3)))) for i in range(200)]
+    normalized_client_map = {}
+    for cid, cname in clientes:
+        norm = normalize_name(cname)
+        if norm:
+            normalized_client_map[norm] = cid
+    resolver = EntityResolver(clientes)
+
+    consultas = [nombre for _, nombre in clientes[:50]]
+    consultas += [" ".join(rng.sample(palabras, rng.randint(1, 4))) for _ in range(300)]
+    consultas += ["acme", "ACMESUR", "Banco de la Plata Sur", "zz", "Ri", ""]
+    for consulta in consultas:
+        assert resolver.find(consulta) == find_cliente_id(consulta, clientes, normalized_client_map), consulta
+
+
+def test_add_indexa_entidades_nuevas():
+    resolver = EntityResolver([(1, "Juan Pérez")])
+    assert resolver.get('text', "  juan   perez ") == 1
+    assert resolver.get('text', "Ana Gómez") is None
+    resolver.add(2, "Ana Gómez")
+    assert resolver.get('text', "ana gomez") == 2
+    assert resolver.get('lower', "ANA  GÓMEZ") == 2
+    assert resolver.find("ana g") == 2
+
+
+def test_indice_compartido_por_tabla_y_recarga_ante_faltante(monkeypatch):
+    from modules import entity_resolver
+    from modules.query_cache import clear_query_cache, invalidate_tables
+
+    filas = {'tecnicos': [(1, "Juan Pérez")], 'clientes': [(7, "Acme")]}
+    lecturas = []
+
+    def fake_load(table, conn=None):
+        lecturas.append(table)
+        return EntityResolver(filas[table])
+
+    monkeypatch.setattr(entity_resolver, 'load_entity_resolver', fake_load)
+    clear_query_cache()
+    try:
+        assert entity_resolver.lookup_entity_id('tecnicos', "Juan Pérez") == 1
+        assert entity_resolver.lookup_entity_id('clientes', "Acme") == 7
+        # Escribir en clientes no descarta el índice de tecnicos
+        invalidate_tables('clientes')
+        assert entity_resolver.lookup_entity_id('tecnicos', "Juan Pérez") == 1
+        assert lecturas == ['tecnicos', 'clientes']
+
+        # Un faltante (creado en otra réplica) relee la tabla y deja el índice actualizado
+        filas['tecnicos'].append((2, "Ana Gómez"))
+        assert entity_resolver.lookup_entity_id('tecnicos', "Ana Gómez") == 2
+        assert entity_resolver.lookup_entity_id('tecnicos', "Ana Gómez") == 2
+        assert lecturas == ['tecnicos', 'clientes', 'tecnicos']
+    finally:
+        clear_query_cache()
@@ -0,0 +1,43 @@
+import io
+from datetime import datetime
+
+import openpyxl
+import pandas as pd
+
+from modules.excel_stream import excel_sheet_names, iter_excel_chunks, read_excel_sheet
+
+
+def _workbook_bytes():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Registros"
+    ws.append(["Fecha", " Técnico ", "Tiempo", "Tiempo", None])
+    for i in range(7):
+        ws.append([datetime(2025, 3, i + 1), f"Tec {i}", i, "NaT", None])
+    ws.append([None, None, None, None, None])  # fila vacía: se omite
+    wb.create_sheet("Otra").append(["x"])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_iter_excel_chunks_bloques_tipados():
+    source = _workbook_bytes()
+    assert excel_sheet_names(source) == ["Registros", "Otra"]
+
+    chunks = list(iter_excel_chunks(source, "Registros", chunk_size=3, normalize_columns=True, na_values=["NaT"]))
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    assert list(chunks[0].columns) == ["Fecha", "Tecnico", "Tiempo", "Tiempo.1"]
+    assert pd.api.types.is_datetime64_any_dtype(chunks[0]["Fecha"])
+    assert chunks[0]["Tiempo"].tolist() == [0, 1, 2]
+    assert chunks[2]["Tiempo.1"].isna().all()
+
+
+def test_read_excel_sheet_igual_a_pandas():
+    source = _workbook_bytes()
+    expected = pd.read_excel(source, sheet_name="Registros").dropna(how="all")
+    df = read_excel_sheet(source, "Registros")
+    assert list(df.columns) == list(expected.columns)
+    assert df["Fecha"].tolist() == expected["Fecha"].tolist()
+    assert len(read_excel_sheet(source, "Registros", max_rows=2)) == 2
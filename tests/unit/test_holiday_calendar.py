@@ -0,0 +1,35 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from modules import database as db
+from modules.holiday_calendar import HolidayCalendar, get_holiday_calendar
+
+
+def test_is_business_day_vectorizado_coincide_con_escalar():
+    cal = HolidayCalendar([date(2024, 5, 1), '2024-05-25'], 2024, 2024)
+    days = pd.date_range('2024-04-28', '2024-05-31')
+    esperado = [d.weekday() < 5 and d.date() not in {date(2024, 5, 1)} for d in days]
+    assert list(cal.is_business_day(days)) == esperado
+    assert [cal.is_business_day(d) for d in days] == esperado
+    assert cal.business_days('2024-04-29', '2024-05-03') == [
+        date(2024, 4, 29), date(2024, 4, 30), date(2024, 5, 2), date(2024, 5, 3)
+    ]
+    assert list(cal.is_business_day([None, '2024-05-02'])) == [False, True]
+
+
+def test_calendario_se_invalida_al_modificar_feriados():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+    fecha = date(2031, 3, 12)
+    assert not get_holiday_calendar(fecha).is_holiday(fecha)
+    feriado_id = db.add_feriado(fecha, "Feriado de prueba")
+    try:
+        assert db.is_feriado(fecha)
+        db.toggle_feriado(feriado_id, activo=False)
+        assert not db.is_feriado(fecha)
+    finally:
+        db.delete_feriado(feriado_id)
+    assert not get_holiday_calendar(fecha).is_holiday(fecha)
@@ -0,0 +1,28 @@
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from modules import database as db
+from modules.parquet_export import export_registros_parquet, partition_key, partition_path
+
+
+def test_rutas_de_particion():
+    assert partition_key(date(2026, 3, 1)) == "2026-03"
+    assert partition_key(None) == "sin_fecha"
+    assert partition_path("out", date(2026, 3, 1)) == os.path.join("out", "anio=2026", "mes_numero=3")
+    assert partition_path("out", None).endswith(os.path.join(
+        "anio=__HIVE_DEFAULT_PARTITION__", "mes_numero=__HIVE_DEFAULT_PARTITION__"))
+
+
+def test_exportacion_incremental(tmp_path):
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+
+    primera = export_registros_parquet(str(tmp_path))
+    segunda = export_registros_parquet(str(tmp_path))
+    assert segunda['escritas'] == [] and segunda['sin_cambios'] == len(primera['escritas'])
+    if primera['registros']:
+        assert len(pd.read_parquet(tmp_path)) == primera['registros']
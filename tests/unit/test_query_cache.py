@@ -0,0 +1,85 @@
+import time
+import pytest
+import pandas as pd
+from modules import database as db
+from modules.cache_invalidation import cache_version, start_invalidation_listener
+from modules.query_cache import QueryCache
+
+
+def test_cache_sirve_copias_hasta_invalidar():
+    cache = QueryCache()
+    calls = []
+
+    @cache.cached('clientes')
+    def get_clientes(only_active=False):
+        calls.append(only_active)
+        return pd.DataFrame({'nombre': ['A', 'B']})
+
+    df = get_clientes()
+    df['extra'] = 1  # modificar el resultado no debe alterar la caché
+    assert 'extra' not in get_clientes().columns
+    assert calls == [False]
+
+    get_clientes(only_active=True)
+    assert calls == [False, True]
+
+    assert cache.invalidate('marcas') == 0
+    get_clientes()
+    assert calls == [False, True]
+
+    assert cache.invalidate('clientes') == 2
+    get_clientes()
+    assert calls == [False, True, False]
+
+
+def test_cache_no_guarda_dataframe_de_error():
+    cache = QueryCache()
+    calls = []
+
+    @cache.cached('roles')
+    def get_roles():
+        calls.append(1)
+        return pd.DataFrame()
+
+    get_roles()
+    get_roles()
+    assert len(calls) == 2
+
+
+def test_cache_descarta_al_cambiar_scope():
+    cache = QueryCache()
+    scope = [object()]
+    cache.set_scope_provider(lambda: scope[0])
+    calls = []
+
+    @cache.cached('grupos_puntajes')
+    def get_puntaje(nombre):
+        calls.append(nombre)
+        return 5
+
+    assert get_puntaje('G') == 5
+    assert get_puntaje('G') == 5
+    scope[0] = object()
+    assert get_puntaje('G') == 5
+    assert calls == ['G', 'G']
+
+
+def test_notify_de_otra_conexion_invalida_la_clave():
+    if not db.test_connection():
+        pytest.skip("No hay conexión disponible a PostgreSQL para ejecutar este test.")
+    assert db.ensure_schema() is True
+    listener = start_invalidation_listener(db.get_connect_kwargs())
+    assert listener.connected.wait(5)
+
+    before = cache_version('registros', 42)
+    other = cache_version('registros', 43)
+    with db.db_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pg_notify('sigo_cache_invalidation', '{\"table\": \"registros\", \"key\": \"42\"}')")
+        conn.commit()
+
+    deadline = time.monotonic() + 5
+    while cache_version('registros', 42) == before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert cache_version('registros', 42) != before
+    assert cache_version('registros', 43) == other
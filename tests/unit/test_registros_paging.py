@@ -0,0 +1,29 @@
+from datetime import date
+
+import pytest
+
+from modules.registros_paging import _filter_sql, period_bounds
+
+
+def test_period_bounds_meses_y_rangos():
+    assert period_bounds('custom_month', 12, 2025) == (date(2025, 12, 1), date(2025, 12, 31))
+    assert period_bounds('custom_month', 2, 2024) == (date(2024, 2, 1), date(2024, 2, 29))
+    assert period_bounds('custom_range', start_date=date(2025, 3, 5), end_date=date(2025, 3, 9)) == (date(2025, 3, 5), date(2025, 3, 9))
+    assert period_bounds('all_time') == (None, None)
+    desde, hasta = period_bounds('current_month')
+    assert desde.day == 1 and desde <= date.today() <= hasta
+
+
+def test_filtros_desconocidos_se_rechazan():
+    with pytest.raises(ValueError):
+        _filter_sql({'tecnicos': 'Ana'})
+
+
+def test_rango_ubica_registros_sin_fecha_por_creacion(monkeypatch):
+    monkeypatch.setattr('modules.registros_paging.registros_fecha_sql', lambda: "r.fecha_date")
+    clauses, _ = _filter_sql({'fecha_desde': date(2025, 3, 5), 'fecha_hasta': date(2025, 3, 9)})
+    assert clauses == ["r.fecha_date >= :fecha_desde", "r.fecha_date <= :fecha_hasta"]
+    clauses, _ = _filter_sql({'fecha_desde': date(2025, 3, 5), 'fecha_hasta': date(2025, 3, 9),
+                              'sin_fecha_por_creacion': True})
+    assert clauses == ["COALESCE(r.fecha_date, r.created_at::date) >= :fecha_desde",
+                       "COALESCE(r.fecha_date, r.created_at::date) <= :fecha_hasta"]
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from modules.score_engine import compute_scores
+
+
+def _puntajes(key, values):
+    return pd.DataFrame({key: list(values), 'puntaje': list(values.values())})
+
+
+def test_compute_scores_coincide_con_el_calculo_por_registro():
+    registros = pd.DataFrame({
+        'tecnico': ['Ana', 'Ana', 'Beto', 'Beto', 'Ana'],
+        'cliente': ['ACME', 'Globex', 'ACME', 'Globex', 'ACME'],
+        'tipo_tarea': ['Soporte', 'Instalación', 'Soporte', 'Sin puntaje', 'Soporte'],
+        'grupo': ['G1', 'G2', None, 'G1', 'G1'],
+        'tiempo': [2.0, 1.5, 3.0, 4.0, 0.5],
+    })
+    tipos = _puntajes('descripcion', {'Soporte': 2, 'Instalación': 3, 'Sin puntaje': 0})
+    clientes = _puntajes('nombre', {'ACME': 5, 'Globex': 1})
+    grupos = _puntajes('nombre', {'G1': 2, 'G2': 4})
+
+    # Cálculo fila por fila como lo hacían las vistas: factor mínimo 1, PT=(T×C×N)×H
+    tipos_dict, clientes_dict, grupos_dict = (dict(zip(df.iloc[:, 0], df['puntaje'])) for df in (tipos, clientes, grupos))
+    esperado = {}
+    for _, r in registros.iterrows():
+        pt = max(1, tipos_dict.get(r['tipo_tarea'], 0)) * max(1, clientes_dict.get(r['cliente'], 0)) \
+            * max(1, grupos_dict.get(r['grupo'], 0)) * r['tiempo']
+        total, cantidad = esperado.get(r['tecnico'], (0, 0))
+        esperado[r['tecnico']] = (total + pt, cantidad + 1)
+
+    scores = compute_scores(registros, tipos, clientes, grupos)
+    por_tecnico = scores['por_tecnico'].set_index('tecnico')
+    for tecnico, (total, cantidad) in esperado.items():
+        assert por_tecnico.loc[tecnico, 'puntaje'] == round(total)
+        assert por_tecnico.loc[tecnico, 'cantidad_registros'] == cantidad
+        assert por_tecnico.loc[tecnico, 'promedio'] == round(total / cantidad)
+    assert scores['por_cliente'].set_index('cliente')['cantidad_registros'].to_dict() == {'ACME': 3, 'Globex': 2}
+
+    # El agregado por combinación da lo mismo que los registros sueltos
+    base = (registros.assign(registros=1).groupby(['tecnico', 'cliente', 'tipo_tarea', 'grupo'], dropna=False)
+            .agg(horas=('tiempo', 'sum'), registros=('registros', 'sum')).reset_index())
+    agregado = compute_scores(base, tipos, clientes, grupos)
+    pd.testing.assert_frame_equal(agregado['por_tecnico'], scores['por_tecnico'])
+    pd.testing.assert_frame_equal(agregado['por_cliente'], scores['por_cliente'])
+
+    diagnostico = scores['diagnostico_ceros']
+    assert sorted(zip(diagnostico['tecnico'], diagnostico['tipo_tarea'])) == [('Beto', 'Sin puntaje'), ('Beto', 'Soporte')]
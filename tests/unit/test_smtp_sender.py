@@ -0,0 +1,91 @@
+import smtplib
+
+import pytest
+
+from modules import smtp_sender
+from modules.smtp_sender import SMTPSender
+
+CONFIG = {'host': 'smtp.example.com', 'port': '587', 'security': 'tls', 'user': 'u', 'password': 'p', 'from_email': 'sigo@example.com'}
+
+
+class FakeSMTP:
+    sessions = []
+    fail_next = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        FakeSMTP.sessions.append(self)
+
+    def ehlo(self):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def send_message(self, message):
+        if FakeSMTP.fail_next:
+            raise FakeSMTP.fail_next.pop(0)
+        self.sent.append(message['To'])
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    FakeSMTP.sessions = []
+    FakeSMTP.fail_next = []
+    monkeypatch.setattr(smtp_sender.smtplib, 'SMTP', FakeSMTP)
+    monkeypatch.setattr(smtp_sender.time, 'sleep', lambda s: None)
+    return FakeSMTP
+
+
+def test_reutiliza_la_sesion_y_reintenta_transitorios(fake_smtp):
+    with SMTPSender(CONFIG, max_messages_per_session=30) as sender:
+        for i in range(50):
+            sender.send(f"u{i}@example.com", "Asunto", "Cuerpo")
+        assert len(fake_smtp.sessions) == 2
+        fake_smtp.fail_next.append(smtplib.SMTPServerDisconnected("cortado"))
+        sender.send("otro@example.com", "Asunto", "Cuerpo")
+    assert len(fake_smtp.sessions) == 3
+    assert sender.stats == {'sessions': 3, 'sent': 51, 'retries': 1}
+
+
+def test_error_permanente_no_se_reintenta(fake_smtp):
+    sender = SMTPSender(CONFIG)
+    fake_smtp.fail_next.append(smtplib.SMTPRecipientsRefused({'x@example.com': (550, b'no')}))
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        sender.send("x@example.com", "Asunto", "Cuerpo")
+    sender.send("y@example.com", "Asunto", "Cuerpo")
+    assert len(fake_smtp.sessions) == 1
+    assert sender.stats['retries'] == 0
+
+
+def test_clasificacion_de_errores_transitorios():
+    import socket
+    import ssl
+
+    assert smtp_sender._is_transient(smtplib.SMTPServerDisconnected("cortada"))
+    assert smtp_sender._is_transient(smtplib.SMTPDataError(451, b"reintentar"))
+    assert smtp_sender._is_transient(socket.timeout())
+    assert smtp_sender._is_transient(ConnectionResetError())
+    assert not smtp_sender._is_transient(smtplib.SMTPDataError(554, b"rechazado"))
+    assert not smtp_sender._is_transient(smtplib.SMTPNotSupportedError("STARTTLS extension not supported"))
+    assert not smtp_sender._is_transient(ssl.SSLCertVerificationError("certificado inválido"))
+
+
+def test_envio_real_contra_el_sink_local():
+    from modules.smtp_sink import SMTPSink
+
+    with SMTPSink() as sink:
+        with SMTPSender(sink.smtp_config()) as sender:
+            sender.send("a@example.com", "Notificación", "Línea 1\n.línea con punto")
+            sender.send("b@example.com", "Otra", "Cuerpo")
+    assert sink.session_count == 1
+    assert [m['rcpt_to'] for m in sink.messages] == [['<a@example.com>'], ['<b@example.com>']]
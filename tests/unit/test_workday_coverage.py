@@ -0,0 +1,14 @@
+from datetime import date
+
+import pandas as pd
+
+from modules.workday_coverage import coverage_deficits, format_deficit
+
+
+def test_coverage_deficits_por_usuario_y_dia():
+    days = [date(2024, 5, 2), date(2024, 5, 3), date(2024, 5, 6)]
+    matrix = pd.DataFrame([[8.0, 0.0, 4.0], [2.5, 9.0, 0.0]], index=[10, 20], columns=days)
+    deficits = coverage_deficits(matrix)
+    assert deficits == {10: [(date(2024, 5, 3), 0.0)], 20: [(date(2024, 5, 2), 2.5), (date(2024, 5, 6), 0.0)]}
+    assert [format_deficit(*d) for d in deficits[20]] == ["02/05 (2.5hs)", "06/05 (Sin carga)"]
+    assert coverage_deficits(matrix, min_hours=2) == {10: [(date(2024, 5, 3), 0.0)], 20: [(date(2024, 5, 6), 0.0)]}